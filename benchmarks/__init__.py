@@ -0,0 +1 @@
+# benchmarks/ — medições de desempenho (rodam offline, sem GUI)
@@ -0,0 +1,106 @@
+# benchmarks/bench_cnab240.py
+"""
+Memória e tempo da leitura em fluxo do CNAB240 (iter_titulos_cnab240) contra
+a leitura anterior, que guardava todos os segmentos P e Q em dicionários.
+
+Gera arquivos sintéticos com P/Q/R por título e mede o pico de memória
+(tracemalloc) percorrendo os títulos sem acumulá-los: no fluxo o pico deve
+ficar constante com o tamanho do arquivo. Também confere os trailers.
+
+Uso:
+    python -m benchmarks.bench_cnab240 [segmentos ...]
+"""
+import os, sys, time, argparse, tempfile, tracemalloc
+
+from src.conversor_bb240 import iter_titulos_cnab240, _campos_p, _campos_q, ErroCnab240
+
+def _reg(campos: dict) -> str:
+    ln = [" "] * 240
+    for ini, val in campos.items():
+        ln[ini - 1:ini - 1 + len(val)] = list(val)
+    return "".join(ln) + "\r\n"
+
+def gerar_cnab240(path: str, titulos: int, com_r: bool = True, trailer_ok: bool = True,
+                  por_lote: int = 20_000) -> int:
+    """Arquivo com lotes de até 'por_lote' títulos (o sequencial tem 5 dígitos por lote)."""
+    segs = 3 if com_r else 2
+    lotes = max(1, -(-titulos // por_lote))
+    with open(path, "w", encoding="latin-1", newline="") as f:
+        f.write(_reg({1: "001", 4: "0000", 8: "0"}))
+        i = 0
+        for lote in range(1, lotes + 1):
+            n_lote = min(por_lote, titulos - i)
+            cod = f"{lote:04d}"
+            f.write(_reg({1: "001", 4: cod, 8: "1"}))
+            seq = 0
+            for _ in range(n_lote):
+                seq += 1
+                f.write(_reg({1: "001", 4: cod, 8: "3", 9: f"{seq:05d}", 14: "P",
+                              63: f"{i + 1:010d}-1".ljust(15), 78: "15082025",
+                              86: f"{(i % 100000) * 100 + 99:015d}", 111: "01072025"}))
+                seq += 1
+                f.write(_reg({1: "001", 4: cod, 8: "3", 9: f"{seq:05d}", 14: "Q",
+                              19: "02", 21: f"{i:015d}", 36: f"SACADO {i}".ljust(40),
+                              76: "RUA X".ljust(40), 116: "CENTRO".ljust(15), 131: "01001000",
+                              139: "SAO PAULO".ljust(15), 154: "SP"}))
+                if com_r:
+                    seq += 1
+                    f.write(_reg({1: "001", 4: cod, 8: "3", 9: f"{seq:05d}", 14: "R"}))
+                i += 1
+            regs_lote = seq + 2 + (0 if trailer_ok else 1)
+            f.write(_reg({1: "001", 4: cod, 8: "5", 18: f"{regs_lote:06d}"}))
+        f.write(_reg({1: "001", 4: "9999", 8: "9", 18: f"{lotes:06d}",
+                      24: f"{titulos * segs + 2 * lotes + 2:06d}"}))
+    return titulos * segs
+
+def _leitura_antiga(path: str) -> int:
+    """Mesmo esquema do parser anterior: guarda todos os P e Q antes de casar."""
+    segP, segQ = {}, {}
+    with open(path, "r", encoding="latin-1") as f:
+        for ln in f:
+            if len(ln) < 240 or ln[7] != "3":
+                continue
+            chave = (ln[3:7], int(ln[8:13]))
+            if ln[13] == "P":
+                segP[chave] = _campos_p(ln)
+            elif ln[13] == "Q":
+                segQ[(chave[0], chave[1] - 1)] = _campos_q(ln)   # casado pelo P anterior
+    return sum(1 for k in segP if k in segQ)
+
+def _medir(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n = fn()
+    dt = time.perf_counter() - t0
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return n, dt, pico
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("segmentos", nargs="*", type=int, default=[50_000, 500_000])
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruim = os.path.join(tmp, "ruim.240")
+        gerar_cnab240(ruim, 10, trailer_ok=False)
+        try:
+            sum(1 for _ in iter_titulos_cnab240(ruim))
+            raise AssertionError("trailer de lote divergente não foi detectado")
+        except ErroCnab240 as e:
+            print(f"trailer conferido: {e}")
+
+        for segs in args.segmentos:
+            path = os.path.join(tmp, f"s{segs}.240")
+            titulos = segs // 3
+            gerar_cnab240(path, titulos)
+            n_f, t_f, pico_f = _medir(lambda: sum(1 for _ in iter_titulos_cnab240(path)))
+            n_a, t_a, pico_a = _medir(lambda: _leitura_antiga(path))
+            if n_f != titulos or n_a != titulos:
+                raise AssertionError(f"títulos: fluxo {n_f}, antigo {n_a}, esperado {titulos}")
+            print(f"{segs:>9,} segmentos • fluxo: {t_f:6.2f}s pico {pico_f / 1024:8,.0f} KiB"
+                  f" • dicionários: {t_a:6.2f}s pico {pico_a / 1024:10,.0f} KiB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
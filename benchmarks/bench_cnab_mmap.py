@@ -0,0 +1,91 @@
+# benchmarks/bench_cnab_mmap.py
+"""
+utils.cnab_mmap contra a leitura linha a linha em str, num CNAB400 grande:
+contagem de registros, leitura do registro N (trailer) e parser completo de
+títulos (_ler_cnab400_bradesco), conferindo que o resultado é o mesmo.
+
+Uso:
+    python -m benchmarks.bench_cnab_mmap [titulos]
+"""
+import os, sys, time, argparse, tempfile, tracemalloc
+
+from utils.cnab_mmap import ArquivoCnab, txt
+from utils.titulo import Titulo, data
+from src.extrator_titulos import _ler_cnab400_bradesco, _doc_base_sem_dv, _doc_pagador_14
+from benchmarks.bench_titulo import gerar_cnab400
+
+def _ler_antigo(arquivo):
+    """Parser anterior: open() em modo texto, uma str por linha."""
+    titulos = []
+    with open(arquivo, "r", encoding="latin-1") as f:
+        for ln in f:
+            if not ln or ln[0] != "1":
+                continue
+            l = ln.rstrip("\r\n")
+            try:
+                venc, emis = data(l[120:126]), data(l[150:156])
+                if venc is None or emis is None:
+                    raise ValueError
+                titulos.append(Titulo(
+                    sacado=l[234:274].strip(), documento=_doc_base_sem_dv(l[110:120].strip()),
+                    valor_centavos=int(l[126:139]), vencimento=venc, emissao=emis,
+                    sacado_cnpj=_doc_pagador_14(l[220:234].strip()), sacado_endereco=l[274:314].strip(),
+                ))
+            except Exception:
+                continue
+    return titulos
+
+def _contar_antigo(arquivo):
+    with open(arquivo, "r", encoding="latin-1") as f:
+        return sum(1 for _ in f)
+
+def _ultimo_antigo(arquivo):
+    ultimo = ""
+    with open(arquivo, "r", encoding="latin-1") as f:
+        for ln in f:
+            ultimo = ln
+    return ultimo.rstrip("\r\n")
+
+def _contar_mmap(arquivo):
+    with ArquivoCnab(arquivo) as arq:
+        return len(arq)
+
+def _ultimo_mmap(arquivo):
+    with ArquivoCnab(arquivo) as arq:
+        return txt(arq[-1])
+
+def _medir(fn, *args):
+    """Tempo sem tracemalloc (que pesa em cada alocação) e pico de memória numa 2ª execução."""
+    t0 = time.perf_counter()
+    r = fn(*args)
+    dt = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(*args)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return r, dt, pico
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("titulos", nargs="?", type=int, default=200_000)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grande.REM")
+        gerar_cnab400(path, args.titulos)
+        print(f"arquivo: {os.path.getsize(path) / 2**20:.1f} MiB, {args.titulos:,} títulos")
+        for rotulo, antigo, novo in (
+            ("contagem de registros", _contar_antigo, _contar_mmap),
+            ("último registro", _ultimo_antigo, _ultimo_mmap),
+            ("parser de títulos", _ler_antigo, _ler_cnab400_bradesco),
+        ):
+            ra, ta, pa = _medir(antigo, path)
+            rn, tn, pn = _medir(novo, path)
+            if ra != rn:
+                raise AssertionError(f"{rotulo}: resultados diferentes")
+            print(f"{rotulo:22s} linhas: {ta * 1000:9.2f} ms ({pa / 1024:8,.0f} KiB) • "
+                  f"mmap: {tn * 1000:9.2f} ms ({pn / 1024:8,.0f} KiB)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# benchmarks/bench_codigo_barras.py
+"""
+Compara o cálculo escalar (montar_codigo_barras / montar_linha_digitavel /
+dv_nosso_numero_base7) com montar_codigos_lote.
+
+Antes de medir, confere em uma amostra aleatória que o lote produz exatamente
+os mesmos códigos que a implementação escalar.
+
+Uso:
+    python -m benchmarks.bench_codigo_barras [quantidade] [--conferir N]
+"""
+import sys, time, random, argparse
+from datetime import date, timedelta
+
+from utils.boletos_bmp import (
+    montar_codigo_barras, montar_linha_digitavel, dv_nosso_numero_base7,
+    montar_codigos_lote, np,
+)
+
+PARAM = {"agencia": "0001", "carteira": "09", "conta": "0907031"}
+
+def gerar_entradas(n: int, seed: int = 42):
+    rnd = random.Random(seed)
+    base = date(2024, 1, 1)
+    vencs = [(base + timedelta(days=rnd.randint(0, 900))).strftime("%d/%m/%Y") for _ in range(n)]
+    cents = [rnd.randint(1, 10**9) for _ in range(n)]
+    nns   = [f"{rnd.randint(1, 10**11 - 1):011d}" for _ in range(n)]
+    return vencs, cents, nns
+
+def _escalar(vencs, cents, nns):
+    out = []
+    for v, c, nn in zip(vencs, cents, nns):
+        t = {"vencimento": v, "valor": f"{c // 100},{c % 100:02d}", "nosso_numero": nn}
+        cb = montar_codigo_barras(PARAM, t)
+        out.append((cb, montar_linha_digitavel(cb), dv_nosso_numero_base7(PARAM["carteira"], nn)))
+    return out
+
+def conferir(n: int, seed: int = 7) -> None:
+    """Propriedade: lote == escalar para entradas aleatórias."""
+    vencs, cents, nns = gerar_entradas(n, seed)
+    esperado = _escalar(vencs, cents, nns)
+    barras, linhas, dvs = montar_codigos_lote(PARAM, vencs, cents, nns)
+    for i, (cb, ld, dv) in enumerate(esperado):
+        if (cb, ld, dv) != (barras[i], linhas[i], dvs[i]):
+            raise AssertionError(f"divergência no item {i}: {(cb, ld, dv)} != {(barras[i], linhas[i], dvs[i])}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("quantidade", nargs="?", type=int, default=1_000_000)
+    ap.add_argument("--conferir", type=int, default=20_000, help="tamanho da amostra conferida")
+    args = ap.parse_args(argv)
+
+    conferir(args.conferir)
+    print(f"conferência OK ({args.conferir} títulos) • NumPy: {'sim' if np is not None else 'não'}")
+
+    vencs, cents, nns = gerar_entradas(args.quantidade)
+
+    t0 = time.perf_counter()
+    montar_codigos_lote(PARAM, vencs, cents, nns)
+    t_lote = time.perf_counter() - t0
+
+    amostra = min(args.quantidade, 100_000)
+    t0 = time.perf_counter()
+    _escalar(vencs[:amostra], cents[:amostra], nns[:amostra])
+    t_esc = (time.perf_counter() - t0) * (args.quantidade / amostra)
+
+    print(f"títulos: {args.quantidade:,}")
+    print(f"escalar: {t_esc:8.2f} s (extrapolado de {amostra:,})")
+    print(f"lote   : {t_lote:8.2f} s  ({args.quantidade / t_lote:,.0f} títulos/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# benchmarks/bench_i25.py
+"""
+Desenho do I2of5: c.rect por barra (implementação anterior) x path único
+com geometria memorizada (utils.i25).
+
+Confere que as duas versões produzem as mesmas barras (posição/largura) e mede
+o tempo de desenho. Com reportlab instalado mede em um Canvas real (PDF em
+memória); sem ele, mede só a emissão das primitivas.
+
+Uso:
+    python -m benchmarks.bench_i25 [boletos]
+"""
+import io, sys, time, random, argparse
+
+from utils.i25 import desenhar_i25, barras_i25, _paths
+
+try:
+    from reportlab.pdfgen import canvas as rl_canvas
+    from reportlab.lib.units import mm
+except Exception:
+    rl_canvas = None
+    mm = 72.0 / 25.4
+
+BAR_W, BAR_H, QUIET, RATIO = 0.33 * mm, 13 * mm, 5 * mm, 2.2
+
+def _draw_i25_rects(c, digits, x, y, barWidth, barHeight, quiet_zone, ratio):
+    """Versão anterior de src.boletos.draw_i25 (um c.rect por barra)."""
+    patt = {'0':'nnwwn','1':'wnnnw','2':'nwnnw','3':'wwnnn','4':'nnwnw','5':'wnwnn','6':'nwwnn','7':'nnnww','8':'wnnwn','9':'nwnwn'}
+    def w(ch): return 1 if ch=='n' else ratio
+    if len(digits) % 2 == 1: digits = '0' + digits
+    cursor = x + quiet_zone
+    seq = [('bar', w('n')), ('sp', w('n')), ('bar', w('n')), ('sp', w('n'))]
+    for i in range(0, len(digits), 2):
+        a,b = digits[i],digits[i+1]; pa,pb = patt[a],patt[b]
+        for k in range(5):
+            seq.append(('bar', w(pa[k]))); seq.append(('sp', w(pb[k])))
+    seq.extend([('bar', w('w')), ('sp', w('n')), ('bar', w('n'))])
+    for kind, units in seq:
+        bw = units * barWidth
+        if kind == 'bar':
+            c.rect(cursor, y, bw, barHeight, stroke=0, fill=1)
+        cursor += bw
+    return cursor + quiet_zone
+
+class _Path:
+    def __init__(self):
+        self.rects = []
+    def rect(self, x, y, w, h):
+        self.rects.append((x, y, w, h))
+
+class _Registro:
+    """Canvas mínimo que só registra os retângulos emitidos (para conferência/medição)."""
+    def __init__(self):
+        self.rects = []
+        self._orig = (0.0, 0.0)
+        self._pilha = []
+    def rect(self, x, y, w, h, stroke=0, fill=1):
+        self.rects.append((x, y, w, h))
+    def saveState(self):
+        self._pilha.append(self._orig)
+    def restoreState(self):
+        self._orig = self._pilha.pop()
+    def translate(self, dx, dy):
+        self._orig = (self._orig[0] + dx, self._orig[1] + dy)
+    def beginPath(self):
+        return _Path()
+    def drawPath(self, p, stroke=0, fill=1):
+        ox, oy = self._orig
+        self.rects.extend((x + ox, y + oy, w, h) for x, y, w, h in p.rects)
+
+def _codigos(n, seed=3):
+    rnd = random.Random(seed)
+    return ["".join(rnd.choice("0123456789") for _ in range(44)) for _ in range(n)]
+
+def conferir(codigos):
+    for cod in codigos:
+        a, b = _Registro(), _Registro()
+        fim_a = _draw_i25_rects(a, cod, 10, 20, BAR_W, BAR_H, QUIET, RATIO)
+        fim_b = desenhar_i25(b, cod, 10, 20, BAR_W, BAR_H, QUIET, RATIO)
+        if len(a.rects) != len(b.rects) or abs(fim_a - fim_b) > 1e-6:
+            raise AssertionError(f"geometria divergente para {cod}")
+        for ra, rb in zip(a.rects, b.rects):
+            if any(abs(p - q) > 1e-6 for p, q in zip(ra, rb)):
+                raise AssertionError(f"barra divergente para {cod}: {ra} != {rb}")
+
+def _medir(fn, codigos, repeticoes):
+    """Desenha cada código 'repeticoes' vezes (reimpressões) em um mesmo canvas."""
+    c = rl_canvas.Canvas(io.BytesIO()) if rl_canvas is not None else _Registro()
+    t0 = time.perf_counter()
+    for _ in range(repeticoes):
+        for cod in codigos:
+            fn(c, cod, 10, 20, BAR_W, BAR_H, QUIET, RATIO)
+    return time.perf_counter() - t0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("boletos", nargs="?", type=int, default=2000)
+    args = ap.parse_args(argv)
+
+    codigos = _codigos(args.boletos)
+    conferir(codigos[:200])
+    print(f"geometria idêntica (200 códigos) • reportlab: {'sim' if rl_canvas is not None else 'não'}")
+
+    n = args.boletos
+    for rotulo, rep in (("códigos novos", 1), ("reimpressão x5", 5)):
+        barras_i25.cache_clear(); _paths.clear()
+        t_rect = _medir(_draw_i25_rects, codigos, rep)
+        barras_i25.cache_clear(); _paths.clear()
+        t_path = _medir(desenhar_i25, codigos, rep)
+        print(f"[{rotulo}] boletos: {n * rep:,}")
+        print(f"  c.rect por barra : {t_rect * 1e6 / (n * rep):8.1f} µs/boleto")
+        print(f"  path único       : {t_path * 1e6 / (n * rep):8.1f} µs/boleto")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# benchmarks/bench_log.py
+"""
+Custo do log na busca de Nosso Número (nn_registry.buscar_nosso_numero):
+a versão anterior, com print() de [DEBUG] por registro comparado, contra o
+logger com DEBUG desligado (padrão) e ligado (fila -> arquivo rotativo).
+
+Os print() vão para os.devnull, então o número da versão antiga é o melhor
+caso; num console do Windows a diferença é bem maior.
+
+Uso:
+    python -m benchmarks.bench_log [--registros 5000] [--buscas 200]
+"""
+import os, sys, time, random, logging, argparse, tempfile, contextlib
+from datetime import date, timedelta, datetime
+
+import utils.nn_registry as nn_registry
+from utils import log as nlog, store
+from utils.titulo import Titulo
+
+def _popular(n: int, seed: int = 7) -> list[Titulo]:
+    rnd = random.Random(seed)
+    base = date(2025, 1, 1)
+    titulos = []
+    for i in range(n):
+        titulos.append(Titulo(
+            sacado=f"SACADO {i}", documento=f"{i % 997:06d}",   # documentos repetidos: mais linhas "comparando"
+            valor_centavos=rnd.randint(100, 10**7), vencimento=base + timedelta(days=rnd.randint(0, 365)),
+            sacado_cnpj=f"{rnd.randint(0, 10**14 - 1):014d}", nosso_numero=f"{i + 1:011d}"))
+    return titulos
+
+def _buscar_antigo(titulo) -> str | None:
+    """Cópia da busca anterior, com os print() de depuração."""
+    k = nn_registry._key_from_titulo(titulo)
+    latest_dt, nn = None, None
+    print(f"[DEBUG] Buscando NN para chave: {k}")
+    for r in nn_registry._iter_rows():
+        rk = (nn_registry._doc_norm(r["documento"]), r["vencimento"], r["valor_centavos"],
+              nn_registry._dig(r["doc_pagador"]))
+        if r["documento"] and nn_registry._doc_norm(r["documento"]) == k[0]:
+            print(f"[DEBUG] Comparando:")
+            print(f"  Procurado: {k}")
+            print(f"  Registro:  {rk}")
+            print(f"  Match: {rk == k}")
+        if rk == k and r.get("nosso_numero"):
+            try:
+                dt = datetime.fromisoformat((r.get("criado_em") or "").replace(" ", "T"))
+            except Exception:
+                dt = None
+            if latest_dt is None or (dt and dt > latest_dt):
+                latest_dt, nn = dt, r["nosso_numero"]
+                print(f"[DEBUG] NN encontrado: {nn}")
+    if not nn:
+        print(f"[DEBUG] Nenhum NN encontrado para {k}")
+    return nn
+
+def _medir(fn, amostra) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    achados = sum(1 for t in amostra if fn(t))
+    return time.perf_counter() - t0, achados
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--registros", type=int, default=5000)
+    ap.add_argument("--buscas", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nn_registry.REG_PATH = os.path.join(tmp, "nn_registry.csv")
+        store._DB_PATH = os.path.join(tmp, "nasapay.db")
+        titulos = _popular(args.registros)
+        nn_registry.registrar_titulos(titulos, {"agencia": "1", "conta": "1", "carteira": "9"})
+        amostra = random.Random(1).sample(titulos, min(args.buscas, len(titulos)))
+        arquivo_log = os.path.join(tmp, "nasapay.log")
+
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            t_print, n_print = _medir(_buscar_antigo, amostra)
+
+        nlog.configurar(nivel="WARNING", arquivo=arquivo_log, niveis={})
+        t_off, n_off = _medir(nn_registry.buscar_nosso_numero, amostra)
+
+        nlog.configurar(nivel="WARNING", arquivo=arquivo_log, niveis={"nn_registry": "DEBUG"})
+        t_on, n_on = _medir(nn_registry.buscar_nosso_numero, amostra)
+        nlog.encerrar()
+        linhas = sum(1 for _ in open(arquivo_log, encoding="utf-8"))
+
+        if not (n_print == n_off == n_on == len(amostra)):
+            raise AssertionError(f"achados: print {n_print}, off {n_off}, on {n_on}, esperado {len(amostra)}")
+        ms = lambda t: 1000 * t / len(amostra)
+        print(f"{args.registros:,} registros • {len(amostra)} buscas")
+        print(f"  print() [DEBUG] (devnull): {ms(t_print):7.2f} ms/busca")
+        print(f"  logger, DEBUG desligado  : {ms(t_off):7.2f} ms/busca ({t_print / t_off:4.2f}x)")
+        print(f"  logger, DEBUG ligado     : {ms(t_on):7.2f} ms/busca ({linhas:,} linhas no arquivo)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# benchmarks/bench_nfe.py
+"""
+Vazão (arquivos/s) da leitura de NF-e: ET.parse + find (forma anterior)
+contra src.nfe_reader (eventos, só ide/dest/cobr), em sequência e com pool de processos.
+
+Gera NF-es sintéticas com vários itens (det) e duplicatas, confere que o
+leitor novo extrai os mesmos campos que a leitura antiga e mede.
+
+Uso:
+    python -m benchmarks.bench_nfe [arquivos] [--itens N] [--workers N]
+"""
+import os, sys, time, random, argparse, tempfile
+import xml.etree.ElementTree as ET
+from datetime import date, timedelta
+
+from src.nfe_reader import ler_nfe, ler_nfes
+from utils.titulo import centavos, data
+
+_NS_URI = "http://www.portalfiscal.inf.br/nfe"
+
+def _nfe_xml(i: int, itens: int, parcelas: int, rnd: random.Random) -> str:
+    emissao = date(2025, 1, 1) + timedelta(days=rnd.randint(0, 300))
+    det = "".join(
+        f'<det nItem="{k}"><prod><cProd>{k:06d}</cProd><xProd>PRODUTO {k} DESCRICAO LONGA</xProd>'
+        f'<NCM>84713012</NCM><CFOP>5102</CFOP><uCom>UN</uCom><qCom>1.0000</qCom>'
+        f'<vUnCom>{rnd.randint(1, 9999)}.00</vUnCom><vProd>10.00</vProd></prod>'
+        f'<imposto><ICMS><ICMS00><orig>0</orig><CST>00</CST><vBC>10.00</vBC><pICMS>18.00</pICMS>'
+        f'<vICMS>1.80</vICMS></ICMS00></ICMS></imposto></det>'
+        for k in range(1, itens + 1)
+    )
+    dups = "".join(
+        f"<dup><nDup>{p:03d}</nDup><dVenc>{(emissao + timedelta(days=30 * p)).isoformat()}</dVenc>"
+        f"<vDup>{rnd.randint(100, 10**6)}.{rnd.randint(0, 99):02d}</vDup></dup>"
+        for p in range(1, parcelas + 1)
+    )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?><nfeProc xmlns="{_NS_URI}" versao="4.00"><NFe><infNFe Id="NFe{i:044d}">'
+        f"<ide><cUF>35</cUF><nNF>{i}</nNF><dhEmi>{emissao.isoformat()}T10:00:00-03:00</dhEmi></ide>"
+        f"<emit><CNPJ>11222333000181</CNPJ><xNome>EMITENTE</xNome></emit>"
+        f"<dest><CNPJ>{rnd.randint(10**13, 10**14 - 1)}</CNPJ><xNome>CLIENTE {i}</xNome>"
+        f"<enderDest><xLgr>RUA {i}</xLgr><nro>{i % 900}</nro><xBairro>CENTRO</xBairro>"
+        f"<xMun>SAO PAULO</xMun><UF>SP</UF><CEP>01001000</CEP><fone>1133334444</fone></enderDest></dest>"
+        f"{det}<total><ICMSTot><vNF>100.00</vNF></ICMSTot></total>"
+        f"<cobr><fat><nFat>{i}</nFat></fat>{dups}</cobr>"
+        f"<infAdic><infCpl>{'OBS ' * 200}</infCpl></infAdic></infNFe></NFe></nfeProc>"
+    )
+
+def _leitura_antiga(arquivo):
+    """Mesmos campos, do jeito anterior (árvore inteira + find/findtext)."""
+    ns = {"nfe": _NS_URI}
+    root = ET.parse(arquivo).getroot()
+    ide = root.find(".//nfe:ide", namespaces=ns)
+    dest = root.find(".//nfe:dest", namespaces=ns)
+    end = dest.find(".//nfe:enderDest", namespaces=ns)
+    nfe_num = ide.findtext("nfe:nNF", default="", namespaces=ns)
+    nome = dest.findtext("nfe:xNome", default="", namespaces=ns)
+    cidade = end.findtext("nfe:xMun", "", namespaces=ns)
+    out = []
+    for dup in root.findall(".//nfe:dup", namespaces=ns):
+        out.append((
+            f"{nfe_num}-{dup.findtext('nfe:nDup', default='', namespaces=ns)}",
+            data(dup.findtext("nfe:dVenc", default="", namespaces=ns)),
+            centavos(dup.findtext("nfe:vDup", default="0", namespaces=ns)),
+            nome, cidade,
+        ))
+    return out
+
+def _campos(t):
+    return (t.documento, t.vencimento, t.valor_centavos, t.sacado, t.sacado_cidade)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("arquivos", nargs="?", type=int, default=2000)
+    ap.add_argument("--itens", type=int, default=40, help="itens (det) por nota")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    rnd = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        arquivos = []
+        for i in range(1, args.arquivos + 1):
+            p = os.path.join(tmp, f"nfe_{i:06d}.xml")
+            with open(p, "w", encoding="utf-8") as f:
+                f.write(_nfe_xml(i, args.itens, rnd.randint(1, 4), rnd))
+            arquivos.append(p)
+        tam = sum(os.path.getsize(p) for p in arquivos) / len(arquivos)
+        print(f"arquivos: {len(arquivos):,} • {tam / 1024:.1f} KiB/arquivo • {args.itens} itens/nota")
+
+        for p in arquivos[:200]:
+            if [_campos(t) for t in ler_nfe(p)] != _leitura_antiga(p):
+                raise AssertionError(f"divergência em {p}")
+        print("conferência OK (200 arquivos)")
+
+        medidas = (
+            ("ET.parse + find", lambda: [_leitura_antiga(p) for p in arquivos]),
+            ("leitor por eventos", lambda: [ler_nfe(p) for p in arquivos]),
+            ("eventos + processos", lambda: ler_nfes(arquivos, max_workers=args.workers)),
+        )
+        for rotulo, fn in medidas:
+            t0 = time.perf_counter()
+            fn()
+            dt = time.perf_counter() - t0
+            print(f"{rotulo:24s} {len(arquivos) / dt:10,.0f} arquivos/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
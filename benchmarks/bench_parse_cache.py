@@ -0,0 +1,62 @@
+# benchmarks/bench_parse_cache.py
+"""
+Reimportação com utils.parse_cache: primeira leitura (parser + gravação no
+cache) contra as seguintes (sha1 do arquivo + leitura do blob), para um CNAB400
+grande e para um lote de NF-e. Usa uma base SQLite temporária.
+
+Uso:
+    python -m benchmarks.bench_parse_cache [titulos_cnab] [--nfes N]
+"""
+import os, sys, time, random, argparse, tempfile
+
+from utils import store, parse_cache
+from src.extrator_titulos import _ler_cnab400_bradesco, CNAB400_VERSAO
+from src.nfe_reader import ler_nfes
+from benchmarks.bench_titulo import gerar_cnab400
+from benchmarks.bench_nfe import _nfe_xml
+
+def _tempo(fn):
+    t0 = time.perf_counter()
+    r = fn()
+    return time.perf_counter() - t0, r
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("titulos_cnab", nargs="?", type=int, default=100_000)
+    ap.add_argument("--nfes", type=int, default=1000)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store._DB_PATH = os.path.join(tmp, "bench.db")
+
+        rem = os.path.join(tmp, "grande.REM")
+        gerar_cnab400(rem, args.titulos_cnab)
+        ler = lambda: parse_cache.com_cache(rem, "cnab400_bradesco", CNAB400_VERSAO, _ler_cnab400_bradesco)
+        t_frio, a = _tempo(ler)
+        parse_cache._sha1_memo.clear()
+        t_quente, b = _tempo(ler)
+        if a != b:
+            raise AssertionError("cache devolveu títulos diferentes do parser")
+        t_parser, _ = _tempo(lambda: _ler_cnab400_bradesco(rem))
+        print(f"CNAB400 {args.titulos_cnab:,} títulos: parser {t_parser:.3f}s • "
+              f"1ª importação {t_frio:.3f}s • reimportação {t_quente:.3f}s")
+
+        rnd = random.Random(1)
+        xmls = []
+        for i in range(args.nfes):
+            p = os.path.join(tmp, f"nfe_{i:05d}.xml")
+            with open(p, "w", encoding="utf-8") as f:
+                f.write(_nfe_xml(i + 1, 40, 2, rnd))
+            xmls.append(p)
+        t_sem, _ = _tempo(lambda: ler_nfes(xmls, usar_cache=False))
+        t_frio, a = _tempo(lambda: ler_nfes(xmls))
+        parse_cache._sha1_memo.clear()
+        t_quente, b = _tempo(lambda: ler_nfes(xmls))
+        if [x[1] for x in a] != [x[1] for x in b]:
+            raise AssertionError("cache devolveu NF-es diferentes do leitor")
+        print(f"NF-e {args.nfes:,} arquivos: sem cache {t_sem:.3f}s • "
+              f"1ª importação {t_frio:.3f}s • reimportação {t_quente:.3f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
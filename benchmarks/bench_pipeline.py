@@ -0,0 +1,87 @@
+# benchmarks/bench_pipeline.py
+"""
+Tempo do processamento ponta a ponta (remessa + boletos) em sequência contra
+o pipeline de src.processamento, sobre arquivos CNAB 400 sintéticos.
+
+Cada execução usa um banco e pastas temporários novos (sem cache de boletos).
+Imprime a tabela de métricas por etapa do pipeline: a coluna "esp.saí" mostra
+onde houve back-pressure e "ocupado" qual etapa é o gargalo.
+
+Uso:
+    python -m benchmarks.bench_pipeline [--titulos 300] [--arquivos 3] [--workers 2]
+"""
+import os, sys, time, argparse, tempfile
+
+from benchmarks.bench_titulo import gerar_cnab400
+from utils import store, sequencias
+import utils.gerar_remessa as gerar_remessa
+import src.processamento as processamento
+
+def _parametros(tmp: str) -> dict:
+    return {
+        "pastas": {"pasta_salvar_remessa_nasapay": os.path.join(tmp, "remessas"),
+                   "pasta_salvar_boletos": os.path.join(tmp, "boletos")},
+        "agencia": "0001", "conta": "1234567", "carteira": "09",
+        "codigo_empresa": "12345678901234567890",
+    }
+
+def _preparar(tmp: str) -> dict:
+    p = _parametros(tmp)
+    store._DB_PATH = os.path.join(tmp, "nasapay.db")
+    sequencias.LEGADO_JSON = os.path.join(tmp, "config.json")
+    store.init_db()
+    gerar_remessa.carregar_parametros = lambda: p
+    return p
+
+def _sequencial(arquivos: list, p: dict) -> int:
+    """Fluxo anterior: tudo de uma etapa antes da seguinte, um commit por boleto."""
+    from src.extrator_titulos import extrair_titulos_de_arquivos
+    from src.boletos import gerar_boleto_titulos, _codigos_do_lote
+    from utils.parametros import reservar_nossos_numeros
+    titulos = [t for _, _, lidos, _ in extrair_titulos_de_arquivos(arquivos, p) for t in lidos]
+    for t, nn in zip(titulos, reservar_nossos_numeros(p, len(titulos))):
+        t.nosso_numero = nn
+    esc = gerar_remessa.EscritorRemessa(p)
+    for t in titulos:
+        esc.escrever(t)
+    esc.concluir()
+    for t, cod in zip(titulos, _codigos_do_lote(titulos, p)):
+        gerar_boleto_titulos(t, codigos=cod, parametros=p)
+    return len(titulos)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--titulos", type=int, default=300, help="títulos por arquivo")
+    ap.add_argument("--arquivos", type=int, default=3)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="workers da etapa de boletos")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arquivos = []
+        for k in range(args.arquivos):
+            arq = os.path.join(tmp, f"entrada{k}.REM")
+            gerar_cnab400(arq, args.titulos, seed=k)
+            arquivos.append(arq)
+        total = args.titulos * args.arquivos
+
+        with tempfile.TemporaryDirectory() as t1:
+            p = _preparar(t1)
+            t0 = time.perf_counter()
+            n_seq = _sequencial(arquivos, p)
+            dt_seq = time.perf_counter() - t0
+
+        with tempfile.TemporaryDirectory() as t2:
+            p = _preparar(t2)
+            t0 = time.perf_counter()
+            res = processamento.processar_arquivos(arquivos, p, workers_boletos=args.workers)
+            dt_pip = time.perf_counter() - t0
+
+        if n_seq != total or res.titulos != total or len(res.pdfs) != total:
+            raise AssertionError(f"títulos: sequencial {n_seq}, pipeline {res.titulos}/{len(res.pdfs)}, esperado {total}")
+        print(res.relatorio)
+        print(f"{total:,} títulos • sequencial: {dt_seq:6.2f}s ({total / dt_seq:6.1f}/s)"
+              f" • pipeline: {dt_pip:6.2f}s ({total / dt_pip:6.1f}/s) • {dt_seq / dt_pip:4.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# benchmarks/bench_titulo.py
+"""
+Custo por título do fluxo extração → remessa → boleto com o título tipado
+(utils.titulo.Titulo) contra o dict de strings usado antes.
+
+Gera um CNAB400 Bradesco sintético, extrai os títulos uma vez e passa a mesma
+carga pelas etapas que consomem valor/datas: detalhe da remessa, chave do
+registro de NN, código de barras/linha digitável e total da confirmação.
+Para o "dict" os títulos são convertidos com Titulo.como_dict(), reproduzindo
+o formato antigo ('1.234,56', 'DD/MM/AAAA'), que as etapas voltam a interpretar.
+
+Mede tempo de CPU (µs/título) por etapa e, com tracemalloc, a memória retida
+pela lista de títulos e o pico durante as etapas.
+
+Uso:
+    python -m benchmarks.bench_titulo [quantidade]
+"""
+import io, os, sys, time, random, argparse, tempfile, tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+from utils import nn_registry, store
+from utils.gerar_remessa import montar_detalhe_bmp
+from utils.boletos_bmp import montar_codigo_barras, montar_linha_digitavel
+from utils.titulo import Titulo, fmt_brl, valor_centavos_de, centavos
+from src.extrator_titulos import extrair_de_bradesco
+
+PARAM = {"agencia": "0001", "conta": "0907031", "digito": "0", "carteira": "09",
+         "multa": "2,00", "juros": "0,033"}
+
+# texto -> centavos, como os parsers BRL anteriores (ponto sem vírgula em grupos de 3 = milhar)
+CENTAVOS = {"1.234,56": 123456, "1234,56": 123456, "1234.56": 123456, "12.5": 1250, "0.005": 1,
+            "1.234": 123400, "500.000": 50000000, "1.234.567": 123456700, "1.234.567,8": 123456780}
+
+def gerar_cnab400(path: str, n: int, seed: int = 42) -> None:
+    rnd = random.Random(seed)
+    base = date(2025, 1, 1)
+    with open(path, "w", encoding="latin-1", newline="") as f:
+        f.write("01REMESSA01COBRANCA".ljust(76) + "237BRADESCO".ljust(324) + "\r\n")
+        for i in range(n):
+            ln = [" "] * 400
+            def put(a, b, v):
+                ln[a - 1:b] = list(str(v).ljust(b - a + 1)[:b - a + 1])
+            put(1, 1, "1")
+            put(111, 120, f"{i + 1:08d}-1")
+            put(121, 126, (base + timedelta(days=rnd.randint(0, 700))).strftime("%d%m%y"))
+            put(127, 139, f"{rnd.randint(100, 10**8):013d}")
+            put(151, 156, base.strftime("%d%m%y"))
+            put(221, 234, f"{rnd.randint(10**12, 10**14 - 1):014d}")
+            put(235, 274, f"SACADO {i}")
+            put(275, 314, f"RUA {i}, 100 - CENTRO")
+            f.write("".join(ln) + "\r\n")
+        f.write("9".ljust(400) + "\r\n")
+
+def _etapas(titulos):
+    """Consumidores de valor/datas; retorna {etapa: segundos de CPU}."""
+    tempos = {}
+
+    t0 = time.process_time()
+    for i, t in enumerate(titulos, start=2):
+        montar_detalhe_bmp(t, PARAM, i)
+    tempos["remessa (detalhe)"] = time.process_time() - t0
+
+    t0 = time.process_time()
+    for t in titulos:
+        nn_registry._key_from_titulo(t)
+    tempos["registro (chave NN)"] = time.process_time() - t0
+
+    t0 = time.process_time()
+    for t in titulos:
+        cb = montar_codigo_barras(PARAM, t)
+        montar_linha_digitavel(cb)
+        fmt_brl(valor_centavos_de(t))
+    tempos["boleto (códigos/valor)"] = time.process_time() - t0
+
+    t0 = time.process_time()
+    sum(valor_centavos_de(t) for t in titulos)
+    tempos["confirmação (total)"] = time.process_time() - t0
+    return tempos
+
+def _medir(titulos):
+    tempos = _etapas(titulos)
+    tracemalloc.start()
+    _etapas(titulos[:20_000])
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return tempos, pico
+
+def _tamanho(factory):
+    tracemalloc.start()
+    objs = factory()
+    atual = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objs, atual
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("quantidade", nargs="?", type=int, default=100_000)
+    args = ap.parse_args(argv)
+    n = args.quantidade
+
+    for texto, esperado in CENTAVOS.items():
+        if centavos(texto) != esperado:
+            raise AssertionError(f"centavos({texto!r}) = {centavos(texto)}, esperado {esperado}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nn_registry.REG_PATH = os.path.join(tmp, "nn_registry.csv")
+        store._DB_PATH = os.path.join(tmp, "nasapay.db")
+        rem = os.path.join(tmp, "sintetico.REM")
+        gerar_cnab400(rem, n)
+
+        t0 = time.process_time()
+        with redirect_stdout(io.StringIO()):
+            tipados = extrair_de_bradesco(rem, PARAM)
+        t_ext = time.process_time() - t0
+
+    if len(tipados) != n:
+        raise AssertionError(f"extraídos {len(tipados)} de {n}")
+    print(f"títulos: {n:,} • extração: {t_ext * 1e6 / n:.1f} µs/título")
+    for i, t in enumerate(tipados, start=1):
+        t.nosso_numero = f"{i:011d}"
+
+    tipados, mem_tip = _tamanho(lambda: [Titulo.de_dict(t.como_dict()) for t in tipados])
+    dicts, mem_dic = _tamanho(lambda: [t.como_dict() for t in tipados])
+
+    # mesmas saídas nos dois formatos
+    for a, b in zip(tipados[:2000], dicts[:2000]):
+        if montar_detalhe_bmp(a, PARAM, 2) != montar_detalhe_bmp(b, PARAM, 2):
+            raise AssertionError("detalhe da remessa diverge entre Titulo e dict")
+        if montar_codigo_barras(PARAM, a) != montar_codigo_barras(PARAM, b):
+            raise AssertionError("código de barras diverge entre Titulo e dict")
+
+    print(f"memória retida: Titulo {mem_tip / n:6.0f} B/título • dict {mem_dic / n:6.0f} B/título")
+    res = {}
+    _etapas(tipados)  # aquece os caches (DV do NN, fatores) igualmente para os dois lados
+    for rotulo, lote in (("dict", dicts), ("Titulo", tipados)):
+        tempos, pico = _medir(lote)
+        res[rotulo] = tempos
+        print(f"[{rotulo}] pico de alocação nas etapas (20k títulos): {pico / 1024:,.0f} KiB")
+    print(f"{'etapa':26s} {'dict':>10s} {'Titulo':>10s}   µs/título")
+    for etapa in res["dict"]:
+        a, b = res["dict"][etapa], res["Titulo"][etapa]
+        print(f"{etapa:26s} {a * 1e6 / n:10.2f} {b * 1e6 / n:10.2f}")
+    ta, tb = sum(res["dict"].values()), sum(res["Titulo"].values())
+    print(f"{'total':26s} {ta * 1e6 / n:10.2f} {tb * 1e6 / n:10.2f}   (-{(ta - tb) * 1e6 / n:.2f} µs/título)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# benchmarks/dados.py
+"""
+Geradores determinísticos (mesma semente, mesmos bytes) das entradas usadas
+nos benchmarks: remessa CNAB 400 Bradesco, retorno BMP (.RET), CNAB 240 BB,
+NF-e (XML) e listas de Titulo. Tudo local, sem rede nem arquivo real de cliente.
+
+Os tamanhos nomeados (TAMANHOS) contam títulos: "10k" = 10.000 detalhes no
+CNAB, 10.000 registros no retorno, NF-es somando 10.000 duplicatas.
+
+Uso (grava os arquivos para inspeção ou para rodar o app contra eles):
+    python -m benchmarks.dados pasta [--tamanho 1k|10k|100k] [--semente 42]
+"""
+import os, sys, random, argparse
+from datetime import date, timedelta
+
+from utils.titulo import Titulo
+from benchmarks.bench_titulo import gerar_cnab400
+from benchmarks.bench_cnab240 import gerar_cnab240
+from benchmarks.bench_nfe import _nfe_xml
+from benchmarks.bench_validador import gerar_remessa
+
+TAMANHOS = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+SEMENTE = 42
+PARCELAS_NFE = 4        # duplicatas por NF-e: 10k títulos = 2.500 XMLs
+ITENS_NFE = 10          # itens (det) por NF-e
+
+_OCORRENCIAS = ("02", "02", "06", "06", "06", "09", "03", "14")
+
+def tamanho(nome: str | int) -> int:
+    """'10k' -> 10000; números passam direto."""
+    if isinstance(nome, int):
+        return nome
+    if nome in TAMANHOS:
+        return TAMANHOS[nome]
+    try:
+        return int(nome)
+    except ValueError:
+        raise ValueError(f"tamanho inválido: {nome!r} (use {', '.join(TAMANHOS)} ou um número)")
+
+# ---------------- títulos em memória ----------------
+def titulos(n: int, seed: int = SEMENTE, pagadores: int | None = None) -> list[Titulo]:
+    """
+    Títulos prontos (sem NN). 'pagadores' limita os CNPJs distintos (padrão:
+    um para cada 4 títulos), como numa carteira real com clientes recorrentes.
+    """
+    rnd = random.Random(seed)
+    base = date(2025, 1, 1)
+    n_pag = max(1, pagadores if pagadores is not None else n // 4)
+    cnpjs = [f"{rnd.randint(10**12, 10**14 - 1):014d}" for _ in range(n_pag)]
+    lista = []
+    for i in range(n):
+        k = rnd.randrange(n_pag)
+        lista.append(Titulo(
+            sacado=f"SACADO {k} COMERCIO LTDA", documento=f"{i + 1:08d}-1",
+            valor_centavos=rnd.randint(100, 10**7),
+            vencimento=base + timedelta(days=rnd.randint(0, 700)), emissao=base,
+            sacado_cnpj=cnpjs[k], doc_pagador_tipo="02",
+            sacado_endereco=f"RUA {k}, 100 - CENTRO", sacado_cidade="SAO PAULO", sacado_uf="SP",
+            sacado_cep="01001000", origem="benchmark"))
+    return lista
+
+def com_nosso_numero(lista: list[Titulo], inicio: int = 1) -> list[Titulo]:
+    """Atribui NNs sequenciais (11 dígitos) no lugar, como uma reserva faria."""
+    for i, t in enumerate(lista, start=inicio):
+        t.nosso_numero = f"{i:011d}"
+    return lista
+
+# ---------------- arquivos ----------------
+def cnab400_bradesco(path: str, n: int, seed: int = SEMENTE) -> str:
+    gerar_cnab400(path, n, seed)
+    return path
+
+def cnab240_bb(path: str, n: int) -> str:
+    gerar_cnab240(path, n)
+    return path
+
+def remessa_bmp(path: str, n: int, seq: int = 1, seed: int = SEMENTE) -> str:
+    """Remessa BMP válida; o nome deve terminar no sequencial (CB + DDMM + seq de 7 dígitos + .REM)."""
+    gerar_remessa(path, n, seq, random.Random(seed))
+    return path
+
+def _reg400(campos: dict, nro: int) -> str:
+    ln = [" "] * 400
+    for ini, val in campos.items():
+        ln[ini - 1:ini - 1 + len(val)] = list(val)
+    ln[394:400] = list(f"{nro:06d}")
+    return "".join(ln)
+
+def retorno_bmp(path: str, n: int, seed: int = SEMENTE) -> str:
+    """Retorno .RET do BMP (CNAB 400): header, n detalhes tipo 1 e trailer."""
+    rnd = random.Random(seed)
+    base = date(2025, 1, 1)
+    with open(path, "w", encoding="latin-1", newline="") as f:
+        f.write(_reg400({1: "02RETORNO01COBRANCA", 27: "12345678901234567890", 47: "NASAPAY",
+                         77: "274BMP MONEY PLUS", 95: base.strftime("%d%m%y")}, 1) + "\r\n")
+        for i in range(n):
+            ocorr = _OCORRENCIAS[rnd.randrange(len(_OCORRENCIAS))]
+            f.write(_reg400({
+                1: "1", 2: "02", 4: f"{rnd.randint(10**13, 10**14 - 1)}",
+                38: f"SACADO {i}".ljust(15)[:15], 71: f"{i + 1:011d}", 109: ocorr,
+                111: (base + timedelta(days=rnd.randint(0, 300))).strftime("%d%m%y"),
+                117: f"{i + 1:08d}-1", 147: (base + timedelta(days=rnd.randint(0, 700))).strftime("%d%m%y"),
+                153: f"{rnd.randint(100, 10**8):013d}",
+                319: "" if ocorr != "03" else "0102030405",
+            }, i + 2) + "\r\n")
+        f.write(_reg400({1: "9", 2: "2", 3: "01", 5: "274"}, n + 2) + "\r\n")
+    return path
+
+def nfes(pasta: str, n_titulos: int, seed: int = SEMENTE, parcelas: int = PARCELAS_NFE,
+         itens: int = ITENS_NFE) -> list[str]:
+    """NF-es com 'parcelas' duplicatas cada, até somar n_titulos. Devolve os caminhos."""
+    os.makedirs(pasta, exist_ok=True)
+    rnd = random.Random(seed)
+    caminhos = []
+    i, restantes = 0, n_titulos
+    while restantes > 0:
+        i += 1
+        k = min(parcelas, restantes)
+        caminho = os.path.join(pasta, f"nfe_{i:06d}.xml")
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write(_nfe_xml(i, itens, k, rnd))
+        caminhos.append(caminho)
+        restantes -= k
+    return caminhos
+
+def gerar_tudo(pasta: str, n: int, seed: int = SEMENTE) -> dict:
+    """Todos os arquivos de uma vez: {'cnab400', 'cnab240', 'retorno', 'remessa', 'nfes'}."""
+    os.makedirs(pasta, exist_ok=True)
+    return {
+        "cnab400": cnab400_bradesco(os.path.join(pasta, "entrada_cnab400.REM"), n, seed),
+        "cnab240": cnab240_bb(os.path.join(pasta, "entrada_cnab240.txt"), n),
+        "retorno": retorno_bmp(os.path.join(pasta, "retorno_bmp.RET"), n, seed),
+        "remessa": remessa_bmp(os.path.join(pasta, "CB01010000001.REM"), n, 1, seed),
+        "nfes": nfes(os.path.join(pasta, "nfe"), n, seed),
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("pasta")
+    ap.add_argument("--tamanho", default="1k", help=f"{', '.join(TAMANHOS)} ou número de títulos")
+    ap.add_argument("--semente", type=int, default=SEMENTE)
+    args = ap.parse_args(argv)
+
+    arqs = gerar_tudo(args.pasta, tamanho(args.tamanho), args.semente)
+    for nome, caminho in arqs.items():
+        print(f"  {nome:8s} {len(caminho)} XML(s) em {os.path.dirname(caminho[0])}" if isinstance(caminho, list)
+              else f"  {nome:8s} {caminho}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
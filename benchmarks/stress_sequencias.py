@@ -0,0 +1,94 @@
+# benchmarks/stress_sequencias.py
+"""
+Estresse do serviço de sequenciais (utils.sequencias) com vários processos
+disputando a mesma base: cada processo alterna reservas de um número e de
+blocos, de nosso número e de remessa, com o espelho config.json ligado.
+
+No fim confere que nenhum número saiu duas vezes, que não ficou buraco
+(1..N contínuo), que o contador da base bate com o total entregue e que o
+config.json espelhado é um JSON válido com os valores finais.
+
+Uso:
+    python -m benchmarks.stress_sequencias [--processos 8] [--reservas 200] [--bloco 25]
+"""
+import os, sys, json, time, random, argparse, tempfile
+import multiprocessing as mp
+
+EMPRESA = 1
+
+def _trabalhador(db: str, espelho: str, reservas: int, bloco: int, seed: int, fila) -> None:
+    from utils import store, sequencias
+    store._DB_PATH = db
+    sequencias.LEGADO_JSON = espelho
+    sequencias.LEGADO_CSV = os.path.join(os.path.dirname(db), "sequenciais.csv")
+    rnd = random.Random(seed)
+    nns, remessas = [], []
+    try:
+        for _ in range(reservas):
+            if rnd.random() < 0.5:
+                nns.extend(sequencias.reservar("nn", rnd.randint(1, bloco), EMPRESA))
+            else:
+                nns.append(sequencias.proximo("nn", EMPRESA))
+            remessas.append(sequencias.proximo("remessa", EMPRESA))
+    except Exception as e:      # o pai espera uma resposta de cada processo
+        fila.put(f"{type(e).__name__}: {e}")
+        raise
+    fila.put((nns, remessas))
+
+def _conferir(nome: str, numeros: list[int], base: int) -> None:
+    if len(set(numeros)) != len(numeros):
+        raise AssertionError(f"{nome}: {len(numeros) - len(set(numeros))} número(s) repetido(s)")
+    esperado = set(range(base + 1, base + len(numeros) + 1))
+    if set(numeros) != esperado:
+        raise AssertionError(f"{nome}: buracos em {sorted(esperado - set(numeros))[:10]}...")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--processos", type=int, default=8)
+    ap.add_argument("--reservas", type=int, default=200, help="reservas de cada tipo por processo")
+    ap.add_argument("--bloco", type=int, default=25, help="tamanho máximo dos blocos de NN")
+    args = ap.parse_args(argv)
+
+    from utils import store, sequencias
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "nasapay.db")
+        espelho = os.path.join(tmp, "config.json")
+        with open(espelho, "w", encoding="utf-8") as f:       # fonte antiga: começa do 41 / 7
+            json.dump({"nosso_numero": "00000000041", "ultima_remessa": "000007"}, f)
+        store._DB_PATH = db
+        sequencias.LEGADO_JSON = espelho
+        sequencias.LEGADO_CSV = os.path.join(tmp, "sequenciais.csv")
+
+        ctx = mp.get_context("spawn")                         # como no Windows
+        fila = ctx.Queue()
+        procs = [ctx.Process(target=_trabalhador, args=(db, espelho, args.reservas, args.bloco, i, fila))
+                 for i in range(args.processos)]
+        t0 = time.perf_counter()
+        for p in procs:
+            p.start()
+        resultados = [fila.get() for _ in procs]
+        for p in procs:
+            p.join()
+        dt = time.perf_counter() - t0
+        erros = [r for r in resultados if isinstance(r, str)]
+        if erros or any(p.exitcode for p in procs):
+            raise AssertionError(f"processo(s) com erro: {erros or [p.exitcode for p in procs]}")
+
+        nns = [n for r in resultados for n in r[0]]
+        remessas = [n for r in resultados for n in r[1]]
+        _conferir("nosso número", nns, 41)
+        _conferir("remessa", remessas, 7)
+        if sequencias.atual("nn", EMPRESA) != 41 + len(nns) or sequencias.atual("remessa", EMPRESA) != 7 + len(remessas):
+            raise AssertionError("contador da base diferente do total entregue")
+        with open(espelho, encoding="utf-8") as f:
+            cfg = json.load(f)
+        if int(cfg["nosso_numero"]) != 41 + len(nns) or int(cfg["ultima_remessa"]) != 7 + len(remessas):
+            raise AssertionError(f"espelho desatualizado: {cfg}")
+
+        total = args.processos * args.reservas * 2
+        print(f"{args.processos} processos • {total:,} reservas • {len(nns):,} NNs • {len(remessas):,} remessas")
+        print(f"  {dt:6.2f}s  ({1000 * dt / total:5.2f} ms/reserva)  sem repetição, sem buraco, espelho ok")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+# benchmarks/suite.py
+"""
+Suíte de benchmarks com linha de base em JSON e comparação de regressões.
+
+Gera os dados sintéticos (benchmarks.dados) num diretório temporário, com
+banco, nn_registry, config.json e pastas de saída próprios — nada toca em
+C:/nasapay — e mede cada caso em µs por item:
+
+  extrair.cnab400     leitura do CNAB 400 Bradesco (sem parse_cache)
+  extrair.cnab240     leitura em fluxo do CNAB 240 BB
+  extrair.nfe         leitura das NF-es (sem parse_cache, sem processos)
+  extrair.retorno     leitura do retorno BMP (.RET)
+  nn.registrar        registrar_titulos de todos os títulos
+  nn.buscar           buscar_nosso_numero numa amostra
+  remessa.gerar       EscritorRemessa: detalhes + trailer + validação + zip
+  remessa.validar     validar_remessa da remessa gerada
+  boletos.codigos     código de barras / linha digitável / DV em lote
+  boletos.render      PDFs de uma amostra (sem cache de renderização)
+  store.persistir     record_boletos em lotes de 200
+  envio.carregar      consultas da tela de envio (pagadores + boletos)
+  envio.filtrar       idem, com filtro por nome
+
+Casos sem efeito colateral rodam --repeticoes vezes e vale o menor tempo.
+Um caso que falha (ex.: reportlab ausente) fica com "erro" no JSON e não
+entra na comparação.
+
+--memoria grava também o pico de memória rastreada (tracemalloc) de cada
+caso; os tempos dessa execução saem inflados, então compare tempo só com
+bases medidas do mesmo jeito. --orcamento-mb MB falha os casos cujo pico
+passar do orçamento (utils.memoria.orcamento).
+
+Uso:
+    python -m benchmarks.suite [--tamanho 1k|10k|100k] [--casos extrair,nn] [--saida atual.json]
+    python -m benchmarks.suite --salvar-base benchmarks/baseline.json
+    python -m benchmarks.suite --comparar benchmarks/baseline.json [--limite 0.20]
+    python -m benchmarks.suite --tamanho 100k --memoria --orcamento-mb 512
+
+O código de saída é 1 se algum caso ficou mais lento (ou, com --memoria nas
+duas execuções, mais pesado) que a base além do limite (fração: 0.20 = 20%),
+ou se passou do orçamento de memória.
+"""
+import os, sys, json, time, argparse, platform, tempfile
+from datetime import datetime
+
+from benchmarks import dados
+from utils import memoria
+
+LIMITE_PADRAO = 0.20
+AMOSTRA_BUSCAS = 50
+AMOSTRA_PDFS = 200
+LOTE_PERSISTIR = 200
+
+# ---------------- registro dos casos ----------------
+_CASOS: list = []     # [(nome, funcao, puro, preparar)]
+
+def caso(nome: str, puro: bool = False, preparar=None):
+    """
+    Registra um caso; a função recebe o Contexto e devolve quantos itens
+    processou. preparar(ctx), se houver, roda antes e fora da medição.
+    """
+    def deco(fn):
+        _CASOS.append((nome, fn, puro, preparar))
+        return fn
+    return deco
+
+class Contexto:
+    """Diretório temporário com dados, parâmetros e estado compartilhado entre os casos."""
+    def __init__(self, tmp: str, n: int, seed: int):
+        self.tmp = tmp
+        self.n = n
+        self.seed = seed
+        self.arquivos = dados.gerar_tudo(os.path.join(tmp, "dados"), n, seed)
+        self.titulos = dados.com_nosso_numero(dados.titulos(n, seed))
+        self.remessa = ""
+        self.pdfs: list[str] = []
+        self.parametros = {
+            "pastas": {"pasta_salvar_remessa_nasapay": os.path.join(tmp, "remessas")},
+            "pasta_boletos": os.path.join(tmp, "boletos"),
+            "agencia": "0001", "conta": "1234567", "digito": "0", "carteira": "09",
+            "codigo_empresa": "12345678901234567890", "codigo_cedente": "1234567",
+            "razao_social": "NASAPAY BENCHMARK LTDA", "cnpj": "11222333000181",
+            "multa": "2,00", "juros": "0,033",
+        }
+
+def _preparar_ambiente(ctx: Contexto) -> None:
+    """Aponta banco, nn_registry, log e perf para o diretório temporário."""
+    from utils import store, nn_registry, perf, sequencias, log as nlog
+    from utils.ui_envio import data as envio_data
+    import utils.gerar_remessa as gerar_remessa
+    store._DB_PATH = os.path.join(ctx.tmp, "nasapay.db")
+    envio_data._DB_PATH = store._DB_PATH
+    nn_registry.REG_PATH = os.path.join(ctx.tmp, "nn_registry.csv")
+    sequencias.LEGADO_JSON = os.path.join(ctx.tmp, "config.json")
+    gerar_remessa.carregar_parametros = lambda: ctx.parametros
+    nlog.configurar(nivel="WARNING", arquivo=os.path.join(ctx.tmp, "nasapay.log"), niveis={})
+    perf.configurar(ativo=False)
+    store.init_db()
+
+# ---------------- extração ----------------
+@caso("extrair.cnab400", puro=True)
+def _extrair_cnab400(ctx):
+    from src.extrator_titulos import _ler_cnab400_bradesco
+    return len(_ler_cnab400_bradesco(ctx.arquivos["cnab400"]))
+
+@caso("extrair.cnab240", puro=True)
+def _extrair_cnab240(ctx):
+    from src.conversor_bb240 import iter_titulos_cnab240
+    return sum(1 for _ in iter_titulos_cnab240(ctx.arquivos["cnab240"]))
+
+@caso("extrair.nfe", puro=True)
+def _extrair_nfe(ctx):
+    from src.nfe_reader import ler_nfe
+    return sum(len(ler_nfe(a)) for a in ctx.arquivos["nfes"])
+
+@caso("extrair.retorno", puro=True)
+def _extrair_retorno(ctx):
+    from src.retorno_bmp import parse_retorno_bmp
+    return len(parse_retorno_bmp(ctx.arquivos["retorno"]))
+
+# ---------------- nosso número ----------------
+@caso("nn.registrar")
+def _nn_registrar(ctx):
+    from utils import nn_registry
+    nn_registry.registrar_titulos(ctx.titulos, ctx.parametros)
+    return len(ctx.titulos)
+
+@caso("nn.buscar", puro=True)
+def _nn_buscar(ctx):
+    from utils import nn_registry
+    passo = max(1, len(ctx.titulos) // AMOSTRA_BUSCAS)
+    amostra = ctx.titulos[::passo][:AMOSTRA_BUSCAS]
+    achados = sum(1 for t in amostra if nn_registry.buscar_nosso_numero(t))
+    if achados != len(amostra):
+        raise AssertionError(f"{achados} de {len(amostra)} NNs encontrados")
+    return len(amostra)
+
+# ---------------- remessa ----------------
+@caso("remessa.gerar")
+def _remessa_gerar(ctx):
+    from utils.gerar_remessa import EscritorRemessa
+    esc = EscritorRemessa(ctx.parametros, cfg=ctx.parametros)
+    for t in ctx.titulos:
+        esc.escrever(t)
+    ctx.remessa = esc.concluir()
+    return len(ctx.titulos)
+
+@caso("remessa.validar", puro=True)
+def _remessa_validar(ctx):
+    from utils.validador_remessa import validar_remessa
+    caminho = ctx.remessa or ctx.arquivos["remessa"]
+    rel = validar_remessa(caminho, max_workers=1)
+    if not rel.ok:
+        raise AssertionError(rel.resumo())
+    return rel.registros
+
+# ---------------- boletos ----------------
+@caso("boletos.codigos", puro=True)
+def _boletos_codigos(ctx):
+    from src.boletos import _codigos_do_lote
+    return sum(1 for c in _codigos_do_lote(ctx.titulos, ctx.parametros) if c is not None)
+
+@caso("boletos.render")
+def _boletos_render(ctx):
+    from src.boletos import gerar_boleto_titulos
+    amostra = ctx.titulos[:AMOSTRA_PDFS]
+    for t in amostra:
+        gerar_boleto_titulos(t, usar_cache=False, parametros=ctx.parametros, registrar=False)
+    return len(amostra)
+
+# ---------------- banco ----------------
+def _pdfs_falsos(ctx):
+    """Um arquivo por título com conteúdo distinto (o banco deduplica boletos pelo sha1 do PDF)."""
+    pasta = os.path.join(ctx.tmp, "pdfs")
+    os.makedirs(pasta, exist_ok=True)
+    corpo = bytes(8_000)
+    ctx.pdfs = []
+    for t in ctx.titulos:
+        caminho = os.path.join(pasta, f"{t.nosso_numero}.pdf")
+        with open(caminho, "wb") as f:
+            f.write(b"%PDF-1.4\n%" + t.nosso_numero.encode() + b"\n" + corpo + b"\n%%EOF\n")
+        ctx.pdfs.append(caminho)
+
+@caso("store.persistir", preparar=_pdfs_falsos)
+def _store_persistir(ctx):
+    from utils import store
+    for i in range(0, len(ctx.titulos), LOTE_PERSISTIR):
+        itens = zip(ctx.titulos[i:i + LOTE_PERSISTIR], ctx.pdfs[i:i + LOTE_PERSISTIR])
+        store.record_boletos([(t, pdf, f"bench-{t.nosso_numero}") for t, pdf in itens], ctx.parametros)
+    return len(ctx.titulos)
+
+@caso("envio.carregar", puro=True)
+def _envio_carregar(ctx):
+    from utils.ui_envio.data import _carregar
+    pags, boletos = _carregar("")
+    return sum(len(b) for b in boletos.values()) or len(pags)
+
+@caso("envio.filtrar", puro=True)
+def _envio_filtrar(ctx):
+    from utils.ui_envio.data import _carregar
+    pags, boletos = _carregar("SACADO 1")
+    return max(1, sum(len(b) for b in boletos.values()))
+
+# ---------------- execução ----------------
+def _medir(fn, ctx, repeticoes: int) -> tuple[float, int]:
+    melhor, itens = None, 0
+    for _ in range(max(1, repeticoes)):
+        t0 = time.perf_counter()
+        itens = fn(ctx)
+        dt = time.perf_counter() - t0
+        melhor = dt if melhor is None else min(melhor, dt)
+    return melhor, itens
+
+def _selecionar(filtro: str | None) -> list:
+    if not filtro:
+        return list(_CASOS)
+    prefixos = [p.strip() for p in filtro.split(",") if p.strip()]
+    return [c for c in _CASOS if any(c[0] == p or c[0].startswith(p + ".") for p in prefixos)]
+
+def executar(n: int, filtro: str | None = None, repeticoes: int = 3, seed: int = dados.SEMENTE,
+             ao_caso=None, medir_memoria: bool = False, orcamento_mb: float | None = None) -> dict:
+    """
+    Roda os casos e devolve o dicionário gravado no JSON. Com medir_memoria
+    (ou orcamento_mb) cada caso ganha "pico_mb"; acima do orçamento, também
+    "acima_orcamento".
+    """
+    medir_memoria = medir_memoria or bool(orcamento_mb)
+    resultado = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "tamanho": n,
+        "memoria": medir_memoria,
+        "maquina": {"python": platform.python_version(), "sistema": platform.platform(),
+                    "cpus": os.cpu_count() or 1},
+        "casos": {},
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="nasapay-bench-") as tmp:
+        os.chdir(tmp)          # config.json e caminhos relativos caem no temporário
+        try:
+            ctx = Contexto(tmp, n, seed)
+            _preparar_ambiente(ctx)
+            for nome, fn, puro, preparar in _selecionar(filtro):
+                try:
+                    if preparar:
+                        preparar(ctx)
+                    if medir_memoria:
+                        with memoria.orcamento(None, nome) as orc:
+                            seg, itens = _medir(fn, ctx, repeticoes if puro else 1)
+                    else:
+                        seg, itens = _medir(fn, ctx, repeticoes if puro else 1)
+                    r = {"segundos": round(seg, 6), "itens": itens,
+                         "us_por_item": round(1e6 * seg / max(1, itens), 3)}
+                    if medir_memoria:
+                        r["pico_mb"] = round(orc.pico_mb, 2)
+                        if orcamento_mb and orc.pico_mb > orcamento_mb:
+                            r["acima_orcamento"] = orcamento_mb
+                except Exception as e:
+                    r = {"erro": f"{type(e).__name__}: {e}"}
+                resultado["casos"][nome] = r
+                if ao_caso:
+                    ao_caso(nome, r)
+        finally:
+            os.chdir(cwd)
+            from utils import log as nlog
+            nlog.encerrar()
+    return resultado
+
+# ---------------- comparação ----------------
+def comparar(atual: dict, base: dict, limite: float = LIMITE_PADRAO) -> list[dict]:
+    """
+    Uma linha por caso e métrica presentes nos dois: "tempo" (µs por item) e,
+    se as duas execuções mediram memória, "memoria" (pico em MB).
+    razão = atual/base; 'regressao' quando a razão passa de 1 + limite.
+    """
+    linhas = []
+    for nome, r in atual.get("casos", {}).items():
+        b = base.get("casos", {}).get(nome) or {}
+        for metrica, chave in (("tempo", "us_por_item"), ("memoria", "pico_mb")):
+            if not b.get(chave) or chave not in r:
+                continue
+            razao = r[chave] / b[chave]
+            linhas.append({"caso": nome, "metrica": metrica, "base": b[chave], "atual": r[chave],
+                           "razao": razao, "regressao": razao > 1 + limite})
+    return linhas
+
+def _fmt_caso(nome: str, r: dict) -> str:
+    if "erro" in r:
+        return f"  {nome:18s} {'-':>12s}  erro: {r['erro']}"
+    txt = f"  {nome:18s} {r['us_por_item']:12.2f} µs/item  ({r['itens']:,} itens em {r['segundos']:.3f}s)"
+    if "pico_mb" in r:
+        txt += f"  pico {r['pico_mb']:.1f} MB"
+    if "acima_orcamento" in r:
+        txt += f"  <-- ACIMA DO ORÇAMENTO ({r['acima_orcamento']:g} MB)"
+    return txt
+
+def _ler_json(caminho: str) -> dict:
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _gravar_json(caminho: str, dados_json: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(dados_json, f, ensure_ascii=False, indent=2)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--tamanho", default="1k", help=f"{', '.join(dados.TAMANHOS)} ou número de títulos")
+    ap.add_argument("--casos", default="", help="nomes ou prefixos separados por vírgula (ex.: extrair,nn.buscar)")
+    ap.add_argument("--repeticoes", type=int, default=3, help="repetições dos casos sem efeito colateral")
+    ap.add_argument("--semente", type=int, default=dados.SEMENTE)
+    ap.add_argument("--saida", default="", help="grava o resultado desta execução em JSON")
+    ap.add_argument("--salvar-base", default="", help="grava o resultado como nova linha de base")
+    ap.add_argument("--comparar", default="", help="JSON de linha de base para comparar")
+    ap.add_argument("--limite", type=float, default=LIMITE_PADRAO, help="regressão tolerada (fração)")
+    ap.add_argument("--memoria", action="store_true", help="mede o pico de memória de cada caso (tracemalloc)")
+    ap.add_argument("--orcamento-mb", type=float, default=None, help="falha casos com pico acima disto (liga --memoria)")
+    ap.add_argument("--listar", action="store_true", help="só lista os casos")
+    args = ap.parse_args(argv)
+
+    if args.listar:
+        for nome, _, puro, _ in _CASOS:
+            print(f"  {nome}{'' if puro else '  (roda uma vez)'}")
+        return 0
+
+    base = _ler_json(args.comparar) if args.comparar else None
+    n = dados.tamanho(args.tamanho)
+    if base is not None and base.get("tamanho") != n:
+        print(f"[suite] aviso: base medida com {base.get('tamanho')} títulos, esta execução com {n}")
+    if base is not None and bool(base.get("memoria")) != (args.memoria or bool(args.orcamento_mb)):
+        print("[suite] aviso: só uma das execuções mediu memória (tracemalloc); os tempos não são comparáveis")
+
+    print(f"[suite] {n:,} títulos • {os.cpu_count() or 1} CPU(s) • Python {platform.python_version()}")
+    res = executar(n, args.casos, args.repeticoes, args.semente,
+                   ao_caso=lambda nome, r: print(_fmt_caso(nome, r), flush=True),
+                   medir_memoria=args.memoria, orcamento_mb=args.orcamento_mb)
+
+    for destino in (args.saida, args.salvar_base):
+        if destino:
+            _gravar_json(destino, res)
+            print(f"[suite] resultado gravado em {destino}")
+
+    estouros = [nome for nome, r in res["casos"].items() if "acima_orcamento" in r]
+    if estouros:
+        print(f"[suite] {len(estouros)} caso(s) acima do orçamento de {args.orcamento_mb:g} MB: {', '.join(estouros)}")
+    if base is None:
+        return 1 if estouros else 0
+    linhas = comparar(res, base, args.limite)
+    print(f"\n{'caso':18s} {'métrica':8s} {'base':>10s} {'atual':>10s} {'razão':>7s}")
+    for ln in linhas:
+        marca = "  <-- REGRESSÃO" if ln["regressao"] else ""
+        print(f"{ln['caso']:18s} {ln['metrica']:8s} {ln['base']:10.2f} {ln['atual']:10.2f} {ln['razao']:6.2f}x{marca}")
+    regressoes = [f"{ln['caso']} ({ln['metrica']})" for ln in linhas if ln["regressao"]]
+    if regressoes:
+        print(f"[suite] {len(regressoes)} regressão(ões) acima de {args.limite:.0%}: {', '.join(regressoes)}")
+        return 1
+    print(f"[suite] nenhuma regressão acima de {args.limite:.0%}")
+    return 1 if estouros else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
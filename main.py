@@ -1,5 +1,6 @@
 # main.py — Nasapay • Remessa e Retorno • v2.0 (versão consolidada)
-from utils import store, session
+from utils import store, session, tasks
+from utils.log import get_logger
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os, sys, traceback, importlib, types
@@ -8,6 +9,8 @@ from PIL import Image, ImageTk, ImageDraw, ImageFont
 
 VERSAO = "2.0"
 
+log = get_logger("main")
+
 # ===================== PATHS =====================
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
     BASE_DIR = sys._MEIPASS
@@ -471,7 +474,7 @@ def iniciar_janela():
                 from src.conversor_xml import converter_arquivo_xml
                 from utils.parametros import carregar_parametros
                 parametros = carregar_parametros()
-                converter_arquivo_xml(parametros)
+                converter_arquivo_xml(parametros, parent=root)
             except Exception as e:
                 messagebox.showerror("Importar XML", f"Falha: {e}", parent=root)
 
@@ -480,7 +483,7 @@ def iniciar_janela():
                 from src.conversor_bradesco import converter_arquivo_bradesco
                 from utils.parametros import carregar_parametros
                 parametros = carregar_parametros()
-                converter_arquivo_bradesco(parametros)
+                converter_arquivo_bradesco(parametros, parent=root)
             except Exception as e:
                 messagebox.showerror("Importar CNAB 400 Bradesco", f"Falha: {e}", parent=root)
 
@@ -489,10 +492,56 @@ def iniciar_janela():
                 from src.conversor_bb240 import converter_arquivo_bb240
                 from utils.parametros import carregar_parametros
                 parametros = carregar_parametros()
-                converter_arquivo_bb240(parametros)
+                converter_arquivo_bb240(parametros, parent=root)
             except Exception as e:
                 messagebox.showerror("Importar CNAB 240 BB", f"Falha: {e}", parent=root)
 
+        def _processar():
+            from utils.parametros import carregar_parametros
+            parametros = carregar_parametros()
+            arquivos = filedialog.askopenfilenames(
+                parent=root,
+                initialdir=parametros.get("pastas", {}).get("pasta_importar_remessa", os.path.expanduser("~")),
+                filetypes=[("Arquivos CNAB/XML", "*.xml *.REM *.TXT *.240"), ("Todos", "*.*")])
+            if not arquivos:
+                return
+
+            import threading
+            cancelar = threading.Event()
+
+            def work():
+                from src.processamento import processar_arquivos
+                return processar_arquivos(arquivos, parametros, workers_boletos=os.cpu_count() or 1,
+                                          cancelar=cancelar)
+
+            def done(res, err):
+                from utils.gerar_remessa import RemessaInvalida, mostrar_remessa_invalida, _popup_remessa_gerada
+                from utils.pipeline import Cancelado
+                if isinstance(err, Cancelado):
+                    messagebox.showinfo("Processar arquivos", "Processamento cancelado. Selecione os mesmos "
+                                        "arquivos de novo para continuar de onde parou.", parent=root)
+                    return
+                if isinstance(err, RemessaInvalida):
+                    mostrar_remessa_invalida(err, parent=root)
+                    return
+                if err is not None:
+                    messagebox.showerror("Processar arquivos", f"Falha: {err}", parent=root)
+                    return
+                log.info("processamento concluído:\n%s", res.relatorio)
+                if res.erros:
+                    messagebox.showwarning("Processar arquivos", "Arquivos ignorados:\n" + "\n".join(
+                        f"{os.path.basename(a)}: {msg}" for a, msg in res.erros), parent=root)
+                if not res.remessa:
+                    messagebox.showinfo("Processar arquivos", "Nenhum título encontrado.", parent=root)
+                    return
+                _popup_remessa_gerada([res.remessa], parent=root, pasta_saida=os.path.dirname(res.remessa))
+                if res.pdfs:
+                    from src.boletos import _popup_boletos_gerados
+                    _popup_boletos_gerados(res.pdfs, parent=root)
+
+            from utils.ui_busy import run_with_busy
+            run_with_busy(root, "Processando arquivos…", work, done, cancelar=cancelar)
+
         def _validar():
             try:
                 from utils.validador_remessa import open_validador_remessa
@@ -504,6 +553,8 @@ def iniciar_janela():
         m.add_command(label="Conversor Bradesco CNAB 400", command=_conv_brad)
         m.add_command(label="Conversor CNAB BB240",        command=_conv_bb240)
         m.add_separator()
+        m.add_command(label="Processar arquivos (remessa + boletos)", command=_processar)
+        m.add_separator()
         m.add_command(label="Validar Remessa (BMP)",       command=_validar)
         return m
 
@@ -515,7 +566,14 @@ def iniciar_janela():
                 abrir_retorno_bmp_gui(root)
             except Exception as e:
                 messagebox.showerror("Retorno Nasapay", f"Falha: {e}", parent=root)
+        def _ret_bradesco():
+            try:
+                from utils.retorno_to_bradesco400 import converter_bmp_para_bradesco400
+                converter_bmp_para_bradesco400(root)
+            except Exception as e:
+                messagebox.showerror("Retorno Nasapay", f"Falha: {e}", parent=root)
         m.add_command(label="Retorno Nasapay", command=_ret_bmp)
+        m.add_command(label="Converter retornos BMP → Bradesco 400", command=_ret_bradesco)
         return m
 
     def dd_emitir():
@@ -523,7 +581,7 @@ def iniciar_janela():
         def _emitir():
             try:
                 from src.boletos import imprimir_boletos
-                imprimir_boletos()
+                imprimir_boletos(parent=root)
             except Exception as e:
                 messagebox.showerror("Gerar Boletos (PDF)", f"Falha: {e}", parent=root)
         m.add_command(label="Gerar Boleto PDF", command=_emitir)
@@ -560,6 +618,8 @@ def iniciar_janela():
             m.add_command(label="Fechar todas as abas", command=fechar_todas)
         else:
             m.add_command(label="(nenhuma aba aberta)", state="disabled")
+        m.add_separator()
+        m.add_command(label="Tarefas em segundo plano", command=lambda: tasks.abrir_painel_tarefas(root))
         return m
 
     # Monta a barra de menus (labels clicáveis)
@@ -570,7 +630,11 @@ def iniciar_janela():
     MenuLabel(bar, "Enviar Boleto", dd_envio).pack(side="left")
     MenuLabel(bar, "Janelas",   dd_janelas).pack(side="left")
 
+    tasks.agendador().ligar_tk(root)
     root.mainloop()
+    tasks.agendador().encerrar()
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # pools de processos no executável (PyInstaller)
     iniciar_janela()
@@ -1,9 +1,13 @@
 # src/boletos.py
-import os
+import os, json, hashlib
+from functools import partial
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from utils import store
+from utils import store, jobs
+from utils.pipeline import Cancelado
+from utils.log import get_logger
+from utils import perf, memoria
 
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
@@ -18,12 +22,35 @@ except Exception:
     except Exception:
         I25 = None
 
-from src.extrator_titulos import extrair_titulos_de_arquivo
+from src.extrator_titulos import extrair_titulos_de_arquivos
+from utils.i25 import desenhar_i25
 from utils.parametros import carregar_parametros
 from utils.boletos_bmp import (
     montar_codigo_barras,
     montar_linha_digitavel,
     dv_nosso_numero_base7,
+    montar_codigos_lote,
+)
+from utils.titulo import fmt_brl, fmt_data, valor_centavos_de, vencimento_de
+
+log = get_logger(__name__)
+
+# Versão do layout desenhado em gerar_boleto_titulos. Incrementar sempre que o
+# desenho do PDF mudar, para invalidar o cache de renderização.
+LAYOUT_VERSAO = "1"
+LOGO_BOLETO = "C:/nasapay/logo_boleto.png"
+
+# campos do título e dos parâmetros que aparecem no PDF (entram no digest;
+# o valor entra em centavos, independente da formatação de origem)
+_RENDER_CAMPOS_TITULO = (
+    "nosso_numero", "documento", "vencimento", "emissao", "sacado",
+    "sacado_endereco", "sacado_cidade", "sacado_uf", "sacado_cep",
+    "sacado_cnpj", "doc_pagador_tipo",
+)
+_RENDER_CAMPOS_PARAM = (
+    "agencia", "conta", "digito", "carteira", "razao_social", "cnpj",
+    "instrucao1", "instrucao2", "instrucao3", "multa", "juros",
+    "sacador_avalista_razao", "sacador_avalista_cnpj", "pasta_boletos",
 )
 
 # ---------------- helpers ----------------
@@ -41,22 +68,7 @@ def draw_logo_fit(c, path, x, y, max_w, max_h):
         return False
 
 def draw_i25(c, digits, x, y, barWidth=0.33 * mm, barHeight=13 * mm, quiet_zone=5 * mm, ratio=2.2):
-    patt = {'0':'nnwwn','1':'wnnnw','2':'nwnnw','3':'wwnnn','4':'nnwnw','5':'wnwnn','6':'nwwnn','7':'nnnww','8':'wnnwn','9':'nwnwn'}
-    def w(ch): return 1 if ch=='n' else ratio
-    if len(digits) % 2 == 1: digits = '0' + digits
-    cursor = x + quiet_zone
-    seq = [('bar', w('n')), ('sp', w('n')), ('bar', w('n')), ('sp', w('n'))]
-    for i in range(0, len(digits), 2):
-        a,b = digits[i],digits[i+1]; pa,pb = patt[a],patt[b]
-        for k in range(5):
-            seq.append(('bar', w(pa[k]))); seq.append(('sp', w(pb[k])))
-    seq.extend([('bar', w('w')), ('sp', w('n')), ('bar', w('n'))])
-    for kind, units in seq:
-        bw = units * barWidth
-        if kind == 'bar':
-            c.rect(cursor, y, bw, barHeight, stroke=0, fill=1)
-        cursor += bw
-    return cursor + quiet_zone
+    return desenhar_i25(c, digits, x, y, barWidth, barHeight, quiet_zone, ratio)
 
 def format_valor_brl(valor_str: str) -> str:
     s = (valor_str or "").strip().replace(" ", "")
@@ -71,25 +83,6 @@ def format_valor_brl(valor_str: str) -> str:
     txt = f"{v:,.2f}"
     return txt.replace(",", "X").replace(".", ",").replace("X", ".")
 
-def _parse_brl_to_float(valor_str: str) -> float:
-    s = (valor_str or "").strip().replace(" ", "")
-    if s == "":
-        return 0.0
-    try:
-        if "," in s and "." in s:
-            s = s.replace(".", "").replace(",", ".")
-        elif "," in s:
-            s = s.replace(",", ".")
-        return float(s)
-    except Exception:
-        d = "".join(ch for ch in s if ch.isdigit())
-        if not d:
-            return 0.0
-        try:
-            return float(int(d)) / 100.0
-        except Exception:
-            return 0.0
-
 def _parse_pct_to_float(pct_str: str) -> float:
     s = (pct_str or "").strip()
     if not s:
@@ -155,6 +148,48 @@ def _unique_sequencial(path):
         idx += 1
     return cand
 
+_logo_hash_cache: dict = {}
+
+def _logo_hash(path: str) -> str:
+    """sha1 do arquivo de logo, memorizado por (mtime, tamanho)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    chave = (path, st.st_mtime_ns, st.st_size)
+    h = _logo_hash_cache.get(chave)
+    if h is None:
+        h = store._sha1_file(path)
+        _logo_hash_cache.clear()
+        _logo_hash_cache[chave] = h
+    return h
+
+def render_digest(titulo: dict, p: dict) -> str:
+    """
+    Digest das entradas da renderização: campos do título, parâmetros usados no
+    desenho, versão do layout e hash do logo. Boletos com o mesmo digest geram
+    o mesmo PDF (exceto a data de processamento).
+    """
+    payload = {
+        "layout": LAYOUT_VERSAO,
+        "logo": _logo_hash(LOGO_BOLETO),
+        "titulo": {k: str(titulo.get(k) or "").strip() for k in _RENDER_CAMPOS_TITULO},
+        "valor_centavos": valor_centavos_de(titulo),
+        "param": {k: str(p.get(k) or "").strip() for k in _RENDER_CAMPOS_PARAM},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _boleto_em_cache(digest: str) -> str | None:
+    """Caminho do PDF já gerado com o mesmo digest (se ainda existir no disco)."""
+    try:
+        r = store.find_boleto_by_digest(digest)
+    except Exception:
+        return None
+    if r and r.get("pdf_path") and os.path.exists(r["pdf_path"]):
+        return r["pdf_path"]
+    return None
+
 def _popup_boletos_gerados(arquivos_pdf: list[str], parent=None):
     top = tk.Toplevel(parent) if parent else tk.Toplevel()
     top.title("Boletos Gerados")
@@ -209,16 +244,50 @@ def _popup_boletos_gerados(arquivos_pdf: list[str], parent=None):
 
 # --------------- desenho do PDF ---------------
 
-def gerar_boleto_titulos(titulo):
+def _codigos_do_lote(titulos: list[dict], p: dict) -> list[tuple | None]:
+    """
+    Pré-calcula (código de barras, linha digitável, DV do NN) de todos os títulos
+    de um arquivo com montar_codigos_lote. Em caso de dado inválido, devolve None
+    para a posição e o cálculo fica a cargo de gerar_boleto_titulos.
+    """
+    try:
+        barras, linhas, dvs = montar_codigos_lote(
+            p,
+            [vencimento_de(t) for t in titulos],
+            [valor_centavos_de(t) for t in titulos],
+            [t["nosso_numero"] for t in titulos],
+        )
+    except Exception:
+        return [None] * len(titulos)
+    return list(zip(barras, linhas, dvs))
+
+@perf.medir("boletos.gerar")
+def gerar_boleto_titulos(titulo, usar_cache: bool = True, codigos: tuple | None = None,
+                         parametros: dict | None = None, registrar: bool = True):
+    """
+    Gera o PDF do boleto e retorna o caminho. Com usar_cache=True, um título
+    cujas entradas não mudaram desde a última geração reaproveita o PDF existente.
+    'codigos' = (código de barras, linha digitável, DV do NN) já calculados em lote.
+    'parametros' evita reler a configuração a cada boleto; registrar=False deixa
+    a gravação no banco para o chamador (store.record_boletos, em lote).
+    """
     largura, altura = A4
-    p = carregar_parametros()
+    p = parametros if parametros is not None else carregar_parametros()
+
+    digest = render_digest(titulo, p)
+    if usar_cache:
+        existente = _boleto_em_cache(digest)
+        if existente:
+            perf.contar("boletos.cache_hit")
+            return existente
 
     # dados do título
     nosso_numero = titulo.get("nosso_numero", "")
     numero_documento = titulo.get("documento", "")
-    vencimento = titulo.get("vencimento", "")
-    valor_fmt = format_valor_brl(titulo.get("valor", "0,00"))
-    valor_float = _parse_brl_to_float(titulo.get("valor", "0,00"))
+    vencimento = fmt_data(vencimento_de(titulo))
+    valor_cent = valor_centavos_de(titulo)
+    valor_fmt = fmt_brl(valor_cent)
+    valor_float = valor_cent / 100.0
     sacado = titulo.get("sacado", "")
     endereco = titulo.get("sacado_endereco", "")
     cidade = titulo.get("sacado_cidade", "")
@@ -243,9 +312,12 @@ def gerar_boleto_titulos(titulo):
     sacador_nome = (p.get("sacador_avalista_razao") or "").strip()
     sacador_doc_fmt = format_doc(p.get("sacador_avalista_cnpj") or "")
 
-    codigo_barras = montar_codigo_barras(p, titulo)
-    linha_digitavel = montar_linha_digitavel(codigo_barras)
-    nn_dv = dv_nosso_numero_base7(carteira, nosso_numero)
+    if codigos:
+        codigo_barras, linha_digitavel, nn_dv = codigos
+    else:
+        codigo_barras = montar_codigo_barras(p, titulo)
+        linha_digitavel = montar_linha_digitavel(codigo_barras)
+        nn_dv = dv_nosso_numero_base7(carteira, nosso_numero)
 
     # saída do PDF (mantido como estava)
     pasta_boletos = p.get("pasta_boletos") or "C:/nasapay/boletos"
@@ -287,7 +359,7 @@ def gerar_boleto_titulos(titulo):
 
     y1 = y_corte1 - 2.8 * altura_linha - mid_ajuste_mm
     y_base = y1
-    if not draw_logo_fit(c, "C:/nasapay/logo_boleto.png", 12 * mm, y_base, 35 * mm, 10 * mm):
+    if not draw_logo_fit(c, LOGO_BOLETO, 12 * mm, y_base, 35 * mm, 10 * mm):
         c.setFont("Helvetica-Bold", 10); c.drawString(12 * mm, y_base + 2 * mm, "NASAPAY")
     c.setLineWidth(THIN); c.line(48 * mm, y_base, 48 * mm, y_base + altura_barras_mm)
     c.setLineWidth(THIN); c.line(68 * mm, y_base, 68 * mm, y_base + altura_barras_mm)
@@ -385,7 +457,7 @@ def gerar_boleto_titulos(titulo):
     y_local = y_corte2 - espaco_3linhas
 
     y_base2 = y_local
-    if not draw_logo_fit(c, "C:/nasapay/logo_boleto.png", 12 * mm, y_base2, 35 * mm, 12 * mm):
+    if not draw_logo_fit(c, LOGO_BOLETO, 12 * mm, y_base2, 35 * mm, 12 * mm):
         c.setFont("Helvetica-Bold", 10); c.drawString(12 * mm, y_base2 + 2 * mm, "NASAPAY")
     c.setLineWidth(THIN); c.line(48 * mm, y_base2, 48 * mm, y_base2 + altura_barras_mm)
     c.setLineWidth(THIN); c.line(68 * mm, y_base2, 68 * mm, y_base2 + altura_barras_mm)
@@ -526,12 +598,15 @@ def gerar_boleto_titulos(titulo):
     c.showPage()
     c.save()
 
+    if not registrar:
+        return caminho_pdf
+
     try:
         store.init_db()
-        boleto_id = store.record_boleto(titulo, caminho_pdf, p)
-        print(f"[store] boleto registrado id={boleto_id} file={caminho_pdf}", flush=True)
+        boleto_id = store.record_boleto(titulo, caminho_pdf, p, render_digest=digest)
+        log.debug("boleto registrado id=%s file=%s", boleto_id, caminho_pdf)
     except Exception as e:
-        print(f"[store] aviso: não consegui registrar o boleto no banco: {e}", flush=True)
+        log.warning("não consegui registrar o boleto no banco: %s", e)
 
     return caminho_pdf
 
@@ -567,7 +642,13 @@ def _dialogo_falta_nn():
     top.wait_window()
     return escolha["ok"], escolha["origem"]
 
-def imprimir_boletos():
+def imprimir_boletos(parent=None):
+    """
+    Seleciona arquivos e gera os boletos. Leitura e renderização rodam no
+    agendador de tarefas (utils.tasks), com progresso e botão Cancelar; só os
+    diálogos ficam no main thread.
+    """
+    from utils.ui_busy import run_with_busy
     p = carregar_parametros()
     caminho_entrada = (
         p.get("pasta_importar_remessa")
@@ -577,21 +658,55 @@ def imprimir_boletos():
 
     arquivos = filedialog.askopenfilenames(
         initialdir=caminho_entrada,
-        filetypes=[("Arquivos CNAB/XML", "*.xml *.REM *.TXT")]
+        filetypes=[("Arquivos CNAB/XML", "*.xml *.REM *.TXT *.240"), ("Todos", "*.*")]
     )
     if not arquivos:
         return
+    root = parent or tk._default_root
 
     try:
         store.init_db()
     except Exception as e:
         print(f"[store] init_db falhou: {e}", flush=True)
 
-    gerados_total: list[str] = []
-
-    for arquivo in arquivos:
+    def _fim(res, err):
+        if isinstance(err, Cancelado):
+            messagebox.showinfo("Boletos", "Geração cancelada. Selecione os mesmos arquivos de novo "
+                                           "para continuar de onde parou.", parent=root)
+            return
+        if err is not None:
+            messagebox.showerror("Erro", f"Falha ao gerar boletos:\n{err}", parent=root)
+            return
+        gerados_total, erros, reaproveitados = res
+        if reaproveitados:
+            messagebox.showinfo("Boletos", f"Continuação da geração anterior destes arquivos: "
+                                           f"{reaproveitados} boleto(s) já gerado(s) foram reaproveitados.", parent=root)
+        if erros:
+            messagebox.showerror("Erro", "Erro ao processar:\n" + "\n".join(
+                f"{os.path.basename(a)}: {msg}" for a, msg in erros[:20])
+                + (f"\n(+{len(erros) - 20} outros)" if len(erros) > 20 else ""), parent=root)
+        if gerados_total:
+            _popup_boletos_gerados(gerados_total)
+
+    def _lidos(lidos, err):
+        if err is not None:
+            messagebox.showerror("Erro", f"Falha ao ler os arquivos:\n{err}", parent=root)
+            return
+        selecionados = _conferir_lidos(lidos)
+        if selecionados:
+            run_with_busy(root, "Gerando boletos…", partial(_gerar_lote, selecionados, arquivos), _fim,
+                          passar_tarefa=True)
+
+    # layout detectado pelo conteúdo: seleção com XML e CNAB misturados é lida em uma passada
+    run_with_busy(root, "Lendo arquivos…", partial(extrair_titulos_de_arquivos, arquivos, p), _lidos)
+
+def _conferir_lidos(lidos) -> list:
+    """Main thread: avisos por arquivo e diálogo de NN ausente. Devolve [(k, arquivo, titulos)]."""
+    selecionados = []
+    for k, (arquivo, _layout, titulos, erro) in enumerate(lidos):
         try:
-            titulos = extrair_titulos_de_arquivo(arquivo, carregar_parametros())
+            if erro:
+                raise RuntimeError(erro)
             if not titulos:
                 messagebox.showinfo("Aviso", f"Nenhum título extraído de {arquivo}.")
                 continue
@@ -601,29 +716,68 @@ def imprimir_boletos():
                 ok, origem = _dialogo_falta_nn()
                 if not ok:
                     continue
+                def _convertido(_paths):
+                    messagebox.showinfo("Conversão concluída",
+                                        "Nosso Número gerado pela conversão.\nAgora volte e gere o boleto novamente.")
                 try:
                     if origem == "xml":
                         from src.conversor_xml import converter_arquivo_xml
-                        converter_arquivo_xml()
+                        converter_arquivo_xml(carregar_parametros(), ao_concluir=_convertido)
                     else:
                         from src.conversor_bradesco import converter_arquivo_bradesco
-                        converter_arquivo_bradesco()
-                    messagebox.showinfo("Conversão concluída",
-                                        "Nosso Número gerado pela conversão.\nAgora volte e gere o boleto novamente.")
+                        converter_arquivo_bradesco(carregar_parametros(), ao_concluir=_convertido)
                 except Exception as e:
                     messagebox.showerror("Erro", f"Falha ao converter: {e}")
                     continue
-
-            for t in titulos:
-                try:
-                    pdf_path = gerar_boleto_titulos(t)
-                    gerados_total.append(pdf_path)
-                except Exception as e:
-                    messagebox.showerror("Erro", f"Erro ao processar {arquivo}:\n{e}")
-                    continue
-
+            selecionados.append((k, arquivo, titulos))
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao processar {arquivo}:\n{e}")
+    return selecionados
 
-    if gerados_total:
-        _popup_boletos_gerados(gerados_total)
+def _gerar_lote(selecionados, arquivos, tarefa):
+    """
+    Worker: gera os PDFs com o diário do lote (utils.jobs). Se a geração
+    anterior destes mesmos arquivos parou no meio, continua dela.
+    Devolve (pdfs, [(arquivo, erro)], quantos vieram do diário).
+    """
+    p = carregar_parametros()
+    job = jobs.Job.iniciar("boletos", arquivos)
+    reaproveitados = job.contar(jobs.PERSISTIDO) if job.retomado else 0
+    total = sum(len(titulos) for _, _, titulos in selecionados)
+    gerados_total, erros, feito = [], [], 0
+    mem = memoria.perfil("boletos")
+    try:
+        with perf.lote("boletos"), mem:
+            for k, arquivo, titulos in selecionados:
+                codigos = _codigos_do_lote(titulos, p)
+                for i, (t, cod) in enumerate(zip(titulos, codigos)):
+                    tarefa.token.verificar()
+                    feito += 1
+                    tarefa.progresso(feito, total, os.path.basename(arquivo))
+                    chave = f"{k}:{i}"
+                    rec = job.item(chave)
+                    if jobs.atingiu(rec, jobs.PERSISTIDO) and os.path.exists(rec["saida"]):
+                        gerados_total.append(rec["saida"])
+                        continue
+                    try:
+                        pdf_path = gerar_boleto_titulos(t, codigos=cod, parametros=p)
+                        gerados_total.append(pdf_path)
+                        job.marcar(chave, jobs.PERSISTIDO, saida=pdf_path)
+                    except Exception as e:
+                        job.marcar(chave, jobs.PENDENTE, erro=str(e))
+                        erros.append((arquivo, str(e)))
+                mem.etapa(os.path.basename(arquivo))
+    except Cancelado:
+        job.cancelar()
+        raise
+    except BaseException as e:
+        job.falhar(e)
+        raise
+    finally:
+        if mem.etapas:
+            try:
+                log.info("perfil de memória: %s", mem.salvar(p.get('pasta_boletos') or 'C:/nasapay/boletos'))
+            except OSError as e:
+                log.warning("não consegui gravar o perfil de memória: %s", e)
+    job.concluir(boletos=len(gerados_total))
+    return gerados_total, erros, reaproveitados
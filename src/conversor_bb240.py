@@ -1,132 +1,176 @@
 # src/conversor_bb240.py
 import os
-from datetime import datetime
+import re
 from tkinter import filedialog, messagebox
 
+from src.detector_layout import conferir_layout, CNAB240_REMESSA
+from utils import parse_cache
+from utils.titulo import Titulo, data
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
 def _dig(s: str) -> str:
     return "".join(ch for ch in (s or "") if ch.isdigit())
 
-def _fmt_ddmmaaaa_to_ddmmyyyy(s: str) -> str:
-    s = (s or "").strip()
-    if len(s) == 8 and s.isdigit():
-        return f"{s[0:2]}/{s[2:4]}/{s[4:8]}"
-    return s
-
 SEG_IDX_TIPO_REG = 7   # registro detalhe '3'
-SEG_IDX_COD_SEG  = 13  # 'P' / 'Q'
+SEG_IDX_COD_SEG  = 13  # 'P' / 'Q' / 'R'
 
-def _parse_cnab240_bb(caminho: str, parametros: dict) -> list[dict]:
-    titulos = []
-    segP, segQ = {}, {}
+# versão do parser (entra na chave do parse_cache; incrementar ao mudar a leitura)
+CNAB240_BB_VERSAO = "2"
 
-    with open(caminho, "r", encoding="latin-1") as f:
-        for ln in f:
-            if not ln or len(ln) < 240:
-                continue
-            try:
-                if ln[SEG_IDX_TIPO_REG] != '3':
-                    continue
-                seg = ln[SEG_IDX_COD_SEG]
+_RE_DOC_DV = re.compile(r"^\s*(\d{1,30})\s*[-/.]\s*\d\s*$")
 
-                try:
-                    seq_reg = int(ln[8:13])  # 9–13 (1-based)
-                except Exception:
-                    seq_reg = None
-
-                if seg == 'P':
-                    seu_numero = ln[62:77].strip()   # 63–77
-                    venc_raw   = ln[77:85]           # 78–85 DDMMAAAA
-                    valor_raw  = ln[85:100]          # 86–100 13+2
-                    emiss_raw  = ln[110:118]         # 111–118
-
-                    vencimento = _fmt_ddmmaaaa_to_ddmmyyyy(venc_raw)
-                    emissao    = _fmt_ddmmaaaa_to_ddmmyyyy(emiss_raw)
-                    try:
-                        valor_cent = int(valor_raw)
-                        valor = f"{valor_cent/100:.2f}".replace('.', ',')
-                    except Exception:
-                        valor = "0,00"
-
-                    segP[seq_reg] = {
-                        "documento": seu_numero,
-                        "vencimento": vencimento,
-                        "valor": valor,
-                        "emissao": emissao,
-                    }
-
-                elif seg == 'Q':
-                    tipo_insc = ln[18:20]            # 19–20
-                    doc       = _dig(ln[20:35])      # 21–35
-                    nome      = ln[35:75].strip()    # 36–75
-                    end       = ln[75:115].strip()   # 76–115
-                    bairro    = ln[115:130].strip()  # 116–130
-                    cep       = _dig(ln[130:138])    # 131–138
-                    cidade    = ln[138:153].strip()  # 139–153
-                    uf        = ln[153:155].strip()  # 154–155
-
-                    if tipo_insc.strip() == '01':
-                        doc_fmt = doc[-11:].rjust(11, '0')
-                    else:
-                        doc_fmt = doc[-14:].rjust(14, '0')
-
-                    segQ[seq_reg] = {
-                        "doc_pagador_tipo": '01' if tipo_insc.strip() == '01' else '02',
-                        "sacado_cnpj": doc_fmt,
-                        "sacado": nome,
-                        "sacado_endereco": f"{end} - {bairro}".strip(" -"),
-                        "sacado_cidade": cidade,
-                        "sacado_uf": uf,
-                        "sacado_cep": cep,
-                    }
-            except Exception:
-                continue
+class ErroCnab240(ValueError):
+    """Arquivo CNAB240 inconsistente (contagens dos trailers de lote/arquivo)."""
 
-    chaves = sorted(set(k for k in segP.keys() if k in segQ))
-    import re
-    for k in chaves:
-        base = {}
-        base.update(segP.get(k, {}))
-        base.update(segQ.get(k, {}))
+def _parse_cnab240_bb(caminho: str, parametros: dict) -> tuple[list[Titulo], dict | None]:
+    """Títulos do arquivo já com Nosso Número (e o resumo do modo delta, se ligado)."""
+    titulos = parse_cache.com_cache(caminho, "cnab240_bb", CNAB240_BB_VERSAO, _ler_cnab240_bb)
+    from utils.gerar_remessa import preparar_conversao
+    return preparar_conversao(titulos, parametros)
 
-        if not base.get("documento"):
-            continue
+def _ler_cnab240_bb(caminho: str) -> list[Titulo]:
+    """Títulos do CNAB240 BB, ainda sem Nosso Número."""
+    return list(iter_titulos_cnab240(caminho))
 
-        # Normaliza documento removendo DV tipo 12345-1 / 12345/1 / 12345.1
-        doc = base.get("documento", "").strip()
-        m = re.match(r"^\\s*(\\d{1,30})\\s*[-\\/.]\\s*\\d\\s*$", doc)
-        if m:
-            base["documento"] = m.group(1)
+def _seq(ln: str):
+    try:
+        return int(ln[8:13])  # 9–13 (1-based)
+    except ValueError:
+        return None
 
-        from utils.parametros import gerar_nosso_numero
-        base["nosso_numero"] = gerar_nosso_numero(parametros)
-        titulos.append(base)
+def _campos_p(ln: str) -> dict:
+    try:
+        valor_cent = int(ln[85:100])         # 86–100 13+2
+    except ValueError:
+        valor_cent = 0
+    return {
+        "documento": ln[62:77].strip(),      # 63–77
+        "vencimento": data(ln[77:85]),       # 78–85 DDMMAAAA
+        "valor_centavos": valor_cent,
+        "emissao": data(ln[110:118]),        # 111–118
+    }
+
+def _campos_q(ln: str) -> dict:
+    tipo_insc = ln[18:20].strip()            # 19–20
+    doc       = _dig(ln[20:35])              # 21–35
+    end       = ln[75:115].strip()           # 76–115
+    bairro    = ln[115:130].strip()          # 116–130
+    return {
+        "doc_pagador_tipo": '01' if tipo_insc == '01' else '02',
+        "sacado_cnpj": doc[-11:].rjust(11, '0') if tipo_insc == '01' else doc[-14:].rjust(14, '0'),
+        "sacado": ln[35:75].strip(),         # 36–75
+        "sacado_endereco": f"{end} - {bairro}".strip(" -"),
+        "sacado_cep": _dig(ln[130:138]),     # 131–138
+        "sacado_cidade": ln[138:153].strip(),  # 139–153
+        "sacado_uf": ln[153:155].strip(),    # 154–155
+    }
+
+def _titulo(p: dict, q: dict) -> Titulo | None:
+    if not p.get("documento"):
+        return None
+    # Normaliza documento removendo DV tipo 12345-1 / 12345/1 / 12345.1
+    m = _RE_DOC_DV.match(p["documento"])
+    if m:
+        p = {**p, "documento": m.group(1)}
+    return Titulo(**p, **q)
+
+def iter_titulos_cnab240(caminho: str):
+    """
+    Lê o CNAB240 em fluxo e gera um Titulo por par de segmentos P/Q (um R
+    opcional depois do Q é aceito e ignorado). P e Q vizinhos são casados na
+    hora; só segmentos fora de ordem ficam guardados (por número sequencial)
+    até aparecer o par. Os trailers de lote (tipo 5) e de arquivo (tipo 9)
+    são conferidos ao passar — contagem divergente levanta ErroCnab240.
+    """
+    p_pend = None                 # (seq, campos) do último P ainda sem Q
+    sobra_p, sobra_q = {}, {}     # fora de ordem: seq -> campos
+    regs_lote = lotes = regs_arquivo = 0
+    trailer_arquivo = False
 
-    return titulos
+    with open(caminho, "r", encoding="latin-1") as f:
+        for ln in f:
+            if len(ln) < 240:
+                continue
+            regs_arquivo += 1
+            tipo = ln[SEG_IDX_TIPO_REG]
+
+            if tipo == '3':
+                regs_lote += 1
+                seg = ln[SEG_IDX_COD_SEG]
+                try:
+                    if seg == 'P':
+                        if p_pend:
+                            sobra_p[p_pend[0]] = p_pend[1]
+                        p_pend = (_seq(ln), _campos_p(ln))
+                    elif seg == 'Q':
+                        seq, q = _seq(ln), _campos_q(ln)
+                        if p_pend:
+                            p = p_pend[1]
+                            p_pend = None
+                        else:
+                            p = sobra_p.pop(seq, None) or (sobra_p.pop(seq - 1, None) if seq else None)
+                        if p is None:
+                            sobra_q[seq] = q
+                            continue
+                        t = _titulo(p, q)
+                        if t:
+                            yield t
+                except Exception:
+                    continue
 
-def converter_arquivo_bb240(parametros: dict):
-    """Converte arquivos CNAB240 BB para títulos BMP."""
+            elif tipo == '1':
+                regs_lote = 1
+                lotes += 1
+
+            elif tipo == '5':
+                regs_lote += 1
+                esperado = ln[17:23]
+                if esperado.strip().isdigit() and int(esperado) != regs_lote:
+                    raise ErroCnab240(f"Lote {ln[3:7]}: trailer informa {int(esperado)} registros, lidos {regs_lote}.")
+                regs_lote = 0
+
+            elif tipo == '9':
+                trailer_arquivo = True
+                qtd_lotes, qtd_regs = ln[17:23], ln[23:29]
+                if qtd_lotes.strip().isdigit() and int(qtd_lotes) != lotes:
+                    raise ErroCnab240(f"Trailer do arquivo informa {int(qtd_lotes)} lotes, lidos {lotes}.")
+                if qtd_regs.strip().isdigit() and int(qtd_regs) != regs_arquivo:
+                    raise ErroCnab240(f"Trailer do arquivo informa {int(qtd_regs)} registros, lidos {regs_arquivo}.")
+
+    if p_pend:
+        sobra_p[p_pend[0]] = p_pend[1]
+    # pares que vieram fora de ordem (mesmo sequencial ou Q logo após o P)
+    for seq in sorted(k for k in sobra_q if k is not None):
+        p = sobra_p.pop(seq, None) or sobra_p.pop(seq - 1, None)
+        if p is not None:
+            t = _titulo(p, sobra_q[seq])
+            if t:
+                yield t
+    if not trailer_arquivo:
+        log.warning("%s sem trailer de arquivo (tipo 9)", os.path.basename(caminho))
+
+def converter_arquivo_bb240(parametros: dict, parent=None, ao_concluir=None):
+    """Converte arquivos CNAB240 BB para títulos BMP (leitura e remessa em segundo plano)."""
     caminho_entrada = parametros.get("pastas", {}).get("pasta_importar_remessa", os.path.expanduser("~"))
 
     arquivo = filedialog.askopenfilename(
+        parent=parent,
         initialdir=caminho_entrada,
         filetypes=[("Arquivos CNAB240", "*.REM *.TXT *.240")]
     )
     if not arquivo:
         return
 
-    try:
-        titulos = _parse_cnab240_bb(arquivo, parametros)
-
-    except Exception as e:
-        messagebox.showerror("Erro", f"Falha ao ler CNAB240: {e}")
-        return
-
-    if not titulos:
-        messagebox.showinfo("Aviso", "Nenhum título encontrado no arquivo selecionado.")
-        return
+    def ler():
+        conferir_layout(arquivo, CNAB240_REMESSA)
+        titulos, delta = _parse_cnab240_bb(arquivo, parametros)
+        return titulos, delta, []
 
-    from utils.gerar_remessa import gerar_remessa_e_zip
-    gerar_remessa_e_zip(titulos, parametros)
+    from utils.gerar_remessa import converter_em_segundo_plano
+    return converter_em_segundo_plano(parametros, ler, parent=parent, erro_leitura="Falha ao ler CNAB240",
+                                      ao_concluir=ao_concluir)
 
 def open_conversor_bb240(parent=None, container=None):
     """Interface para abrir o conversor BB CNAB240 a partir do menu principal."""
@@ -135,10 +179,10 @@ def open_conversor_bb240(parent=None, container=None):
         parametros = carregar_parametros()
         
         # Debug: verificar se os parâmetros foram carregados
-        print(f"[DEBUG] Parâmetros carregados: {type(parametros)}")
-        print(f"[DEBUG] Pastas: {parametros.get('pastas', {})}")
+        log.debug(f"Parâmetros carregados: {type(parametros)}")
+        log.debug(f"Pastas: {parametros.get('pastas', {})}")
         
-        converter_arquivo_bb240(parametros)
+        converter_arquivo_bb240(parametros, parent=parent)
     except Exception as e:
         import traceback
         error_msg = f"Falha ao executar conversor BB CNAB240: {e}\n\nDetalhes:\n{traceback.format_exc()}"
@@ -1,8 +1,14 @@
 # src/conversor_bradesco.py
 import os
-from datetime import datetime
 from tkinter import filedialog, messagebox
 
+from src.detector_layout import conferir_layout, CNAB400_REMESSA
+from utils import parse_cache
+from utils.titulo import Titulo, data
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
 def _digits(s: str) -> str:
     return "".join(ch for ch in (s or "") if ch.isdigit())
 
@@ -14,81 +20,86 @@ def _normalize_tipo_insc(raw: str) -> str:
         return "02"
     return "02"
 
-def converter_arquivo_bradesco(parametros: dict):
-    """Converte arquivos CNAB400 Bradesco para títulos BMP."""
+# versão do parser (entra na chave do parse_cache; incrementar ao mudar a leitura)
+CNAB400_VERSAO = "1"
+
+def _ler_cnab400(arquivo: str) -> list[Titulo]:
+    """Detalhes (tipo 1) do CNAB400 Bradesco, ainda sem Nosso Número."""
+    titulos = []
+    with open(arquivo, "r", encoding="latin-1") as f:
+        for linha in f:
+            if not linha.startswith("1"):
+                continue
+            try:
+                l = linha.rstrip("\r\n")
+
+                documento_raw  = l[110:120]                      # 111–120
+                vencimento_str = l[120:126]                      # 121–126
+                valor_str      = l[126:139]                      # 127–139
+                emissao_str    = l[150:156]                      # 151–156
+
+                tipo_insc_raw  = l[218:220]                      # 219–220
+                doc_raw        = l[220:234]                      # 221–234
+                nome_sacado    = l[234:274].strip()              # 235–274
+                endereco       = l[274:314].strip()              # 275–314
+                cep_raw        = l[326:334]                      # 327–334
+
+                vencimento = data(vencimento_str)
+                emissao    = data(emissao_str)
+                if vencimento is None or emissao is None:
+                    continue
+                valor_cent = int(valor_str)
+
+                numero  = documento_raw[:5].strip().zfill(5)
+                parcela = documento_raw[5:].strip().zfill(3)
+                documento_formatado = f"{numero}/{parcela}"
+
+                doc_tipo = _normalize_tipo_insc(tipo_insc_raw)
+                doc_nums = _digits(doc_raw)
+
+                if doc_tipo == "01":
+                    sacado_doc = doc_nums[-11:].rjust(11, "0")
+                else:
+                    sacado_doc = doc_nums[-14:].rjust(14, "0")
+
+                titulos.append(Titulo(
+                    origem="cnab_bradesco",
+                    sacado=nome_sacado,
+                    documento=documento_formatado,
+                    valor_centavos=valor_cent,
+                    vencimento=vencimento,
+                    emissao=emissao,
+                    sacado_cnpj=sacado_doc,
+                    sacado_endereco=endereco,
+                    sacado_cep=_digits(cep_raw),
+                    doc_pagador_tipo=doc_tipo,
+                ))
+            except Exception:
+                continue
+    return titulos
+
+def converter_arquivo_bradesco(parametros: dict, parent=None, ao_concluir=None):
+    """Converte arquivos CNAB400 Bradesco para títulos BMP (leitura e remessa em segundo plano)."""
     caminho_entrada = parametros.get("pastas", {}).get("pasta_importar_remessa", os.path.expanduser("~"))
 
     arquivo = filedialog.askopenfilename(
+        parent=parent,
         initialdir=caminho_entrada,
         filetypes=[("Arquivos CNAB400", "*.REM *.TXT")]
     )
     if not arquivo:
         return
 
-    titulos = []
-    try:
-        with open(arquivo, "r", encoding="latin-1") as f:
-            for linha in f:
-                if not linha.startswith("1"):
-                    continue
-                try:
-                    l = linha.rstrip("\r\n")
-
-                    documento_raw  = l[110:120]                      # 111–120
-                    vencimento_str = l[120:126]                      # 121–126
-                    valor_str      = l[126:139]                      # 127–139
-                    emissao_str    = l[150:156]                      # 151–156
-
-                    tipo_insc_raw  = l[218:220]                      # 219–220
-                    doc_raw        = l[220:234]                      # 221–234
-                    nome_sacado    = l[234:274].strip()              # 235–274
-                    endereco       = l[274:314].strip()              # 275–314
-                    cep_raw        = l[326:334]                      # 327–334
-
-                    vencimento = datetime.strptime(vencimento_str, "%d%m%y").strftime("%d/%m/%Y")
-                    emissao    = datetime.strptime(emissao_str, "%d%m%y").strftime("%d/%m/%Y")
-                    valor      = f"{int(valor_str) / 100:.2f}".replace(".", ",")
-
-                    numero  = documento_raw[:5].strip().zfill(5)
-                    parcela = documento_raw[5:].strip().zfill(3)
-                    documento_formatado = f"{numero}/{parcela}"
-
-                    doc_tipo = _normalize_tipo_insc(tipo_insc_raw)
-                    doc_nums = _digits(doc_raw)
-
-                    if doc_tipo == "01":
-                        sacado_doc = doc_nums[-11:].rjust(11, "0")
-                    else:
-                        sacado_doc = doc_nums[-14:].rjust(14, "0")
-
-                    from utils.parametros import gerar_nosso_numero
-                    nosso_numero = gerar_nosso_numero(parametros)
-
-                    titulos.append({
-                        "origem": "cnab_bradesco",
-                        "sacado": nome_sacado,
-                        "documento": documento_formatado,
-                        "valor": valor,
-                        "vencimento": vencimento,
-                        "emissao": emissao,
-                        "nosso_numero": nosso_numero,
-                        "sacado_cnpj": sacado_doc,
-                        "sacado_endereco": endereco,
-                        "sacado_cep": _digits(cep_raw),
-                        "doc_pagador_tipo": doc_tipo,
-                    })
-                except Exception:
-                    continue
-    except Exception as e:
-        messagebox.showerror("Erro", f"Falha ao ler o arquivo: {e}")
-        return
+    from utils.gerar_remessa import converter_em_segundo_plano, preparar_conversao
 
-    if not titulos:
-        messagebox.showinfo("Aviso", "Nenhum título encontrado no arquivo selecionado.")
-        return
+    def ler():
+        conferir_layout(arquivo, CNAB400_REMESSA)
+        titulos = parse_cache.com_cache(arquivo, "conv_cnab400_bradesco", CNAB400_VERSAO, _ler_cnab400)
+        if not titulos:
+            return [], None, []
+        return (*preparar_conversao(titulos, parametros), [])
 
-    from utils.gerar_remessa import gerar_remessa_e_zip
-    gerar_remessa_e_zip(titulos, parametros)
+    return converter_em_segundo_plano(parametros, ler, parent=parent, ao_concluir=ao_concluir)
 
 def open_conversor_bradesco(parent=None, container=None):
     """Interface para abrir o conversor Bradesco a partir do menu principal."""
@@ -97,10 +108,10 @@ def open_conversor_bradesco(parent=None, container=None):
         parametros = carregar_parametros()
         
         # Debug: verificar se os parâmetros foram carregados
-        print(f"[DEBUG] Parâmetros carregados: {type(parametros)}")
-        print(f"[DEBUG] Pastas: {parametros.get('pastas', {})}")
+        log.debug(f"Parâmetros carregados: {type(parametros)}")
+        log.debug(f"Pastas: {parametros.get('pastas', {})}")
         
-        converter_arquivo_bradesco(parametros)
+        converter_arquivo_bradesco(parametros, parent=parent)
     except Exception as e:
         import traceback
         error_msg = f"Falha ao executar conversor Bradesco: {e}\n\nDetalhes:\n{traceback.format_exc()}"
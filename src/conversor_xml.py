@@ -1,95 +1,54 @@
 # src/conversor_xml.py
 import os
-import xml.etree.ElementTree as ET
-from datetime import datetime
 from tkinter import filedialog, messagebox
 
-def converter_arquivo_xml(parametros: dict):
-    """Converte arquivos XML de notas fiscais para títulos BMP."""
+from src.nfe_reader import ler_nfes
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+def converter_arquivo_xml(parametros: dict, parent=None, ao_concluir=None):
+    """Converte arquivos XML de notas fiscais para títulos BMP (leitura e remessa em segundo plano)."""
     caminho_entrada = parametros.get("pastas", {}).get("pasta_importar_remessa", os.path.expanduser("~"))
 
     arquivos = filedialog.askopenfilenames(
+        parent=parent,
         initialdir=caminho_entrada,
         filetypes=[("Arquivos XML", "*.xml")]
     )
     if not arquivos:
         return
 
-    titulos = []
-    for arq in arquivos:
-        try:
-            tree = ET.parse(arq)
-            root = tree.getroot()
-            ns = {"nfe": "http://www.portalfiscal.inf.br/nfe"}
+    from utils.gerar_remessa import converter_em_segundo_plano, preparar_conversao
 
-            duplicatas = root.findall(".//nfe:dup", namespaces=ns)
-            if not duplicatas:
+    def ler():
+        titulos, avisos = [], []
+        for arq, lidos, erro in ler_nfes(arquivos):
+            if erro:
+                avisos.append(f"Erro ao processar {arq}: {erro}")
                 continue
-
-            ide = root.find(".//nfe:ide", namespaces=ns)
-            dest = root.find(".//nfe:dest", namespaces=ns)
-
-            nfe_num = ide.findtext("nfe:nNF", default="", namespaces=ns)
-            emissao_raw = (ide.findtext("nfe:dhEmi", default="", namespaces=ns) or "")[:10]
-            emissao = datetime.strptime(emissao_raw, "%Y-%m-%d").strftime("%d/%m/%Y")
-
-            sacado_nome = dest.findtext("nfe:xNome", default="", namespaces=ns) or ""
-            doc_sacado  = (dest.findtext("nfe:CNPJ", default="", namespaces=ns)
-                           or dest.findtext("nfe:CPF", default="", namespaces=ns) or "")
-            end = dest.find(".//nfe:enderDest", namespaces=ns)
-
-            xLgr = end.findtext("nfe:xLgr","",namespaces=ns) or ""
-            nro  = end.findtext("nfe:nro","",namespaces=ns) or ""
-            xBai = end.findtext("nfe:xBairro","",namespaces=ns) or ""
-            cep  = end.findtext("nfe:CEP","",namespaces=ns) or ""
-            endereco_str = f"{xLgr}, {nro} - {xBai}".strip().strip(", -")
-
-            for dup in duplicatas:
-                parcela_raw = dup.findtext("nfe:nDup", default="", namespaces=ns) or ""
-                venc_raw = dup.findtext("nfe:dVenc", default="", namespaces=ns) or ""
-                valor_raw = dup.findtext("nfe:vDup", default="", namespaces=ns) or ""
-
-                if not venc_raw or not valor_raw:
+            for t in lidos:
+                if t.vencimento is None or not t.extras.get("valor_raw"):
                     continue
 
-                vencimento = datetime.strptime(venc_raw, "%Y-%m-%d").strftime("%d/%m/%Y")
-                valor = valor_raw.replace(".", ",")
-
+                parcela_raw = t.extras.get("parcela", "")
                 parcela = parcela_raw.split("/")[-1] if "/" in parcela_raw else ""
-                
-                from utils.parametros import gerar_nosso_numero
-                nosso_numero = gerar_nosso_numero(parametros)
-
-                dig = "".join(ch for ch in doc_sacado if ch.isdigit())
-                tipo = "01" if len(dig) == 11 else "02"
-
-                titulos.append({
-                    "sacado": sacado_nome,
-                    "documento": f"{nfe_num}-{parcela}" if parcela else nfe_num,
-                    "valor": valor,
-                    "vencimento": vencimento,
-                    "nosso_numero": nosso_numero,
-                    "sacado_endereco": endereco_str,
-                    "sacado_cep": "".join(ch for ch in (cep or "") if ch.isdigit()),
-                    "doc_pagador_tipo": tipo,
-                    "emissao": emissao,
-                    "sacado_cnpj": dig
-                })
-
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao processar {arq}: {str(e)}")
-
-    if not titulos:
-        messagebox.showinfo("Aviso", "Nenhum título válido encontrado nos arquivos selecionados.")
-        return
-
-    from utils.gerar_remessa import gerar_remessa_e_zip
-    gerar_remessa_e_zip(titulos, parametros)
+                nfe_num = t.extras.get("nfe_numero", "")
+                t.documento = f"{nfe_num}-{parcela}" if parcela else nfe_num
+                t.origem = ""
+                t.extras.clear()
+                titulos.append(t)
+        if not titulos:
+            return [], None, avisos
+        return (*preparar_conversao(titulos, parametros), avisos)
+
+    return converter_em_segundo_plano(parametros, ler, parent=parent, ao_concluir=ao_concluir,
+                                      vazio="Nenhum título válido encontrado nos arquivos selecionados.")
 
 # Função de interface para o menu principal
 def open_conversor_xml(parent=None, container=None):
     """Interface para abrir o conversor XML a partir do menu principal."""
-    print("[DEBUG] open_conversor_xml chamada!")
+    log.debug("open_conversor_xml chamada!")
     
     try:
         # Forçar reload dos módulos para garantir que estamos usando a versão mais recente
@@ -103,11 +62,11 @@ def open_conversor_xml(parent=None, container=None):
         from utils.parametros import carregar_parametros
         parametros = carregar_parametros()
         
-        print(f"[DEBUG] Parâmetros carregados: {type(parametros)}")
-        print(f"[DEBUG] Pastas: {parametros.get('pastas', {})}")
+        log.debug(f"Parâmetros carregados: {type(parametros)}")
+        log.debug(f"Pastas: {parametros.get('pastas', {})}")
         
         # Chamar a função de conversão
-        converter_arquivo_xml(parametros)
+        converter_arquivo_xml(parametros, parent=parent)
         
     except Exception as e:
         import traceback
@@ -119,4 +78,4 @@ def open_conversor_xml(parent=None, container=None):
 __all__ = ['converter_arquivo_xml', 'open_conversor_xml']
 
 # Debug: mostrar que o módulo foi carregado
-print(f"[DEBUG] Módulo conversor_xml carregado. Funções disponíveis: {__all__}")
+log.debug(f"Módulo conversor_xml carregado. Funções disponíveis: {__all__}")
@@ -0,0 +1,121 @@
+# src/detector_layout.py
+"""
+Identifica o layout de um arquivo pelo conteúdo (e não pela extensão):
+NF-e em XML, CNAB 400 remessa/retorno e CNAB 240 remessa/retorno.
+
+Lê só o começo do arquivo (AMOSTRA bytes) e o tamanho no disco, então o custo
+é o mesmo para um arquivo de 1 KB ou de 1 GB. O registro header de cada
+layout tem literais fixos que bastam para separar os casos:
+
+  CNAB 400 — pos 1 '0', pos 2 '1' (remessa) / '2' (retorno),
+             3–9 'REMESSA'/'RETORNO', 77–79 código do banco, 80–94 nome.
+  CNAB 240 — 1–3 código do banco, 4–7 '0000' (lote do header), 8 '0',
+             143 '1' (remessa) / '2' (retorno).
+  NF-e     — XML com <nfeProc>/<NFe> ou o namespace da SEFAZ.
+"""
+import os
+from dataclasses import dataclass
+
+AMOSTRA = 1024
+
+NFE_XML          = "nfe_xml"
+CNAB400_REMESSA  = "cnab400_remessa"
+CNAB400_RETORNO  = "cnab400_retorno"
+CNAB240_REMESSA  = "cnab240_remessa"
+CNAB240_RETORNO  = "cnab240_retorno"
+DESCONHECIDO     = "desconhecido"
+
+_DESCRICOES = {
+    NFE_XML: "NF-e (XML)",
+    CNAB400_REMESSA: "CNAB 400 remessa",
+    CNAB400_RETORNO: "CNAB 400 retorno",
+    CNAB240_REMESSA: "CNAB 240 remessa",
+    CNAB240_RETORNO: "CNAB 240 retorno",
+    DESCONHECIDO: "formato desconhecido",
+}
+
+_BOM = b"\xef\xbb\xbf"
+
+@dataclass(frozen=True, slots=True)
+class Layout:
+    tipo: str
+    banco: str = ""           # código do banco do header CNAB ('237', '274', '001'...)
+    nome_banco: str = ""
+    tam_registro: int = 0     # 240/400 para CNAB (sem o fim de linha)
+    motivo: str = ""          # por que não foi reconhecido
+
+    @property
+    def descricao(self) -> str:
+        d = _DESCRICOES.get(self.tipo, self.tipo)
+        if self.banco:
+            d += f" • banco {self.banco}" + (f" {self.nome_banco}" if self.nome_banco else "")
+        return d
+
+def _tam_registro(amostra: bytes, tam_arquivo: int) -> int:
+    """Tamanho do 1º registro; sem quebra de linha na amostra, deduz pelo tamanho do arquivo."""
+    fim = amostra.find(b"\n")
+    if fim >= 0:
+        return len(amostra[:fim].rstrip(b"\r"))
+    for tam in (400, 240):
+        if len(amostra) >= tam and tam_arquivo % tam == 0:
+            return tam
+    return len(amostra)
+
+def detectar_amostra(amostra: bytes, tam_arquivo: int | None = None) -> Layout:
+    """Classifica a partir dos primeiros bytes do arquivo."""
+    if tam_arquivo is None:
+        tam_arquivo = len(amostra)
+    if amostra.startswith(_BOM):
+        amostra = amostra[len(_BOM):]
+    ini = amostra.lstrip()
+
+    if ini.startswith(b"<"):
+        if b"<nfeProc" in ini or b"<NFe" in ini or b"portalfiscal.inf.br/nfe" in ini:
+            return Layout(NFE_XML)
+        return Layout(DESCONHECIDO, motivo="XML que não é NF-e")
+
+    tam = _tam_registro(amostra, tam_arquivo)
+    ln = amostra[:tam].decode("latin-1")
+
+    if tam == 400 and ln[0] == "0":
+        banco, nome = ln[76:79].strip(), ln[79:94].strip()
+        if ln[1] == "1" or ln[2:9] == "REMESSA":
+            return Layout(CNAB400_REMESSA, banco, nome, 400)
+        if ln[1] == "2" or ln[2:9] == "RETORNO":
+            return Layout(CNAB400_RETORNO, banco, nome, 400)
+        # header sem a identificação (gerado por sistemas antigos): trata como remessa
+        return Layout(CNAB400_REMESSA, banco, nome, 400)
+
+    if tam == 240 and ln[3:8] == "00000":
+        banco, nome = ln[0:3], ln[102:132].strip()
+        if ln[142] == "1":
+            return Layout(CNAB240_REMESSA, banco, nome, 240)
+        if ln[142] == "2":
+            return Layout(CNAB240_RETORNO, banco, nome, 240)
+        # alguns sistemas deixam o código remessa/retorno em branco: trata como remessa
+        return Layout(CNAB240_REMESSA, banco, nome, 240)
+
+    if tam in (240, 400):
+        return Layout(DESCONHECIDO, tam_registro=tam, motivo=f"registros de {tam} posições sem header reconhecível")
+    return Layout(DESCONHECIDO, tam_registro=tam, motivo=f"registro de {tam} posições (esperado 240 ou 400)")
+
+def detectar_layout(caminho: str) -> Layout:
+    """Layout do arquivo lendo no máximo AMOSTRA bytes."""
+    with open(caminho, "rb") as f:
+        amostra = f.read(AMOSTRA)
+        tam_arquivo = os.fstat(f.fileno()).st_size
+    if not amostra:
+        return Layout(DESCONHECIDO, motivo="arquivo vazio")
+    return detectar_amostra(amostra, tam_arquivo)
+
+def conferir_layout(caminho: str, *tipos: str) -> Layout:
+    """
+    Falha logo (ValueError) se o arquivo não é de um dos 'tipos' esperados,
+    em vez de deixar um arquivo trocado chegar ao parser.
+    """
+    layout = detectar_layout(caminho)
+    if layout.tipo not in tipos:
+        esperado = " ou ".join(_DESCRICOES.get(t, t) for t in tipos)
+        raise ValueError(f"{os.path.basename(caminho)} parece ser {layout.descricao}"
+                         f"{' (' + layout.motivo + ')' if layout.motivo else ''}; esperado {esperado}.")
+    return layout
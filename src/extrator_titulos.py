@@ -1,9 +1,19 @@
 # === src/extrator_titulos.py ===
 import os
 import re
-import xml.etree.ElementTree as ET
-from datetime import datetime
+from src.detector_layout import (
+    detectar_layout, Layout, NFE_XML, CNAB400_REMESSA, CNAB400_RETORNO,
+    CNAB240_REMESSA, CNAB240_RETORNO, DESCONHECIDO,
+)
+from src.nfe_reader import ler_nfe_em_cache, ler_nfes
+from utils import parse_cache
+from utils.cnab_mmap import ArquivoCnab, txt
 from utils.nn_registry import buscar_nosso_numero
+from utils.titulo import Titulo, data
+from utils.log import get_logger
+from utils import perf
+
+log = get_logger(__name__)
 
 # ---------------- helpers ----------------
 
@@ -48,100 +58,105 @@ def _formatar_fone(f):
 
 # ---------------- API principal ----------------
 
+@perf.medir("extrair.arquivo")
 def extrair_titulos_de_arquivo(arquivo, parametros):
     """
-    Retorna lista de títulos em um formato único para a app.
-    Cada título é um dict com chaves como: sacado, documento, valor, vencimento, emissao, sacado_endereco, sacado_cnpj etc.
+    Retorna lista de títulos em um formato único para a app (utils.titulo.Titulo:
+    valor em centavos e datas como date; também aceita acesso estilo dict).
+    O layout é detectado pelo conteúdo (src.detector_layout), não pela extensão.
     Se houver Nosso Número previamente registrado, ele já é atribuído (campo 'nosso_numero').
     """
     try:
-        low = (arquivo or "").lower()
-        if low.endswith(".xml"):
-            return extrair_de_xml(arquivo, parametros)
-        elif low.endswith((".rem", ".txt")):
-            return extrair_de_bradesco(arquivo, parametros)
-        else:
-            raise RuntimeError("Formato de arquivo não suportado. Use XML ou CNAB400 (.REM/.TXT).")
+        layout = detectar_layout(arquivo)
+        ler = _EXTRATORES.get(layout.tipo)
+        if ler is None:
+            raise RuntimeError(_nao_suportado(layout))
+        return ler(arquivo, parametros)
     except Exception as e:
         raise Exception(f"Erro ao extrair dados de {os.path.basename(arquivo)}: {e}")
 
-# ---------------- XML NFe ----------------
-
-def extrair_de_xml(arquivo, parametros):
-    ns = {"nfe": "http://www.portalfiscal.inf.br/nfe"}
-    tree = ET.parse(arquivo)
-    root = tree.getroot()
+def _nao_suportado(layout) -> str:
+    if layout.tipo in (CNAB400_RETORNO, CNAB240_RETORNO):
+        return f"{layout.descricao}: arquivo de retorno não contém títulos para emitir."
+    return (f"Formato não suportado ({layout.motivo or layout.descricao}). "
+            "Use NF-e (XML), CNAB 400 ou CNAB 240 de remessa.")
 
-    ide = root.find(".//nfe:ide", namespaces=ns)
-    dest = root.find(".//nfe:dest", namespaces=ns)
+def extrair_titulos_de_arquivos(arquivos, parametros):
+    """
+    Importação em lote de uma pasta com arquivos de layouts misturados, em uma
+    passada: cada arquivo é classificado pelo começo (custo fixo por arquivo) e
+    as NF-e vão juntas para src.nfe_reader.ler_nfes (cache + processos).
+    Devolve [(arquivo, layout, títulos, erro)] na ordem de entrada; 'erro' é
+    None quando o arquivo foi lido.
+    """
+    arquivos = list(arquivos)
+    layouts = {}
+    for a in arquivos:
+        try:
+            layouts[a] = detectar_layout(a)
+        except OSError as e:
+            layouts[a] = Layout(DESCONHECIDO, motivo=str(e))
+
+    resultado = {}
+    xmls = [a for a in arquivos if layouts[a].tipo == NFE_XML]
+    for a, titulos, erro in ler_nfes(xmls):
+        resultado[a] = (titulos, erro) if erro else (_ajustar_titulos_xml(titulos), None)
+
+    for a in arquivos:
+        if a in resultado:
+            continue
+        ler = _EXTRATORES.get(layouts[a].tipo)
+        if ler is None:
+            resultado[a] = ([], _nao_suportado(layouts[a]))
+            continue
+        try:
+            resultado[a] = (ler(a, parametros), None)
+        except Exception as e:
+            resultado[a] = ([], str(e))
 
-    nfe_num = (ide.findtext("nfe:nNF", default="", namespaces=ns) or "").strip()
+    return [(a, layouts[a], *resultado[a]) for a in arquivos]
 
-    emissao = ""
-    emissao_raw = (ide.findtext("nfe:dhEmi", default="", namespaces=ns) or "")[:10]
-    if emissao_raw:
-        try:
-            emissao = datetime.strptime(emissao_raw, "%Y-%m-%d").strftime("%d/%m/%Y")
-        except Exception:
-            emissao = emissao_raw
-
-    # Sacado
-    sacado_nome = (dest.findtext("nfe:xNome", default="", namespaces=ns) or "").strip()
-    sacado_cnpj = (dest.findtext("nfe:CNPJ", default="", namespaces=ns)
-                   or dest.findtext("nfe:CPF", default="", namespaces=ns) or "").strip()
-
-    end = dest.find(".//nfe:enderDest", namespaces=ns)
-    xLgr = (end.findtext("nfe:xLgr", "", namespaces=ns) or "").strip()
-    nro = (end.findtext("nfe:nro", "", namespaces=ns) or "").strip()
-    xBairro = (end.findtext("nfe:xBairro", "", namespaces=ns) or "").strip()
-    cidade = (end.findtext("nfe:xMun", "", namespaces=ns) or "").strip()
-    uf = (end.findtext("nfe:UF", "", namespaces=ns) or "").strip()
-    cep = (end.findtext("nfe:CEP", "", namespaces=ns) or "").strip()
-    fone = (end.findtext("nfe:fone", "", namespaces=ns)
-            or dest.findtext("nfe:fone", "", namespaces=ns) or "").strip()
-    endereco_str = f"{xLgr}, {nro} - {xBairro}".strip().strip(", -")
-
-    cep_fmt = _formatar_cep(cep)
-    fone_fmt = _formatar_fone(fone)
+def extrair_titulos_de_pasta(pasta, parametros):
+    """extrair_titulos_de_arquivos para todos os arquivos (não ocultos) da pasta."""
+    arquivos = sorted(
+        os.path.join(pasta, n) for n in os.listdir(pasta)
+        if not n.startswith(".") and os.path.isfile(os.path.join(pasta, n))
+    )
+    return extrair_titulos_de_arquivos(arquivos, parametros)
 
-    titulos = []
-    for dup in root.findall(".//nfe:dup", namespaces=ns):
-        parcela = (dup.findtext("nfe:nDup", default="", namespaces=ns) or "").strip()
+# ---------------- XML NFe ----------------
 
-        vencimento = ""
-        venc_raw = (dup.findtext("nfe:dVenc", default="", namespaces=ns) or "").strip()
-        if venc_raw:
-            try:
-                vencimento = datetime.strptime(venc_raw, "%Y-%m-%d").strftime("%d/%m/%Y")
-            except Exception:
-                vencimento = venc_raw
-
-        valor = (dup.findtext("nfe:vDup", default="0,00", namespaces=ns) or "0,00").strip()
-
-        doc_composto = f"{nfe_num}-{parcela}" if parcela else nfe_num
-        t = {
-            "sacado": sacado_nome,
-            "documento": _doc_base_sem_dv(doc_composto),
-            "valor": valor,
-            "vencimento": vencimento,
-            "emissao": emissao,
-            "sacado_cnpj": _doc_pagador_14(sacado_cnpj),
-            "sacado_endereco": endereco_str,
-            "sacado_cidade": cidade,
-            "sacado_uf": uf,
-            "sacado_cep": cep_fmt,
-            "sacado_fone": fone_fmt,
-        }
+def extrair_de_xml(arquivo, parametros):
+    return _ajustar_titulos_xml(ler_nfe_em_cache(arquivo))
+
+def _ajustar_titulos_xml(titulos):
+    for t in titulos:
+        t.documento = _doc_base_sem_dv(t.documento)
+        t.sacado_cnpj = _doc_pagador_14(t.sacado_cnpj)
+        t.doc_pagador_tipo = ""
+        t.sacado_cep = _formatar_cep(t.sacado_cep)
+        t.sacado_fone = _formatar_fone(t.sacado_fone)
+        t.origem = ""
+        t.extras.clear()
         nn = buscar_nosso_numero(t)
         if nn:
-            t["nosso_numero"] = nn
-        titulos.append(t)
-
+            t.nosso_numero = nn
     return titulos
 
 # ---------------- CNAB400 Bradesco (.REM/.TXT) ----------------
 
+# versão do parser de CNAB400 (entra na chave do parse_cache; incrementar ao mudar a leitura)
+CNAB400_VERSAO = "1"
+
 def extrair_de_bradesco(arquivo, parametros):
+    titulos = parse_cache.com_cache(arquivo, "cnab400_bradesco", CNAB400_VERSAO, _ler_cnab400_bradesco)
+    for t in titulos:
+        nn = buscar_nosso_numero(t)
+        if nn:
+            t.nosso_numero = nn
+    return titulos
+
+def _ler_cnab400_bradesco(arquivo):
     """
     Extrai títulos do CNAB400 Bradesco (registro detalhe = linhas com '1').
     Campos que usamos:
@@ -154,41 +169,58 @@ def extrair_de_bradesco(arquivo, parametros):
       - endereço (275–314)
     """
     titulos = []
-    with open(arquivo, "r", encoding="latin-1") as f:
-        for ln in f:
-            if not ln or ln[0] != "1":
+    ignoradas = 0
+    with ArquivoCnab(arquivo) as arq:
+        for n, reg in arq.linhas():
+            if not len(reg) or reg[0] != 0x31:   # '1' — header/trailer nem são decodificados
                 continue
-            l = ln.rstrip("\r\n")
+            l = txt(reg)
             try:
                 documento = l[110:120].strip()
-                vencimento = datetime.strptime(l[120:126], "%d%m%y").strftime("%d/%m/%Y")
+                vencimento = data(l[120:126])
+                if vencimento is None:
+                    raise ValueError(f"vencimento inválido: {l[120:126]!r}")
                 valor_cent = int(l[126:139])
-                valor = f"{valor_cent/100:.2f}".replace(".", ",")
-                emissao = datetime.strptime(l[150:156], "%d%m%y").strftime("%d/%m/%Y")
+                emissao = data(l[150:156])
+                if emissao is None:
+                    raise ValueError(f"emissão inválida: {l[150:156]!r}")
                 cnpj_cpf = l[220:234].strip()
                 nome_sacado = l[234:274].strip()
                 endereco = l[274:314].strip()
             except Exception as e:
-                # pula linha mal formatada, mas loga no console
-                print(f"[extrair_de_bradesco] linha ignorada: {e}")
+                # pula linha mal formatada; o detalhe só vai para o log em DEBUG, o resumo em WARNING
+                ignoradas += 1
+                log.debug("%s linha %d ignorada: %s", arquivo, n, e)
                 continue
 
-            t = {
-                "sacado": nome_sacado,
-                "documento": _doc_base_sem_dv(documento),   # normaliza para bater com a chave do registro
-                "valor": valor,
-                "vencimento": vencimento,
-                "emissao": emissao,
-                "sacado_cnpj": _doc_pagador_14(cnpj_cpf),   # 14 dígitos
-                "sacado_endereco": endereco,
-                "sacado_cidade": "",
-                "sacado_uf": "",
-                "sacado_cep": "",
-                "sacado_fone": "",
-            }
-            nn = buscar_nosso_numero(t)
-            if nn:
-                t["nosso_numero"] = nn
+            t = Titulo(
+                sacado=nome_sacado,
+                documento=_doc_base_sem_dv(documento),   # normaliza para bater com a chave do registro
+                valor_centavos=valor_cent,
+                vencimento=vencimento,
+                emissao=emissao,
+                sacado_cnpj=_doc_pagador_14(cnpj_cpf),   # 14 dígitos
+                sacado_endereco=endereco,
+            )
             titulos.append(t)
 
+    if ignoradas:
+        log.warning("%s: %d linha(s) de detalhe mal formatada(s) ignorada(s)", os.path.basename(arquivo), ignoradas)
     return titulos
+
+# ---------------- CNAB240 (remessa) ----------------
+
+def extrair_de_cnab240(arquivo, parametros):
+    from src.conversor_bb240 import _ler_cnab240_bb, CNAB240_BB_VERSAO
+    titulos = parse_cache.com_cache(arquivo, "cnab240_bb", CNAB240_BB_VERSAO, _ler_cnab240_bb)
+    for t in titulos:
+        nn = buscar_nosso_numero(t)
+        if nn:
+            t.nosso_numero = nn
+    return titulos
+
+_EXTRATORES = {
+    NFE_XML: extrair_de_xml,
+    CNAB400_REMESSA: extrair_de_bradesco,
+    CNAB240_REMESSA: extrair_de_cnab240,
+}
@@ -0,0 +1,178 @@
+# src/nfe_reader.py
+"""
+Leitor único de NF-e (XML) para o extrator de boletos e o conversor de remessa.
+
+Leitura por eventos (XMLPullParser, o mesmo motor do iterparse) que só
+interpreta ide, dest (com enderDest) e dup: os bytes dos itens (det), totais
+e transporte nem chegam ao parser — o leitor alimenta o trecho até o primeiro
+<det> e depois só o bloco <cobr> — e os elementos são limpos assim que lidos.
+Se os marcadores não forem achados (ex.: tags com prefixo), o arquivo inteiro
+é alimentado e os det são descartados ao fechar. Vários arquivos são lidos em
+paralelo com um pool de processos.
+
+O resultado são títulos canônicos (utils.titulo.Titulo) ainda sem Nosso Número:
+  - documento = "nNF-nDup" (ou só nNF sem parcela), sem outra normalização
+  - sacado_cnpj/sacado_cep/sacado_fone só com dígitos
+  - extras["nfe_numero"] / extras["parcela"] / extras["valor_raw"] como no XML
+Cada chamador aplica as próprias regras de documento e de Nosso Número.
+"""
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import parse_cache
+from utils.titulo import Titulo, centavos, data
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# versão da leitura (entra na chave do parse_cache; incrementar ao mudar ler_nfe)
+NFE_VERSAO = "1"
+
+_NS = "{http://www.portalfiscal.inf.br/nfe}"
+_IDE, _DEST, _DUP, _DET, _COBR = (_NS + t for t in ("ide", "dest", "dup", "det", "cobr"))
+
+# abaixo disso o custo de subir os processos não compensa
+_MIN_ARQUIVOS_PARALELO = 8
+
+def _so_digitos(s: str) -> str:
+    return "".join(ch for ch in s if ch.isdigit())
+
+def _txt(el, nome: str) -> str:
+    return (el.findtext(_NS + nome) or "").strip() if el is not None else ""
+
+def _tag_em(buf: bytes, tag: bytes, inicio: int = 0) -> int:
+    """Posição de '<tag' seguida de '>' ou espaço (não confunde <det com <dest)."""
+    i = buf.find(tag, inicio)
+    while i >= 0:
+        prox = buf[i + len(tag):i + len(tag) + 1]
+        if prox in (b">", b" ", b"\t", b"\r", b"\n"):
+            return i
+        i = buf.find(tag, i + 1)
+    return -1
+
+def _eventos(buf: bytes):
+    parser = ET.XMLPullParser(events=("end",))
+    i_det = _tag_em(buf, b"<det")
+    i_cobr = _tag_em(buf, b"<cobr", i_det) if i_det >= 0 else -1
+    if i_det < 0 or i_cobr < 0:
+        parser.feed(buf)
+        yield from parser.read_events()
+        return
+    parser.feed(buf[:i_det])
+    yield from parser.read_events()
+    fim = buf.find(b"</cobr>", i_cobr)
+    parser.feed(buf[i_cobr:fim + 7] if fim >= 0 else buf[i_cobr:])
+    yield from parser.read_events()
+
+def ler_nfe(arquivo: str) -> list[Titulo]:
+    """Títulos (duplicatas) de uma NF-e. XML sem ide/dest levanta ValueError."""
+    ide = dest = None
+    dups = []
+    with open(arquivo, "rb") as f:
+        buf = f.read()
+    for _ev, el in _eventos(buf):
+        tag = el.tag
+        if tag == _DUP:
+            dups.append((_txt(el, "nDup"), _txt(el, "dVenc"), _txt(el, "vDup")))
+            el.clear()
+        elif tag == _DET:
+            el.clear()
+        elif tag == _IDE:
+            ide = (_txt(el, "nNF"), (_txt(el, "dhEmi") or _txt(el, "dEmi"))[:10])
+            el.clear()
+        elif tag == _DEST:
+            end = el.find(_NS + "enderDest")
+            dest = {
+                "nome": _txt(el, "xNome"),
+                "doc": _txt(el, "CNPJ") or _txt(el, "CPF"),
+                "xLgr": _txt(end, "xLgr"), "nro": _txt(end, "nro"), "xBairro": _txt(end, "xBairro"),
+                "cidade": _txt(end, "xMun"), "uf": _txt(end, "UF"), "cep": _txt(end, "CEP"),
+                "fone": _txt(end, "fone") or _txt(el, "fone"),
+            }
+            el.clear()
+        elif tag == _COBR:
+            break
+
+    if ide is None or dest is None:
+        raise ValueError("XML não é uma NF-e (ide/dest ausentes).")
+
+    nfe_num, emissao_raw = ide
+    emissao = data(emissao_raw)
+    endereco = f"{dest['xLgr']}, {dest['nro']} - {dest['xBairro']}".strip().strip(", -")
+    doc = _so_digitos(dest["doc"])
+    cep = _so_digitos(dest["cep"])
+    fone = _so_digitos(dest["fone"])
+
+    titulos = []
+    for parcela, venc_raw, valor_raw in dups:
+        titulos.append(Titulo(
+            sacado=dest["nome"],
+            documento=f"{nfe_num}-{parcela}" if parcela else nfe_num,
+            valor_centavos=centavos(valor_raw or "0"),
+            vencimento=data(venc_raw),
+            emissao=emissao,
+            sacado_cnpj=doc,
+            doc_pagador_tipo="01" if len(doc) == 11 else "02",
+            sacado_endereco=endereco,
+            sacado_cidade=dest["cidade"],
+            sacado_uf=dest["uf"],
+            sacado_cep=cep,
+            sacado_fone=fone,
+            origem="xml",
+            extras={"nfe_numero": nfe_num, "parcela": parcela, "valor_raw": valor_raw},
+        ))
+    return titulos
+
+def ler_nfe_em_cache(arquivo: str) -> list[Titulo]:
+    """ler_nfe passando antes pelo parse_cache (chave: sha1 do arquivo + versão)."""
+    return parse_cache.com_cache(arquivo, "nfe", NFE_VERSAO, ler_nfe)
+
+def _ler_seguro(arquivo: str) -> tuple[str, list[Titulo], str | None]:
+    try:
+        return arquivo, ler_nfe(arquivo), None
+    except Exception as e:
+        return arquivo, [], str(e)
+
+def ler_nfes(arquivos, max_workers: int | None = None,
+             usar_cache: bool = True) -> list[tuple[str, list[Titulo], str | None]]:
+    """
+    Lê vários XMLs e devolve [(arquivo, titulos, erro)] na ordem de entrada;
+    'erro' é None quando o arquivo foi lido. Arquivos já no parse_cache não são
+    relidos; os demais vão para um pool de processos quando o lote é grande
+    (max_workers=1 força leitura sequencial).
+    """
+    arquivos = list(arquivos)
+    em_cache = {}
+    if usar_cache:
+        try:
+            em_cache = parse_cache.obter_varios(arquivos, "nfe", NFE_VERSAO)
+        except Exception as e:
+            log.warning("leitura do cache falhou: %s", e)
+    resultado = {i: (a, em_cache[a], None) for i, a in enumerate(arquivos) if a in em_cache}
+    faltam = [i for i in range(len(arquivos)) if i not in resultado]
+
+    novos = []
+    for i, lido in zip(faltam, _ler_varios([arquivos[i] for i in faltam], max_workers)):
+        resultado[i] = lido
+        if lido[2] is None:
+            novos.append((lido[0], lido[1]))
+    if usar_cache and novos:
+        try:
+            parse_cache.gravar_varios(novos, "nfe", NFE_VERSAO)
+        except Exception as e:
+            log.warning("não consegui gravar no cache: %s", e)
+    return [resultado[i] for i in range(len(arquivos))]
+
+def _ler_varios(arquivos: list[str], max_workers: int | None):
+    workers = max_workers or min(8, os.cpu_count() or 1)
+    if workers <= 1 or len(arquivos) < _MIN_ARQUIVOS_PARALELO:
+        return [_ler_seguro(a) for a in arquivos]
+    chunk = max(1, len(arquivos) // (workers * 4))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(_ler_seguro, arquivos, chunksize=chunk))
+    except (OSError, RuntimeError) as e:
+        # ambiente sem suporte a subprocessos (ex.: executável sem freeze_support)
+        log.warning("pool indisponível, lendo em sequência: %s", e)
+        return [_ler_seguro(a) for a in arquivos]
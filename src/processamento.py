@@ -0,0 +1,249 @@
+# src/processamento.py
+"""
+Processamento ponta a ponta em pipeline: arquivos de entrada (XML/CNAB) →
+nosso número → remessa → boletos (PDF) → registro no banco.
+
+Cada etapa roda nos seus próprios workers, ligada à seguinte por uma fila
+limitada (utils.pipeline): o primeiro boleto começa a ser desenhado enquanto
+os arquivos seguintes ainda estão sendo lidos, e uma etapa lenta segura as
+anteriores em vez de acumular tudo na memória.
+
+  extrair      1 worker   arquivo → títulos (layout detectado pelo conteúdo)
+  nosso_numero 1 worker   lotes de 500: reserva NNs numa transação e calcula
+                          código de barras/linha digitável/DV em lote
+  remessa      1 worker   grava cada detalhe na hora (ordem preservada);
+                          no fim, trailer + validação + sequencial + zip
+  boletos      N workers  renderização dos PDFs (threads ou processos)
+  persistir    1 worker   record_boletos em lotes de 200 (um commit por lote)
+
+O andamento fica no diário (utils.jobs): rodar de novo com os mesmos arquivos
+depois de uma queda ou cancelamento reaproveita os nossos números já
+reservados, a remessa já concluída e os boletos já gerados/gravados.
+
+Uso (sem interface):
+    python -m src.processamento arquivo1.xml arquivo2.REM [--sem-boletos] [--workers-boletos N]
+"""
+import os, sys, argparse, threading
+from dataclasses import dataclass, field
+from functools import partial
+
+from utils.pipeline import Pipeline, Etapa, Cancelado
+from utils.jobs import PENDENTE, RENDERIZADO, PERSISTIDO
+from utils.parametros import carregar_parametros, reservar_nossos_numeros
+from utils import store, jobs, perf, memoria
+from src.extrator_titulos import extrair_titulos_de_arquivo
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+LOTE_NN = 500
+LOTE_PERSISTIR = 200
+
+@dataclass(slots=True)
+class Item:
+    chave: str                      # "<nº do arquivo>:<posição>" no diário do job
+    arquivo: str
+    titulo: object
+    codigos: tuple | None = None
+    pdf: str = ""
+    digest: str = ""
+
+@dataclass
+class ResultadoProcessamento:
+    remessa: str = ""
+    titulos: int = 0
+    pdfs: list = field(default_factory=list)
+    erros: list = field(default_factory=list)       # [(arquivo, mensagem)] de arquivos ignorados
+    metricas: list = field(default_factory=list)    # MetricasEtapa.como_dict() por etapa
+    relatorio: str = ""
+    memoria: str = ""                               # relatório do perfil de memória, se ligado
+    job_id: int = 0
+    retomado: bool = False
+
+# ---------------- etapas ----------------
+def _extrair(entrada: tuple, parametros: dict, erros: list):
+    k, arquivo = entrada
+    try:
+        titulos = extrair_titulos_de_arquivo(arquivo, parametros)
+    except Exception as e:
+        log.warning("%s ignorado: %s", os.path.basename(arquivo), e)
+        erros.append((arquivo, str(e)))
+        return ()
+    return (Item(f"{k}:{i}", arquivo, t) for i, t in enumerate(titulos))
+
+def _nosso_numero(lote: list, parametros: dict, job: jobs.Job) -> list:
+    sem_nn = []
+    for it in lote:
+        rec = job.item(it.chave)
+        if rec and rec["dados"].get("nn"):       # reservado numa execução anterior deste job
+            it.titulo.nosso_numero = rec["dados"]["nn"]
+        elif not str(it.titulo.get("nosso_numero") or "").strip():
+            sem_nn.append(it)
+        if jobs.atingiu(rec, RENDERIZADO) and os.path.exists(rec["saida"]):
+            it.pdf, it.digest = rec["saida"], rec["dados"].get("digest", "")
+    for it, nn in zip(sem_nn, reservar_nossos_numeros(parametros, len(sem_nn))):
+        it.titulo.nosso_numero = nn
+        job.marcar(it.chave, PENDENTE, dados={"nn": nn})
+    if sem_nn:
+        job.checkpoint()   # NNs reservados precisam estar no diário antes de seguir
+    from src.boletos import _codigos_do_lote
+    for it, cod in zip(lote, _codigos_do_lote([it.titulo for it in lote], parametros)):
+        it.codigos = cod
+        if cod is not None:
+            it.titulo.nn_dv = cod[2]
+    return lote
+
+class _EtapaRemessa:
+    """
+    Abre a remessa só no primeiro título (sem títulos, nenhum sequencial é
+    consumido). Num job retomado cuja remessa já foi concluída, só repassa os itens.
+    """
+    def __init__(self, parametros: dict, job: jobs.Job):
+        self.parametros = parametros
+        self.job = job
+        self.escritor = None
+        self.path = job.resultado.get("remessa", "")
+        self.pronta = bool(self.path) and os.path.exists(self.path)
+
+    def escrever(self, it: Item) -> Item:
+        if self.pronta:
+            return it
+        if self.escritor is None:
+            from utils.gerar_remessa import EscritorRemessa
+            self.escritor = EscritorRemessa(self.parametros, parar_no_erro=True)
+        self.escritor.escrever(it.titulo)
+        return it
+
+    def concluir(self):
+        if self.escritor is not None:
+            self.path = self.escritor.concluir()
+            self.job.salvar_resultado(remessa=self.path)
+        return None
+
+    def abortar(self):
+        if self.escritor is not None and not self.pronta and self.escritor.path != self.path:
+            self.escritor.abortar()
+
+def _renderizar(it: Item, parametros: dict) -> Item:
+    if it.pdf:          # já gerado numa execução anterior do job
+        return it
+    from src.boletos import gerar_boleto_titulos, render_digest
+    it.digest = render_digest(it.titulo, parametros)
+    it.pdf = gerar_boleto_titulos(it.titulo, codigos=it.codigos, parametros=parametros, registrar=False)
+    return it
+
+def _persistir(lote: list, parametros: dict, job: jobs.Job) -> list:
+    novos = [it for it in lote if not jobs.atingiu(job.item(it.chave), PERSISTIDO)]
+    if novos:
+        for it in novos:
+            job.marcar(it.chave, RENDERIZADO, dados={"digest": it.digest}, saida=it.pdf)
+        job.checkpoint()
+        store.record_boletos([(it.titulo, it.pdf, it.digest) for it in novos], parametros)
+        for it in novos:
+            job.marcar(it.chave, PERSISTIDO)
+        job.checkpoint()
+    return lote
+
+# ---------------- execução ----------------
+def processar_arquivos(arquivos, parametros: dict | None = None, gerar_boletos: bool = True,
+                       workers_boletos: int = 1, processos: bool = False,
+                       ao_progresso=None, cancelar: threading.Event | None = None) -> ResultadoProcessamento:
+    """
+    Gera uma remessa com os títulos de todos os 'arquivos' e, se gerar_boletos,
+    os PDFs correspondentes. Erro em qualquer etapa (ex.: remessa inválida)
+    interrompe tudo e é relançado; a remessa incompleta é descartada.
+    ao_progresso(etapa, metricas) e cancelar: ver utils.pipeline.Pipeline.
+    """
+    p = parametros if parametros is not None else carregar_parametros()
+    res = ResultadoProcessamento()
+    try:
+        store.init_db()
+    except Exception as e:
+        print(f"[store] init_db falhou: {e}", flush=True)
+
+    arquivos = list(arquivos)
+    job = jobs.Job.iniciar("processamento" if gerar_boletos else "remessa", arquivos)
+    res.job_id, res.retomado = job.id, job.retomado
+
+    remessa = _EtapaRemessa(p, job)
+    etapas = [
+        Etapa("extrair", partial(_extrair, parametros=p, erros=res.erros), fila=16, expande=True),
+        Etapa("nosso_numero", partial(_nosso_numero, parametros=p, job=job), fila=2 * LOTE_NN, lote=LOTE_NN,
+              expande=True),
+        Etapa("remessa", remessa.escrever, fila=256, ao_final=remessa.concluir),
+    ]
+    if gerar_boletos:
+        etapas += [
+            Etapa("boletos", partial(_renderizar, parametros=p), workers=max(1, workers_boletos),
+                  fila=64, processos=processos),
+            Etapa("persistir", partial(_persistir, parametros=p, job=job), fila=2 * LOTE_PERSISTIR,
+                  lote=LOTE_PERSISTIR, expande=True),
+        ]
+
+    mem = memoria.perfil("processamento")
+    pipe = Pipeline(etapas, ao_progresso=ao_progresso, cancelar=cancelar, ao_fim_etapa=mem.etapa)
+    medicao = perf.lote("processamento")
+    try:
+        with medicao, mem:
+            saida = pipe.executar(enumerate(arquivos))
+    except Cancelado:
+        remessa.abortar()
+        job.cancelar()
+        raise
+    except BaseException as e:
+        remessa.abortar()
+        job.falhar(e)
+        raise
+    finally:
+        res.metricas = [m.como_dict() for m in pipe.metricas]
+        res.relatorio = pipe.relatorio()
+        if medicao.resumo is not None:
+            res.relatorio += "\n\n" + medicao.resumo.texto()
+        if mem.etapas:
+            try:
+                res.memoria = mem.salvar(os.path.dirname(remessa.path) if remessa.path else None)
+                log.info("perfil de memória: %s", res.memoria)
+            except OSError as e:
+                log.warning("não consegui gravar o perfil de memória: %s", e)
+            res.relatorio += "\n\n" + mem.texto()
+
+    res.remessa = remessa.path
+    res.titulos = len(saida)
+    if gerar_boletos:
+        res.pdfs = [it.pdf for it in saida]
+    job.concluir(remessa=res.remessa, titulos=res.titulos)
+    return res
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Gera remessa e boletos a partir de arquivos XML/CNAB.")
+    ap.add_argument("arquivos", nargs="+")
+    ap.add_argument("--sem-boletos", action="store_true", help="só a remessa")
+    ap.add_argument("--workers-boletos", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--processos", action="store_true", help="renderiza os boletos em processos separados")
+    args = ap.parse_args(argv)
+
+    from utils.gerar_remessa import RemessaInvalida
+    try:
+        res = processar_arquivos(args.arquivos, gerar_boletos=not args.sem_boletos,
+                                 workers_boletos=args.workers_boletos, processos=args.processos)
+    except RemessaInvalida as e:
+        print(f"[processamento] remessa inválida: {e}")
+        return 2
+    except Cancelado:
+        print("[processamento] cancelado (rode de novo com os mesmos arquivos para retomar)")
+        return 1
+
+    print(res.relatorio)
+    if res.retomado:
+        print(f"[processamento] job {res.job_id} retomado do diário")
+    if res.memoria:
+        print(f"[processamento] perfil de memória: {res.memoria}")
+    for arq, msg in res.erros:
+        print(f"[processamento] ignorado {arq}: {msg}")
+    print(f"[processamento] {res.titulos} título(s) • remessa: {res.remessa or '-'} • boletos: {len(res.pdfs)}")
+    return 0
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
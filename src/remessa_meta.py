@@ -1,30 +1,208 @@
 # src/remessa_meta.py
-import os, json, re
+"""
+Catálogo das remessas geradas, na base do app (no lugar dos antigos
+.meta.json ao lado de cada arquivo e das varreduras de pasta):
+
+  remessa         uma linha por arquivo: sequencial, caminho, sha256, nº de
+                  títulos, valor total, empresa e os campos do header
+  remessa_titulo  um título por detalhe (nº do registro, documento, NN,
+                  vencimento, valor, pagador), ligado à remessa
+
+A remessa e seus títulos entram numa transação só, quando EscritorRemessa
+conclui uma remessa válida (catalogar_remessa). Histórico, "última remessa"
+e "em que remessa foi o título X" são consultas por índice:
+
+    ultima_remessa_meta()                     # beneficiário para o retorno
+    historico(limite=50)                      # mais recentes primeiro
+    remessa_por_sequencial(123)
+    remessas_do_titulo(nosso_numero="00000000042")
+"""
+import os, sqlite3
+
+from utils import store, session
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+_tabela_ok: set = set()
+
+def _con() -> sqlite3.Connection:
+    con = store._connect()
+    chave = store._DB_PATH
+    if chave not in _tabela_ok:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS remessa (
+                id             INTEGER PRIMARY KEY AUTOINCREMENT,
+                arquivo        TEXT NOT NULL UNIQUE,
+                sequencial     INTEGER,
+                banco          TEXT,
+                nome_banco     TEXT,
+                data_gravacao  TEXT,
+                codigo_empresa TEXT,
+                nome_empresa   TEXT,
+                agencia        TEXT,
+                conta          TEXT,
+                dv_conta       TEXT,
+                carteira       TEXT,
+                criado_em      TEXT DEFAULT (datetime('now','localtime'))
+            )
+        """)
+        for coldef in ("empresa_id INTEGER", "sha256 TEXT", "titulos INTEGER DEFAULT 0",
+                       "total_centavos INTEGER DEFAULT 0", "codigo_cedente TEXT"):
+            store._try_add_column(con, "remessa", coldef)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_remessa_sequencial ON remessa(sequencial)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_remessa_emp_seq ON remessa(empresa_id, sequencial)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_remessa_sha256 ON remessa(sha256)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS remessa_titulo (
+                remessa_id     INTEGER NOT NULL,
+                nro_registro   INTEGER NOT NULL,
+                documento      TEXT,
+                nosso_numero   TEXT,
+                vencimento     TEXT,
+                valor_centavos INTEGER,
+                doc_pagador    TEXT,
+                PRIMARY KEY (remessa_id, nro_registro),
+                FOREIGN KEY (remessa_id) REFERENCES remessa(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_remessa_titulo_nn ON remessa_titulo(nosso_numero)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_remessa_titulo_doc ON remessa_titulo(documento)")
+        con.commit()
+        _tabela_ok.add(chave)
+    return con
+
+def ler_header(rem_path: str) -> dict | None:
+    """Campos do header da remessa (layout BMP/Bradesco 400) ou None se não for um header."""
+    with open(rem_path, "r", encoding="latin-1") as f:
+        header = f.readline()
+    if not header or header[0] not in "01":  # cabeçalho 0/1 conforme layout
+        return None
+    seq = header[110:117].strip()
+    return {
+        "banco": header[76:79].strip() or "237",
+        "nome_banco": header[79:94].strip() or "BRADESCO",
+        "data_gravacao": header[94:100].strip(),
+        "codigo_empresa": header[26:46],   # 20 posições: zeros + agência + cedente + carteira
+        "nome_empresa": header[46:76].strip(),
+        "agencia": header[33:37].strip(),
+        "codigo_cedente": header[37:44].strip(),   # 38–44 é o cedente, não a conta (essa vem dos parâmetros)
+        "carteira": header[44:46].strip(),
+        "sequencial": int(seq) if seq.isdigit() else None,
+    }
+
+def _gravar(con: sqlite3.Connection, meta: dict) -> int:
+    """Upsert da linha da remessa (chave: caminho); devolve o id."""
+    cols = ", ".join(meta)
+    con.execute(f"""INSERT INTO remessa ({cols}) VALUES ({', '.join('?' * len(meta))})
+                    ON CONFLICT(arquivo) DO UPDATE SET
+                    {', '.join(f'{c}=excluded.{c}' for c in meta if c != 'arquivo')}""",
+                list(meta.values()))
+    return con.execute("SELECT id FROM remessa WHERE arquivo=?", (meta["arquivo"],)).fetchone()[0]
+
+def catalogar_remessa(rem_path: str, titulos, sha256: str = "", total_centavos: int = 0,
+                      empresa_id: int | None = None) -> int:
+    """
+    Cataloga a remessa e seus títulos numa transação. 'titulos' =
+    [(nro_registro, documento, nosso_numero, vencimento, valor_centavos, doc_pagador)].
+    Gerar de novo o mesmo arquivo substitui os títulos dele. Devolve o id.
+    """
+    meta = ler_header(rem_path) or {}
+    titulos = list(titulos)
+    meta.update(arquivo=os.path.abspath(rem_path), sha256=sha256, titulos=len(titulos),
+                total_centavos=int(total_centavos),
+                empresa_id=empresa_id if empresa_id is not None else session.get_empresa_id())
+    con = _con()
+    try:
+        with con:
+            rid = _gravar(con, meta)
+            con.execute("DELETE FROM remessa_titulo WHERE remessa_id=?", (rid,))
+            con.executemany("""INSERT INTO remessa_titulo (remessa_id, nro_registro, documento, nosso_numero,
+                                                           vencimento, valor_centavos, doc_pagador)
+                               VALUES (?,?,?,?,?,?,?)""", ((rid, *t) for t in titulos))
+        return rid
+    finally:
+        con.close()
 
 def record_remessa_meta(rem_path: str):
     """
-    Lê o header da remessa Bradesco 400 e grava um .meta.json com os campos
-    essenciais para montagem do retorno (código empresa, agência/conta, carteira, etc.).
+    Lê o header da remessa e grava (ou atualiza) só a linha dela no catálogo,
+    para remessas feitas fora do EscritorRemessa.
     """
     try:
-        with open(rem_path, "r", encoding="latin-1") as f:
-            header = f.readline()
-        if not header or header[0] not in "01":  # cabeçalho 0/1 conforme layout
+        meta = ler_header(rem_path)
+        if meta is None:
             return
-        meta = {
-            "banco": header[76:79].strip() or "237",
-            "nome_banco": header[79:94].strip() or "BRADESCO",
-            "data_gravacao": header[94:100].strip(),
-            "codigo_empresa": header[26:46],   # 20 posições (ver seu layout de remessa)
-            "nome_empresa": header[46:76].strip(),
-            # Se sua remessa grava agência/conta/carteira em outras posições, ajuste aqui:
-            "agencia": "",
-            "conta": "",
-            "dv_conta": "",
-            "carteira": ""
-        }
-        meta_path = rem_path + ".meta.json"
-        with open(meta_path, "w", encoding="utf-8") as g:
-            json.dump(meta, g, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+        meta["arquivo"] = os.path.abspath(rem_path)
+        con = _con()
+        try:
+            with con:
+                _gravar(con, meta)
+        finally:
+            con.close()
+    except Exception as e:
+        log.warning("não consegui registrar %s: %s", rem_path, e)
+
+def _uma(sql: str, params=()) -> dict | None:
+    con = _con()
+    try:
+        r = con.execute(sql, params).fetchone()
+        return dict(r) if r else None
+    finally:
+        con.close()
+
+def ultima_remessa_meta(empresa_id: int | None = None) -> dict | None:
+    """Metadados da remessa registrada por último (da empresa, se informada) ou None."""
+    if empresa_id is None:
+        return _uma("SELECT * FROM remessa ORDER BY id DESC LIMIT 1")
+    return _uma("SELECT * FROM remessa WHERE empresa_id=? ORDER BY sequencial DESC LIMIT 1", (empresa_id,))
+
+def remessa_por_sequencial(sequencial: int, empresa_id: int | None = None) -> dict | None:
+    if empresa_id is None:
+        return _uma("SELECT * FROM remessa WHERE sequencial=? ORDER BY id DESC LIMIT 1", (int(sequencial),))
+    return _uma("SELECT * FROM remessa WHERE empresa_id=? AND sequencial=?", (empresa_id, int(sequencial)))
+
+def ultimo_sequencial(empresa_id: int | None = None) -> int:
+    """Maior sequencial já catalogado (0 se nenhum)."""
+    r = _uma("SELECT MAX(sequencial) AS s FROM remessa" + (" WHERE empresa_id=?" if empresa_id is not None else ""),
+             (empresa_id,) if empresa_id is not None else ())
+    return int(r["s"] or 0) if r else 0
+
+def historico(limite: int = 50, antes_de_id: int | None = None, empresa_id: int | None = None) -> list[dict]:
+    """Remessas mais recentes primeiro; antes_de_id pagina (id da última linha da página anterior)."""
+    onde, params = [], []
+    if empresa_id is not None:
+        onde.append("empresa_id=?"); params.append(empresa_id)
+    if antes_de_id is not None:
+        onde.append("id<?"); params.append(antes_de_id)
+    sql = "SELECT * FROM remessa" + (" WHERE " + " AND ".join(onde) if onde else "") + " ORDER BY id DESC LIMIT ?"
+    con = _con()
+    try:
+        return [dict(r) for r in con.execute(sql, params + [int(limite)])]
+    finally:
+        con.close()
+
+def titulos_da_remessa(remessa_id: int) -> list[dict]:
+    con = _con()
+    try:
+        return [dict(r) for r in con.execute(
+            "SELECT * FROM remessa_titulo WHERE remessa_id=? ORDER BY nro_registro", (remessa_id,))]
+    finally:
+        con.close()
+
+def remessas_do_titulo(nosso_numero: str | None = None, documento: str | None = None) -> list[dict]:
+    """Remessas (com o nº do registro) que levaram o título, pelo NN ou pelo documento."""
+    if nosso_numero:
+        onde, valor = "t.nosso_numero=?", str(nosso_numero)
+    elif documento:
+        onde, valor = "t.documento=?", str(documento)
+    else:
+        return []
+    con = _con()
+    try:
+        return [dict(r) for r in con.execute(f"""
+            SELECT r.*, t.nro_registro, t.documento AS titulo_documento, t.nosso_numero AS titulo_nosso_numero
+              FROM remessa_titulo t JOIN remessa r ON r.id = t.remessa_id
+             WHERE {onde} ORDER BY r.id DESC""", (valor,))]
+    finally:
+        con.close()
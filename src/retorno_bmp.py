@@ -2,6 +2,10 @@
 import os, json, tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+from utils.cnab_mmap import ArquivoCnab, campo, txt
+from utils.titulo import centavos
+from utils.ui_virtual_list import ListaVirtual, FonteLista
+
 # --- util: carrega config.json
 def _load_cfg():
     cfg_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "config.json"))
@@ -49,16 +53,16 @@ def _status(ocorr, motivos):
 # --- parser do retorno BMP (CNAB 400) - registro tipo '1'
 def parse_retorno_bmp(file_path):
     itens = []
-    with open(file_path, "r", encoding="latin-1") as f:
-        for line in f:
-            if not line or line[0] != "1":
+    with ArquivoCnab(file_path) as arq:
+        for reg in arq:
+            if not len(reg) or reg[0] != 0x31:                  # '1'
                 continue
-            controle = line[37:52].strip()          # 38-52 Nº controle do participante
-            ocorr    = line[108:110]                # 109-110 Identificação de Ocorrência
-            numdoc   = line[116:126].strip()        # 117-126 Nº Documento
-            venc     = _ddmmaa(line[146:152])       # 147-152 Vencimento
-            valor    = _money13(line[152:165])      # 153-165 Valor do Título
-            motivos  = line[318:328].strip()        # 319-328 Motivos
+            controle = txt(campo(reg, 38, 52)).strip()          # 38-52 Nº controle do participante
+            ocorr    = txt(campo(reg, 109, 110))                # 109-110 Identificação de Ocorrência
+            numdoc   = txt(campo(reg, 117, 126)).strip()        # 117-126 Nº Documento
+            venc     = _ddmmaa(txt(campo(reg, 147, 152)))       # 147-152 Vencimento
+            valor    = _money13(txt(campo(reg, 153, 165)))      # 153-165 Valor do Título
+            motivos  = txt(campo(reg, 319, 328)).strip()        # 319-328 Motivos
             itens.append({
                 "sacado": controle or "(controle)",
                 "numdoc": numdoc,
@@ -100,23 +104,21 @@ def abrir_retorno_bmp_gui(root):
     frm = ttk.Frame(nb)
     nb.add(frm, text="Títulos retornados")
 
-    tv = ttk.Treeview(frm, columns=("sacado", "numdoc", "venc", "valor", "status"), show="headings", height=18)
-    tv.heading("sacado", text="Sacado")
-    tv.heading("numdoc", text="Nº Documento")
-    tv.heading("venc",   text="Vencimento")
-    tv.heading("valor",  text="Valor")
-    tv.heading("status", text="Status")
-
+    # lista virtual: retornos grandes abrem na hora (só as linhas visíveis viram itens)
+    cols = ("sacado", "numdoc", "venc", "valor", "status")
+    fonte = FonteLista([tuple(it[c] for c in cols) for it in itens], cols, chaves={
+        "venc": lambda v: (v[6:10], v[3:5], v[0:2]),            # DD/MM/AAAA
+        "valor": centavos,
+    })
     # larguras enxutas para caber bem
-    tv.column("sacado", width=200, anchor="w")
-    tv.column("numdoc", width=120, anchor="center")
-    tv.column("venc",   width=100, anchor="center")
-    tv.column("valor",  width=120, anchor="e")
-    tv.column("status", width=300, anchor="w")
-    tv.pack(fill="both", expand=True)
-
-    for it in itens:
-        tv.insert("", "end", values=(it["sacado"], it["numdoc"], it["venc"], it["valor"], it["status"]))
+    lista = ListaVirtual(frm, [
+        ("sacado", "Sacado",       200, "w"),
+        ("numdoc", "Nº Documento", 120, "center"),
+        ("venc",   "Vencimento",   100, "center"),
+        ("valor",  "Valor",        120, "e"),
+        ("status", "Status",       300, "w"),
+    ], fonte)
+    lista.pack(fill="both", expand=True)
 
     btns = ttk.Frame(win)
     btns.pack(fill="x", side="bottom")
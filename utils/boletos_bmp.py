@@ -1,24 +1,36 @@
 # === utils/boletos_bmp.py ===
 from datetime import date, datetime
+from functools import lru_cache
+
+try:
+    import numpy as np
+except Exception:
+    np = None  # opcional: sem NumPy o lote usa as funções escalares
+
+from utils.titulo import centavos, valor_centavos_de, vencimento_de
 
 BANCO = "274"
 MOEDA = "9"  # Real
 
+_BASE_ANTIGA = date(1997, 10, 7)
+_BASE_NOVA   = date(2025, 2, 22)
+
 def _limpa_valor_brl(valor_str: str) -> int:
-    v = valor_str.replace(".", "").replace(",", ".")
-    centavos = int(round(float(v) * 100))
-    return max(0, centavos)
+    """'1.234,56' -> 123456 (aritmética inteira, sem float)."""
+    return centavos(valor_str or "")
 
-def fator_vencimento(dt_venc_str: str) -> str:
-    d = datetime.strptime(dt_venc_str, "%d/%m/%Y").date()
-    base_antiga = date(1997, 10, 7)
-    base_nova   = date(2025, 2, 22)
-    if d >= base_nova:
-        fator = 1000 + (d - base_nova).days
+def fator_de_data(d: date) -> str:
+    if d >= _BASE_NOVA:
+        fator = 1000 + (d - _BASE_NOVA).days
     else:
-        fator = (d - base_antiga).days
+        fator = (d - _BASE_ANTIGA).days
     return f"{fator:04d}"
 
+@lru_cache(maxsize=8192)
+def fator_vencimento(dt_venc_str: str) -> str:
+    d = datetime.strptime(dt_venc_str, "%d/%m/%Y").date()
+    return fator_de_data(d)
+
 def campo_livre(agencia: str, carteira: str, nosso_numero11: str, conta: str) -> str:
     ag = f"{int(agencia):04d}"
     cart = f"{int(carteira):02d}"
@@ -50,8 +62,11 @@ def _mod11_barcode(num_str_43: str) -> str:
     return str(dv)
 
 def montar_codigo_barras(param, titulo) -> str:
-    fator = fator_vencimento(titulo["vencimento"])
-    valor = f"{_limpa_valor_brl(titulo['valor']):010d}"
+    venc = vencimento_de(titulo)
+    if venc is None:
+        raise ValueError(f"Vencimento inválido: {titulo.get('vencimento')!r}")
+    fator = fator_de_data(venc)
+    valor = f"{valor_centavos_de(titulo):010d}"
     livre = campo_livre(param["agencia"], param["carteira"], titulo["nosso_numero"], param["conta"])
     base43 = BANCO + MOEDA + fator + valor + livre  # sem o DV geral
     dv = _mod11_barcode(base43)
@@ -71,6 +86,7 @@ def montar_linha_digitavel(codigo_barras_44: str) -> str:
     c5 = f"{fator}{valor}"
     return f"{c1} {c2} {c3} {c4} {c5}"
 
+@lru_cache(maxsize=65536)
 def dv_nosso_numero_base7(carteira: str, nosso_numero11: str) -> str:
     seq = f"{int(carteira):02d}{int(nosso_numero11):011d}"
     pesos = [2,3,4,5,6,7]
@@ -82,3 +98,83 @@ def dv_nosso_numero_base7(carteira: str, nosso_numero11: str) -> str:
     if resto in (0, 1):
         return "0"
     return str(11 - resto)
+
+# ======================== cálculo em lote ========================
+
+def _fator_any(venc) -> str:
+    if isinstance(venc, date):
+        return fator_de_data(venc)
+    return fator_vencimento(str(venc).strip())
+
+def _pesos_ciclicos(n: int, ciclo: list[int]):
+    """Pesos aplicados da direita para a esquerda, alinhados às n colunas."""
+    return np.array([ciclo[i % len(ciclo)] for i in range(n)][::-1], dtype=np.int64)
+
+def _matriz_digitos(strs: list[str], largura: int):
+    buf = "".join(strs).encode("ascii")
+    return (np.frombuffer(buf, dtype=np.uint8).reshape(len(strs), largura) - 48).astype(np.int64)
+
+def _mod10_lote(strs: list[str], largura: int):
+    mat = _matriz_digitos(strs, largura)
+    p = mat * _pesos_ciclicos(largura, [2, 1])
+    p = (p // 10) + (p % 10)
+    return (10 - (p.sum(axis=1) % 10)) % 10
+
+def montar_codigos_lote(param: dict, vencimentos, valores_centavos, nossos_numeros):
+    """
+    Calcula em lote (código de barras, linha digitável, DV do nosso número).
+    - vencimentos: 'DD/MM/AAAA' ou datetime.date
+    - valores_centavos: inteiros
+    - nossos_numeros: str/int com até 11 dígitos
+    Retorna (barras, linhas, dvs_nn) — listas alinhadas à entrada.
+    Usa somas ponderadas vetorizadas com NumPy quando disponível; o resultado
+    é idêntico ao de montar_codigo_barras/montar_linha_digitavel/dv_nosso_numero_base7.
+    """
+    n = len(nossos_numeros)
+    if not (len(vencimentos) == len(valores_centavos) == n):
+        raise ValueError("vencimentos, valores_centavos e nossos_numeros devem ter o mesmo tamanho.")
+    if n == 0:
+        return [], [], []
+
+    ag   = f"{int(param['agencia']):04d}"
+    cart = f"{int(param['carteira']):02d}"
+    cc   = f"{int(param['conta']):07d}"
+    nns  = [f"{int(x):011d}" for x in nossos_numeros]
+    fatores = [_fator_any(v) for v in vencimentos]
+    valores = [f"{max(0, int(v)):010d}" for v in valores_centavos]
+    prefixo = BANCO + MOEDA
+    livres  = [f"{ag}{cart}{nn}{cc}0" for nn in nns]
+    base43  = [prefixo + f + v + l for f, v, l in zip(fatores, valores, livres)]
+
+    if np is None:
+        barras = []
+        for b in base43:
+            barras.append(b[:4] + _mod11_barcode(b) + b[4:])
+        linhas = [montar_linha_digitavel(b) for b in barras]
+        dvs = [dv_nosso_numero_base7(cart, nn) for nn in nns]
+        return barras, linhas, dvs
+
+    # DV geral (módulo 11, pesos 2..9)
+    somas = _matriz_digitos(base43, 43) @ _pesos_ciclicos(43, [2, 3, 4, 5, 6, 7, 8, 9])
+    dv = 11 - (somas % 11)
+    dv[(dv == 0) | (dv == 1) | (dv > 9)] = 1
+    barras = [b[:4] + str(d) + b[4:] for b, d in zip(base43, dv.tolist())]
+
+    # campos da linha digitável (módulo 10)
+    c1 = [prefixo + l[:5] for l in livres]
+    c2 = [l[5:15] for l in livres]
+    c3 = [l[15:25] for l in livres]
+    d1 = _mod10_lote(c1, 9).tolist()
+    d2 = _mod10_lote(c2, 10).tolist()
+    d3 = _mod10_lote(c3, 10).tolist()
+    linhas = [
+        f"{a[:5]}.{a[5:]}{da} {b[:5]}.{b[5:]}{db} {c[:5]}.{c[5:]}{dc} {g} {f}{v}"
+        for a, da, b, db, c, dc, g, f, v in zip(c1, d1, c2, d2, c3, d3, dv.tolist(), fatores, valores)
+    ]
+
+    # DV do nosso número (módulo 11, base 7) sobre carteira + NN
+    s_nn = _matriz_digitos([cart + nn for nn in nns], 13) @ _pesos_ciclicos(13, [2, 3, 4, 5, 6, 7])
+    resto = s_nn % 11
+    dv_nn = np.where(resto <= 1, 0, 11 - resto)
+    dvs = [str(x) for x in dv_nn.tolist()]
+    return barras, linhas, dvs
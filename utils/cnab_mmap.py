@@ -0,0 +1,138 @@
+# utils/cnab_mmap.py — leitura de CNAB de largura fixa via mmap
+"""
+Arquivos CNAB têm registros de tamanho fixo (400 ou 240 posições) seguidos de
+CRLF ou LF. Com o arquivo mapeado em memória (mmap), o registro N começa em
+N * passo: contar registros e ler o registro N custa O(1), sem decodificar
+o resto do arquivo, e os campos saem como memoryview (sem cópia). Só o que
+o parser realmente usa vira str/int (txt(), inteiro()).
+
+    with ArquivoCnab(caminho) as arq:
+        len(arq)                 # quantidade de registros
+        reg = arq[0]             # memoryview do header
+        txt(campo(reg, 77, 79))  # posições 1-based inclusivas, como nos manuais
+
+A iteração também aceita arquivos com linhas de tamanho irregular (linha
+truncada, espaços finais cortados): ao encontrar um registro fora do passo
+esperado, continua procurando o fim de linha a partir dali.
+"""
+import os, mmap
+
+def campo(reg, ini: int, fim: int):
+    """Fatia 1-based inclusiva [ini..fim] do registro (memoryview, sem cópia)."""
+    return reg[ini - 1:fim]
+
+def txt(mv) -> str:
+    return str(mv, "latin-1")
+
+def inteiro(mv, padrao: int = 0) -> int:
+    try:
+        return int(bytes(mv))
+    except ValueError:
+        return padrao
+
+class ArquivoCnab:
+    """Registros de um arquivo CNAB de largura fixa (somente leitura)."""
+
+    def __init__(self, caminho: str, tam_registro: int | None = None):
+        self.caminho = caminho
+        self._f = open(caminho, "rb")
+        self.tamanho = os.fstat(self._f.fileno()).st_size
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.tamanho else b""
+        self._buf = memoryview(self._mm)
+
+        fim = self._mm.find(b"\n", 0, 1024)
+        if fim >= 0:
+            term = 2 if fim and self._mm[fim - 1:fim] == b"\r" else 1
+            self.tam_registro = tam_registro or fim + 1 - term
+            self.fim_linha = b"\r\n" if term == 2 else b"\n"
+        else:
+            self.tam_registro = tam_registro or next(
+                (t for t in (400, 240) if self.tamanho % t == 0), self.tamanho)
+            self.fim_linha = b""
+        self.passo = self.tam_registro + len(self.fim_linha)
+
+    # --- contexto / fechamento ---
+    def close(self):
+        self._buf.release()
+        if isinstance(self._mm, mmap.mmap):
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # ainda há campos (memoryview) vivos: o mapa fecha quando forem coletados
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- acesso aleatório (arquivo de passo fixo) ---
+    def __len__(self) -> int:
+        if not self.passo:
+            return 0
+        n, resto = divmod(self.tamanho, self.passo)
+        # último registro sem fim de linha (ou só com lixo/EOF \x1a depois)
+        return n + (1 if resto >= self.tam_registro else 0)
+
+    def __getitem__(self, i: int):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(f"registro {i} fora do arquivo ({n} registros)")
+        ini = i * self.passo
+        return self._buf[ini:ini + self.tam_registro]
+
+    def _alinhados(self) -> int:
+        """Quantos registros, desde o início, têm o fim de linha exatamente no passo fixo."""
+        if not self.fim_linha:
+            return len(self)
+        t, passo, mm = self.tam_registro, self.passo, self._mm
+        n = self.tamanho // passo
+        alinhados = n
+        # um fatiamento com passo (em C) por byte do fim de linha, em vez de um teste por registro
+        for k, ch in enumerate(self.fim_linha):
+            col = mm[t + k:n * passo:passo]
+            alinhados = min(alinhados, len(col) - len(col.lstrip(bytes((ch,)))))
+        return alinhados
+
+    def desalinhado(self) -> int | None:
+        """Índice do 1º registro cujo fim de linha não está onde o passo fixo indica (ou None)."""
+        if not self.fim_linha:
+            return None
+        i = self._alinhados()
+        return None if i == self.tamanho // self.passo else i
+
+    # --- leitura sequencial (tolerante) ---
+    def linhas(self):
+        """
+        Gera (nº da linha 1-based, memoryview sem o fim de linha). Segue o passo
+        fixo enquanto o arquivo estiver alinhado; a partir de um registro fora
+        do tamanho, procura cada fim de linha.
+        """
+        mm, buf, total = self._mm, self._buf, self.tamanho
+        t, passo = self.tam_registro, self.passo
+        if not self.fim_linha:   # sem quebras de linha: só o passo fixo
+            for i in range(len(self)):
+                yield i + 1, self[i]
+            return
+        n = self._alinhados()
+        for i, ini in enumerate(range(0, n * passo, passo), 1):
+            yield i, buf[ini:ini + t]
+        pos = n * passo
+        while pos < total:
+            fim = mm.find(b"\n", pos)
+            if fim < 0:
+                fim = total
+            n += 1
+            reg = buf[pos:fim]
+            if len(reg) and reg[-1] == 0x0D:
+                reg = reg[:-1]
+            if len(reg) or fim < total:
+                yield n, reg
+            pos = fim + 1
+
+    def __iter__(self):
+        for _, reg in self.linhas():
+            yield reg
@@ -1,14 +1,21 @@
 # utils/gerar_remessa.py
-import os, re, zipfile, unicodedata
+import os, re, zipfile, hashlib, unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 
 from utils.popup_confirmacao import popup_confirmacao_titulos
-from utils.parametros import carregar_parametros, salvar_parametros
-from utils.nn_registry import registrar_titulos
+from utils.parametros import carregar_parametros
+from utils.nn_registry import (registrar_titulos, classificar_titulos, _key_from_titulo,
+                               NOVO, DUPLICADO, ALTERADO)
+from utils import perf, sequencias
 from utils.boletos_bmp import dv_nosso_numero_base7  # DV do Nosso Número
+from utils.titulo import centavos, fmt_ddmmaa, valor_centavos_de, vencimento_de, emissao_de
+from utils.log import get_logger
+
+log = get_logger(__name__)
 
 # ======================== helpers básicos ========================
 
@@ -44,34 +51,7 @@ def _centavos_from_brl(valor_str: str) -> int:
     """Converte '1.234,56' / '1234,56' / '1234.56' / 1234.56 -> centavos (int)."""
     if valor_str is None:
         return 0
-    s = str(valor_str).strip().replace(" ", "")
-    if s == "":
-        return 0
-    if "," in s and "." in s:
-        s = s.replace(".", "").replace(",", ".")
-    elif "," in s:
-        s = s.replace(",", ".")
-    try:
-        v = float(s)
-    except Exception:
-        v = float(int(_dig(s) or 0))
-    return int(round(max(0.0, v) * 100))
-
-def _fmt_date_ddmmaa(date_str: str) -> str:
-    """Entrada: 'DD/MM/AAAA' ou 'AAAA-MM-DD' -> 'DDMMAA'."""
-    if not date_str:
-        return "000000"
-    s = date_str.strip()
-    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
-        try:
-            dt = datetime.strptime(s, fmt)
-            return dt.strftime("%d%m%y")
-        except Exception:
-            pass
-    d = _dig(s)
-    if len(d) == 8:  # DDMMAAAA
-        return d[:4] + d[-2:]
-    return "000000"
+    return centavos(str(valor_str))
 
 def _pct_to_hundredths3(pct_str: str) -> str:
     """
@@ -93,12 +73,12 @@ def _pct_to_hundredths3(pct_str: str) -> str:
     n = max(0, min(999, n))
     return f"{n:03d}"
 
-def _juros_dia_centavos(valor_brl: str, juros_pct_str: str) -> int:
+def _juros_dia_centavos(valor_brl, juros_pct_str: str) -> int:
     """
     Juros ao dia em centavos = (valor_em_centavos) * (percentual/100).
-    Ex.: R$ 1.000,00 e '0,10' -> 100 centavos/dia.
+    Ex.: R$ 1.000,00 (ou 100000 centavos) e '0,10' -> 100 centavos/dia.
     """
-    base = _centavos_from_brl(valor_brl)
+    base = valor_brl if isinstance(valor_brl, int) else _centavos_from_brl(valor_brl)
     s = (juros_pct_str or "").strip()
     if s == "":
         return 0
@@ -113,123 +93,8 @@ def _juros_dia_centavos(valor_brl: str, juros_pct_str: str) -> int:
     return int(round(base * (pct / 100.0)))
 
 # ======================== sequencial contínuo ========================
-
-def _proximo_sequencial(cfg: dict) -> int:
-    """Lê cfg['ultima_remessa'] (7 dígitos), soma 1 e retorna int."""
-    try:
-        # Tentar diferentes locais onde pode estar o sequencial
-        atual = 0
-        
-        # Primeiro: estrutura aninhada sequenciais.ultima_remessa
-        if "sequenciais" in cfg and isinstance(cfg["sequenciais"], dict):
-            seq_dict = cfg["sequenciais"]
-            if "ultima_remessa" in seq_dict:
-                atual = int(_dig(str(seq_dict["ultima_remessa"])) or "0")
-            elif "remessa" in seq_dict:
-                atual = int(seq_dict.get("remessa", 0))
-        
-        # Segundo: chave direta ultima_remessa
-        elif "ultima_remessa" in cfg:
-            atual = int(_dig(str(cfg.get("ultima_remessa", "0"))) or "0")
-        
-        # Terceiro: chave remessa (como int)
-        elif "remessa" in cfg:
-            atual = int(cfg.get("remessa", 0))
-        
-        # Quarto: tentar ler do config.json
-        elif atual == 0:
-            try:
-                import json
-                import os
-                config_path = "config.json"
-                if os.path.exists(config_path):
-                    with open(config_path, 'r', encoding='utf-8') as f:
-                        config_data = json.load(f)
-                    
-                    # Tentar diferentes chaves no config.json
-                    if "sequenciais" in config_data and isinstance(config_data["sequenciais"], dict):
-                        seq_dict = config_data["sequenciais"]
-                        if "ultima_remessa" in seq_dict:
-                            atual = int(seq_dict["ultima_remessa"])
-                        elif "remessa" in seq_dict:
-                            atual = int(seq_dict["remessa"])
-                    elif "ultima_remessa" in config_data:
-                        atual = int(_dig(str(config_data["ultima_remessa"])) or "0")
-                    elif "sequencial_remessa" in config_data:
-                        atual = int(_dig(str(config_data["sequencial_remessa"])) or "0")
-            except Exception as e:
-                print(f"Erro ao ler config.json: {e}")
-        
-        # Quinto: usar gerar_nosso_numero do parametros.py
-        if atual == 0:
-            try:
-                from utils.parametros import gerar_nosso_numero
-                return int(_dig(gerar_nosso_numero(cfg)) or "1")
-            except:
-                pass
-            
-    except Exception as e:
-        print(f"Erro em _proximo_sequencial: {e}")
-        atual = 0
-    
-    return max(0, atual) + 1
-
-def _persistir_sequencial(cfg: dict, seq: int):
-    """Salva o novo sequencial (7 dígitos) em cfg['ultima_remessa'] e persiste o config."""
-    try:
-        # Salvar em múltiplos locais para compatibilidade
-        cfg["ultima_remessa"] = str(seq).zfill(7)
-        cfg["remessa"] = seq
-        
-        # Também salvar na estrutura aninhada se existir
-        if "sequenciais" not in cfg:
-            cfg["sequenciais"] = {}
-        cfg["sequenciais"]["ultima_remessa"] = seq
-        cfg["sequenciais"]["remessa"] = seq
-        
-        # Salvar no config.json também
-        try:
-            import json
-            import os
-            config_path = "config.json"
-            
-            config_data = {}
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config_data = json.load(f)
-            
-            # Atualizar sequenciais no config.json
-            config_data["ultima_remessa"] = str(seq).zfill(6)
-            config_data["sequencial_remessa"] = str(seq).zfill(6)
-            
-            if "sequenciais" not in config_data:
-                config_data["sequenciais"] = {}
-            config_data["sequenciais"]["ultima_remessa"] = seq
-            config_data["sequenciais"]["remessa"] = seq
-            
-            # Salvar config.json atualizado
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=2, ensure_ascii=False)
-                
-        except Exception as e:
-            print(f"Erro ao salvar config.json: {e}")
-        
-        # Usar a função gerar_nosso_numero para atualizar no banco
-        try:
-            from utils.parametros import gerar_nosso_numero, definir_parametro
-            gerar_nosso_numero(cfg)  # Isso atualiza o sequencial no banco
-            definir_parametro("ultima_remessa", str(seq).zfill(7))
-            definir_parametro("remessa", seq)
-        except Exception as e:
-            print(f"Erro ao atualizar banco: {e}")
-        
-        salvar_parametros(cfg)
-        
-    except Exception as e:
-        print(f"Erro ao persistir sequencial: {e}")
-        # Fallback: salvar pelo menos localmente
-        cfg["ultima_remessa"] = str(seq).zfill(7)
-        cfg["remessa"] = seq
+# O número da remessa vem de utils.sequencias (reservado ao abrir a remessa e
+# devolvido se ela for descartada antes de alguém reservar o seguinte).
 
 def _codigo_arquivo_remessa(seq: int, data: datetime) -> str:
     """CB + DDMM + SEQ(7) — ex.: CB12080000001"""
@@ -267,6 +132,7 @@ def montar_header_bmp(param: dict, seq_remessa: int, data_geracao: datetime, nro
 
 # ======================== DETALHE TIPO 1 ========================
 
+@perf.medir("remessa.detalhe")
 def montar_detalhe_bmp(titulo: dict, param: dict, nro_registro: int) -> str:
     """
     TIPO 1 conforme instruções do cliente (posições 1-based, inclusivas).
@@ -282,9 +148,9 @@ def montar_detalhe_bmp(titulo: dict, param: dict, nro_registro: int) -> str:
     # Título
     doc      = (titulo.get("documento") or "")
     doc_10   = _dig(doc)[-10:].rjust(10, "0")                     # 111–120 (numérico, zeros à esquerda)
-    venc_ddmmaa  = _fmt_date_ddmmaa(titulo.get("vencimento") or "")
-    emiss_ddmmaa = _fmt_date_ddmmaa(titulo.get("emissao") or "")
-    valor_cent = _centavos_from_brl(titulo.get("valor") or "0")
+    venc_ddmmaa  = fmt_ddmmaa(vencimento_de(titulo))
+    emiss_ddmmaa = fmt_ddmmaa(emissao_de(titulo))
+    valor_cent = valor_centavos_de(titulo)
     valor_13  = f"{valor_cent:013d}"                              # 127–139
 
     # Nosso número + DV
@@ -293,7 +159,7 @@ def montar_detalhe_bmp(titulo: dict, param: dict, nro_registro: int) -> str:
 
     # Multa e juros
     multa_068_070 = _pct_to_hundredths3(param.get("multa", "0"))  # 68–70 (centésimos)
-    juros_dia_cent = _juros_dia_centavos(titulo.get("valor") or "0", param.get("juros", "0"))
+    juros_dia_cent = _juros_dia_centavos(valor_cent, param.get("juros", "0"))
     juros_161_173  = f"{juros_dia_cent:013d}"
 
     # Pagador
@@ -496,72 +362,418 @@ def _popup_remessa_gerada(arquivos_rem: list[str], parent=None, pasta_saida: str
 
 # ======================== Geração da remessa ========================
 
-def gerar_remessa_e_zip(titulos: list[dict], parametros: dict, parent=None):
+class RemessaInvalida(ValueError):
+    """A remessa gerada não passou na validação; 'relatorio' traz todas as violações."""
+    def __init__(self, relatorio):
+        super().__init__(relatorio.resumo())
+        self.relatorio = relatorio
+
+class EscritorRemessa:
     """
-    1) Gera remessa (HEADER + DETALHES + TRAILER)
-    2) Persiste sequencial e registra NNs no CSV
-    3) Popup “Remessa Gerada” (novo estilo)
-    4) Confirmação de Títulos (com TOTAL e QTD Total)
+    Grava a remessa em fluxo: header ao criar, um detalhe por escrever(t) e,
+    em concluir(), trailer + validação completa. O sequencial é reservado ao
+    abrir; só uma remessa válida fica com ele, entra no catálogo (sha256,
+    total e títulos acumulados durante a gravação), registra os NNs e gera o
+    zip; com erro o sequencial é devolvido, o arquivo vira .REM.invalido (com
+    o relatório JSON ao lado) e sobe RemessaInvalida.
+
+    parar_no_erro=True confere cada detalhe ao gravar e interrompe na
+    primeira violação (usado no processamento em pipeline, para não
+    renderizar boletos de uma remessa que não vai sair).
     """
-    if not titulos:
-        messagebox.showinfo("Aviso", "Nenhum título para remessa.", parent=parent)
-        return
-
-    cfg  = carregar_parametros()
-    hoje = datetime.now()
-
-    seq = _proximo_sequencial(cfg)
-    codigo_cb = _codigo_arquivo_remessa(seq, hoje)
+    def __init__(self, parametros: dict, cfg: dict | None = None, hoje: datetime | None = None,
+                 parar_no_erro: bool = False, seq: int | None = None):
+        self.parametros = parametros
+        self.cfg = cfg if cfg is not None else carregar_parametros()
+        self.hoje = hoje or datetime.now()
+        self.parar_no_erro = parar_no_erro
+        self._seq_proprio = seq is None     # sequencial reservado por fora (lote) é devolvido por quem reservou
+        self.seq = sequencias.proximo("remessa") if seq is None else int(seq)
+        self.nome_base = _codigo_arquivo_remessa(self.seq, self.hoje)
+        self.pasta_saida = self.cfg.get("pastas", {}).get(
+            "pasta_salvar_remessa_nasapay", os.path.join(os.path.expanduser("~"), "nasapay", "remessas"))
+        os.makedirs(self.pasta_saida, exist_ok=True)
+        self.path = os.path.join(self.pasta_saida, f"{self.nome_base}.REM")
+        self.titulos: list = []
+        self.violacoes: list = []
+        self.total_centavos = 0
+        self._catalogo: list = []    # (nº registro, documento, NN, vencimento, centavos, pagador)
+        self._sha = hashlib.sha256()
+        self._nro = 2
+        self._f = open(self.path, "w", encoding="latin-1", newline="")
+        self._gravar(montar_header_bmp(parametros, seq_remessa=self.seq, data_geracao=self.hoje, nro_registro=1))
+
+    def _gravar(self, ln: str) -> None:
+        ln += "\r\n"
+        self._f.write(ln)
+        self._sha.update(ln.encode("latin-1"))
+
+    def escrever(self, titulo) -> None:
+        ln = montar_detalhe_bmp(titulo, self.parametros, nro_registro=self._nro)
+        if self.parar_no_erro:
+            from utils.validador_remessa import _conferir_detalhe, RelatorioValidacao
+            _conferir_detalhe(self.violacoes, self._nro, ln)
+            if self.violacoes:
+                self.abortar()
+                raise RemessaInvalida(RelatorioValidacao(self.path, self._nro, self.violacoes))
+        self._gravar(ln)
+        doc, venc, cents, docp = _key_from_titulo(titulo)
+        nn = _dig(str(titulo.get("nosso_numero") or ""))
+        self._catalogo.append((self._nro, doc, nn.zfill(11) if nn else "", venc, int(cents), docp))
+        self.total_centavos += int(cents)
+        self._nro += 1
+        self.titulos.append(titulo)
+
+    def concluir(self) -> str:
+        self.fechar()
+        return self.publicar()
+
+    def fechar(self, max_workers: int | None = None) -> None:
+        """Trailer + validação completa; com erro vira .REM.invalido e sobe RemessaInvalida."""
+        from utils.validador_remessa import validar_remessa
+        self._gravar(montar_trailer_bmp(qtde_registros=self._nro))
+        self._f.close()
+
+        with perf.span("remessa.validar"):
+            rel = validar_remessa(self.path, max_workers=max_workers)
+        if not rel.ok:
+            path_invalido = self.path + ".invalido"
+            os.replace(self.path, path_invalido)
+            rel.arquivo = path_invalido
+            try:
+                rel.salvar_json()
+            except OSError as e:
+                log.warning("não consegui salvar o relatório do validador: %s", e)
+            self._devolver_seq()
+            raise RemessaInvalida(rel)
+
+    def publicar(self, zip: bool = True) -> str:
+        """Remessa já validada: catálogo, registro dos NNs e (zip=True) o .zip dela."""
+        try:
+            from src.remessa_meta import catalogar_remessa
+            catalogar_remessa(self.path, self._catalogo, sha256=self._sha.hexdigest(),
+                              total_centavos=self.total_centavos)
+        except Exception as e:
+            log.warning("não consegui catalogar a remessa %s: %s", self.path, e)
+        try:
+            with perf.span("nn.registrar"):
+                registrar_titulos(self.titulos, self.parametros, meta={"arquivo": self.path})
+        except Exception as e:
+            log.warning("não consegui registrar os títulos de %s: %s", self.path, e)
 
-    pasta_saida = cfg.get("pastas", {}).get("pasta_salvar_remessa_nasapay", os.path.join(os.path.expanduser("~"), "nasapay", "remessas"))
-    os.makedirs(pasta_saida, exist_ok=True)
-    nome_base   = f"{codigo_cb}"
-    path_rem    = os.path.join(pasta_saida, f"{nome_base}.REM")
+        if not zip:
+            return self.path
+        try:
+            path_zip = os.path.join(self.pasta_saida, f"{self.nome_base}.zip")
+            with zipfile.ZipFile(path_zip, "w", zipfile.ZIP_DEFLATED) as z:
+                z.write(self.path, arcname=os.path.basename(self.path))
+        except Exception as e:
+            log.warning("não consegui gerar o zip de %s: %s", self.path, e)
+        return self.path
 
-    # Montagem
-    linhas = []
-    linhas.append(montar_header_bmp(parametros, seq_remessa=seq, data_geracao=hoje, nro_registro=1))
+    def abortar(self) -> None:
+        """Descarta a remessa incompleta e devolve o sequencial (se ainda for o último)."""
+        try:
+            self._f.close()
+        except Exception:
+            pass
+        self._devolver_seq()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
 
-    nro = 2
+    def _devolver_seq(self) -> None:
+        if not self._seq_proprio:
+            return
+        try:
+            sequencias.devolver("remessa", self.seq)
+        except Exception as e:
+            log.warning("sequencial de remessa %s não devolvido: %s", self.seq, e)
+
+# ======================== divisão em várias remessas ========================
+# Parâmetros (todos opcionais; sem eles sai uma remessa só, como antes):
+#   remessa_dividir_por     "conta,carteira" (também "agencia") — um arquivo por combinação;
+#                           o valor vem do título quando ele traz o campo, senão dos parâmetros.
+#                           A conta leva junto o dígito e o código do cedente (header 38–44),
+#                           que o título também precisa trazer se a conta dele for outra
+#   remessa_max_registros   detalhes por arquivo
+#   remessa_max_valor       valor total por arquivo (ex.: "500.000,00")
+#   remessa_zip             "por_arquivo" (padrão: um .zip por remessa) ou "unico"
+
+LIMITE_REGISTROS = 999_997      # nº do registro tem 6 dígitos (395–400): header + detalhes + trailer
+_CHAVES_DIVISAO = {        # chave -> (campo, campos que acompanham o campo na parte)
+    "agencia": ("agencia", ()),
+    "conta": ("conta", ("digito", "codigo_cedente")),
+    "carteira": ("carteira", ()),
+}
+
+def _valores_divisao(t, parametros: dict, chave: str) -> tuple:
+    """(campo, acompanhantes...) da parte do título; sem o campo no título, tudo dos parâmetros."""
+    campo, juntos = _CHAVES_DIVISAO[chave]
+    proprio = _dig(str(t.get(campo) or ""))
+    if not proprio or proprio == _dig(str(parametros.get(campo) or "")):
+        return (_dig(str(parametros.get(campo) or "")),) + tuple(str(parametros.get(j) or "") for j in juntos)
+    faltam = [j for j in juntos if not str(t.get(j) or "").strip()]
+    if faltam:
+        raise ValueError(f"título {t.get('documento') or '?'}: {campo} {proprio} sem {', '.join(faltam)} — "
+                         f"não dá para dividir por {chave}")
+    return (proprio,) + tuple(str(t.get(j)).strip() for j in juntos)
+
+def opcoes_divisao(parametros: dict) -> dict:
+    chaves = parametros.get("remessa_dividir_por") or ()
+    if isinstance(chaves, str):
+        chaves = [c.strip().lower() for c in re.split(r"[,;\s]+", chaves) if c.strip()]
+    invalidas = [c for c in chaves if c not in _CHAVES_DIVISAO]
+    if invalidas:
+        raise ValueError(f"remessa_dividir_por: chave(s) desconhecida(s) {', '.join(invalidas)} "
+                         f"(use {', '.join(_CHAVES_DIVISAO)})")
+    try:
+        max_registros = int(_dig(str(parametros.get("remessa_max_registros") or "")) or 0)
+    except ValueError:
+        max_registros = 0
+    return {
+        "chaves": tuple(chaves),
+        "max_registros": min(max_registros or LIMITE_REGISTROS, LIMITE_REGISTROS),
+        "max_valor": centavos(parametros.get("remessa_max_valor") or 0),
+        "zip_unico": str(parametros.get("remessa_zip") or "").strip().lower() == "unico",
+    }
+
+def dividir_titulos(titulos, parametros: dict, chaves=(), max_registros: int = LIMITE_REGISTROS,
+                    max_valor: int = 0) -> list[tuple[dict, list]]:
+    """
+    Agrupa os títulos pelas chaves (na ordem em que aparecem) e corta cada
+    grupo em arquivos de até max_registros detalhes e max_valor centavos
+    (um título acima do limite sozinho vai num arquivo só dele). Devolve
+    [(parâmetros da parte, títulos)], com a conta (e dígito/cedente) e a
+    carteira da parte já aplicadas nos parâmetros.
+    """
+    max_registros = max_registros or LIMITE_REGISTROS
+    grupos: dict[tuple, list] = {}
     for t in titulos:
-        linhas.append(montar_detalhe_bmp(t, parametros, nro_registro=nro))
-        nro += 1
+        k = tuple(_valores_divisao(t, parametros, c) for c in chaves)
+        grupos.setdefault(k, []).append(t)
+
+    partes = []
+    for k, lista in grupos.items():
+        param = dict(parametros)
+        for c, valores in zip(chaves, k):
+            campo, juntos = _CHAVES_DIVISAO[c]
+            param.update(zip((campo,) + juntos, valores))
+        atual, total = [], 0
+        for t in lista:
+            v = valor_centavos_de(t)
+            if atual and (len(atual) >= max_registros or (max_valor and total + v > max_valor)):
+                partes.append((param, atual))
+                atual, total = [], 0
+            atual.append(t)
+            total += v
+        if atual:
+            partes.append((param, atual))
+    return partes
+
+def gerar_remessas(titulos, parametros: dict, cfg: dict | None = None, hoje: datetime | None = None,
+                   workers: int | None = None) -> list[str]:
+    """
+    Gera uma ou várias remessas conforme opcoes_divisao(parametros). Os
+    sequenciais saem num bloco só (consecutivos, na ordem das partes); as
+    partes são gravadas e validadas em paralelo. Só se TODAS passarem cada
+    uma é catalogada, tem os NNs registrados e ganha o zip (ou entra no zip
+    único); se alguma falhar, nenhuma fica, o bloco é devolvido e sobe o erro
+    (RemessaInvalida da primeira parte inválida). Devolve os caminhos .REM.
+    """
+    op = opcoes_divisao(parametros)
+    partes = dividir_titulos(titulos, parametros, op["chaves"], op["max_registros"], op["max_valor"])
+    if not partes:
+        return []
+    cfg = cfg if cfg is not None else carregar_parametros()
+    hoje = hoje or datetime.now()
+    seqs = sequencias.reservar("remessa", len(partes))
+    escritores: list[EscritorRemessa] = []
+
+    def _gravar_parte(esc: EscritorRemessa, lista: list) -> None:
+        for t in lista:
+            esc.escrever(t)
+        esc.fechar(max_workers=1 if len(partes) > 1 else None)   # o paralelismo já está nas partes
 
-    linhas.append(montar_trailer_bmp(qtde_registros=nro))
+    try:
+        for (param, _), seq in zip(partes, seqs):
+            escritores.append(EscritorRemessa(param, cfg, hoje, seq=seq))
+        erros = []
+        with ThreadPoolExecutor(max_workers=max(1, min(len(partes), workers or os.cpu_count() or 1))) as pool:
+            futs = [pool.submit(perf.levar(_gravar_parte), esc, lista) for esc, (_, lista) in zip(escritores, partes)]
+            for fut in futs:
+                try:
+                    fut.result()
+                except Exception as e:
+                    erros.append(e)
+        if erros:
+            raise next((e for e in erros if isinstance(e, RemessaInvalida)), erros[0])
+    except BaseException:
+        for esc in escritores:
+            esc.abortar()           # as inválidas já viraram .REM.invalido: só as válidas somem
+        sequencias.devolver("remessa", seqs)
+        raise
+
+    caminhos = [esc.publicar(zip=not op["zip_unico"]) for esc in escritores]
+    if op["zip_unico"]:
+        nome = escritores[0].nome_base + (f"-{seqs[-1]:07d}" if len(seqs) > 1 else "")
+        try:
+            with zipfile.ZipFile(os.path.join(escritores[0].pasta_saida, f"{nome}.zip"), "w",
+                                 zipfile.ZIP_DEFLATED) as z:
+                for c in caminhos:
+                    z.write(c, arcname=os.path.basename(c))
+        except Exception as e:
+            log.warning("não consegui gerar o zip único %s: %s", nome, e)
+    return caminhos
 
-    with open(path_rem, "w", encoding="latin-1", newline="") as f:
-        for ln in linhas:
-            f.write(ln + "\r\n")
+# ======================== modo delta (conversões) ========================
+# remessa_delta = "excluir": títulos já registrados (mesma chave) ficam fora da remessa
+#                 "marcar":  entram de novo, com o NN do registro (NN novo se o registro
+#                            não tiver), marcados no popup
+# Alterados (mesmo documento/pagador, vencimento ou valor diferente) entram e são marcados.
 
-    try:
-        from utils.validador_remessa import validar_arquivo_remessa as _val
-        _val(path_rem)
-    except Exception:
-        pass
+MODOS_DELTA = ("excluir", "marcar")
 
-    _persistir_sequencial(cfg, seq)
+def aplicar_delta(titulos: list, parametros: dict) -> tuple[list, dict | None]:
+    """
+    Confere o lote no registro de NN (classificar_titulos) antes da remessa.
+    Devolve (títulos que seguem, resumo {modo, novo, alterado, duplicado,
+    excluidos} com as contagens) — ou (títulos, None) com o modo desligado.
+    Cada título que segue leva a situação em t["delta"].
+    """
+    modo = str(parametros.get("remessa_delta") or "").strip().lower()
+    if not modo:
+        return titulos, None
+    if modo not in MODOS_DELTA:
+        raise ValueError(f"remessa_delta: modo desconhecido {modo!r} (use {', '.join(MODOS_DELTA)})")
+    with perf.span("nn.delta"):
+        situacoes = classificar_titulos(titulos)
+    resumo = {"modo": modo, NOVO: 0, ALTERADO: 0, DUPLICADO: 0, "excluidos": 0}
+    saida = []
+    for t, (sit, nn) in zip(titulos, situacoes):
+        resumo[sit] += 1
+        if sit == DUPLICADO:
+            if modo == "excluir":
+                resumo["excluidos"] += 1
+                continue
+            t["nosso_numero"] = nn
+        t["delta"] = sit
+        saida.append(t)
+    return saida, resumo
+
+def preparar_conversao(titulos: list, parametros: dict) -> tuple[list, dict | None]:
+    """Modo delta (se ligado) e nossos números novos para quem não reaproveita o do registro."""
+    from utils.parametros import reservar_nossos_numeros
+    titulos, delta = aplicar_delta(titulos, parametros)
+    sem_nn = [t for t in titulos if t.get("delta") != DUPLICADO or not t.get("nosso_numero")]
+    for t, nn in zip(sem_nn, reservar_nossos_numeros(parametros, len(sem_nn))):
+        t["nosso_numero"] = nn
+    return titulos, delta
+
+def mostrar_remessa_invalida(erro: RemessaInvalida, parent=None) -> None:
+    from utils.validador_remessa import mostrar_relatorio
+    rel = erro.relatorio
+    messagebox.showerror(
+        "Remessa com erros",
+        f"{rel.resumo()}\n\nA remessa não foi registrada."
+        + (f" Arquivo e relatório mantidos em:\n{rel.arquivo}" if os.path.exists(rel.arquivo) else ""),
+        parent=parent)
+    mostrar_relatorio(rel, parent=parent)
+
+def gerar_remessa_e_zip(titulos: list[dict], parametros: dict, parent=None, delta: dict | None = None):
+    """
+    1) Gera a(s) remessa(s) (HEADER + DETALHES + TRAILER) e valida cada arquivo
+       inteiro — várias quando os parâmetros pedem divisão (gerar_remessas)
+    2) Cataloga as remessas e registra os NNs (só se a validação passou)
+    3) Popup “Remessa Gerada” (novo estilo)
+    4) Confirmação de Títulos (com TOTAL e QTD Total e, no modo delta, as
+       contagens de novos, alterados e já registrados — aplicar_delta)
+    Bloqueia o main thread; as telas usam converter_em_segundo_plano.
+    """
+    if not titulos:
+        _avisar_sem_titulos(delta, parent)
+        return
     try:
-        registrar_titulos(titulos, parametros, meta={"arquivo": path_rem})
+        paths_rem = _gerar_lote_remessa(titulos, parametros)
     except Exception as e:
-        print(f"[nn_registry] aviso: não consegui registrar os títulos: {e}")
+        _mostrar_falha_remessa(e, parent)
+        return
+    concluir_remessa(titulos, paths_rem, parent=parent, delta=delta)
 
-    try:
-        path_zip = os.path.join(pasta_saida, f"{nome_base}.zip")
-        with zipfile.ZipFile(path_zip, "w", zipfile.ZIP_DEFLATED) as z:
-            z.write(path_rem, arcname=os.path.basename(path_rem))
-    except Exception:
-        pass
+def _gerar_lote_remessa(titulos: list, parametros: dict) -> list[str]:
+    with perf.lote("remessa"):
+        return gerar_remessas(titulos, parametros)
+
+def _avisar_sem_titulos(delta: dict | None, parent=None) -> None:
+    if delta and delta["excluidos"]:
+        messagebox.showinfo("Aviso", f"Os {delta['excluidos']} títulos já estavam registrados; "
+                                     "nenhuma remessa gerada.", parent=parent)
+    else:
+        messagebox.showinfo("Aviso", "Nenhum título para remessa.", parent=parent)
 
+def _mostrar_falha_remessa(erro: Exception, parent=None) -> None:
+    if isinstance(erro, RemessaInvalida):
+        mostrar_remessa_invalida(erro, parent=parent)
+    else:
+        messagebox.showerror("Remessa", f"Falha ao gerar a remessa:\n{erro}", parent=parent)
+
+def concluir_remessa(titulos: list, paths_rem: list[str], parent=None, delta: dict | None = None) -> None:
+    """Main thread, remessas já gravadas: confirmação de títulos e popup “Remessa Gerada”."""
     # Confirmação de Títulos (com TOTAL e QTD Total)
     # Este popup deve vir primeiro
-    if popup_confirmacao_titulos(titulos, parent=parent):
+    if popup_confirmacao_titulos(titulos, parent=parent, delta=delta):
         # Popup “Remessa Gerada” (novo estilo) - agora exibido APÓS a confirmação
         try:
-            _popup_remessa_gerada([path_rem], parent=parent, pasta_saida=pasta_saida)
+            _popup_remessa_gerada(paths_rem, parent=parent, pasta_saida=os.path.dirname(paths_rem[0]))
         except Exception as e:
             print("[ui] falha ao exibir popup da remessa:", e)
 
+# ======================== conversores em segundo plano ========================
+class _FalhaLeitura(Exception):
+    pass
 
+def converter_em_segundo_plano(parametros: dict, ler, parent=None, erro_leitura: str = "Falha ao ler o arquivo",
+                               vazio: str = "Nenhum título encontrado no arquivo selecionado.",
+                               ao_concluir=None):
+    """
+    Conversores: ler() e a geração das remessas rodam numa tarefa (utils.tasks)
+    com overlay; os diálogos (erros, confirmação, “Remessa Gerada”) ficam no
+    main thread, ao concluir. ler() -> (titulos, delta, avisos) roda fora do
+    main thread: não pode abrir diálogos — avisos ([str]) são mostrados depois.
+    Sem títulos e sem delta = nada lido (mensagem 'vazio').
+    ao_concluir(paths_rem) é chamado depois dos popups, só se houve remessa.
+    """
+    from utils.ui_busy import run_with_busy
+    parent = parent or tk._default_root
 
-
-
+    def trabalho():
+        try:
+            titulos, delta, avisos = ler()
+        except Exception as e:
+            raise _FalhaLeitura(e) from e
+        paths_rem = _gerar_lote_remessa(titulos, parametros) if titulos else []
+        return titulos, delta, avisos, paths_rem
+
+    def _fim(res, err):
+        if isinstance(err, _FalhaLeitura):
+            messagebox.showerror("Erro", f"{erro_leitura}: {err}", parent=parent)
+            return
+        if err is not None:
+            _mostrar_falha_remessa(err, parent)
+            return
+        titulos, delta, avisos, paths_rem = res
+        if avisos:
+            messagebox.showerror("Erro", "\n".join(avisos[:20])
+                                 + (f"\n(+{len(avisos) - 20} outros)" if len(avisos) > 20 else ""), parent=parent)
+        if not titulos:
+            if not delta:
+                messagebox.showinfo("Aviso", vazio, parent=parent)
+            else:
+                _avisar_sem_titulos(delta, parent)
+            return
+        concluir_remessa(titulos, paths_rem, parent=parent, delta=delta)
+        if callable(ao_concluir):
+            ao_concluir(paths_rem)
+
+    return run_with_busy(parent, "Gerando remessa…", trabalho, _fim)
@@ -0,0 +1,75 @@
+# utils/i25.py — Interleaved 2 of 5 (código de barras do boleto, 44 dígitos)
+"""
+Desenho do código de barras I2of5 sem depender do módulo de barcodes do reportlab.
+
+A geometria (posição e largura de cada barra, em módulos) é calculada a partir
+de uma tabela pré-computada por par de dígitos e memorizada por código; o
+desenho sai como um único path preenchido (também memorizado, desenhado na
+origem e posicionado com translate) em vez de um c.rect por barra.
+Largura do módulo (barWidth), razão larga/estreita (ratio), altura e zona de
+silêncio são os mesmos parâmetros usados até aqui.
+"""
+from functools import lru_cache
+
+_PADROES = {
+    "0": "nnwwn", "1": "wnnnw", "2": "nwnnw", "3": "wwnnn", "4": "nnwnw",
+    "5": "wnwnn", "6": "nwwnn", "7": "nnnww", "8": "wnnwn", "9": "nwnwn",
+}
+
+# par de dígitos -> 10 elementos (barra, espaço, barra, ...) com True = largo
+_PARES = {
+    a + b: tuple(el == "w" for k in range(5) for el in (_PADROES[a][k], _PADROES[b][k]))
+    for a in _PADROES for b in _PADROES
+}
+
+_INICIO = (False, False, False, False)   # barra n, espaço n, barra n, espaço n
+_FIM    = (True, False, False)           # barra w, espaço n, barra n
+
+@lru_cache(maxsize=512)
+def barras_i25(digits: str, ratio: float = 2.2) -> tuple[tuple[tuple[float, float], ...], float]:
+    """
+    Retorna ((deslocamento, largura), ...) das barras, em módulos a partir do
+    início do símbolo, e a largura total do símbolo em módulos (sem zona de silêncio).
+    """
+    if len(digits) % 2 == 1:
+        digits = "0" + digits
+    elementos = list(_INICIO)
+    for i in range(0, len(digits), 2):
+        elementos.extend(_PARES[digits[i:i + 2]])
+    elementos.extend(_FIM)
+
+    barras = []
+    cursor = 0.0
+    for idx, largo in enumerate(elementos):
+        w = ratio if largo else 1.0
+        if idx % 2 == 0:  # posições pares são barras
+            barras.append((cursor, w))
+        cursor += w
+    return tuple(barras), cursor
+
+_paths: dict = {}
+_PATHS_MAX = 512
+
+def _path_i25(c, digits, barWidth, barHeight, ratio):
+    """Path com todas as barras na origem, memorizado por código/dimensões."""
+    chave = (digits, barWidth, barHeight, ratio)
+    p = _paths.get(chave)
+    if p is None:
+        barras, _total = barras_i25(digits, ratio)
+        p = c.beginPath()
+        for desloc, w in barras:
+            p.rect(desloc * barWidth, 0, w * barWidth, barHeight)
+        if len(_paths) >= _PATHS_MAX:
+            _paths.pop(next(iter(_paths)))
+        _paths[chave] = p
+    return p
+
+def desenhar_i25(c, digits, x, y, barWidth, barHeight, quiet_zone, ratio=2.2):
+    """Desenha o símbolo em um único path; retorna a coordenada x final (com zona de silêncio)."""
+    _barras, total = barras_i25(digits, ratio)
+    x0 = x + quiet_zone
+    c.saveState()
+    c.translate(x0, y)
+    c.drawPath(_path_i25(c, digits, barWidth, barHeight, ratio), stroke=0, fill=1)
+    c.restoreState()
+    return x0 + total * barWidth + quiet_zone
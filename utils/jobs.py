@@ -0,0 +1,230 @@
+# utils/jobs.py — diário (journal) de processamentos em lote
+"""
+Registra na base SQLite o andamento de um processamento em lote (boletos,
+remessa): as entradas, o estado de cada item e o que ele produziu. Se o app
+fechar no meio, travar ou o usuário cancelar, rodar de novo com os mesmos
+arquivos retoma o mesmo job: itens já prontos são pulados e os nossos
+números já reservados são reaproveitados (o sequencial não anda duas vezes).
+
+    job = Job.iniciar("boletos", arquivos)
+    rec = job.item("0:15")                 # None ou {"estado", "dados", "saida"}
+    ... gera o PDF ...
+    job.marcar("0:15", PERSISTIDO, saida=pdf)
+    job.concluir()                         # ou cancelar() / falhar(erro)
+
+Estados de um item, em ordem: pendente → renderizado → persistido → enviado.
+marcar() só acumula em memória; a gravação é feita em lote (checkpoint) a
+cada CHECKPOINT_ITENS itens ou CHECKPOINT_SEG segundos, numa transação só.
+Depois de um efeito que não pode ser repetido (reservar NNs, commit no
+banco), chame checkpoint() na hora. Um job é identificado pelo tipo e pelo
+sha1 dos arquivos de entrada: arquivo alterado = job novo.
+"""
+import os, json, time, hashlib, threading, sqlite3
+
+from utils import store
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+PENDENTE    = "pendente"
+RENDERIZADO = "renderizado"
+PERSISTIDO  = "persistido"
+ENVIADO     = "enviado"
+_ORDEM_ESTADO = {PENDENTE: 0, RENDERIZADO: 1, PERSISTIDO: 2, ENVIADO: 3}
+
+EXECUTANDO = "executando"
+CONCLUIDO  = "concluido"
+CANCELADO  = "cancelado"
+FALHOU     = "falhou"
+
+CHECKPOINT_ITENS = 200
+CHECKPOINT_SEG = 2.0
+
+_tabela_ok: set = set()
+
+def _con() -> sqlite3.Connection:
+    con = store._connect()
+    chave = store._DB_PATH
+    if chave not in _tabela_ok:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS job (
+                id            INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo          TEXT NOT NULL,
+                assinatura    TEXT NOT NULL,
+                estado        TEXT NOT NULL,
+                entradas      TEXT,
+                resultado     TEXT,
+                erro          TEXT,
+                criado_em     TEXT DEFAULT (datetime('now','localtime')),
+                atualizado_em TEXT DEFAULT (datetime('now','localtime'))
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_job_assinatura ON job(tipo, assinatura, estado)")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS job_item (
+                job_id INTEGER NOT NULL,
+                chave  TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                dados  TEXT,
+                saida  TEXT,
+                erro   TEXT,
+                PRIMARY KEY (job_id, chave),
+                FOREIGN KEY (job_id) REFERENCES job(id)
+            ) WITHOUT ROWID
+        """)
+        con.commit()
+        _tabela_ok.add(chave)
+    return con
+
+def assinatura(tipo: str, entradas) -> str:
+    """sha1 do tipo + sha1 de cada arquivo de entrada (na ordem)."""
+    from utils.parse_cache import sha1_arquivo
+    h = hashlib.sha1(tipo.encode())
+    for arq in entradas:
+        h.update(b"\0" + sha1_arquivo(arq).encode())
+    return h.hexdigest()
+
+def atingiu(rec: dict | None, estado: str) -> bool:
+    """O item (registro de Job.item) já chegou pelo menos até 'estado'?"""
+    return bool(rec) and _ORDEM_ESTADO.get(rec["estado"], -1) >= _ORDEM_ESTADO[estado]
+
+class Job:
+    def __init__(self, id: int, tipo: str, entradas: list, resultado: dict, itens: dict, retomado: bool):
+        self.id = id
+        self.tipo = tipo
+        self.entradas = entradas
+        self.resultado = resultado
+        self.retomado = retomado
+        self._itens = itens            # chave -> {"estado", "dados", "saida", "erro"}
+        self._sujos: set = set()
+        self._ultimo = time.monotonic()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def iniciar(cls, tipo: str, entradas) -> "Job":
+        """Retoma o job não concluído com as mesmas entradas ou cria um novo."""
+        entradas = [os.path.abspath(a) for a in entradas]
+        ass = assinatura(tipo, entradas)
+        con = _con()
+        try:
+            r = con.execute("""SELECT id, resultado FROM job
+                                WHERE tipo=? AND assinatura=? AND estado<>?
+                                ORDER BY id DESC LIMIT 1""", (tipo, ass, CONCLUIDO)).fetchone()
+            if r:
+                itens = {
+                    row["chave"]: {"estado": row["estado"], "dados": json.loads(row["dados"] or "{}"),
+                                   "saida": row["saida"] or "", "erro": row["erro"] or ""}
+                    for row in con.execute("SELECT chave, estado, dados, saida, erro FROM job_item WHERE job_id=?",
+                                           (r["id"],))
+                }
+                con.execute("UPDATE job SET estado=?, erro=NULL, atualizado_em=datetime('now','localtime') WHERE id=?",
+                            (EXECUTANDO, r["id"]))
+                con.commit()
+                log.info("retomando job %s (%s): %d item(ns) no diário", r["id"], tipo, len(itens))
+                return cls(int(r["id"]), tipo, entradas, json.loads(r["resultado"] or "{}"), itens, True)
+
+            cur = con.execute("INSERT INTO job (tipo, assinatura, estado, entradas) VALUES (?, ?, ?, ?)",
+                              (tipo, ass, EXECUTANDO, json.dumps(entradas, ensure_ascii=False)))
+            con.commit()
+            return cls(int(cur.lastrowid), tipo, entradas, {}, {}, False)
+        finally:
+            con.close()
+
+    # ---------------- itens ----------------
+    def item(self, chave: str) -> dict | None:
+        with self._lock:
+            return self._itens.get(chave)
+
+    def contar(self, estado: str) -> int:
+        """Quantos itens já chegaram pelo menos até 'estado'."""
+        with self._lock:
+            return sum(1 for rec in self._itens.values() if atingiu(rec, estado))
+
+    def marcar(self, chave: str, estado: str, dados: dict | None = None, saida: str | None = None,
+               erro: str = "") -> None:
+        with self._lock:
+            rec = self._itens.setdefault(chave, {"estado": PENDENTE, "dados": {}, "saida": "", "erro": ""})
+            rec["estado"] = estado
+            if dados:
+                rec["dados"].update(dados)
+            if saida is not None:
+                rec["saida"] = saida
+            rec["erro"] = erro
+            self._sujos.add(chave)
+            if len(self._sujos) >= CHECKPOINT_ITENS or time.monotonic() - self._ultimo >= CHECKPOINT_SEG:
+                self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Grava os itens alterados desde o último checkpoint numa única transação."""
+        with self._lock:
+            linhas = [(self.id, k, r["estado"], json.dumps(r["dados"], ensure_ascii=False), r["saida"], r["erro"])
+                      for k in self._sujos for r in (self._itens[k],)]
+            con = _con()
+            try:
+                con.executemany("INSERT OR REPLACE INTO job_item (job_id, chave, estado, dados, saida, erro) "
+                                "VALUES (?, ?, ?, ?, ?, ?)", linhas)
+                con.execute("UPDATE job SET resultado=?, atualizado_em=datetime('now','localtime') WHERE id=?",
+                            (json.dumps(self.resultado, ensure_ascii=False), self.id))
+                con.commit()
+            finally:
+                con.close()
+            self._sujos.clear()
+            self._ultimo = time.monotonic()
+
+    def salvar_resultado(self, **valores) -> None:
+        """Guarda saídas do job inteiro (ex.: caminho da remessa) e faz checkpoint."""
+        with self._lock:
+            self.resultado.update(valores)
+            self.checkpoint()
+
+    # ---------------- fim ----------------
+    def _encerrar(self, estado: str, erro: str = "") -> None:
+        with self._lock:
+            self.checkpoint()
+            con = _con()
+            try:
+                con.execute("UPDATE job SET estado=?, erro=?, atualizado_em=datetime('now','localtime') WHERE id=?",
+                            (estado, erro or None, self.id))
+                con.commit()
+            finally:
+                con.close()
+
+    def concluir(self, **resultado) -> None:
+        if resultado:
+            self.resultado.update(resultado)
+        self._encerrar(CONCLUIDO)
+
+    def cancelar(self) -> None:
+        self._encerrar(CANCELADO)
+
+    def falhar(self, erro) -> None:
+        self._encerrar(FALHOU, str(erro))
+
+def listar_jobs(limite: int = 50, pendentes: bool = False) -> list[dict]:
+    """Jobs mais recentes (pendentes=True: só os que podem ser retomados)."""
+    con = _con()
+    try:
+        filtro = "WHERE j.estado<>?" if pendentes else ""
+        args = (CONCLUIDO, limite) if pendentes else (limite,)
+        rows = con.execute(f"""
+            SELECT j.id, j.tipo, j.estado, j.entradas, j.erro, j.criado_em, j.atualizado_em,
+                   (SELECT COUNT(*) FROM job_item i WHERE i.job_id=j.id) AS itens
+              FROM job j {filtro}
+             ORDER BY j.id DESC LIMIT ?""", args).fetchall()
+        return [dict(r) | {"entradas": json.loads(r["entradas"] or "[]")} for r in rows]
+    finally:
+        con.close()
+
+def limpar_concluidos(dias: int = 30) -> int:
+    """Apaga jobs concluídos há mais de 'dias' dias (e seus itens)."""
+    con = _con()
+    try:
+        ids = [r[0] for r in con.execute(
+            "SELECT id FROM job WHERE estado=? AND atualizado_em < datetime('now','localtime', ?)",
+            (CONCLUIDO, f"-{int(dias)} days"))]
+        con.executemany("DELETE FROM job_item WHERE job_id=?", [(i,) for i in ids])
+        con.executemany("DELETE FROM job WHERE id=?", [(i,) for i in ids])
+        con.commit()
+        return len(ids)
+    finally:
+        con.close()
@@ -0,0 +1,138 @@
+# utils/log.py — log estruturado por módulo (logging da biblioteca padrão)
+"""
+Loggers nomeados por módulo ("nasapay.nn_registry", "nasapay.boletos"...)
+sob um logger raiz "nasapay". Quem loga só põe o registro numa fila
+(QueueHandler): a formatação e a escrita no arquivo rotativo são feitas por
+uma thread própria (QueueListener), então um log.info() no meio de um laço
+não espera pelo disco nem pelo console — lento no executável do Windows.
+
+Nada é criado no import: get_logger() só aplica os níveis; a pasta do
+arquivo, o handler e a thread da fila nascem no primeiro registro emitido
+(ou numa chamada explícita a configurar()).
+
+Por padrão o nível é WARNING: os log.debug() dos laços quentes não custam
+nada além do teste de nível. Para investigar, ajuste no config.json:
+
+    "log": {
+        "nivel": "INFO",
+        "niveis": {"nn_registry": "DEBUG", "boletos": "DEBUG"},
+        "arquivo": "C:/nasapay/logs/nasapay.log",
+        "console": false
+    }
+
+Em laços, monte mensagens caras só se o nível estiver ativo:
+
+    log = get_logger(__name__)
+    dbg = log.isEnabledFor(logging.DEBUG)
+    for ...:
+        if dbg:
+            log.debug("comparando %s com %s", k, rk)
+"""
+import os, json, queue, atexit, logging, logging.handlers
+
+RAIZ = "nasapay"
+NIVEL_PADRAO = "WARNING"
+ARQUIVO_PADRAO = r"C:/nasapay/logs/nasapay.log"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 5
+FORMATO = "%(asctime)s %(levelname)-7s %(name)s [%(threadName)s] %(message)s"
+
+_configurado = False
+_niveis_ok = False
+_listener: logging.handlers.QueueListener | None = None
+
+def _ler_config() -> dict:
+    """Seção "log" do config.json (pasta do app ou diretório atual)."""
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for caminho in (os.path.join(base, "config.json"), "config.json"):
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                cfg = json.load(f).get("log") or {}
+            return cfg if isinstance(cfg, dict) else {}
+        except (OSError, ValueError, AttributeError):
+            continue
+    return {}
+
+def _nome(modulo: str) -> str:
+    """'utils.nn_registry' / 'src.boletos' / 'nn_registry' -> 'nasapay.nn_registry'."""
+    curto = modulo.rsplit(".", 1)[-1] if modulo.startswith(("utils.", "src.")) else modulo
+    return curto if curto == RAIZ or curto.startswith(RAIZ + ".") else f"{RAIZ}.{curto}"
+
+def _aplicar_niveis(nivel: str, niveis: dict) -> logging.Logger:
+    raiz = logging.getLogger(RAIZ)
+    raiz.setLevel(getattr(logging, nivel, logging.WARNING))
+    raiz.propagate = False
+    for modulo, nv in niveis.items():
+        logging.getLogger(_nome(modulo)).setLevel(getattr(logging, str(nv).upper(), logging.NOTSET))
+    return raiz
+
+class _Adiado(logging.Handler):
+    """Handler provisório da raiz: no primeiro registro liga configurar() e repassa."""
+    def emit(self, record: logging.LogRecord) -> None:
+        if not _configurado:
+            configurar()
+        raiz = logging.getLogger(RAIZ)
+        if self not in raiz.handlers:
+            raiz.handle(record)
+
+def _preparar() -> None:
+    """Só níveis + handler provisório: sem pasta, arquivo ou thread até alguém logar."""
+    global _niveis_ok
+    cfg = _ler_config()
+    raiz = _aplicar_niveis((cfg.get("nivel") or NIVEL_PADRAO).upper(), cfg.get("niveis") or {})
+    if not raiz.handlers:
+        raiz.addHandler(_Adiado())
+    _niveis_ok = True
+
+def configurar(nivel: str | None = None, arquivo: str | None = None, niveis: dict | None = None,
+               console: bool | None = None) -> None:
+    """
+    Liga a fila + arquivo rotativo. Argumentos não informados vêm do
+    config.json. Pode ser chamada de novo para trocar níveis/arquivo.
+    """
+    global _configurado, _listener
+    cfg = _ler_config()
+    nivel = (nivel or cfg.get("nivel") or NIVEL_PADRAO).upper()
+    arquivo = arquivo or cfg.get("arquivo") or ARQUIVO_PADRAO
+    niveis = niveis if niveis is not None else (cfg.get("niveis") or {})
+    console = bool(cfg.get("console")) if console is None else console
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    destinos: list[logging.Handler] = []
+    try:
+        os.makedirs(os.path.dirname(arquivo) or ".", exist_ok=True)
+        destinos.append(logging.handlers.RotatingFileHandler(
+            arquivo, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding="utf-8", delay=True))
+    except OSError as e:
+        print(f"[log] não consegui abrir {arquivo}: {e}")
+    if console or not destinos:
+        destinos.append(logging.StreamHandler())
+    for h in destinos:
+        h.setFormatter(logging.Formatter(FORMATO))
+
+    fila: queue.SimpleQueue = queue.SimpleQueue()
+    raiz = _aplicar_niveis(nivel, niveis)
+    for h in list(raiz.handlers):
+        raiz.removeHandler(h)
+    raiz.addHandler(logging.handlers.QueueHandler(fila))
+
+    _listener = logging.handlers.QueueListener(fila, *destinos, respect_handler_level=True)
+    _listener.start()
+    if not _configurado:
+        atexit.register(encerrar)
+    _configurado = True
+
+def encerrar() -> None:
+    """Esvazia a fila e fecha o arquivo (chamado no atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def get_logger(modulo: str) -> logging.Logger:
+    if not (_configurado or _niveis_ok):
+        _preparar()
+    return logging.getLogger(_nome(modulo))
@@ -0,0 +1,276 @@
+# utils/memoria.py — perfil de memória por etapa nos lotes grandes
+"""
+Modo opcional de perfil de memória para processamentos em lote. Em cada
+fronteira de etapa tira um snapshot do tracemalloc e anota:
+
+- memória rastreada no fim da etapa e o pico durante ela (tracemalloc);
+- RSS atual e o pico de RSS do processo até ali (o que o Windows mostra);
+- os pontos (arquivo:linha) que mais cresceram desde a etapa anterior.
+
+    mem = memoria.perfil("processamento")     # nulo quando desligado
+    with mem:
+        ...
+        mem.etapa("extrair")                  # fronteira: snapshot + comparação
+        ...
+    if mem.etapas:
+        mem.salvar(pasta_da_saida)            # memoria-processamento-AAAAMMDD-HHMMSS.txt/.json
+
+Desligado (padrão) não custa nada: o tracemalloc deixa tudo bem mais lento e
+só é ligado aqui. Liga com NASAPAY_MEMORIA=1 ou no config.json:
+
+    "memoria": {"ativo": true, "top": 10}
+
+Para benchmarks, orcamento(mb) mede o pico de um trecho e lança
+OrcamentoExcedido se passar do limite:
+
+    with memoria.orcamento(200, "boletos 10k") as o:
+        ...
+    print(o.pico_mb)
+
+Alocações feitas em processos filhos (ProcessPoolExecutor) não aparecem.
+"""
+import os, sys, json, time, threading, tracemalloc
+
+from utils.log import get_logger, ARQUIVO_PADRAO
+
+log = get_logger(__name__)
+
+TOP_PADRAO = 10
+PASTA_PADRAO = os.path.dirname(ARQUIVO_PADRAO)     # quando o lote não tem pasta de saída
+QUADROS = 1          # profundidade do traceback guardado por alocação (1 = só a linha)
+_MB = 1024 * 1024
+
+class _Estado:
+    ativo = False
+    top = TOP_PADRAO
+
+_estado = _Estado()
+
+def _ler_config() -> dict:
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for caminho in (os.path.join(base, "config.json"), "config.json"):
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                cfg = json.load(f).get("memoria") or {}
+            return cfg if isinstance(cfg, dict) else {}
+        except (OSError, ValueError, AttributeError):
+            continue
+    return {}
+
+def configurar(ativo: bool | None = None, top: int | None = None) -> None:
+    cfg = _ler_config()
+    if ativo is None:
+        ativo = os.environ.get("NASAPAY_MEMORIA", "") not in ("", "0") or bool(cfg.get("ativo"))
+    _estado.ativo = bool(ativo)
+    try:
+        _estado.top = int(top if top is not None else cfg.get("top") or TOP_PADRAO)
+    except (TypeError, ValueError):
+        _estado.top = TOP_PADRAO
+
+def ativo() -> bool:
+    return _estado.ativo
+
+# ---------------- RSS do processo ----------------
+def rss() -> tuple[int, int]:
+    """(RSS atual, pico de RSS) em bytes; (0, 0) se a plataforma não informar."""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class _PMC(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+            pmc = _PMC()
+            pmc.cb = ctypes.sizeof(_PMC)
+            k32 = ctypes.windll.kernel32
+            k32.GetCurrentProcess.restype = wintypes.HANDLE
+            if ctypes.windll.psapi.GetProcessMemoryInfo(k32.GetCurrentProcess(), ctypes.byref(pmc), pmc.cb):
+                return int(pmc.WorkingSetSize), int(pmc.PeakWorkingSetSize)
+        except Exception:
+            pass
+        return 0, 0
+    atual = pico = 0
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        pico *= 1 if sys.platform == "darwin" else 1024      # macOS em bytes, Linux em KiB
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            atual = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    return atual, max(pico, atual)
+
+# ---------------- perfil por etapa ----------------
+_FILTROS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+def _local(frame) -> str:
+    partes = frame.filename.replace("\\", "/").rsplit("/", 2)
+    return f"{'/'.join(partes[-2:])}:{frame.lineno}"
+
+class EtapaMemoria:
+    __slots__ = ("nome", "segundos", "atual", "pico", "rss", "rss_pico", "top")
+
+    def __init__(self, nome, segundos, atual, pico, rss_atual, rss_pico, top):
+        self.nome = nome
+        self.segundos = segundos
+        self.atual = atual          # bytes rastreados no fim da etapa
+        self.pico = pico            # pico rastreado durante a etapa
+        self.rss = rss_atual
+        self.rss_pico = rss_pico    # pico do processo até o fim da etapa
+        self.top = top              # [{local, kib, delta_kib, blocos}]
+
+    def como_dict(self) -> dict:
+        return {"etapa": self.nome, "segundos": round(self.segundos, 3),
+                "rastreado_mb": round(self.atual / _MB, 2), "pico_mb": round(self.pico / _MB, 2),
+                "rss_mb": round(self.rss / _MB, 2), "rss_pico_mb": round(self.rss_pico / _MB, 2),
+                "top": self.top}
+
+class Perfil:
+    """
+    Liga o tracemalloc (se ainda não estiver ligado) no with e tira um snapshot
+    a cada etapa(). Pode ser chamado de várias threads (etapas do Pipeline).
+    """
+    def __init__(self, nome: str, top: int | None = None):
+        self.nome = nome
+        self.top = top or _estado.top
+        self.etapas: list[EtapaMemoria] = []
+        self._lock = threading.Lock()
+        self._anterior = None
+        self._parar = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(QUADROS)
+            self._parar = True
+        self._anterior = tracemalloc.take_snapshot().filter_traces(_FILTROS)
+        tracemalloc.reset_peak()
+        self._t = time.perf_counter()
+        return self
+
+    def etapa(self, nome: str) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        with self._lock:
+            atual, pico = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            rss_atual, rss_pico = rss()
+            snap = tracemalloc.take_snapshot().filter_traces(_FILTROS)
+            top = [{"local": _local(s.traceback[0]), "kib": round(s.size / 1024, 1),
+                    "delta_kib": round(s.size_diff / 1024, 1), "blocos": s.count}
+                   for s in snap.compare_to(self._anterior, "lineno")[:self.top]]
+            agora = time.perf_counter()
+            self.etapas.append(EtapaMemoria(nome, agora - self._t, atual, pico, rss_atual, rss_pico, top))
+            self._anterior, self._t = snap, agora
+
+    def __exit__(self, *exc):
+        if tracemalloc.is_tracing():
+            self.etapa("(fim)")
+        self._anterior = None
+        if self._parar:
+            tracemalloc.stop()
+        return False
+
+    @property
+    def pico(self) -> int:
+        return max((e.pico for e in self.etapas), default=0)
+
+    def texto(self) -> str:
+        linhas = [f"memória — '{self.nome}'",
+                  f"{'etapa':22s} {'tempo':>7s} {'rastr. MB':>10s} {'pico MB':>9s} {'RSS MB':>8s} {'pico RSS':>9s}"]
+        for e in self.etapas:
+            linhas.append(f"{e.nome:22s} {e.segundos:6.2f}s {e.atual / _MB:10.1f} {e.pico / _MB:9.1f} "
+                          f"{e.rss / _MB:8.1f} {e.rss_pico / _MB:9.1f}")
+        for e in self.etapas:
+            if not e.top:
+                continue
+            linhas += ["", f"[{e.nome}] maiores crescimentos:"]
+            for t in e.top:
+                linhas.append(f"  {t['delta_kib']:+10.1f} KiB  {t['kib']:10.1f} KiB  {t['blocos']:8d} blocos  {t['local']}")
+        return "\n".join(linhas)
+
+    def como_dict(self) -> dict:
+        return {"nome": self.nome, "pico_mb": round(self.pico / _MB, 2),
+                "etapas": [e.como_dict() for e in self.etapas]}
+
+    def salvar(self, pasta: str | None = None) -> str:
+        """Grava memoria-<nome>-<data>.txt e .json em 'pasta' (padrão: pasta de logs); devolve o .txt."""
+        pasta = pasta or PASTA_PADRAO
+        os.makedirs(pasta, exist_ok=True)
+        base = os.path.join(pasta, f"memoria-{self.nome}-{time.strftime('%Y%m%d-%H%M%S')}")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.texto() + "\n")
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.como_dict(), f, ensure_ascii=False, indent=2)
+        log.info("perfil de memória gravado em %s", base + ".txt")
+        return base + ".txt"
+
+class _Nulo:
+    etapas: list = []
+    pico = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def etapa(self, nome: str) -> None:
+        pass
+
+_NULO = _Nulo()
+
+def perfil(nome: str):
+    """Perfil do lote 'nome' se o modo memória estiver ligado; senão um objeto nulo."""
+    return Perfil(nome) if _estado.ativo else _NULO
+
+# ---------------- orçamento (benchmarks) ----------------
+class OrcamentoExcedido(AssertionError):
+    def __init__(self, nome: str, pico: int, limite: int):
+        self.nome, self.pico, self.limite = nome, pico, limite
+        super().__init__(f"{nome or 'trecho'}: pico de {pico / _MB:.1f} MB acima do orçamento de {limite / _MB:.1f} MB")
+
+class orcamento:
+    """
+    Mede o pico de memória rastreada (tracemalloc) do bloco. Com 'mb', lança
+    OrcamentoExcedido na saída se o pico passar do limite; sem 'mb', só mede.
+    """
+    def __init__(self, mb: float | None = None, nome: str = ""):
+        self.limite = int(mb * _MB) if mb else 0
+        self.nome = nome
+        self.pico = 0
+
+    @property
+    def pico_mb(self) -> float:
+        return self.pico / _MB
+
+    def __enter__(self):
+        self._parar = not tracemalloc.is_tracing()
+        if self._parar:
+            tracemalloc.start(QUADROS)
+        self._base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        self.pico = max(0, tracemalloc.get_traced_memory()[1] - self._base)
+        if self._parar:
+            tracemalloc.stop()
+        if tipo is None and self.limite and self.pico > self.limite:
+            raise OrcamentoExcedido(self.nome, self.pico, self.limite)
+        return False
+
+configurar()
@@ -1,9 +1,16 @@
 # === utils/nn_registry.py ===
-import os, csv, re
+import os, csv, re, logging, sqlite3
 from datetime import datetime
+from itertools import islice
 from typing import List, Dict, Optional, Tuple, Iterable
 
-# Caminho do CSV de registro
+from utils.titulo import Titulo, centavos, fmt_data
+from utils.log import get_logger
+from utils import perf, store
+
+log = get_logger(__name__)
+
+# CSV do registro antigo (importado para o banco na primeira abertura)
 REG_PATH = r"C:/nasapay/nn_registry.csv"
 
 # Colunas persistidas
@@ -12,6 +19,23 @@ CSV_FIELDS = [
     "nosso_numero", "agencia", "conta", "carteira", "arquivo", "criado_em"
 ]
 
+LOTE_IMPORTACAO = 5000     # linhas por executemany na importação/exportação
+
+# coluna da listagem -> expressão de ORDER BY (todas com índice)
+_ORDEM = {
+    "sacado": "sacado",
+    "documento": "documento",
+    "vencimento": "substr(vencimento, 7, 4) || substr(vencimento, 4, 2) || substr(vencimento, 1, 2)",
+    "valor": "valor_centavos",
+    "nosso_numero": "nosso_numero",
+    "arquivo_nome": "arquivo_nome",
+    "timestamp": "criado_em",
+}
+_INDICES = {**{k: v for k, v in _ORDEM.items() if k != "documento"},   # documento: índice da chave
+            "conta": "agencia, conta, carteira"}
+# colunas comparadas no filtro rápido (o valor é tratado à parte, pelos dígitos)
+_BUSCA = ("sacado", "documento", "nosso_numero", "arquivo_nome", "criado_em")
+
 # -------------------- utils básicos --------------------
 _re_nd = re.compile(r"\D")
 
@@ -43,21 +67,7 @@ def _centavos_from_any(valor) -> int:
     if s.isdigit():  # já em centavos
         try: return max(0, int(s))
         except: return 0
-    has_c, has_d = ("," in s), ("." in s)
-    if has_c and has_d:
-        # padrão BR: 1.234,56
-        s = s.replace(".", "").replace(",", ".")
-    elif has_c:
-        # vírgula decimal
-        s = s.replace(",", ".")
-    else:
-        # ponto decimal (XML)
-        s = s
-    try:
-        v = float(s)
-    except Exception:
-        v = float(int(_dig(s) or 0))
-    return int(round(max(0.0, v) * 100))
+    return centavos(s)
 
 def _fmt_brl(cents: int) -> str:
     v = max(0, int(cents or 0)) / 100.0
@@ -66,32 +76,90 @@ def _fmt_brl(cents: int) -> str:
 def _basename(p: str) -> str:
     return os.path.basename(p or "").strip()
 
-# -------------------- IO do CSV --------------------
-def _ensure_csv():
-    os.makedirs(os.path.dirname(REG_PATH) or ".", exist_ok=True)
+# -------------------- tabela no banco --------------------
+# O registro mora na base do app (tabela nn_registry). O CSV antigo em REG_PATH
+# é importado uma vez, na primeira abertura, e renomeado para *.importado.
+_COLS_SQL = ", ".join(CSV_FIELDS)
+_INSERT = ("INSERT INTO nn_registry (documento, vencimento, valor_centavos, doc_pagador, sacado, nosso_numero,"
+           " agencia, conta, carteira, arquivo, arquivo_nome, criado_em) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)")
+_tabela_ok: set = set()
+
+def _con() -> sqlite3.Connection:
+    con = store._connect()
+    chave = store._DB_PATH
+    if chave not in _tabela_ok:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS nn_registry (
+                id             INTEGER PRIMARY KEY AUTOINCREMENT,
+                documento      TEXT NOT NULL DEFAULT '',
+                vencimento     TEXT NOT NULL DEFAULT '',
+                valor_centavos INTEGER NOT NULL DEFAULT 0,
+                doc_pagador    TEXT NOT NULL DEFAULT '',
+                sacado         TEXT NOT NULL DEFAULT '',
+                nosso_numero   TEXT NOT NULL DEFAULT '',
+                agencia        TEXT NOT NULL DEFAULT '',
+                conta          TEXT NOT NULL DEFAULT '',
+                carteira       TEXT NOT NULL DEFAULT '',
+                arquivo        TEXT NOT NULL DEFAULT '',
+                arquivo_nome   TEXT NOT NULL DEFAULT '',
+                criado_em      TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        con.execute("""CREATE UNIQUE INDEX IF NOT EXISTS ux_nn_registry_chave
+                       ON nn_registry(documento, vencimento, valor_centavos, doc_pagador)""")
+        for nome, expr in _INDICES.items():
+            con.execute(f"CREATE INDEX IF NOT EXISTS idx_nn_registry_{nome} ON nn_registry({expr})")
+        con.commit()
+        _importar_legado(con)
+        _tabela_ok.add(chave)
+    return con
+
+def _importar_legado(con: sqlite3.Connection) -> None:
     if not os.path.exists(REG_PATH):
-        with open(REG_PATH, "w", newline="", encoding="utf-8") as f:
-            csv.DictWriter(f, fieldnames=CSV_FIELDS, delimiter=";").writeheader()
-
-def _load_rows() -> List[Dict[str, str]]:
-    _ensure_csv()
-    rows: List[Dict[str, str]] = []
+        return
+    n = 0
     with open(REG_PATH, "r", newline="", encoding="utf-8") as f:
-        for r in csv.DictReader(f, delimiter=";"):
-            row = {k: (r.get(k) or "") for k in CSV_FIELDS}
-            rows.append(row)
-    return rows
-
-def _write_rows(rows: List[Dict[str, str]]):
-    _ensure_csv()
-    with open(REG_PATH, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=CSV_FIELDS, delimiter=";")
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: (r.get(k) or "") for k in CSV_FIELDS})
+        linhas = ((_doc_norm(r.get("documento")), (r.get("vencimento") or "").strip(),
+                   _centavos_from_any(r.get("valor_centavos")), _dig(r.get("doc_pagador")),
+                   (r.get("sacado") or "").strip(), (r.get("nosso_numero") or "").strip(),
+                   r.get("agencia") or "", r.get("conta") or "", r.get("carteira") or "",
+                   r.get("arquivo") or "", _basename(r.get("arquivo")), r.get("criado_em") or "")
+                  for r in csv.DictReader(f, delimiter=";"))
+        with con:
+            # chave repetida no CSV: fica a linha mais recente, como buscar_nosso_numero fazia
+            n = con.executemany(_INSERT + """
+                ON CONFLICT(documento, vencimento, valor_centavos, doc_pagador) DO UPDATE SET
+                    sacado=excluded.sacado, nosso_numero=excluded.nosso_numero,
+                    agencia=excluded.agencia, conta=excluded.conta, carteira=excluded.carteira,
+                    arquivo=excluded.arquivo, arquivo_nome=excluded.arquivo_nome,
+                    criado_em=excluded.criado_em
+                WHERE excluded.criado_em >= nn_registry.criado_em
+            """, linhas).rowcount
+    try:
+        os.replace(REG_PATH, REG_PATH + ".importado")
+    except OSError as e:
+        log.warning("CSV antigo importado mas não renomeado (%s): %s", REG_PATH, e)
+    log.info("registro de NN: %d linha(s) importada(s) de %s", n, REG_PATH)
+
+def _agora() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def _iter_rows() -> Iterable[Dict[str, str]]:
+    """Linhas do registro com os campos do CSV (tudo texto), na ordem de inserção."""
+    con = _con()
+    try:
+        for r in con.execute(f"SELECT {_COLS_SQL} FROM nn_registry ORDER BY id"):
+            d = dict(r)
+            d["valor_centavos"] = str(d["valor_centavos"])
+            yield d
+    finally:
+        con.close()
 
 # -------------------- chave canônica --------------------
 def _key_from_titulo(t: dict) -> Tuple[str, str, str, str]:
+    if isinstance(t, Titulo):
+        return (_doc_norm(t.documento), fmt_data(t.vencimento), str(t.valor_centavos),
+                _dig(t.sacado_cnpj or t.extras.get("doc_pagador") or ""))
     doc = _doc_norm(t.get("documento", ""))
     venc = str(t.get("vencimento", "")).strip()
     cents = str(_centavos_from_any(t.get("valor", "0")))
@@ -103,130 +171,196 @@ def next_nosso_numero(params: dict) -> str:
     ag = str(params.get("agencia", "")).zfill(4)
     cc = str(params.get("conta", "")).zfill(7)
     cart = str(params.get("carteira", "")).zfill(2)
-    maxi = 0
-    for r in _load_rows():
-        if r.get("agencia") == ag and r.get("conta") == cc and r.get("carteira") == cart:
-            nn = _dig(r.get("nosso_numero"))
-            if nn:
-                try: maxi = max(maxi, int(nn))
-                except: pass
+    con = _con()
+    try:
+        maxi = con.execute("""SELECT MAX(CAST(nosso_numero AS INTEGER)) FROM nn_registry
+                               WHERE agencia=? AND conta=? AND carteira=? AND nosso_numero<>''""",
+                           (ag, cc, cart)).fetchone()[0] or 0
+    finally:
+        con.close()
     return str(maxi + 1).zfill(11)
 
+@perf.medir("nn.buscar")
 def buscar_nosso_numero(titulo: dict) -> Optional[str]:
-    k = _key_from_titulo(titulo)
-    latest_dt = None
-    nn = None
-    
-    # Debug: mostrar chave procurada
-    print(f"[DEBUG] Buscando NN para chave: {k}")
-    
-    for r in _load_rows():
-        rk = (_doc_norm(r["documento"]), r["vencimento"], r["valor_centavos"], _dig(r["doc_pagador"]))
-        
-        # Debug: mostrar comparação
-        if r["documento"] and _doc_norm(r["documento"]) == k[0]:
-            print(f"[DEBUG] Comparando:")
-            print(f"  Procurado: {k}")
-            print(f"  Registro:  {rk}")
-            print(f"  Match: {rk == k}")
-        
-        if rk == k and r.get("nosso_numero"):
-            try:
-                dt = datetime.fromisoformat((r.get("criado_em") or "").replace(" ", "T"))
-            except Exception:
-                dt = None
-            if latest_dt is None or (dt and dt > latest_dt):
-                latest_dt = dt
-                nn = r["nosso_numero"]
-                print(f"[DEBUG] NN encontrado: {nn}")
-    
-    if not nn:
-        print(f"[DEBUG] Nenhum NN encontrado para {k}")
-    
+    doc, venc, cents, docp = _key_from_titulo(titulo)
+    dbg = log.isEnabledFor(logging.DEBUG)   # nada de formatar mensagens com o debug desligado
+
+    con = _con()
+    try:
+        if dbg:
+            k = (doc, venc, cents, docp)
+            log.debug("buscando NN para chave %s", k)
+            if doc:
+                for r in con.execute("""SELECT vencimento, valor_centavos, doc_pagador FROM nn_registry
+                                         WHERE documento=?""", (doc,)):
+                    rk = (doc, r[0], str(r[1]), r[2])
+                    log.debug("comparando procurado=%s registro=%s match=%s", k, rk, rk == k)
+        r = con.execute("""SELECT nosso_numero FROM nn_registry
+                            WHERE documento=? AND vencimento=? AND valor_centavos=? AND doc_pagador=?
+                              AND nosso_numero<>''""", (doc, venc, int(cents), docp)).fetchone()
+    finally:
+        con.close()
+
+    nn = r[0] if r else None
+    if dbg:
+        if nn:
+            log.debug("NN encontrado: %s", nn)
+        else:
+            log.debug("nenhum NN encontrado para %s", (doc, venc, cents, docp))
     return nn
 
+def nossos_numeros_por_chave(chaves: Iterable[Tuple[str, str, int]]) -> Dict[Tuple[str, str, int], Tuple[str, str]]:
+    """
+    (documento, vencimento 'DD/MM/AAAA', valor_centavos) -> (nosso_numero, carteira)
+    para um lote inteiro numa consulta só: as chaves vão para uma tabela
+    temporária e o join usa o índice da chave do registro. Sem o pagador na
+    chave, se houver mais de um registro vale o mais recente.
+    """
+    con = _con()
+    try:
+        con.execute("CREATE TEMP TABLE _chaves (documento TEXT, vencimento TEXT, valor_centavos INTEGER)")
+        con.executemany("INSERT INTO temp._chaves VALUES (?,?,?)", set(chaves))
+        mapa = {}
+        for r in con.execute("""SELECT r.documento, r.vencimento, r.valor_centavos, r.nosso_numero, r.carteira
+                                  FROM temp._chaves k
+                                  JOIN nn_registry r ON r.documento=k.documento AND r.vencimento=k.vencimento
+                                                    AND r.valor_centavos=k.valor_centavos
+                                 WHERE r.nosso_numero<>''
+                                 ORDER BY r.criado_em, r.id"""):
+            mapa[(r[0], r[1], r[2])] = (r[3], r[4])
+        return mapa
+    finally:
+        con.close()
+
+NOVO, DUPLICADO, ALTERADO = "novo", "duplicado", "alterado"
+
+def classificar_titulos(titulos) -> List[Tuple[str, str]]:
+    """
+    Situação de cada título no registro, para o lote inteiro numa consulta só
+    (tabela temporária + índice da chave), na ordem dos títulos:
+      (DUPLICADO, nn)  a chave (documento, vencimento, valor, pagador) já está registrada
+                       (nn pode vir vazio: o registro aceita linhas sem NN)
+      (ALTERADO, nn)   mesmo documento e pagador com vencimento/valor diferentes
+                       (nn do registro mais recente)
+      (NOVO, "")       o resto, inclusive títulos sem documento
+    """
+    chaves = [_key_from_titulo(t) for t in titulos]
+    dup: Dict[int, str] = {}
+    alt: Dict[int, str] = {}
+    con = _con()
+    try:
+        con.execute("""CREATE TEMP TABLE _delta (pos INTEGER, documento TEXT, vencimento TEXT,
+                                                 valor_centavos INTEGER, doc_pagador TEXT)""")
+        con.executemany("INSERT INTO temp._delta VALUES (?,?,?,?,?)",
+                        ((i, d, v, int(c or 0), p) for i, (d, v, c, p) in enumerate(chaves) if d))
+        for pos, venc, cents, nn, vk, ck in con.execute("""
+                SELECT k.pos, r.vencimento, r.valor_centavos, r.nosso_numero, k.vencimento, k.valor_centavos
+                  FROM temp._delta k
+                  JOIN nn_registry r ON r.documento=k.documento AND r.doc_pagador=k.doc_pagador
+                 ORDER BY r.nosso_numero<>'', r.criado_em, r.id"""):   # com NN por último: vence
+            if venc == vk and cents == ck:
+                dup[pos] = nn
+            else:
+                alt[pos] = nn
+    finally:
+        con.close()
+    return [(DUPLICADO, dup[i]) if i in dup else (ALTERADO, alt[i]) if i in alt else (NOVO, "")
+            for i in range(len(chaves))]
+
 def registrar_titulos(titulos: List[dict], params: dict, meta: dict | None = None):
     """
-    Grava/atualiza CSV com (doc, venc, valor_centavos, doc_pagador) como chave.
+    Grava/atualiza o registro com (doc, venc, valor_centavos, doc_pagador) como chave.
     - meta['arquivo'] opcional
     - meta['override_nn'] True para forçar atualização do NN/arquivo/sacado
     """
-    rows = _load_rows()
-    index = {(_doc_norm(r["documento"]), r["vencimento"], r["valor_centavos"], _dig(r["doc_pagador"])): i
-             for i, r in enumerate(rows)}
-
     ag = str(params.get("agencia", "")).zfill(4)
     cc = str(params.get("conta", "")).zfill(7)
     cart = str(params.get("carteira", "")).zfill(2)
     override = bool((meta or {}).get("override_nn"))
     arquivo = (meta or {}).get("arquivo", "") or ""
-
-    changed = False
-    for t in titulos:
-        doc, venc, cents, docp = _key_from_titulo(t)
-        nn = str(_dig(t.get("nosso_numero"))).zfill(11) if t.get("nosso_numero") else ""
-        sacado = str(t.get("sacado") or "").strip()
-
-        key = (doc, venc, cents, docp)
-        i = index.get(key)
-        if i is None:
-            rows.append({
-                "documento": doc, "vencimento": venc, "valor_centavos": cents,
-                "doc_pagador": docp, "sacado": sacado,
-                "nosso_numero": nn, "agencia": ag, "conta": cc, "carteira": cart,
-                "arquivo": arquivo, "criado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-            index[key] = len(rows) - 1
-            changed = True
-        elif override:
-            r = rows[i]
-            if nn: r["nosso_numero"] = nn
-            if sacado: r["sacado"] = sacado
-            if arquivo: r["arquivo"] = arquivo
-            r["criado_em"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            changed = True
-
-    if changed:
-        _write_rows(rows)
+    agora = _agora()
+
+    def _linhas():
+        for t in titulos:
+            doc, venc, cents, docp = _key_from_titulo(t)
+            nn = str(_dig(t.get("nosso_numero"))).zfill(11) if t.get("nosso_numero") else ""
+            sacado = str(t.get("sacado") or "").strip()
+            yield (doc, venc, int(cents), docp, sacado, nn, ag, cc, cart, arquivo, _basename(arquivo), agora)
+
+    conflito = """DO UPDATE SET
+        nosso_numero=CASE WHEN excluded.nosso_numero<>'' THEN excluded.nosso_numero ELSE nosso_numero END,
+        sacado=CASE WHEN excluded.sacado<>'' THEN excluded.sacado ELSE sacado END,
+        arquivo=CASE WHEN excluded.arquivo<>'' THEN excluded.arquivo ELSE arquivo END,
+        arquivo_nome=CASE WHEN excluded.arquivo<>'' THEN excluded.arquivo_nome ELSE arquivo_nome END,
+        criado_em=excluded.criado_em""" if override else "DO NOTHING"
+    con = _con()
+    try:
+        with con:
+            con.executemany(_INSERT + f"""
+                ON CONFLICT(documento, vencimento, valor_centavos, doc_pagador) {conflito}""", _linhas())
+    finally:
+        con.close()
+
+def _like(s: str) -> str:
+    return "%" + s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _where(filtro: Optional[str]) -> Tuple[str, list]:
+    f = (filtro or "").strip()
+    if not f:
+        return "", []
+    partes = [f"{c} LIKE ? ESCAPE '\\'" for c in _BUSCA]
+    params = [_like(f)] * len(_BUSCA)
+    # valor: "1.234" acha 1.234,56 na tela — compara os dígitos com os centavos
+    if re.fullmatch(r"[\d.,\s]+", f) and _dig(f):
+        partes.append("CAST(valor_centavos AS TEXT) LIKE ?")
+        params.append(_like(_dig(f).lstrip("0") or "0"))
+    return " WHERE " + " OR ".join(partes), params
+
+def _entrada(r) -> Dict[str, str]:
+    cents = max(0, int(r["valor_centavos"] or 0))
+    return {
+        "key": str(r["id"]),
+        "sacado": (r["sacado"] or r["doc_pagador"] or "").strip(),
+        "documento": r["documento"],
+        "valor": _fmt_brl(cents),
+        "vencimento": r["vencimento"],
+        "nosso_numero": r["nosso_numero"],
+        "arquivo": r["arquivo"],
+        "arquivo_nome": r["arquivo_nome"],
+        "timestamp": r["criado_em"],
+        "_valor_centavos": str(cents),
+        "doc_pagador": r["doc_pagador"],
+        "agencia": r["agencia"],
+        "conta": r["conta"],
+        "carteira": r["carteira"],
+    }
+
+def query_entries(filtro: Optional[str] = None, sort_by: str = "timestamp", reverse: bool = True,
+                  offset: int = 0, limit: Optional[int] = None, contar: bool = True) -> Tuple[Optional[int], List[Dict[str, str]]]:
+    """
+    Uma página do registro: (total que passa no filtro, linhas de offset até offset+limit).
+    Filtro, ordem e paginação vão para o SQL; só as linhas da página são formatadas.
+    limit=None traz tudo; limit=0 só conta. Com contar=False o total vem None.
+    """
+    where, params = _where(filtro)
+    ordem = _ORDEM.get(sort_by, _ORDEM["timestamp"])
+    sentido = "DESC" if reverse else "ASC"
+    con = _con()
+    try:
+        total = con.execute(f"SELECT COUNT(*) FROM nn_registry{where}", params).fetchone()[0] if contar else None
+        if limit == 0:
+            return total, []
+        cur = con.execute(f"SELECT * FROM nn_registry{where} ORDER BY {ordem} {sentido}, id {sentido}"
+                          " LIMIT ? OFFSET ?", params + [-1 if limit is None else int(limit), max(0, int(offset))])
+        return total, [_entrada(r) for r in cur]
+    finally:
+        con.close()
+
+def count_entries(filtro: Optional[str] = None) -> int:
+    return query_entries(filtro, limit=0)[0]
 
 def list_entries(filtro: Optional[str] = None, sort_by: str = "timestamp", reverse: bool = True) -> List[Dict[str, str]]:
-    rows = _load_rows()
-    out: List[Dict[str, str]] = []
-    for i, r in enumerate(rows):
-        cents = r.get("valor_centavos") or "0"
-        try:
-            cents_i = int(cents) if str(cents).isdigit() else _centavos_from_any(cents)
-        except Exception:
-            cents_i = 0
-        out.append({
-            "key": str(i),
-            "sacado": (r.get("sacado") or r.get("doc_pagador") or "").strip(),
-            "documento": r.get("documento", ""),
-            "valor": _fmt_brl(cents_i),
-            "vencimento": r.get("vencimento", ""),
-            "nosso_numero": r.get("nosso_numero", ""),
-            "arquivo": r.get("arquivo", ""),
-            "arquivo_nome": _basename(r.get("arquivo", "")),
-            "timestamp": r.get("criado_em", ""),
-            "_valor_centavos": str(max(0, cents_i)),
-            "doc_pagador": r.get("doc_pagador", ""),
-            "agencia": r.get("agencia", ""),
-            "conta": r.get("conta", ""),
-            "carteira": r.get("carteira", ""),
-        })
-
-    if filtro:
-        f = filtro.strip().lower()
-        if f:
-            def ok(d):
-                return any((d.get(c, "").lower().find(f) >= 0) for c in
-                           ["sacado", "documento", "nosso_numero", "arquivo_nome", "valor", "timestamp"])
-            out = [d for d in out if ok(d)]
-
-    if sort_by not in ("sacado", "documento", "vencimento", "valor", "nosso_numero", "arquivo_nome", "timestamp"):
-        sort_by = "timestamp"
-    out.sort(key=lambda d: d.get(sort_by, ""), reverse=reverse)
-    return out
+    return query_entries(filtro, sort_by, reverse, contar=False)[1]
 
 def search_entries(filtro: Optional[str] = None, sort_by: str = "criado_em", reverse: bool = True) -> List[Dict[str, str]]:
     return list_entries(filtro=filtro, sort_by=("timestamp" if sort_by == "criado_em" else sort_by), reverse=reverse)
@@ -236,25 +370,28 @@ def update_entry(row_id, nosso_numero: Optional[str] = None, arquivo: Optional[s
         idx = int(row_id)
     except Exception:
         return False
-    rows = _load_rows()
-    if not (0 <= idx < len(rows)): return False
-    ch = False
+    novos = {}
     if nosso_numero is not None:
         nn = _dig(nosso_numero).zfill(11)
         if len(nn) != 11:
             raise ValueError("Nosso Número deve ter 11 dígitos.")
-        if rows[idx].get("nosso_numero") != nn:
-            rows[idx]["nosso_numero"] = nn; ch = True
+        novos["nosso_numero"] = nn
     if arquivo is not None:
-        arq = (arquivo or "").strip()
-        if rows[idx].get("arquivo") != arq:
-            rows[idx]["arquivo"] = arq; ch = True
+        novos["arquivo"] = (arquivo or "").strip()
+        novos["arquivo_nome"] = _basename(novos["arquivo"])
     if sacado is not None:
-        sc = (sacado or "").strip()
-        if rows[idx].get("sacado", "") != sc:
-            rows[idx]["sacado"] = sc; ch = True
-    if ch: _write_rows(rows)
-    return ch
+        novos["sacado"] = (sacado or "").strip()
+    if not novos: return False
+    sets = ", ".join(f"{c}=?" for c in novos)
+    difere = " OR ".join(f"{c}<>?" for c in novos)
+    con = _con()
+    try:
+        with con:
+            cur = con.execute(f"UPDATE nn_registry SET {sets} WHERE id=? AND ({difere})",
+                              [*novos.values(), idx, *novos.values()])
+        return cur.rowcount > 0
+    finally:
+        con.close()
 
 def delete_entries(ids: Iterable[int | str]) -> int:
     s = set()
@@ -262,88 +399,94 @@ def delete_entries(ids: Iterable[int | str]) -> int:
         try: s.add(int(x))
         except: pass
     if not s: return 0
-    rows = _load_rows()
-    new = []; rm = 0
-    for i, r in enumerate(rows):
-        if i in s: rm += 1
-        else: new.append(r)
-    if rm: _write_rows(new)
+    ids = sorted(s)
+    rm = 0
+    con = _con()
+    try:
+        with con:
+            for i in range(0, len(ids), 500):      # limite de variáveis por comando do SQLite
+                bloco = ids[i:i + 500]
+                rm += con.execute(f"DELETE FROM nn_registry WHERE id IN ({','.join('?' * len(bloco))})",
+                                  bloco).rowcount
+    finally:
+        con.close()
     return rm
 
-def import_from_csv(path: str):
+def _linha_importada(raw: dict) -> tuple:
+    doc  = _doc_norm(raw.get("documento") or raw.get("Documento") or "")
+    venc = str(raw.get("vencimento") or raw.get("Vencimento") or "").strip()
+    valc = raw.get("valor_centavos") or raw.get("ValorCentavos")
+    cents = _centavos_from_any(valc if valc not in (None, "") else (raw.get("valor") or raw.get("Valor") or "0"))
+    docp = _dig(raw.get("doc_pagador") or raw.get("DocPagador") or raw.get("CPF_CNPJ") or "")
+    sac  = (raw.get("sacado") or raw.get("Sacado") or raw.get("Nome") or "").strip()
+    nn   = _dig(raw.get("nosso_numero") or raw.get("NossoNumero") or "")
+    arq  = (raw.get("arquivo") or raw.get("Arquivo") or "").strip()
+    cri  = (raw.get("criado_em") or raw.get("CriadoEm") or _agora())
+    return (doc, venc, cents, docp, sac, nn.zfill(11) if nn else "",
+            _dig(raw.get("agencia") or ""), _dig(raw.get("conta") or ""), _dig(raw.get("carteira") or ""),
+            arq, _basename(arq), cri)
+
+def import_from_csv(path: str, lote: int = LOTE_IMPORTACAO):
+    """
+    Importa um CSV (';' ou ',') em blocos de 'lote' linhas, numa transação só.
+    Chave nova entra; chave existente só troca NN/sacado quando vêm preenchidos
+    e diferentes. Devolve (adicionados, atualizados, ignorados). Memória
+    constante: nada além de um bloco fica carregado.
+    """
     added = updated = skipped = 0
     if not path or not os.path.exists(path): return (0,0,0)
 
-    rows = _load_rows()
-    index = {(_doc_norm(r["documento"]), r["vencimento"], r["valor_centavos"], _dig(r["doc_pagador"])): i
-             for i, r in enumerate(rows)}
-
-    # detecta delimitador
-    delim = ";"
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        s = f.read(4096)
-        if s.count(",") > s.count(";"):
-            delim = ","
-
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        rdr = csv.DictReader(f, delimiter=delim)
-        for raw in rdr:
-            doc  = _doc_norm(raw.get("documento") or raw.get("Documento") or "")
-            venc = str(raw.get("vencimento") or raw.get("Vencimento") or "").strip()
-            valc = raw.get("valor_centavos") or raw.get("ValorCentavos")
-            cents = _centavos_from_any(valc if valc not in (None, "") else (raw.get("valor") or raw.get("Valor") or "0"))
-            docp = _dig(raw.get("doc_pagador") or raw.get("DocPagador") or raw.get("CPF_CNPJ") or "")
-            sac  = (raw.get("sacado") or raw.get("Sacado") or raw.get("Nome") or "").strip()
-            nn   = _dig(raw.get("nosso_numero") or raw.get("NossoNumero") or "")
-            ag   = _dig(raw.get("agencia") or "")
-            cc   = _dig(raw.get("conta") or "")
-            cart = _dig(raw.get("carteira") or "")
-            arq  = (raw.get("arquivo") or raw.get("Arquivo") or "").strip()
-            cri  = (raw.get("criado_em") or raw.get("CriadoEm") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-
-            k = (doc, venc, str(cents), docp)
-            i = index.get(k)
-            if i is None:
-                rows.append({
-                    "documento": doc, "vencimento": venc, "valor_centavos": str(cents),
-                    "doc_pagador": docp, "sacado": sac, "nosso_numero": nn.zfill(11) if nn else "",
-                    "agencia": ag, "conta": cc, "carteira": cart, "arquivo": arq, "criado_em": cri
-                })
-                index[k] = len(rows) - 1
-                added += 1
-            else:
-                ch = False
-                if nn and rows[i].get("nosso_numero") != nn:
-                    rows[i]["nosso_numero"] = nn; ch = True
-                if sac and rows[i].get("sacado", "") != sac:
-                    rows[i]["sacado"] = sac; ch = True
-                if ch: updated += 1
-                else: skipped += 1
-
-    if added or updated: _write_rows(rows)
+    upsert = _INSERT + """
+        ON CONFLICT(documento, vencimento, valor_centavos, doc_pagador) DO UPDATE SET
+            nosso_numero=CASE WHEN excluded.nosso_numero<>'' THEN excluded.nosso_numero ELSE nosso_numero END,
+            sacado=CASE WHEN excluded.sacado<>'' THEN excluded.sacado ELSE sacado END
+        WHERE (excluded.nosso_numero<>'' AND excluded.nosso_numero<>nosso_numero)
+           OR (excluded.sacado<>'' AND excluded.sacado<>sacado)"""
+    con = _con()
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f, con:
+            amostra = f.read(4096)          # detecta o delimitador e volta ao início
+            delim = "," if amostra.count(",") > amostra.count(";") else ";"
+            f.seek(0)
+            linhas = map(_linha_importada, csv.DictReader(f, delimiter=delim))
+            while True:
+                bloco = list(islice(linhas, lote))
+                if not bloco:
+                    break
+                ultimo_id = con.execute("SELECT COALESCE(MAX(id), 0) FROM nn_registry").fetchone()[0]
+                antes = con.total_changes
+                con.executemany(upsert, bloco)
+                mudou = con.total_changes - antes           # inseridas + atualizadas
+                novas = con.execute("SELECT COUNT(*) FROM nn_registry WHERE id > ?", (ultimo_id,)).fetchone()[0]
+                added += novas
+                updated += mudou - novas
+                skipped += len(bloco) - mudou
+    finally:
+        con.close()
+    log.info("importação de %s: %d adicionado(s), %d atualizado(s), %d ignorado(s)",
+             path, added, updated, skipped)
     return (added, updated, skipped)
 
 def export_to_csv(path: str, filtro: Optional[str] = None) -> int:
-    data = list_entries(filtro=filtro, reverse=False)
+    """Grava o registro (filtrado como na tela) direto do cursor, em ordem de criação."""
     if not path: return 0
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=CSV_FIELDS, delimiter=";")
-        w.writeheader()
-        for r in data:
-            w.writerow({
-                "documento": _doc_norm(r.get("documento","")),
-                "vencimento": r.get("vencimento",""),
-                "valor_centavos": r.get("_valor_centavos","0"),
-                "doc_pagador": r.get("doc_pagador",""),
-                "sacado": r.get("sacado",""),
-                "nosso_numero": r.get("nosso_numero",""),
-                "agencia": r.get("agencia",""),
-                "conta": r.get("conta",""),
-                "carteira": r.get("carteira",""),
-                "arquivo": r.get("arquivo",""),
-                "criado_em": r.get("timestamp",""),
-            })
-    return len(data)
+    where, params = _where(filtro)
+    n = 0
+    con = _con()
+    try:
+        cur = con.execute(f"SELECT {_COLS_SQL} FROM nn_registry{where} ORDER BY criado_em, id", params)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(CSV_FIELDS)
+            while True:
+                linhas = cur.fetchmany(LOTE_IMPORTACAO)
+                if not linhas:
+                    break
+                w.writerows(linhas)
+                n += len(linhas)
+    finally:
+        con.close()
+    return n
 
 # ---- aliases de compatibilidade (se algum código antigo chamar) ----
 def search_entries_wrapper(*a, **k): return search_entries(*a, **k)
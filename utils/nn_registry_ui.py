@@ -2,12 +2,13 @@
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from tkinter import font as tkfont
 
-from . import nn_registry as reg
+from . import nn_registry as reg, store
+from .ui_virtual_list import ListaVirtual
 
 PADX = 8
 PADY = 6
+FILTRO_MS = 250     # espera após a última tecla antes de filtrar
 
 COLS = ("sacado", "documento", "valor", "vencimento",
         "nosso_numero", "arquivo_nome", "timestamp")
@@ -32,7 +33,23 @@ ANCHORS = {
     "timestamp": "center",
 }
 
-CSV_PATH = reg.REG_PATH
+class _FonteRegistro:
+    """Fonte da ListaVirtual direto no banco: cada página é uma consulta com LIMIT/OFFSET."""
+    def __init__(self):
+        self._cont_de = None
+        self._cont = 0
+
+    def contar(self, filtro: str = "") -> int:
+        if self._cont_de != filtro:
+            self._cont, self._cont_de = reg.count_entries(filtro), filtro
+        return self._cont
+
+    def pagina(self, filtro, ordem, reverso, inicio, qtd) -> list:
+        _, linhas = reg.query_entries(filtro, ordem or "timestamp", reverso, inicio, qtd, contar=False)
+        return [tuple(row[c] for c in COLS) + (row["key"],) for row in linhas]
+
+    def invalidar(self) -> None:
+        self._cont_de = None
 
 def _open_window(parent: tk.Tk | tk.Toplevel):
     win = tk.Toplevel(parent)
@@ -52,82 +69,49 @@ def _open_window(parent: tk.Tk | tk.Toplevel):
     btn_import = ttk.Button(top, text="Importar CSV")
     btn_edit = ttk.Button(top, text="Editar")
     btn_del = ttk.Button(top, text="Apagar Selecionados")
-    btn_open_csv = ttk.Button(top, text="Abrir CSV")
     btn_open_dir = ttk.Button(top, text="Abrir Pasta")
 
-    for b in (btn_atualizar, btn_export, btn_import, btn_edit, btn_del, btn_open_csv, btn_open_dir):
+    for b in (btn_atualizar, btn_export, btn_import, btn_edit, btn_del, btn_open_dir):
         b.pack(side="left", padx=4)
 
-    # Tabela
+    # Tabela (virtual: só as linhas visíveis existem no Treeview)
     frm = ttk.Frame(win); frm.pack(fill="both", expand=True, padx=PADX, pady=PADY)
-    tree = ttk.Treeview(frm, columns=COLS, show="headings", selectmode="extended")
-    tree.pack(side="left", fill="both", expand=True)
-    vsb = ttk.Scrollbar(frm, orient="vertical", command=tree.yview)
-    vsb.pack(side="right", fill="y")
-    tree.configure(yscrollcommand=vsb.set)
-
-    # Cabeçalhos
-    for c in COLS:
-        tree.heading(c, text=HEADERS[c])
 
     # Larguras iniciais (Sacado largo pra ~40 chars)
-    tree.column("sacado",       anchor=ANCHORS["sacado"],       stretch=True,  width=360, minwidth=300)
-    tree.column("documento",    anchor=ANCHORS["documento"],    stretch=False, width=120, minwidth=90)
-    tree.column("valor",        anchor=ANCHORS["valor"],        stretch=False, width=120, minwidth=90)
-    tree.column("vencimento",   anchor=ANCHORS["vencimento"],   stretch=False, width=110, minwidth=90)
-    tree.column("nosso_numero", anchor=ANCHORS["nosso_numero"], stretch=False, width=140, minwidth=120)
-    tree.column("arquivo_nome", anchor=ANCHORS["arquivo_nome"], stretch=True,  width=240, minwidth=180)
-    tree.column("timestamp",    anchor=ANCHORS["timestamp"],    stretch=False, width=150, minwidth=120)
-
-    # Fonte para medir (não usa tree.cget('font') pra evitar erro do Tk)
-    try:
-        treefont = tkfont.nametofont("TkDefaultFont")
-    except Exception:
-        treefont = tkfont.Font(family="Segoe UI", size=9)
-
-    # Mapa iid -> key (índice real)
-    item_key: dict[str, str] = {}
-
-    def autosize_columns(items):
-        padding = 24
-        for c in COLS:
-            header_w = treefont.measure(HEADERS[c]) + padding
-            max_w = header_w
-            for iid in items:
-                val = str(tree.set(iid, c))
-                w = treefont.measure(val) + padding
-                if w > max_w:
-                    max_w = w
-            info = tree.column(c)
-            minw = int(info.get("minwidth") or 90)
-            tree.column(c, width=max(max_w, minw))
+    lista = ListaVirtual(frm, [
+        ("sacado",       HEADERS["sacado"],       360, ANCHORS["sacado"],       True, 300),
+        ("documento",    HEADERS["documento"],    120, ANCHORS["documento"],    False, 90),
+        ("valor",        HEADERS["valor"],        120, ANCHORS["valor"],        False, 90),
+        ("vencimento",   HEADERS["vencimento"],   110, ANCHORS["vencimento"],   False, 90),
+        ("nosso_numero", HEADERS["nosso_numero"], 140, ANCHORS["nosso_numero"], False, 120),
+        ("arquivo_nome", HEADERS["arquivo_nome"], 240, ANCHORS["arquivo_nome"], True, 180),
+        ("timestamp",    HEADERS["timestamp"],    150, ANCHORS["timestamp"],    False, 120),
+    ], _FonteRegistro(), ordem="timestamp", reverso=True,
+        ao_duplo_clique=lambda ln: on_edit())
+    lista.pack(fill="both", expand=True)
 
     # Status bar
     status = ttk.Label(win, text="", anchor="w")
     status.pack(fill="x", padx=PADX, pady=(0, PADY))
     def set_status(msg: str): status.configure(text=msg)
 
+    def carregado():
+        lista.dimensionar()
+        set_status(f"{lista.total} registro(s) — banco: {store._DB_PATH}")
+
     def refresh():
-        tree.delete(*tree.get_children())
-        item_key.clear()
-        filtro = ent_filtro.get().strip()
-        data = reg.list_entries(filtro=filtro, sort_by="timestamp", reverse=True)
-        iids = []
-        for row in data:
-            values = (
-                row.get("sacado", ""),
-                row.get("documento", ""),
-                row.get("valor", ""),
-                row.get("vencimento", ""),
-                row.get("nosso_numero", ""),
-                os.path.basename(row.get("arquivo", "") or ""),
-                row.get("timestamp", ""),
-            )
-            iid = tree.insert("", "end", values=values)
-            item_key[iid] = row.get("key", "")
-            iids.append(iid)
-        autosize_columns(iids)
-        set_status(f"{len(data)} registro(s) — CSV: {CSV_PATH}")
+        lista.filtrar(ent_filtro.get().strip())
+        carregado()
+
+    pendente = [None]
+    def on_digitar(_e=None):
+        if pendente[0] is not None:
+            win.after_cancel(pendente[0])
+        def _filtrar():
+            pendente[0] = None
+            if ent_filtro.get().strip() != lista.filtro:
+                refresh()
+        pendente[0] = win.after(FILTRO_MS, _filtrar)
 
     def on_export():
         path = filedialog.asksaveasfilename(
@@ -150,13 +134,13 @@ def _open_window(parent: tk.Tk | tk.Toplevel):
         refresh()
 
     def on_delete():
-        sel = list(tree.selection())
+        sel = lista.selecionados()
         if not sel: return
         if not messagebox.askyesno("Confirmar", "Apagar os itens selecionados?", parent=win):
             return
         ids = []
-        for iid in sel:
-            key = item_key.get(iid)
+        for ln in sel:
+            key = ln[-1]
             if key != "" and key is not None:
                 ids.append(int(key))
         apagados = reg.delete_entries(ids)
@@ -164,18 +148,12 @@ def _open_window(parent: tk.Tk | tk.Toplevel):
         refresh()
 
     def on_edit():
-        sel = list(tree.selection())
+        sel = lista.selecionados()
         if not sel: return
-        iid = sel[0]
-        key = item_key.get(iid)
+        vals = sel[0]
+        key = vals[-1]
         if key is None or key == "":
             return
-        # Recarrega dados atuais pra esse índice
-        data = reg.list_entries(sort_by="timestamp", reverse=True)
-        try:
-            idx = int(key)
-        except:
-            idx = None
         # Dialog
         dlg = tk.Toplevel(win); dlg.title("Editar registro"); dlg.transient(win); dlg.grab_set()
         ttk.Label(dlg, text="Nosso Número (11 dígitos):").grid(row=0, column=0, sticky="w", padx=10, pady=8)
@@ -184,8 +162,7 @@ def _open_window(parent: tk.Tk | tk.Toplevel):
         e_arq = ttk.Entry(dlg, width=64); e_arq.grid(row=1, column=1, padx=10, pady=8)
         ttk.Label(dlg, text="Sacado (nome):").grid(row=2, column=0, sticky="w", padx=10, pady=8)
         e_sc = ttk.Entry(dlg, width=64); e_sc.grid(row=2, column=1, padx=10, pady=8)
-        # Pre-fill usando os valores mostrados na listagem para o iid
-        vals = tree.item(iid, "values")
+        # Pre-fill usando os valores mostrados na listagem
         try:
             e_nn.insert(0, vals[4])
         except: pass
@@ -208,15 +185,8 @@ def _open_window(parent: tk.Tk | tk.Toplevel):
         ttk.Button(dlg, text="Salvar", command=_ok).grid(row=3, column=1, sticky="e", padx=10, pady=10)
         ttk.Button(dlg, text="Cancelar", command=dlg.destroy).grid(row=3, column=0, sticky="w", padx=10, pady=10)
 
-    def on_open_csv():
-        if not os.path.exists(CSV_PATH):
-            messagebox.showwarning("Aviso", f"CSV não encontrado em:\n{CSV_PATH}", parent=win)
-            return
-        try: os.startfile(CSV_PATH)
-        except Exception as e: messagebox.showerror("Erro", str(e), parent=win)
-
     def on_open_dir():
-        d = os.path.dirname(CSV_PATH) or "."
+        d = os.path.dirname(store._DB_PATH) or "."
         try: os.startfile(d)
         except Exception as e: messagebox.showerror("Erro", str(e), parent=win)
 
@@ -226,12 +196,12 @@ def _open_window(parent: tk.Tk | tk.Toplevel):
     btn_import.configure(command=on_import)
     btn_del.configure(command=on_delete)
     btn_edit.configure(command=on_edit)
-    btn_open_csv.configure(command=on_open_csv)
     btn_open_dir.configure(command=on_open_dir)
     win.bind("<F5>", lambda e: refresh())
     win.bind("<Return>", lambda e: refresh())
+    ent_filtro.bind("<KeyRelease>", on_digitar)
 
-    refresh()
+    carregado()     # a ListaVirtual já carregou a primeira página
     return win
 
 # nomes-ponte usados pelo main.py
@@ -6,7 +6,7 @@ Módulo de parâmetros corrigido com mapeamento adequado de chaves.
 import sqlite3
 import json
 from typing import Dict
-from utils import session, store
+from utils import session, store, sequencias
 
 def _ensure_param_table(con):
     """Garante que a tabela de parâmetros existe."""
@@ -163,38 +163,15 @@ def carregar_parametros() -> Dict[str, str]:
     }
 
 def gerar_nosso_numero(parametros: dict) -> str:
-    """Gera próximo nosso número."""
-    try:
-        eid = session.get_empresa_id()
-        if not eid:
-            return "00000000001"
-        
-        con = store._connect()
-        try:
-            # Buscar nosso número atual
-            r = con.execute(
-                "SELECT COALESCE(valor, '0') FROM parametros WHERE empresa_id=? AND secao='sequenciais' AND chave='nosso_numero'",
-                (eid,)
-            ).fetchone()
-            
-            if r:
-                atual = int(r[0])
-                proximo = atual + 1
-                
-                # Atualizar no banco
-                con.execute("""
-                    INSERT OR REPLACE INTO parametros (empresa_id, secao, chave, valor)
-                    VALUES (?, 'sequenciais', 'nosso_numero', ?)
-                """, (eid, str(proximo).zfill(11)))
-                con.commit()
-                
-                return str(proximo).zfill(11)
-            else:
-                return "00000000001"
-        finally:
-            con.close()
-    except:
-        return "00000000001"
+    """Gera próximo nosso número (utils.sequencias)."""
+    return str(sequencias.proximo("nn")).zfill(11)
+
+def reservar_nossos_numeros(parametros: dict, quantidade: int) -> list[str]:
+    """
+    Reserva de uma vez 'quantidade' nossos números consecutivos (uma única
+    transação em vez de uma ida ao banco por título) e devolve a lista.
+    """
+    return [str(n).zfill(11) for n in sequencias.reservar("nn", quantidade)]
 
 def salvar_parametros(parametros: dict):
     """Salva parâmetros no banco de dados."""
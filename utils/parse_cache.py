@@ -0,0 +1,227 @@
+# utils/parse_cache.py — cache persistente de arquivos importados
+"""
+Guarda os títulos extraídos de um arquivo (CNAB/XML) na base SQLite, com chave
+(sha1 dos bytes do arquivo, parser, versão do parser). Reabrir o mesmo arquivo
+— em outra tela, ou depois de reiniciar o app — não passa de novo pelo parser;
+um arquivo corrigido tem outro sha1 e é lido normalmente.
+
+O que fica no cache é sempre a saída "crua" do parser (antes de Nosso Número
+vir do registro ou ser gerado), então o enriquecimento continua sendo feito a
+cada importação. Cada leitura devolve objetos novos (desserializados), que o
+chamador pode alterar à vontade.
+
+Tamanho limitado por LIMITE_BYTES/LIMITE_ENTRADAS, com descarte dos menos
+usados recentemente (LRU). invalidar() e limpar() removem entradas à mão.
+"""
+import os, time, pickle, marshal, hashlib, sqlite3
+from dataclasses import fields
+from datetime import date
+
+from utils import store
+from utils.titulo import Titulo, _ORDEM
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+LIMITE_BYTES = 256 * 1024 * 1024
+LIMITE_ENTRADAS = 20_000
+
+# muda sozinho quando os campos de Titulo mudam (blobs antigos deixam de bater)
+_ESQUEMA = hashlib.sha1(",".join(f.name for f in fields(Titulo)).encode()).hexdigest()[:8]
+
+_tabela_ok: set = set()
+_sha1_memo: dict = {}   # (caminho, mtime_ns, tamanho) -> sha1
+
+def _con() -> sqlite3.Connection:
+    con = store._connect()
+    chave = store._DB_PATH
+    if chave not in _tabela_ok:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS parse_cache (
+                sha1      TEXT NOT NULL,
+                parser    TEXT NOT NULL,
+                versao    TEXT NOT NULL,
+                titulos   BLOB NOT NULL,
+                tamanho   INTEGER NOT NULL,
+                qtd       INTEGER NOT NULL,
+                arquivo   TEXT,
+                criado_em TEXT DEFAULT (datetime('now','localtime')),
+                usado_em  REAL NOT NULL,
+                PRIMARY KEY (sha1, parser, versao)
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_uso ON parse_cache(usado_em)")
+        con.commit()
+        _tabela_ok.add(chave)
+    return con
+
+def sha1_arquivo(caminho: str) -> str:
+    """sha1 dos bytes; memorizado por (caminho, mtime, tamanho) dentro do processo."""
+    st = os.stat(caminho)
+    chave = (os.path.abspath(caminho), st.st_mtime_ns, st.st_size)
+    h = _sha1_memo.get(chave)
+    if h is None:
+        h = store._sha1_file(caminho)
+        if len(_sha1_memo) > 4096:
+            _sha1_memo.clear()
+        _sha1_memo[chave] = h
+    return h
+
+# ---------------- serialização ----------------
+# Listas de Titulo viram tuplas simples (datas como ordinal) em marshal, bem
+# mais rápido de carregar que objetos em pickle; o resto cai no pickle.
+
+_I_DATAS = tuple(_ORDEM.index(k) for k in ("vencimento", "emissao"))
+
+def _serializar(titulos: list) -> bytes:
+    if all(type(t) is Titulo for t in titulos):
+        linhas = []
+        for t in titulos:
+            v = [getattr(t, k) for k in _ORDEM]
+            for i in _I_DATAS:
+                v[i] = v[i].toordinal() if v[i] else 0
+            v.append(t.extras)
+            linhas.append(tuple(v))
+        try:
+            return b"M" + marshal.dumps(linhas)
+        except ValueError:
+            pass  # extras com tipos que o marshal não conhece
+    return b"P" + pickle.dumps(list(titulos), protocol=pickle.HIGHEST_PROTOCOL)
+
+def _desserializar(blob: bytes) -> list:
+    if blob[:1] == b"P":
+        return pickle.loads(blob[1:])
+    datas = {0: None}   # poucas datas distintas por arquivo: converte cada uma uma vez
+    def _data(o):
+        d = datas.get(o, False)
+        if d is False:
+            d = datas[o] = date.fromordinal(o)
+        return d
+    out = [Titulo(*v) for v in marshal.loads(blob[1:])]
+    for t in out:
+        t.vencimento = _data(t.vencimento)
+        t.emissao = _data(t.emissao)
+    return out
+
+def _versao(versao: str) -> str:
+    return f"{versao}/{_ESQUEMA}"
+
+def obter_varios(caminhos, parser: str, versao: str) -> dict:
+    """{caminho: títulos} dos arquivos que estão no cache (uma conexão para o lote)."""
+    chaves = {}
+    for c in caminhos:
+        chaves.setdefault(sha1_arquivo(c), []).append(c)
+    if not chaves:
+        return {}
+    v = _versao(versao)
+    achados, ruins = {}, []
+    con = _con()
+    try:
+        lista = list(chaves)
+        for i in range(0, len(lista), 500):
+            bloco = lista[i:i + 500]
+            marcas = ",".join("?" * len(bloco))
+            for r in con.execute(f"SELECT sha1, titulos FROM parse_cache "
+                                 f"WHERE parser=? AND versao=? AND sha1 IN ({marcas})", (parser, v, *bloco)):
+                try:
+                    for c in chaves[r["sha1"]]:
+                        achados[c] = _desserializar(r["titulos"])
+                except Exception:
+                    ruins.append((r["sha1"], parser, v))
+        agora = time.time()
+        usados = {sha1_arquivo(c) for c in achados}
+        con.executemany("UPDATE parse_cache SET usado_em=? WHERE sha1=? AND parser=? AND versao=?",
+                        [(agora, h, parser, v) for h in usados])
+        con.executemany("DELETE FROM parse_cache WHERE sha1=? AND parser=? AND versao=?", ruins)
+        con.commit()
+    finally:
+        con.close()
+    return achados
+
+def obter(caminho: str, parser: str, versao: str):
+    """Títulos em cache para o conteúdo atual do arquivo, ou None."""
+    return obter_varios([caminho], parser, versao).get(caminho)
+
+def gravar_varios(itens, parser: str, versao: str) -> None:
+    """Grava [(caminho, títulos)] em uma única transação."""
+    v, agora = _versao(versao), time.time()
+    linhas = []
+    for caminho, titulos in itens:
+        blob = _serializar(titulos)
+        linhas.append((sha1_arquivo(caminho), parser, v, blob, len(blob), len(titulos),
+                       os.path.basename(caminho), agora))
+    if not linhas:
+        return
+    con = _con()
+    try:
+        con.executemany("""
+            INSERT OR REPLACE INTO parse_cache (sha1, parser, versao, titulos, tamanho, qtd, arquivo, usado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, linhas)
+        _podar(con)
+        con.commit()
+    finally:
+        con.close()
+
+def gravar(caminho: str, parser: str, versao: str, titulos: list) -> None:
+    gravar_varios([(caminho, titulos)], parser, versao)
+
+def _podar(con: sqlite3.Connection) -> None:
+    """Descarta as entradas menos usadas até caber em LIMITE_BYTES/LIMITE_ENTRADAS."""
+    r = con.execute("SELECT COUNT(*) AS n, COALESCE(SUM(tamanho), 0) AS b FROM parse_cache").fetchone()
+    n, total = int(r["n"]), int(r["b"])
+    if n <= LIMITE_ENTRADAS and total <= LIMITE_BYTES:
+        return
+    remover = []
+    for row in con.execute("SELECT rowid, tamanho FROM parse_cache ORDER BY usado_em"):
+        if n <= LIMITE_ENTRADAS and total <= LIMITE_BYTES:
+            break
+        remover.append((row["rowid"],))
+        n -= 1
+        total -= int(row["tamanho"])
+    con.executemany("DELETE FROM parse_cache WHERE rowid=?", remover)
+
+def com_cache(caminho: str, parser: str, versao: str, ler):
+    """
+    Devolve os títulos de 'caminho' pelo cache; na falta, chama ler(caminho),
+    grava o resultado e o devolve. Falhas do cache nunca impedem a leitura.
+    """
+    try:
+        titulos = obter(caminho, parser, versao)
+    except Exception as e:
+        log.warning("leitura do cache falhou para %s: %s", caminho, e)
+        titulos = None
+    if titulos is not None:
+        return titulos
+    titulos = ler(caminho)
+    try:
+        gravar(caminho, parser, versao, titulos)
+    except Exception as e:
+        log.warning("não consegui gravar %s no cache: %s", caminho, e)
+    return titulos
+
+def invalidar(caminho: str | None = None, parser: str | None = None) -> int:
+    """Remove as entradas do arquivo (conteúdo atual) e/ou do parser. Retorna quantas saíram."""
+    cond, args = [], []
+    if caminho:
+        cond.append("sha1=?"); args.append(sha1_arquivo(caminho))
+    if parser:
+        cond.append("parser=?"); args.append(parser)
+    if not cond:
+        return limpar()
+    con = _con()
+    try:
+        n = con.execute("DELETE FROM parse_cache WHERE " + " AND ".join(cond), args).rowcount
+        con.commit()
+        return n
+    finally:
+        con.close()
+
+def limpar() -> int:
+    con = _con()
+    try:
+        n = con.execute("DELETE FROM parse_cache").rowcount
+        con.commit()
+        return n
+    finally:
+        con.close()
@@ -0,0 +1,281 @@
+# utils/perf.py — medição de tempo por etapa nos caminhos quentes
+"""
+Spans (trechos cronometrados) e contadores em volta das etapas caras —
+extração, montar_detalhe_bmp, gerar_boleto_titulos, store.*, sha1, envio SMTP —
+agregados por lote:
+
+    with perf.lote("boletos"):          # no fim: resumo no log + tabela perf_log
+        ...
+        with perf.span("pdf.render"):
+            ...
+        perf.contar("boletos.cache_hit")
+
+    @perf.medir("store.record_boleto")  # decorador = span com o nome dado
+    def record_boleto(...): ...
+
+Desligado (padrão) o custo é um teste de flag por chamada: span() devolve um
+objeto nulo compartilhado e medir() chama a função direto. Liga com a
+variável de ambiente NASAPAY_PERF=1 ou no config.json:
+
+    "perf": {"ativo": true, "trace": "C:/nasapay/logs/traces"}
+
+Cada lote coleta só o que roda no contexto dele: dois lotes ao mesmo tempo
+(em threads diferentes) não se misturam. Threads criadas dentro do lote não
+herdam o contexto — passe o alvo por perf.levar(fn):
+
+    threading.Thread(target=perf.levar(trabalhador)).start()
+    pool.submit(perf.levar(gravar_parte), ...)
+
+Com "trace", cada lote também grava um JSON no formato do Chrome
+(chrome://tracing, ui.perfetto.dev) com um evento por span e por thread.
+Spans medidos dentro de ProcessPoolExecutor ficam no processo filho e não
+entram no resumo do lote.
+"""
+import os, json, time, threading
+from contextvars import ContextVar
+from functools import wraps
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+MAX_EVENTOS_TRACE = 500_000
+
+class _Estado:
+    ativo = False
+    trace_dir = ""
+
+class _Coleta:
+    """O que um lote juntou até agora (compartilhado com as threads que ele levou)."""
+    __slots__ = ("lock", "duracoes", "contadores", "eventos")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duracoes: dict[str, list[float]] = {}     # etapa -> durações (s)
+        self.contadores: dict[str, int] = {}
+        self.eventos: list[tuple] = []                  # (nome, inicio_s, duracao_s, thread_id) para o trace
+
+_estado = _Estado()
+_coleta: ContextVar[_Coleta | None] = ContextVar("perf_lote", default=None)
+_T0 = time.perf_counter()
+
+def _ler_config() -> dict:
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for caminho in (os.path.join(base, "config.json"), "config.json"):
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                cfg = json.load(f).get("perf") or {}
+            return cfg if isinstance(cfg, dict) else {}
+        except (OSError, ValueError, AttributeError):
+            continue
+    return {}
+
+def configurar(ativo: bool | None = None, trace_dir: str | None = None) -> None:
+    cfg = _ler_config()
+    if ativo is None:
+        ativo = os.environ.get("NASAPAY_PERF", "") not in ("", "0") or bool(cfg.get("ativo"))
+    _estado.ativo = bool(ativo)
+    _estado.trace_dir = trace_dir if trace_dir is not None else (cfg.get("trace") or "")
+
+def ativo() -> bool:
+    return _estado.ativo
+
+# ---------------- coleta ----------------
+def _registrar(nome: str, inicio: float, dur: float) -> None:
+    c = _coleta.get()
+    if c is None:                               # fora de lote: não há onde resumir
+        return
+    with c.lock:
+        c.duracoes.setdefault(nome, []).append(dur)
+        if _estado.trace_dir and len(c.eventos) < MAX_EVENTOS_TRACE:
+            c.eventos.append((nome, inicio, dur, threading.get_ident()))
+
+class _Span:
+    __slots__ = ("nome", "t0")
+
+    def __init__(self, nome: str):
+        self.nome = nome
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _registrar(self.nome, self.t0, time.perf_counter() - self.t0)
+        return False
+
+class _Nulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULO = _Nulo()
+
+def span(nome: str):
+    """Context manager que cronometra o bloco (nulo quando desligado)."""
+    return _Span(nome) if _estado.ativo else _NULO
+
+def medir(nome: str):
+    """Decorador: cronometra cada chamada da função sob 'nome'."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _estado.ativo:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _registrar(nome, t0, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+def contar(nome: str, n: int = 1) -> None:
+    if _estado.ativo:
+        c = _coleta.get()
+        if c is None:
+            return
+        with c.lock:
+            c.contadores[nome] = c.contadores.get(nome, 0) + n
+
+def levar(fn):
+    """fn amarrada ao lote aberto agora, para rodar em outra thread (fn mesma se não houver lote)."""
+    c = _coleta.get()
+    if c is None:
+        return fn
+    @wraps(fn)
+    def no_lote(*args, **kwargs):
+        token = _coleta.set(c)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _coleta.reset(token)
+    return no_lote
+
+# ---------------- resumo por lote ----------------
+def _percentil(ordenado: list[float], p: float) -> float:
+    if not ordenado:
+        return 0.0
+    i = min(len(ordenado) - 1, max(0, round(p / 100.0 * (len(ordenado) - 1))))
+    return ordenado[i]
+
+class Resumo:
+    def __init__(self, lote: str, segundos: float, etapas: list[dict], contadores: dict, trace: str = ""):
+        self.lote = lote
+        self.segundos = segundos
+        self.etapas = etapas            # [{etapa, qtd, total_ms, p50_ms, p95_ms, max_ms}] por total desc.
+        self.contadores = contadores
+        self.trace = trace
+
+    def texto(self) -> str:
+        linhas = [f"lote '{self.lote}' em {self.segundos:.2f}s",
+                  f"{'etapa':28s} {'qtd':>7s} {'total ms':>10s} {'p50':>8s} {'p95':>8s} {'max':>8s}"]
+        for e in self.etapas:
+            linhas.append(f"{e['etapa']:28s} {e['qtd']:7d} {e['total_ms']:10.1f} "
+                          f"{e['p50_ms']:8.2f} {e['p95_ms']:8.2f} {e['max_ms']:8.2f}")
+        for k, v in sorted(self.contadores.items()):
+            linhas.append(f"{k:28s} {v:7d}")
+        if self.trace:
+            linhas.append(f"trace: {self.trace}")
+        return "\n".join(linhas)
+
+def _resumir(nome: str, segundos: float, duracoes: dict, contadores: dict) -> Resumo:
+    etapas = []
+    for etapa, ds in duracoes.items():
+        ds = sorted(ds)
+        etapas.append({
+            "etapa": etapa, "qtd": len(ds), "total_ms": 1000 * sum(ds),
+            "p50_ms": 1000 * _percentil(ds, 50), "p95_ms": 1000 * _percentil(ds, 95), "max_ms": 1000 * ds[-1],
+        })
+    etapas.sort(key=lambda e: e["total_ms"], reverse=True)
+    return Resumo(nome, segundos, etapas, dict(contadores))
+
+def _salvar(res: Resumo) -> None:
+    from utils import store
+    con = store._connect()
+    try:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS perf_log (
+                id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                lote      TEXT NOT NULL,
+                inicio    TEXT NOT NULL,
+                segundos  REAL,
+                etapa     TEXT NOT NULL,
+                qtd       INTEGER,
+                total_ms  REAL,
+                p50_ms    REAL,
+                p95_ms    REAL,
+                max_ms    REAL
+            )
+        """)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_perf_log_lote ON perf_log(lote, inicio)")
+        inicio = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - res.segundos))
+        linhas = [(res.lote, inicio, res.segundos, e["etapa"], e["qtd"], e["total_ms"], e["p50_ms"],
+                   e["p95_ms"], e["max_ms"]) for e in res.etapas]
+        # contadores: mesma tabela, sem tempos
+        linhas += [(res.lote, inicio, res.segundos, k, v, None, None, None, None) for k, v in res.contadores.items()]
+        con.executemany("INSERT INTO perf_log (lote, inicio, segundos, etapa, qtd, total_ms, p50_ms, p95_ms, max_ms) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas)
+        con.commit()
+    finally:
+        con.close()
+
+def exportar_trace(caminho: str, eventos: list[tuple], lote: str = "") -> str:
+    """Grava eventos (nome, inicio_s, dur_s, thread) no JSON do Chrome trace."""
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    pid = os.getpid()
+    trace = [{"name": n, "cat": lote or "nasapay", "ph": "X", "pid": pid, "tid": tid,
+              "ts": round((ini - _T0) * 1e6, 1), "dur": round(dur * 1e6, 1)}
+             for n, ini, dur, tid in eventos]
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+    return caminho
+
+class lote:
+    """
+    Context manager de um lote: zera a coleta na entrada e, na saída, grava o
+    resumo (log INFO + perf_log) e o trace, se configurado. A coleta é do
+    contexto de quem abriu o lote: lotes aninhados entram no resumo do mais
+    externo, lotes em threads diferentes ficam separados. 'resumo' fica
+    disponível depois do with.
+    """
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.resumo: Resumo | None = None
+        self._token = None
+
+    def __enter__(self):
+        if not _estado.ativo or _coleta.get() is not None:    # desligado ou aninhado
+            return self
+        self._c = _Coleta()
+        self._token = _coleta.set(self._c)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._token is None:
+            return False
+        _coleta.reset(self._token)
+        self._token = None
+        with self._c.lock:
+            duracoes = {k: list(v) for k, v in self._c.duracoes.items()}
+            contadores, eventos = dict(self._c.contadores), list(self._c.eventos)
+        self.resumo = _resumir(self.nome, time.perf_counter() - self._t0, duracoes, contadores)
+        if _estado.trace_dir and eventos:
+            nome_arq = f"{self.nome}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+            try:
+                self.resumo.trace = exportar_trace(os.path.join(_estado.trace_dir, nome_arq), eventos, self.nome)
+            except OSError as e:
+                log.warning("não consegui gravar o trace: %s", e)
+        log.info("%s", self.resumo.texto())
+        try:
+            _salvar(self.resumo)
+        except Exception as e:
+            log.warning("não consegui gravar perf_log: %s", e)
+        return False
+
+configurar()
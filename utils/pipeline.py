@@ -0,0 +1,286 @@
+# utils/pipeline.py — execução em etapas encadeadas por filas limitadas
+"""
+Um Pipeline liga etapas (Etapa) por filas de capacidade limitada: cada etapa
+tem seus próprios workers (threads) e começa a trabalhar assim que o
+primeiro item sai da etapa anterior. Assim a renderização (CPU) de um item
+acontece enquanto o anterior está sendo gravado, zipado ou commitado (E/S).
+
+- Back-pressure: fila cheia bloqueia quem produz; uma etapa lenta segura as
+  anteriores em vez de acumular tudo na memória.
+- Etapa(lote=N) recebe listas de até N itens (commits/cálculos em lote).
+- Etapa(expande=True) devolve um iterável e cada elemento segue adiante
+  (ex.: arquivo -> títulos). Devolver None descarta o item.
+- Etapa(ao_final=fn) chama fn() uma vez depois do último item da etapa; o que
+  ela devolver (iterável) também segue adiante (ex.: fechar o arquivo de remessa).
+- processos=True roda a função num ProcessPoolExecutor (itens picklable).
+
+Um erro em qualquer etapa cancela o pipeline e é relançado por executar().
+Cada etapa mede itens, tempo ocupado e tempo esperando (fila vazia/cheia).
+"""
+import time, queue, threading
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from utils import perf
+
+_FIM = object()
+
+class Cancelado(Exception):
+    """O pipeline foi cancelado (pelo chamador ou por erro em outra etapa)."""
+
+@dataclass
+class Etapa:
+    nome: str
+    funcao: Callable
+    workers: int = 1
+    fila: int = 64                  # capacidade da fila de entrada desta etapa
+    lote: int = 1
+    expande: bool = False
+    ao_final: Callable | None = None
+    processos: bool = False
+
+@dataclass
+class MetricasEtapa:
+    nome: str
+    workers: int
+    entrada: int = 0
+    saida: int = 0
+    ocupado: float = 0.0            # soma do tempo dentro da função (todos os workers)
+    espera_entrada: float = 0.0     # parado com a fila de entrada vazia
+    espera_saida: float = 0.0       # parado com a fila seguinte cheia (back-pressure)
+    inicio: float = 0.0
+    fim: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def duracao(self) -> float:
+        return max((self.fim or time.perf_counter()) - self.inicio, 1e-9) if self.inicio else 0.0
+
+    @property
+    def vazao(self) -> float:
+        """Itens de entrada por segundo de parede."""
+        return self.entrada / self.duracao if self.inicio else 0.0
+
+    def como_dict(self) -> dict:
+        return {
+            "etapa": self.nome, "workers": self.workers,
+            "entrada": self.entrada, "saida": self.saida,
+            "duracao_s": round(self.duracao, 4), "vazao_itens_s": round(self.vazao, 1),
+            "ocupado_s": round(self.ocupado, 4),
+            "espera_entrada_s": round(self.espera_entrada, 4),
+            "espera_saida_s": round(self.espera_saida, 4),
+        }
+
+class Pipeline:
+    def __init__(self, etapas: list[Etapa], ao_progresso: Callable | None = None,
+                 cancelar: threading.Event | None = None, ao_fim_etapa: Callable | None = None):
+        """
+        ao_progresso(nome_etapa, metricas) é chamado (da thread do worker) a
+        cada item processado; na GUI, repasse para a thread do Tk com after().
+        cancelar: Event externo; quando setado, o pipeline para assim que possível.
+        ao_fim_etapa(nome_etapa) é chamado quando o último worker da etapa
+        termina (ex.: snapshot de memória em utils.memoria).
+        """
+        if not etapas:
+            raise ValueError("Pipeline sem etapas.")
+        self.etapas = etapas
+        self.metricas = [MetricasEtapa(e.nome, max(1, e.workers)) for e in etapas]
+        self._filas = [queue.Queue(maxsize=max(1, e.fila)) for e in etapas]
+        self._saida: queue.Queue = queue.Queue()
+        self._cancelar = cancelar or threading.Event()
+        self._erro: BaseException | None = None
+        self._ao_progresso = ao_progresso
+        self._ao_fim_etapa = ao_fim_etapa
+        self._restantes = [max(1, e.workers) for e in etapas]
+        self._lock = threading.Lock()
+
+    # ---------------- filas com cancelamento ----------------
+    def _put(self, q: queue.Queue, item, m: MetricasEtapa | None = None):
+        t0 = time.perf_counter()
+        while True:
+            if self._cancelar.is_set():
+                raise Cancelado()
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if m is not None:
+            with m._lock:
+                m.espera_saida += time.perf_counter() - t0
+
+    def _get(self, q: queue.Queue, m: MetricasEtapa):
+        t0 = time.perf_counter()
+        while True:
+            if self._cancelar.is_set():
+                raise Cancelado()
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        with m._lock:
+            m.espera_entrada += time.perf_counter() - t0
+        return item
+
+    def _emitir(self, i: int, resultado, m: MetricasEtapa):
+        destino = self._filas[i + 1] if i + 1 < len(self.etapas) else self._saida
+        itens = resultado if self.etapas[i].expande else (resultado,)
+        for r in itens:
+            if r is None:
+                continue
+            self._put(destino, r, m)
+            with m._lock:
+                m.saida += 1
+
+    # ---------------- workers ----------------
+    def _worker(self, i: int, pool):
+        etapa, m, q = self.etapas[i], self.metricas[i], self._filas[i]
+        try:
+            fim = False
+            while not fim:
+                item = self._get(q, m)
+                if item is _FIM:
+                    break
+                bloco = [item]
+                while len(bloco) < etapa.lote:   # junta até 'lote' itens sem esperar mais que o necessário
+                    try:
+                        prox = q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if prox is _FIM:
+                        fim = True
+                        break
+                    bloco.append(prox)
+                arg = bloco if etapa.lote > 1 else bloco[0]
+                t0 = time.perf_counter()
+                if pool is not None:
+                    resultado = pool.submit(etapa.funcao, arg).result()
+                else:
+                    resultado = etapa.funcao(arg)
+                with m._lock:
+                    m.ocupado += time.perf_counter() - t0
+                    m.entrada += len(bloco)
+                self._emitir(i, resultado, m)
+                if self._ao_progresso:
+                    self._ao_progresso(etapa.nome, m)
+        except Cancelado:
+            return
+        except BaseException as e:
+            self._falhar(e)
+            return
+        self._worker_terminou(i)
+
+    def _worker_terminou(self, i: int):
+        with self._lock:
+            self._restantes[i] -= 1
+            ultimo = self._restantes[i] == 0
+        if not ultimo:
+            return
+        etapa, m = self.etapas[i], self.metricas[i]
+        try:
+            if etapa.ao_final is not None:
+                t0 = time.perf_counter()
+                extra = etapa.ao_final()
+                with m._lock:
+                    m.ocupado += time.perf_counter() - t0
+                if extra is not None:
+                    destino = self._filas[i + 1] if i + 1 < len(self.etapas) else self._saida
+                    for r in extra:
+                        self._put(destino, r, m)
+                        with m._lock:
+                            m.saida += 1
+            m.fim = time.perf_counter()
+            if self._ao_fim_etapa is not None:
+                self._ao_fim_etapa(etapa.nome)
+            if i + 1 < len(self.etapas):
+                for _ in range(self._restantes[i + 1]):
+                    self._put(self._filas[i + 1], _FIM)
+            else:
+                self._put(self._saida, _FIM)
+        except Cancelado:
+            return
+        except BaseException as e:
+            self._falhar(e)
+
+    def _falhar(self, e: BaseException):
+        with self._lock:
+            if self._erro is None:
+                self._erro = e
+        self._cancelar.set()
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    # ---------------- execução ----------------
+    def executar(self, entradas: Iterable) -> list:
+        """Processa 'entradas' e devolve a lista do que saiu da última etapa."""
+        pools, threads = [], []
+        agora = time.perf_counter()
+        for m in self.metricas:
+            m.inicio = agora
+        for i, etapa in enumerate(self.etapas):
+            pool = None
+            if etapa.processos:
+                from concurrent.futures import ProcessPoolExecutor
+                pool = ProcessPoolExecutor(max_workers=max(1, etapa.workers))
+                pools.append(pool)
+            for k in range(max(1, etapa.workers)):
+                th = threading.Thread(target=perf.levar(self._worker), args=(i, pool),
+                                      name=f"pipeline-{etapa.nome}-{k}", daemon=True)
+                th.start()
+                threads.append(th)
+
+        def alimentar():
+            try:
+                for item in entradas:
+                    self._put(self._filas[0], item)
+                for _ in range(self._restantes[0]):
+                    self._put(self._filas[0], _FIM)
+            except Cancelado:
+                pass
+            except BaseException as e:
+                self._falhar(e)
+        fonte = threading.Thread(target=perf.levar(alimentar), name="pipeline-fonte", daemon=True)
+        fonte.start()
+
+        saida = []
+        try:
+            while True:
+                if self._cancelar.is_set():
+                    break
+                try:
+                    r = self._saida.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if r is _FIM:
+                    break
+                saida.append(r)
+        finally:
+            if self._cancelar.is_set():
+                for q in self._filas:       # destrava quem estiver esperando em fila cheia
+                    try:
+                        while True:
+                            q.get_nowait()
+                    except queue.Empty:
+                        pass
+            for th in threads:
+                th.join()
+            fonte.join()
+            for pool in pools:
+                pool.shutdown(cancel_futures=True)
+
+        if self._erro is not None:
+            raise self._erro
+        if self._cancelar.is_set():
+            raise Cancelado("Processamento cancelado.")
+        return saida
+
+    def relatorio(self) -> str:
+        """Tabela de texto com as métricas por etapa."""
+        linhas = [f"{'etapa':14s} {'wk':>3s} {'entrada':>8s} {'saída':>8s} {'itens/s':>9s} "
+                  f"{'ocupado':>8s} {'esp.ent':>8s} {'esp.saí':>8s}"]
+        for m in self.metricas:
+            linhas.append(f"{m.nome:14s} {m.workers:3d} {m.entrada:8d} {m.saida:8d} {m.vazao:9.1f} "
+                          f"{m.ocupado:7.2f}s {m.espera_entrada:7.2f}s {m.espera_saida:7.2f}s")
+        return "\n".join(linhas)
@@ -1,9 +1,12 @@
 # utils/popup_confirmacao.py
-import os, re
+import os
 import tkinter as tk
 from tkinter import ttk
 from PIL import ImageTk, Image
 
+from utils.titulo import fmt_brl, valor_centavos_de, centavos
+from utils.ui_virtual_list import ListaVirtual, FonteLista
+
 # ---------- função utilitária para ícones ----------
 def _aplicar_icone_nasapay(top: tk.Toplevel):
     """Aplica o ícone Nasapay à janela de forma padronizada."""
@@ -32,31 +35,6 @@ def _aplicar_icone_nasapay(top: tk.Toplevel):
     
     return False
 
-# ---------- helpers de valor ----------
-def _parse_brl(v) -> float:
-    s = str(v or "").strip().replace(" ", "")
-    if s == "":
-        return 0.0
-    if "," in s and "." in s:
-        s = s.replace(".", "").replace(",", ".")
-    elif "," in s:
-        s = s.replace(",", ".")
-    try:
-        return float(s)
-    except Exception:
-        digits = re.sub(r"\D", "", s)
-        if not digits:
-            return 0.0
-        return float(int(digits)) / 100.0
-
-def _fmt_brl(x: float) -> str:
-    try:
-        f = float(x)
-    except Exception:
-        f = 0.0
-    txt = f"{f:,.2f}"
-    return txt.replace(",", "X").replace(".", ",").replace("X", ".")
-
 # ---------- centralização ----------
 def _center_on_parent(top: tk.Toplevel, parent):
     try:
@@ -86,15 +64,18 @@ def _center_on_parent(top: tk.Toplevel, parent):
             pass
 
 # ---------- popup ----------
-def popup_confirmacao_titulos(titulos: list[dict], parent=None) -> bool:
+_SITUACOES = {"novo": "novo", "alterado": "alterado", "duplicado": "já registrado"}
+
+def popup_confirmacao_titulos(titulos: list[dict], parent=None, delta: dict | None = None) -> bool:
     """
     Mostra uma listagem dos títulos gerados com TOTAL em R$ e QTD de títulos.
-    Colunas na ordem: #, Sacado, Documento, Vencimento, Valor (R$).
+    Colunas na ordem: #, Sacado, Documento, Vencimento, Valor (R$) e, com o
+    resumo do modo delta (gerar_remessa.aplicar_delta), a Situação de cada um
+    e as contagens de novos, alterados e já registrados no rodapé.
     Retorna True se o usuário clicou em OK, False caso contrário.
     """
-    total = 0.0
-    for t in titulos or []:
-        total += _parse_brl(t.get("valor", "0"))
+    centavos_lista = [valor_centavos_de(t) for t in titulos or []]
+    total = sum(centavos_lista)
 
     top = tk.Toplevel(parent)
     top.title("Confirmação dos Títulos Gerados")
@@ -111,44 +92,38 @@ def popup_confirmacao_titulos(titulos: list[dict], parent=None) -> bool:
     frame = ttk.Frame(top)
     frame.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
 
-    cols = ("idx", "sacado", "documento", "vencimento", "valor")
-    tree = ttk.Treeview(frame, columns=cols, show="headings", height=12)
-    vbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
-    hbar = ttk.Scrollbar(frame, orient="horizontal", command=tree.xview)
-    tree.configure(yscroll=vbar.set, xscroll=hbar.set)
-
-    tree.grid(row=0, column=0, sticky="nsew")
-    vbar.grid(row=0, column=1, sticky="ns")
-    hbar.grid(row=1, column=0, sticky="ew")
+    # lista virtual: com dezenas de milhares de títulos só as linhas visíveis viram itens do Treeview
+    cols = ("idx", "sacado", "documento", "vencimento", "valor") + (("situacao",) if delta else ())
+    linhas = [(f"{i:03d}", str(t.get("sacado", "") or ""), str(t.get("documento", "") or ""),
+               str(t.get("vencimento", "") or ""), fmt_brl(cent))
+              + ((_SITUACOES.get(t.get("delta"), ""),) if delta else ())
+              for i, (t, cent) in enumerate(zip(titulos or [], centavos_lista), start=1)]
+    fonte = FonteLista(linhas, cols, chaves={
+        "idx": int,
+        "vencimento": lambda v: (v[6:10], v[3:5], v[0:2]),     # DD/MM/AAAA
+        "valor": centavos,
+    })
+    colunas = [
+        ("idx",        "#",          50,  "e",      False),
+        ("sacado",     "Sacado",     340, "w",      True),
+        ("documento",  "Documento",  150, "w",      True),
+        ("vencimento", "Vencimento", 110, "center", False),
+        ("valor",      "Valor (R$)", 120, "e",      False),
+    ]
+    if delta:
+        colunas.append(("situacao", "Situação", 110, "center", False))
+    lista = ListaVirtual(frame, colunas, fonte, selectmode="browse")
+    lista.grid(row=0, column=0, sticky="nsew")
 
     frame.columnconfigure(0, weight=1)
     frame.rowconfigure(0, weight=1)
 
-    tree.heading("idx",         text="#")
-    tree.heading("sacado",      text="Sacado")
-    tree.heading("documento",   text="Documento")
-    tree.heading("vencimento",  text="Vencimento")
-    tree.heading("valor",       text="Valor (R$)")
-
-    tree.column("idx",        width=50,  anchor="e",      stretch=False)
-    tree.column("sacado",     width=340, anchor="w",      stretch=True)
-    tree.column("documento",  width=150, anchor="w",      stretch=True)
-    tree.column("vencimento", width=110, anchor="center", stretch=False)
-    tree.column("valor",      width=120, anchor="e",      stretch=False)
-
-    for i, t in enumerate(titulos or [], start=1):
-        sac  = str(t.get("sacado", "") or "")
-        doc  = str(t.get("documento", "") or "")
-        venc = str(t.get("vencimento", "") or "")
-        val  = _fmt_brl(_parse_brl(t.get("valor", "0")))
-        tree.insert("", "end", values=(f"{i:03d}", sac, doc, venc, val))
-
     footer = ttk.Frame(top)
     footer.grid(row=1, column=0, sticky="ew", padx=10, pady=(6, 10))
     footer.columnconfigure(0, weight=1)
     footer.columnconfigure(1, weight=0)
 
-    total_txt = f"TOTAL — R$: {_fmt_brl(total)}"
+    total_txt = f"TOTAL — R$: {fmt_brl(total)}"
     qtd_txt   = f"QTD Total: {len(titulos):03d}"
 
     lbl_total = ttk.Label(footer, text=total_txt, font=("Segoe UI", 10, "bold"))
@@ -157,6 +132,13 @@ def popup_confirmacao_titulos(titulos: list[dict], parent=None) -> bool:
     lbl_total.grid(row=0, column=0, sticky="w")
     lbl_qtd.grid(row=0, column=1, sticky="e", padx=(10, 0))
 
+    if delta:
+        repetidos = f"Já registrados: {delta['duplicado']}"
+        if delta["duplicado"]:
+            repetidos += " (fora da remessa)" if delta["modo"] == "excluir" else " (reenviados com o mesmo NN)"
+        ttk.Label(footer, text=f"Novos: {delta['novo']}   •   Alterados: {delta['alterado']}   •   {repetidos}",
+                  font=("Segoe UI", 9)).grid(row=1, column=0, columnspan=2, sticky="w", pady=(4, 0))
+
     actions = ttk.Frame(top)
     actions.grid(row=2, column=0, sticky="e", padx=10, pady=(0, 10))
 
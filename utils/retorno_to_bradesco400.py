@@ -1,7 +1,28 @@
 # src/retorno_to_bradesco400.py
-import os, json, datetime, tkinter as tk
+"""
+Converte retornos do BMP (.RET) em retornos CNAB 400 no layout Bradesco.
+
+Vários arquivos de uma vez, em paralelo (um arquivo por worker). Cada arquivo
+é lido duas vezes via mmap, sem montar a lista de registros: a primeira
+passada junta as chaves (documento, vencimento, valor) e faz UMA consulta no
+registro de NN (join com tabela temporária); a segunda grava os detalhes já
+com o nosso número + DV (posições 71-82).
+
+    res = converter_retornos(["A.RET", "B.RET"], workers=4)
+    # [(entrada, saída, registros, com_nosso_numero), ...]
+"""
+import os, datetime, tkinter as tk
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from tkinter import filedialog, messagebox
 
+from utils import sequencias, session
+from utils.cnab_mmap import ArquivoCnab, txt
+from utils.nn_registry import nossos_numeros_por_chave, _doc_norm
+from utils.boletos_bmp import dv_nosso_numero_base7
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
 # ---------- helpers de configuração/beneficiário ----------
 
 def _load_cfg():
@@ -11,27 +32,26 @@ def _load_cfg():
         from parametros import carregar_parametros, salvar_parametros  # type: ignore
     return carregar_parametros(), salvar_parametros
 
-def _last_meta(rem_dir: str):
-    """Retorna dict lido do .meta.json mais recente em rem_dir (ou None)."""
+def _last_meta():
+    """Metadados da última remessa registrada da empresa ativa (tabela 'remessa') ou None."""
     try:
-        metas = [os.path.join(rem_dir, f) for f in os.listdir(rem_dir) if f.lower().endswith(".meta.json")]
-        if not metas: return None
-        metas.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-        with open(metas[0], "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
+        from src.remessa_meta import ultima_remessa_meta
+        return ultima_remessa_meta(session.get_empresa_id())
+    except Exception as e:
+        log.warning("não consegui ler a última remessa: %s", e)
         return None
 
 def _benef_from_meta_or_cfg(cfg: dict):
     """
     Monta o dicionário com os dados do beneficiário:
-    prioridade: .meta.json da última remessa -> cfg (config.json).
+    prioridade: última remessa registrada -> cfg (config.json); conta e
+    dígito sempre do cfg.
     """
-    meta = _last_meta(cfg.get("pasta_saida") or r"C:/nasapay/remessas") or {}
+    meta = _last_meta() or {}
 
     def pick(*keys, default=""):
         for k in keys:
-            v = (meta.get(k) or cfg.get(k) or "").strip()
+            v = str(meta.get(k) or cfg.get(k) or "").strip()
             if v: return v
         return default
 
@@ -41,10 +61,10 @@ def _benef_from_meta_or_cfg(cfg: dict):
         "nome_empresa": pick("nome_empresa", "razao_social"),
         "codigo_empresa": pick("codigo_empresa", "codigo_beneficiario", "codigo_cedente"),
         "agencia": pick("agencia"),
-        "conta": pick("conta"),
-        "dv_conta": pick("dv_conta", "digito"),
+        # conta e dígito só dos parâmetros: o header da remessa não traz a conta
+        "conta": str(cfg.get("conta") or "").strip(),
+        "dv_conta": str(cfg.get("dv_conta") or cfg.get("digito") or "").strip(),
         "carteira": pick("carteira"),
-        "sequencial_arquivo": pick("sequencial_arquivo", "seq_retorno_bradesco", default="1"),
         "data_gravacao": pick("data_gravacao"),
     }
 
@@ -59,25 +79,8 @@ def _benef_from_meta_or_cfg(cfg: dict):
         today = datetime.date.today()
         benef["data_gravacao"] = today.strftime("%d%m%y")
 
-    try:
-        benef["sequencial_arquivo"] = int(str(benef["sequencial_arquivo"]).strip() or "1")
-    except Exception:
-        benef["sequencial_arquivo"] = 1
-
     return benef
 
-def _bump_seq_retorno(cfg: dict, salvar_parametros):
-    """Incrementa seq_retorno_bradesco no config.json."""
-    try:
-        cur = int(str(cfg.get("seq_retorno_bradesco") or "0"))
-    except Exception:
-        cur = 0
-    cfg["seq_retorno_bradesco"] = cur + 1
-    try:
-        salvar_parametros(cfg)
-    except Exception:
-        pass
-
 # ---------- parser simples do retorno BMP (.RET) ----------
 
 _DOC_SLICE   = (108, 119)
@@ -86,11 +89,11 @@ _VALOR_SLICE = (154, 167)
 _STATUS_SLICE= (318, 329)
 _SACADO_SLICE= (46, 86)
 
-def _slice_try(line: str, a: int, b: int) -> str:
-    s = line[a:b]
-    if not s.strip() and b+1 <= len(line):
-        s = line[a+1:b+1]
-    return s
+def _slice_try(reg, a: int, b: int) -> str:
+    s = reg[a:b]
+    if not bytes(s).strip() and b+1 <= len(reg):
+        s = reg[a+1:b+1]
+    return txt(s)
 
 def _fmt_valor(num_str: str) -> str:
     d = "".join(ch for ch in (num_str or "") if ch.isdigit())
@@ -98,25 +101,40 @@ def _fmt_valor(num_str: str) -> str:
     v = int(d) / 100.0
     return f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
-def _parse_bmp_retorno(path: str):
-    itens = []
-    with open(path, "r", encoding="latin-1", errors="ignore") as f:
-        for line in f:
-            if len(line) < 330:
+def _iter_bmp_retorno(path: str):
+    with ArquivoCnab(path) as arq:
+        for reg in arq:
+            if len(reg) < 329:
                 continue
-            tipo = line[0]
-            if tipo not in ("1", "2", "7"):
+            if reg[0] not in b"127":
                 continue
-            doc   = _slice_try(line, *_DOC_SLICE).strip()
-            vcto  = _slice_try(line, *_VCTO_SLICE).strip()
-            valor = _slice_try(line, *_VALOR_SLICE).strip()
-            stat  = _slice_try(line, *_STATUS_SLICE).strip()
-            sac   = _slice_try(line, *_SACADO_SLICE).strip()
+            doc   = _slice_try(reg, *_DOC_SLICE).strip()
+            vcto  = _slice_try(reg, *_VCTO_SLICE).strip()
+            valor = _slice_try(reg, *_VALOR_SLICE).strip()
+            stat  = _slice_try(reg, *_STATUS_SLICE).strip()
+            sac   = _slice_try(reg, *_SACADO_SLICE).strip()
             if len(vcto) == 8 and vcto.isdigit():
                 vcto = f"{vcto[0:2]}/{vcto[2:4]}/{vcto[4:8]}"
             valor = _fmt_valor(valor)
-            itens.append({"sacado": sac, "doc": doc, "venc": vcto, "valor": valor, "status": stat})
-    return itens
+            yield {"sacado": sac, "doc": doc, "venc": vcto, "valor": valor, "status": stat}
+
+def _tem_detalhe(path: str) -> bool:
+    it = _iter_bmp_retorno(path)
+    try:
+        return next(it, None) is not None
+    finally:
+        it.close()
+
+def _parse_bmp_retorno(path: str):
+    return list(_iter_bmp_retorno(path))
+
+def _chave(item) -> tuple | None:
+    """Chave do registro de NN (documento, vencimento, centavos) ou None se faltar campo."""
+    doc = _doc_norm(item.get("doc"))
+    venc = item.get("venc") or ""
+    if not doc or len(venc) != 10:
+        return None
+    return (doc, venc, int("".join(ch for ch in item.get("valor") or "" if ch.isdigit()) or "0"))
 
 # ---------- gerador de arquivo Retorno Bradesco 400 ----------
 
@@ -130,7 +148,7 @@ def _header_retorno_bradesco(benef):
     line[76:79] = list("237")
     line[79:94] = list("BRADESCO       ")
     line[94:100]= list(benef["data_gravacao"])
-    seq = str(benef["sequencial_arquivo"]).zfill(7)
+    seq = str(benef["sequencial_arquivo"]).zfill(6)[-6:]
     line[394:400]= list(seq)
     return "".join(line)
 
@@ -140,36 +158,102 @@ def _trailer_retorno_bradesco(total_registros: int):
     line[394:400] = list(str(total_registros).zfill(6)[:6])
     return "".join(line)
 
-def _detail_retorno_bradesco(item, benef):
-    line = [" "] * 400
-    line[0] = "1"
+def _detail_retorno_bradesco(item, benef, nosso_numero: str = ""):
+    """Detalhe tipo 1; nosso_numero = 11 dígitos + DV (posições 71-82), vazio se não achado."""
     doc = (item.get("doc") or "")[:12].rjust(12)
-    line[37:49] = list(doc)
-    nn = "".ljust(8)
-    line[62:70] = list(nn)
     try:
         dd, mm, aaaa = item.get("venc","").split("/")
-        line[146:152] = list(dd+mm+aaaa[-2:])
+        venc = (dd+mm+aaaa[-2:]).ljust(6)[:6]
     except Exception:
-        pass
+        venc = " " * 6
     v = "".join(ch for ch in (item.get("valor") or "") if ch.isdigit())
     v = v.zfill(13)[-13:]
-    line[152:165] = list(v)
-    line[170:174] = list(benef["agencia"])
     ccc = (benef["conta"] + benef["dv_conta"])[:8].rjust(8)
-    line[174:182] = list(ccc)
-    line[106:108] = list(benef["carteira"])
     oc = (item.get("status") or "")[:10].rjust(10)
-    line[318:328] = list(oc)
-    return "".join(line)
+    return ("1" + " " * 36 + doc + " " * 21 + nosso_numero.ljust(12)[:12] + " " * 24
+            + benef["carteira"][:2].ljust(2) + " " * 38 + venc + v + " " * 5
+            + benef["agencia"][:4].ljust(4) + ccc + " " * 136 + oc + " " * 72)
+
+def converter_arquivo(path: str, out_path: str, benef: dict) -> tuple:
+    """
+    Converte um .RET: 1ª passada junta as chaves e resolve os NNs numa consulta,
+    2ª grava o retorno. Devolve (entrada, saída, registros, com_nosso_numero).
+    """
+    chaves = {k for k in map(_chave, _iter_bmp_retorno(path)) if k}
+    nns = nossos_numeros_por_chave(chaves) if chaves else {}
+    cart_padrao = benef["carteira"]
+
+    n = achados = 0
+    with open(out_path, "w", encoding="latin-1", errors="ignore", newline="") as f:
+        f.write(_header_retorno_bradesco(benef) + "\r\n")
+        for it in _iter_bmp_retorno(path):
+            nn = ""
+            achado = nns.get(_chave(it))
+            if achado:
+                nn11 = achado[0].zfill(11)[-11:]
+                nn = nn11 + dv_nosso_numero_base7(achado[1] or cart_padrao, nn11)
+                achados += 1
+            f.write(_detail_retorno_bradesco(it, benef, nn) + "\r\n")
+            n += 1
+        f.write(_trailer_retorno_bradesco(n + 2) + "\r\n")
+    return path, out_path, n, achados
+
+def converter_retornos(paths, cfg: dict | None = None, out_dir: str | None = None,
+                       workers: int | None = None, processos: bool = False, tarefa=None) -> list:
+    """
+    Converte vários .RET em paralelo (threads; processos=True para CPU em
+    processos separados). Arquivos sem detalhe são ignorados antes de reservar
+    os sequenciais de retorno (utils.sequencias), um por arquivo convertido,
+    num bloco só — devolvido se a conversão falhar ou for cancelada.
+    tarefa (utils.tasks): progresso por arquivo e cancelamento.
+    """
+    if cfg is None:
+        cfg, _ = _load_cfg()
+    paths = list(paths)
+    benef = _benef_from_meta_or_cfg(cfg)
+    out_dir = out_dir or (
+        cfg.get("pasta_retorno_nasapay")
+        or cfg.get("pasta_retorno")       # retrocompatível
+        or r"C:/nasapay/retornos"
+    )
+    os.makedirs(out_dir, exist_ok=True)
+
+    com_detalhe = [p for p in paths if _tem_detalhe(p)]
+    if not com_detalhe:
+        return []
+    seqs = sequencias.reservar("retorno", len(com_detalhe))
+    jobs = []
+    for seq, path in zip(seqs, com_detalhe):
+        b = dict(benef, sequencial_arquivo=seq)
+        base = os.path.splitext(os.path.basename(path))[0]
+        jobs.append((path, os.path.join(out_dir, f"RET_BRADESCO_{base}.ret"), b))
+
+    pool_cls = ProcessPoolExecutor if processos else ThreadPoolExecutor
+    res = []
+    with pool_cls(max_workers=max(1, min(len(jobs) or 1, workers or os.cpu_count() or 1))) as pool:
+        futs = [pool.submit(converter_arquivo, *j) for j in jobs]
+        try:
+            for k, fut in enumerate(as_completed(futs), start=1):
+                res.append(fut.result())
+                if tarefa is not None:
+                    tarefa.progresso(k, len(futs), os.path.basename(res[-1][0]))
+                    tarefa.token.verificar()
+        except BaseException:
+            for f in futs:
+                f.cancel()
+            sequencias.devolver("retorno", seqs)
+            raise
+
+    ordem = {p: i for i, p in enumerate(paths)}
+    return sorted(res, key=lambda r: ordem[r[0]])
 
 def converter_bmp_para_bradesco400(parent=None):
     """
-    1) pergunta o .RET do BMP
-    2) lê e exibe contagem
-    3) gera arquivo de retorno CNAB 400 (Bradesco) na Pasta Retorno Nasapay
+    1) pergunta os .RET do BMP (um ou vários)
+    2) converte em segundo plano, um arquivo por worker
+    3) gera os retornos CNAB 400 (Bradesco) na Pasta Retorno Nasapay
     """
-    cfg, salvar_parametros = _load_cfg()
+    cfg, _ = _load_cfg()
 
     # >>> abre na pasta configurada para retorno
     dir_retorno_ini = (
@@ -178,51 +262,32 @@ def converter_bmp_para_bradesco400(parent=None):
         or os.path.expanduser("~")
     )
 
-    path = filedialog.askopenfilename(
+    paths = filedialog.askopenfilenames(
         parent=parent,
         initialdir=dir_retorno_ini,
-        title="Selecione o arquivo de retorno BMP (.RET)",
+        title="Selecione os arquivos de retorno BMP (.RET)",
         filetypes=[("Retorno BMP", "*.ret;*.RET"), ("Todos", "*.*")]
     )
-    if not path:
-        return
-
-    itens = _parse_bmp_retorno(path)
-    if not itens:
-        messagebox.showerror("Retorno Nasapay", "Não encontrei registros de detalhe nesse arquivo.", parent=parent)
+    if not paths:
         return
 
-    benef = _benef_from_meta_or_cfg(cfg)
+    def _fim(res, err):
+        if err is not None:
+            messagebox.showerror("Retorno Nasapay", f"Falha na conversão:\n{err}", parent=parent)
+            return
+        if not res:
+            messagebox.showerror("Retorno Nasapay", "Não encontrei registros de detalhe nesses arquivos.", parent=parent)
+            return
+        linhas = [f"{os.path.basename(saida)}: {n} registro(s), {nn} com nosso número" for _, saida, n, nn in res]
+        messagebox.showinfo(
+            "Retorno convertido",
+            f"Arquivos convertidos: {len(res)} de {len(paths)}\n\n" + "\n".join(linhas[:20])
+            + (f"\n... e mais {len(linhas) - 20}" if len(linhas) > 20 else "")
+            + f"\n\nPasta: {os.path.dirname(res[0][1])}",
+            parent=parent
+        )
 
-    # >>> saída definida por “Pasta Retorno Nasapay”
-    out_dir = (
-        cfg.get("pasta_retorno_nasapay")
-        or cfg.get("pasta_retorno")       # retrocompatível
-        or r"C:/nasapay/retornos"
-    )
-    try:
-        os.makedirs(out_dir, exist_ok=True)
-    except Exception:
-        pass
-
-    base = os.path.splitext(os.path.basename(path))[0]
-    out_path = os.path.join(out_dir, f"RET_BRADESCO_{base}.ret")
-
-    lines = []
-    lines.append(_header_retorno_bradesco(benef))
-    for it in itens:
-        lines.append(_detail_retorno_bradesco(it, benef))
-    lines.append(_trailer_retorno_bradesco(len(lines)+1))
-
-    with open(out_path, "w", encoding="latin-1", errors="ignore") as f:
-        for ln in lines:
-            s = (ln or "")[:400].ljust(400)
-            f.write(s + "\r\n")
-
-    _bump_seq_retorno(cfg, salvar_parametros)
-
-    messagebox.showinfo(
-        "Retorno convertido",
-        f"Registros convertidos: {len(itens)}\nArquivo gerado:\n{out_path}",
-        parent=parent
-    )
+    from utils.ui_busy import run_with_busy
+    run_with_busy(parent, "Convertendo retornos",
+                  lambda tarefa: converter_retornos(paths, cfg=cfg, tarefa=tarefa),
+                  on_done=_fim, passar_tarefa=True)
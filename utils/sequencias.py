@@ -0,0 +1,291 @@
+# utils/sequencias.py — numeração única (nosso número, remessa, retorno)
+"""
+Serviço único de sequenciais, na tabela 'sequenciais' da base (uma linha por
+empresa). Toda numeração do app passa por aqui:
+
+    nn = sequencias.proximo("nn")                 # 1 número
+    bloco = sequencias.reservar("nn", 500)        # range de 500 consecutivos
+    seq = sequencias.proximo("remessa")
+    sequencias.devolver("remessa", seq)           # remessa descartada: volta se ainda for a última
+
+Cada reserva é um UPDATE dentro de BEGIN IMMEDIATE: dois processos nunca
+recebem o mesmo número e um bloco custa o mesmo que um número só.
+
+Na primeira reserva de cada empresa, os valores são importados das fontes
+antigas (tabela parametros, empresas, config.json, sequenciais.csv e o
+catálogo de remessas), ficando com o MAIOR de cada uma — a numeração pode
+pular, nunca repetir.
+
+Depois de cada mudança, o config.json do diretório do app (LEGADO_JSON), se
+existir, recebe os valores atuais para quem ainda lê de lá. A escrita é feita
+sob trava de arquivo entre processos (config.json.lock) e por troca atômica
+do arquivo.
+"""
+import os, csv, json, time, sqlite3
+from contextlib import contextmanager
+
+from utils import store, session
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+TIPOS = {"nn": "nn_atual", "remessa": "remessa_atual", "retorno": "retorno_atual"}
+# config.json do diretório do app: fonte antiga na importação e espelho depois
+LEGADO_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.json")
+LEGADO_CSV = r"C:/nasapay/sequenciais.csv"        # nosso_numero;sequencial_remessa;data_criacao
+ESPERA_MS = 30_000                                # busy_timeout com muitos processos disputando
+ESPERA_TRAVA_S = 10                               # trava do espelho: depois disso o espelho é pulado
+
+_tabela_ok: set = set()
+
+def _coluna(tipo: str) -> str:
+    try:
+        return TIPOS[tipo]
+    except KeyError:
+        raise ValueError(f"sequencial desconhecido: {tipo!r} (use {', '.join(TIPOS)})") from None
+
+def _empresa(empresa_id: int | None) -> int:
+    if empresa_id is None:
+        empresa_id = session.get_empresa_id()
+    return int(empresa_id or 0)
+
+def _con() -> sqlite3.Connection:
+    con = store._connect()
+    con.execute(f"PRAGMA busy_timeout={ESPERA_MS}")
+    chave = store._DB_PATH
+    if chave not in _tabela_ok:
+        store._ensure_sequenciais_table(con)
+        store._try_add_column(con, "sequenciais", "retorno_atual INTEGER DEFAULT 0")
+        store._try_add_column(con, "sequenciais", "importado INTEGER DEFAULT 0")
+        con.commit()
+        _tabela_ok.add(chave)
+    return con
+
+# ---------------- importação das fontes antigas ----------------
+def _int(v) -> int:
+    try:
+        return int("".join(ch for ch in str(v) if ch.isdigit()) or "0")
+    except (TypeError, ValueError):
+        return 0
+
+def _legado_json(caminho: str) -> dict:
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cfg, dict):
+        return {}
+    seqs = cfg.get("sequenciais") if isinstance(cfg.get("sequenciais"), dict) else {}
+    return {
+        "nn": max(_int(cfg.get("nosso_numero")), _int(seqs.get("nosso_numero"))),
+        "remessa": max(_int(cfg.get(k)) for k in ("ultima_remessa", "sequencial_remessa", "remessa")) if cfg else 0,
+        "remessa2": max(_int(seqs.get("ultima_remessa")), _int(seqs.get("remessa"))),
+        # seq_retorno_bradesco guardava o PRÓXIMO a usar
+        "retorno": max(0, _int(cfg.get("seq_retorno_bradesco")) - 1),
+    }
+
+def _legado_csv(caminho: str) -> dict:
+    ultimo = None
+    try:
+        with open(caminho, "r", encoding="utf-8", newline="") as f:
+            for ultimo in csv.DictReader(f, delimiter=";"):
+                pass
+    except (OSError, csv.Error):
+        return {}
+    if not ultimo:
+        return {}
+    return {"nn": _int(ultimo.get("nosso_numero")), "remessa": _int(ultimo.get("sequencial_remessa"))}
+
+def _legado_banco(con: sqlite3.Connection, eid: int) -> list[dict]:
+    achados = []
+    try:
+        vals = {(r[0], r[1]): r[2] for r in con.execute(
+            "SELECT secao, chave, valor FROM parametros WHERE empresa_id=?", (eid,))}
+        achados.append({
+            "nn": max(_int(vals.get(("sequenciais", "nosso_numero"))), _int(vals.get(("geral", "nosso_numero")))),
+            "remessa": max(_int(vals.get(("geral", k))) for k in ("ultima_remessa", "remessa", "sequencial_remessa")),
+            "retorno": max(0, _int(vals.get(("geral", "seq_retorno_bradesco"))) - 1),
+        })
+    except sqlite3.Error:
+        pass
+    try:
+        r = con.execute("SELECT nosso_numero_atual, ultima_remessa FROM empresas WHERE id=?", (eid,)).fetchone()
+        if r:   # nosso_numero_atual é o próximo a usar
+            achados.append({"nn": max(0, _int(r[0]) - 1), "remessa": _int(r[1])})
+    except sqlite3.Error:
+        pass
+    try:
+        sql = "SELECT MAX(sequencial) FROM remessa" + (" WHERE empresa_id=?" if eid else "")
+        achados.append({"remessa": _int(con.execute(sql, (eid,) if eid else ()).fetchone()[0])})
+    except sqlite3.Error:
+        pass
+    return achados
+
+def _importar_legado(con: sqlite3.Connection, eid: int) -> dict:
+    fontes = _legado_banco(con, eid)
+    if LEGADO_JSON:
+        fontes.append(_legado_json(LEGADO_JSON))
+    fontes.append(_legado_csv(LEGADO_CSV))
+    return {
+        "nn": max((f.get("nn", 0) for f in fontes), default=0),
+        "remessa": max((max(f.get("remessa", 0), f.get("remessa2", 0)) for f in fontes), default=0),
+        "retorno": max((f.get("retorno", 0) for f in fontes), default=0),
+    }
+
+# ---------------- transação ----------------
+@contextmanager
+def _transacao(eid: int):
+    """BEGIN IMMEDIATE com a linha da empresa garantida (e importada na primeira vez)."""
+    con = _con()
+    con.isolation_level = None
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            r = con.execute("SELECT importado FROM sequenciais WHERE empresa_id=?", (eid,)).fetchone()
+            if r is None or not r[0]:
+                v = _importar_legado(con, eid)
+                con.execute("""INSERT INTO sequenciais (empresa_id, nn_atual, remessa_atual, retorno_atual, importado)
+                               VALUES (?,?,?,?,1)
+                               ON CONFLICT(empresa_id) DO UPDATE SET
+                                   nn_atual=MAX(COALESCE(nn_atual, 0), excluded.nn_atual),
+                                   remessa_atual=MAX(COALESCE(remessa_atual, 0), excluded.remessa_atual),
+                                   retorno_atual=MAX(COALESCE(retorno_atual, 0), excluded.retorno_atual),
+                                   importado=1""", (eid, v["nn"], v["remessa"], v["retorno"]))
+                log.info("sequenciais da empresa %s importados das fontes antigas: %s", eid, v)
+            yield con
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.close()
+
+# ---------------- API ----------------
+def reservar(tipo: str, quantidade: int = 1, empresa_id: int | None = None) -> range:
+    """Reserva 'quantidade' números consecutivos de uma vez e devolve o range."""
+    col = _coluna(tipo)
+    if quantidade <= 0:
+        return range(0)
+    eid = _empresa(empresa_id)
+    with _transacao(eid) as con:
+        con.execute(f"UPDATE sequenciais SET {col}=COALESCE({col}, 0)+? WHERE empresa_id=?", (int(quantidade), eid))
+        ultimo = int(con.execute(f"SELECT {col} FROM sequenciais WHERE empresa_id=?", (eid,)).fetchone()[0])
+    _espelhar(eid)
+    return range(ultimo - quantidade + 1, ultimo + 1)
+
+def proximo(tipo: str, empresa_id: int | None = None) -> int:
+    return reservar(tipo, 1, empresa_id)[0]
+
+def atual(tipo: str, empresa_id: int | None = None) -> int:
+    """Último número entregue (0 se nenhum)."""
+    col = _coluna(tipo)
+    eid = _empresa(empresa_id)
+    with _transacao(eid) as con:
+        return int(con.execute(f"SELECT COALESCE({col}, 0) FROM sequenciais WHERE empresa_id=?", (eid,)).fetchone()[0])
+
+def devolver(tipo: str, reserva: "int | range", empresa_id: int | None = None) -> bool:
+    """
+    Desfaz a reserva (um número ou o range de reservar) se ninguém reservou
+    depois dela — ex.: remessa inválida. Devolve True se voltou.
+    """
+    col = _coluna(tipo)
+    bloco = reserva if isinstance(reserva, range) else range(int(reserva), int(reserva) + 1)
+    if not bloco:
+        return False
+    eid = _empresa(empresa_id)
+    with _transacao(eid) as con:
+        ok = con.execute(f"UPDATE sequenciais SET {col}=? WHERE empresa_id=? AND {col}=?",
+                         (bloco[0] - 1, eid, bloco[-1])).rowcount > 0
+    if ok:
+        _espelhar(eid)
+    return ok
+
+def definir(tipo: str, valor: int, empresa_id: int | None = None) -> None:
+    """Ajuste manual: o próximo número entregue será valor + 1."""
+    col = _coluna(tipo)
+    eid = _empresa(empresa_id)
+    with _transacao(eid) as con:
+        con.execute(f"UPDATE sequenciais SET {col}=? WHERE empresa_id=?", (max(0, int(valor)), eid))
+    _espelhar(eid)
+
+# ---------------- espelho legado (config.json) ----------------
+@contextmanager
+def _trava(caminho: str):
+    """
+    Trava exclusiva entre processos num arquivo ao lado (msvcrt no Windows,
+    flock no resto). Espera no máximo ESPERA_TRAVA_S e sobe TimeoutError.
+    """
+    fd = os.open(caminho + ".lock", os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        limite = time.monotonic() + ESPERA_TRAVA_S
+        while True:
+            try:
+                if os.name == "nt":
+                    import msvcrt
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= limite:
+                    raise TimeoutError(f"trava {caminho}.lock ocupada há mais de {ESPERA_TRAVA_S} s") from None
+                time.sleep(0.02)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                import msvcrt
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+def _espelhar(eid: int) -> None:
+    caminho = LEGADO_JSON
+    if not caminho or not os.path.exists(caminho):
+        return
+    try:
+        with _trava(caminho):
+            # lê os valores já dentro da trava: o último a escrever grava o estado mais novo
+            con = _con()
+            try:
+                r = con.execute("SELECT nn_atual, remessa_atual, retorno_atual FROM sequenciais WHERE empresa_id=?",
+                                (eid,)).fetchone()
+            finally:
+                con.close()
+            if r is None:
+                return
+            nn, rem, ret = (int(x or 0) for x in r)
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    cfg = json.load(f)
+            except ValueError as e:     # não reescreve (e apaga) as outras configurações
+                log.warning("espelho %s não atualizado: config.json ilegível (%s)", caminho, e)
+                return
+            if not isinstance(cfg, dict):
+                log.warning("espelho %s não atualizado: config.json não é um objeto JSON", caminho)
+                return
+            seqs = cfg.get("sequenciais") if isinstance(cfg.get("sequenciais"), dict) else {}
+            seqs.update(ultima_remessa=rem, remessa=rem, nosso_numero=nn)
+            cfg.update(ultima_remessa=str(rem).zfill(6), sequencial_remessa=str(rem).zfill(6),
+                       nosso_numero=str(nn).zfill(11), seq_retorno_bradesco=ret + 1, sequenciais=seqs)
+            tmp = f"{caminho}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cfg, f, indent=2, ensure_ascii=False)
+            for tentativa in range(5):      # no Windows um leitor com o arquivo aberto barra o replace
+                try:
+                    os.replace(tmp, caminho)
+                    break
+                except PermissionError:
+                    time.sleep(0.05 * (tentativa + 1))
+            else:
+                os.remove(tmp)
+                log.warning("espelho %s não atualizado (arquivo em uso)", caminho)
+    except OSError as e:
+        log.warning("espelho %s não atualizado: %s", caminho, e)
@@ -4,6 +4,9 @@ from typing import Optional, List, Dict, Iterable
 import re as _re
 import sqlite3, json, re
 
+from utils.titulo import valor_centavos_de
+from utils import perf
+
 def _connect(db_path=r"C:\nasapay\nasapay.db") -> sqlite3.Connection:
     con = sqlite3.connect(db_path)
     con.row_factory = sqlite3.Row
@@ -136,46 +139,35 @@ def _ensure_sequenciais_table(conn: sqlite3.Connection):
     """)
     conn.execute("CREATE INDEX IF NOT EXISTS idx_seq_emp ON sequenciais(empresa_id)")
 
-def _ensure_seq_row(conn: sqlite3.Connection, empresa_id: int):
-    _ensure_sequenciais_table(conn)
-    row = conn.execute("SELECT 1 FROM sequenciais WHERE empresa_id=?", (empresa_id,)).fetchone()
-    if not row:
-        conn.execute(
-            "INSERT INTO sequenciais(empresa_id, nn_atual, remessa_atual) VALUES (?,0,0)",
-            (empresa_id,)
-        )
-
+# A numeração em si fica em utils.sequencias (transação própria, importação
+# das fontes antigas e espelho no config.json); 'conn' é ignorado aqui.
 def peek_nn(conn: sqlite3.Connection, empresa_id: int) -> int:
-    _ensure_seq_row(conn, empresa_id)
-    v = conn.execute("SELECT nn_atual FROM sequenciais WHERE empresa_id=?", (empresa_id,)).fetchone()
-    return int((v[0] if v else 0) or 0)
+    from utils import sequencias
+    return sequencias.atual("nn", empresa_id)
 
 def peek_remessa(conn: sqlite3.Connection, empresa_id: int) -> int:
-    _ensure_seq_row(conn, empresa_id)
-    v = conn.execute("SELECT remessa_atual FROM sequenciais WHERE empresa_id=?", (empresa_id,)).fetchone()
-    return int((v[0] if v else 0) or 0)
+    from utils import sequencias
+    return sequencias.atual("remessa", empresa_id)
 
 def set_nn(conn: sqlite3.Connection, empresa_id: int, value: int):
-    _ensure_seq_row(conn, empresa_id)
-    conn.execute("UPDATE sequenciais SET nn_atual=? WHERE empresa_id=?", (int(value), empresa_id))
+    from utils import sequencias
+    sequencias.definir("nn", value, empresa_id)
 
 def set_remessa(conn: sqlite3.Connection, empresa_id: int, value: int):
-    _ensure_seq_row(conn, empresa_id)
-    conn.execute("UPDATE sequenciais SET remessa_atual=? WHERE empresa_id=?", (int(value), empresa_id))
+    from utils import sequencias
+    sequencias.definir("remessa", value, empresa_id)
 
 def next_nn(conn: sqlite3.Connection, empresa_id: int, width: int = 11) -> str:
-    cur_val = peek_nn(conn, empresa_id)
-    nxt = cur_val + 1
-    set_nn(conn, empresa_id, nxt)
+    from utils import sequencias
+    nxt = sequencias.proximo("nn", empresa_id)
     s = str(nxt).zfill(width)
     if len(s) > width:
         raise ValueError(f"Nosso Número ultrapassou {width} dígitos (valor atual={nxt}).")
     return s
 
 def next_remessa(conn: sqlite3.Connection, empresa_id: int, width: int = 6) -> str:
-    cur_val = peek_remessa(conn, empresa_id)
-    nxt = cur_val + 1
-    set_remessa(conn, empresa_id, nxt)
+    from utils import sequencias
+    nxt = sequencias.proximo("remessa", empresa_id)
     s = str(nxt).zfill(width)
     if len(s) > width:
         raise ValueError(f"Sequencial de remessa ultrapassou {width} dígitos (valor atual={nxt}).")
@@ -216,26 +208,12 @@ def ensure_company_sequentials(conn: sqlite3.Connection, empresa_id: int):
     _exec(conn, "UPDATE empresas SET ultima_remessa=COALESCE(ultima_remessa, 0) WHERE id=?", (empresa_id,))
 
 def next_nosso_numero(conn: sqlite3.Connection, empresa_id: int) -> int:
-    conn.execute("BEGIN IMMEDIATE")
-    row = _fetchone(conn, "SELECT nosso_numero_atual FROM empresas WHERE id=?", (empresa_id,))
-    if not row:
-        raise RuntimeError("Empresa não encontrada para NN")
-    nn = int(row[0] or 1)
-    _exec(conn, "UPDATE empresas SET nosso_numero_atual=? WHERE id=?", (nn + 1, empresa_id))
-    return nn
+    from utils import sequencias
+    return sequencias.proximo("nn", empresa_id)
 
 def next_sequencial_remessa(conn: sqlite3.Connection, empresa_id: int) -> int:
-    hoje = datetime.datetime.now().strftime("%d%m")
-    key = f"seq_remessa_{empresa_id}_{hoje}"
-    row = _fetchone(conn, "SELECT json FROM settings WHERE key=?", (key,))
-    last = int(json.loads(row[0])["n"]) if row and row[0] else 0
-    new = last + 1
-    payload = json.dumps({"n": new, "date": hoje})
-    if row:
-        _exec(conn, "UPDATE settings SET json=? WHERE key=?", (payload, key))
-    else:
-        _exec(conn, "INSERT INTO settings(key, json) VALUES(?, ?)", (key, payload))
-    return new
+    from utils import sequencias
+    return sequencias.proximo("remessa", empresa_id)
 
 # --- Sacadores / Avalistas (CRUD básico) ---
 def sac_list(conn: sqlite3.Connection, empresa_id: int):
@@ -344,6 +322,9 @@ def init_db(db_path: Optional[str] = None) -> None:
     """)
     cur.execute("CREATE INDEX IF NOT EXISTS idx_boleto_titulo ON boleto(titulo_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_boleto_sha1   ON boleto(pdf_sha1)")
+    # cache de renderização: digest das entradas do PDF (título + parâmetros + layout + logo)
+    _try_add_column(con, "boleto", "render_digest TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_boleto_digest ON boleto(render_digest)")
 
     cur.execute("""
         CREATE TABLE IF NOT EXISTS email_log (
@@ -541,20 +522,7 @@ def cb_delete(con, empresa_id: int, cid: int):
 
 # ---------------------- helpers p/ boletos/títulos ----------------------
 
-def _to_centavos(valor_str: Optional[str]) -> int:
-    s = (valor_str or "").strip().replace(" ", "")
-    if not s:
-        return 0
-    if "," in s and "." in s:
-        s = s.replace(".", "").replace(",", ".")
-    elif "," in s:
-        s = s.replace(",", ".")
-    try:
-        v = float(s)
-    except Exception:
-        v = float(int(_digits(s) or 0))
-    return int(round(max(0.0, v) * 100))
-
+@perf.medir("store.sha1")
 def _sha1_file(path: str) -> str:
     h = hashlib.sha1()
     with open(path, "rb") as f:
@@ -566,7 +534,8 @@ def _today_str() -> str:
     return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 # ---------------------- upserts/CRUD -----------------------
-def upsert_pagador_from_titulo(t: Dict) -> int:
+def upsert_pagador_from_titulo(t: Dict, con: Optional[sqlite3.Connection] = None) -> int:
+    """Com 'con', usa a conexão do chamador e não faz commit (lote numa transação só)."""
     doc = _digits(t.get("sacado_cnpj") or t.get("doc_pagador") or "")
     if not doc:
         doc = "00000000000"
@@ -580,7 +549,10 @@ def upsert_pagador_from_titulo(t: Dict) -> int:
     fantasia = (t.get("sacado_fantasia") or "").strip().upper()
     contato  = (t.get("sacado_contato")  or "").strip().upper()
 
-    con = _connect(); cur = con.cursor()
+    proprio = con is None
+    if proprio:
+        con = _connect()
+    cur = con.cursor()
     cur.execute("""
         INSERT INTO pagador (doc, nome, email, endereco, cidade, uf, cep, telefone, fantasia, contato)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -595,28 +567,39 @@ def upsert_pagador_from_titulo(t: Dict) -> int:
             fantasia=COALESCE(NULLIF(excluded.fantasia,''), pagador.fantasia),
             contato=COALESCE(NULLIF(excluded.contato,''), pagador.contato)
     """, (doc, nome, email, endereco, cidade, uf, cep, telefone, fantasia, contato))
-    con.commit()
     cur.execute("SELECT id FROM pagador WHERE doc=?", (doc,))
     row = cur.fetchone()
-    con.close()
+    if proprio:
+        con.commit(); con.close()
     return int(row["id"])
 
-def ensure_titulo(t: Dict, parametros: Dict) -> int:
-    pagador_id = upsert_pagador_from_titulo(t)
+@perf.medir("store.ensure_titulo")
+def ensure_titulo(t: Dict, parametros: Dict, con: Optional[sqlite3.Connection] = None) -> int:
+    pagador_id = upsert_pagador_from_titulo(t, con)
     origem = (t.get("origem") or "").strip().lower()
     documento = (t.get("documento") or "").strip()
     nosso_numero = _digits(t.get("nosso_numero") or "")
     carteira = _digits(parametros.get("carteira") or "")
-    try:
-        from utils.boletos_bmp import dv_nosso_numero_base7
-        nn_dv = dv_nosso_numero_base7(carteira.zfill(2), nosso_numero.zfill(11)) if nosso_numero else ""
-    except Exception:
-        nn_dv = ""
-    valor_cent = _to_centavos(t.get("valor"))
+    nn_dv = _digits(t.get("nn_dv") or "")[:1]  # já calculado (ex.: montar_codigos_lote)
+    if not nn_dv and nosso_numero:
+        try:
+            from utils.boletos_bmp import dv_nosso_numero_base7
+            nn_dv = dv_nosso_numero_base7(carteira.zfill(2), nosso_numero.zfill(11))
+        except Exception:
+            nn_dv = ""
+    valor_cent = valor_centavos_de(t)
     vencimento = (t.get("vencimento") or "").strip()
     emissao    = (t.get("emissao") or "").strip()
 
-    con = _connect(); cur = con.cursor()
+    proprio = con is None
+    if proprio:
+        con = _connect()
+    cur = con.cursor()
+
+    def _fim(tid):
+        if proprio:
+            con.commit(); con.close()
+        return int(tid)
 
     if nosso_numero:
         cur.execute("SELECT id FROM titulo WHERE nosso_numero=? AND pagador_id=?", (nosso_numero, pagador_id))
@@ -633,7 +616,7 @@ def ensure_titulo(t: Dict, parametros: Dict) -> int:
                        emissao=COALESCE(NULLIF(?, ''), emissao)
                  WHERE id=?""",
                  (documento, nn_dv, carteira, valor_cent, vencimento, emissao, tid))
-            con.commit(); con.close(); return tid
+            return _fim(tid)
 
     if documento:
         cur.execute("""SELECT id FROM titulo
@@ -652,7 +635,7 @@ def ensure_titulo(t: Dict, parametros: Dict) -> int:
                        emissao=COALESCE(NULLIF(?, ''), emissao)
                  WHERE id=?""",
                  (nosso_numero, nn_dv, carteira, valor_cent, vencimento, emissao, tid))
-            con.commit(); con.close(); return tid
+            return _fim(tid)
 
     cur.execute("""
         INSERT INTO titulo (pagador_id, origem, documento, nosso_numero, nn_dv, carteira,
@@ -660,42 +643,79 @@ def ensure_titulo(t: Dict, parametros: Dict) -> int:
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'gerado')
     """, (pagador_id, origem, documento, nosso_numero, nn_dv, carteira,
           valor_cent, vencimento, emissao))
-    con.commit()
-    tid = cur.lastrowid
-    con.close()
-    return int(tid)
+    return _fim(cur.lastrowid)
 
-def record_boleto(t: Dict, pdf_path: str, parametros: Dict) -> int:
-    titulo_id = ensure_titulo(t, parametros)
+@perf.medir("store.record_boleto")
+def record_boleto(t: Dict, pdf_path: str, parametros: Dict, render_digest: Optional[str] = None,
+                  con: Optional[sqlite3.Connection] = None) -> int:
     sha1 = _sha1_file(pdf_path)
+    proprio = con is None
+    if proprio:
+        con = _connect()
+    titulo_id = ensure_titulo(t, parametros, con)
+    cur = con.cursor()
+
+    def _fim(bid):
+        if proprio:
+            con.commit(); con.close()
+        return int(bid)
 
-    con = _connect(); cur = con.cursor()
     cur.execute("SELECT id, titulo_id FROM boleto WHERE pdf_sha1=?", (sha1,))
     r = cur.fetchone()
     if r:
         boleto_id = int(r["id"])
-        cur.execute("UPDATE boleto SET pdf_path=?, titulo_id=? WHERE id=?",
-                    (pdf_path, titulo_id, boleto_id))
-        con.commit(); con.close()
-        return boleto_id
+        cur.execute("""UPDATE boleto
+                          SET pdf_path=?, titulo_id=?,
+                              render_digest=COALESCE(?, render_digest)
+                        WHERE id=?""",
+                    (pdf_path, titulo_id, render_digest, boleto_id))
+        return _fim(boleto_id)
 
     cur.execute("SELECT id FROM boleto WHERE titulo_id=?", (titulo_id,))
     r2 = cur.fetchone()
     if r2:
         boleto_id = int(r2["id"])
-        cur.execute("UPDATE boleto SET pdf_path=?, pdf_sha1=?, generated_at=? WHERE id=?",
-                    (pdf_path, sha1, _today_str(), boleto_id))
-        con.commit(); con.close()
-        return boleto_id
+        cur.execute("UPDATE boleto SET pdf_path=?, pdf_sha1=?, generated_at=?, render_digest=? WHERE id=?",
+                    (pdf_path, sha1, _today_str(), render_digest, boleto_id))
+        return _fim(boleto_id)
 
     cur.execute("""
-        INSERT INTO boleto (titulo_id, pdf_path, pdf_sha1)
-        VALUES (?, ?, ?)
-    """, (titulo_id, pdf_path, sha1))
-    con.commit()
-    boleto_id = cur.lastrowid
-    con.close()
-    return int(boleto_id)
+        INSERT INTO boleto (titulo_id, pdf_path, pdf_sha1, render_digest)
+        VALUES (?, ?, ?, ?)
+    """, (titulo_id, pdf_path, sha1, render_digest))
+    return _fim(cur.lastrowid)
+
+@perf.medir("store.record_boletos")
+def record_boletos(itens: Iterable, parametros: Dict) -> List[int]:
+    """
+    record_boleto para um lote [(titulo, pdf_path, render_digest)] numa única
+    conexão e transação (um commit por lote em vez de vários por boleto).
+    """
+    con = _connect()
+    try:
+        ids = [record_boleto(t, pdf, parametros, render_digest=dg, con=con) for t, pdf, dg in itens]
+        con.commit()
+        return ids
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+
+def find_boleto_by_digest(render_digest: str) -> Optional[Dict]:
+    """
+    Busca (pelo índice idx_boleto_digest) um boleto já renderizado com as mesmas entradas.
+    Retorna {id, titulo_id, pdf_path} do mais recente ou None.
+    """
+    if not render_digest:
+        return None
+    con = _connect(); cur = con.cursor()
+    cur.execute("""SELECT id, titulo_id, pdf_path
+                     FROM boleto
+                    WHERE render_digest=?
+                    ORDER BY id DESC LIMIT 1""", (render_digest,))
+    r = cur.fetchone(); con.close()
+    return dict(r) if r else None
 
 # ---------------------- consultas para UI ----------------------
 def query_pagadores(q: Optional[str] = None) -> List[Dict]:
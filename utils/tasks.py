@@ -0,0 +1,329 @@
+# utils/tasks.py — tarefas em segundo plano para a interface Tk
+"""
+Um único agendador para o app inteiro, no lugar de uma Thread solta por
+operação:
+
+- ThreadPoolExecutor limitado (MAX_THREADS) para E/S (banco, arquivos, rede);
+  processo=True usa um ProcessPoolExecutor para trabalho de CPU (a função e
+  os argumentos precisam ser picklable).
+- Progresso e conclusão voltam para o Tk por UMA fila, drenada com after()
+  a cada INTERVALO_MS: nenhum callback toca em widget fora do main thread.
+  Atualizações de progresso de uma tarefa são coalescidas (só a última vale).
+- Cancelamento cooperativo: cada tarefa tem um CancelToken; a função consulta
+  token.cancelado / token.verificar() (ou repassa token.evento a um Pipeline).
+- abrir_painel_tarefas() lista o que está rodando, com botão de cancelar.
+
+    t = executar(widget, "Gerando boletos", func, arg, passar_tarefa=True,
+                 ao_progresso=lambda t: ..., ao_concluir=lambda res, err: ...)
+
+Com passar_tarefa=True a função recebe tarefa=Tarefa e chama
+tarefa.progresso(feito, total, mensagem) e tarefa.token.verificar().
+"""
+import os, time, queue, itertools, threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import tkinter as tk
+from tkinter import ttk
+
+from utils.pipeline import Cancelado
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+MAX_THREADS = 4
+INTERVALO_MS = 50
+HISTORICO = 100          # tarefas encerradas mantidas para o painel
+
+AGUARDANDO = "aguardando"
+EXECUTANDO = "executando"
+CONCLUIDA  = "concluída"
+CANCELADA  = "cancelada"
+FALHOU     = "falhou"
+
+class CancelToken:
+    def __init__(self, evento: threading.Event | None = None):
+        self.evento = evento or threading.Event()
+
+    def cancelar(self):
+        self.evento.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self.evento.is_set()
+
+    def verificar(self):
+        """Lança Cancelado se o cancelamento foi pedido."""
+        if self.evento.is_set():
+            raise Cancelado()
+
+class Tarefa:
+    def __init__(self, agendador: "Agendador", id: int, nome: str, token: CancelToken,
+                 ao_concluir=None, ao_progresso=None):
+        self.id = id
+        self.nome = nome
+        self.token = token
+        self.estado = AGUARDANDO
+        self.feito = 0
+        self.total = 0
+        self.mensagem = ""
+        self.erro: BaseException | None = None
+        self.criada = time.monotonic()
+        self.inicio = 0.0
+        self.fim = 0.0
+        self._agendador = agendador
+        self._ao_concluir = ao_concluir
+        self._ao_progresso = ao_progresso
+        self._progresso_pendente = False
+        self._future = None
+
+    def progresso(self, feito: int, total: int | None = None, mensagem: str = ""):
+        """Chamado do worker; o callback roda depois, no main thread."""
+        self.feito = feito
+        if total is not None:
+            self.total = total
+        if mensagem:
+            self.mensagem = mensagem
+        if not self._progresso_pendente:
+            self._progresso_pendente = True
+            self._agendador._postar(("progresso", self, None, None))
+
+    def cancelar(self):
+        self.token.cancelar()
+        if self._future is not None and self._future.cancel():
+            self._agendador._postar(("fim", self, None, Cancelado()))
+
+    @property
+    def ativa(self) -> bool:
+        return self.estado in (AGUARDANDO, EXECUTANDO)
+
+    @property
+    def percentual(self) -> float | None:
+        return 100.0 * self.feito / self.total if self.total else None
+
+    @property
+    def duracao(self) -> float:
+        if not self.inicio:
+            return 0.0
+        return (self.fim or time.monotonic()) - self.inicio
+
+class Agendador:
+    def __init__(self, max_threads: int = MAX_THREADS, max_processos: int | None = None):
+        self._threads = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="nasapay-tarefa")
+        self._max_processos = max_processos
+        self._processos: ProcessPoolExecutor | None = None
+        self._fila: queue.Queue = queue.Queue()
+        self._tarefas: dict[int, Tarefa] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._root = None
+        self.ouvintes: list = []      # fn() chamada no main thread quando alguma tarefa muda de estado
+
+    # ---------------- ligação com o Tk ----------------
+    def ligar_tk(self, widget) -> None:
+        """Passa a entregar callbacks no main thread do Tk (idempotente)."""
+        root = widget.winfo_toplevel()
+        while getattr(root, "master", None) is not None:
+            root = root.master
+        if self._root is root:
+            return
+        self._root = root
+        root.after(INTERVALO_MS, self._drenar)
+
+    def _drenar(self):
+        try:
+            while True:
+                self._despachar(self._fila.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            self._root.after(INTERVALO_MS, self._drenar)
+        except tk.TclError:          # janela principal destruída
+            self._root = None
+
+    def _postar(self, evento):
+        if self._root is None:       # sem Tk (linha de comando): entrega direto
+            self._despachar(evento)
+        else:
+            self._fila.put(evento)
+
+    def _despachar(self, evento):
+        tipo, t, res, err = evento
+        if tipo == "progresso":
+            t._progresso_pendente = False
+            if t._ao_progresso and t.ativa:
+                t._ao_progresso(t)
+            return
+        if not t.ativa:              # fim já entregue (ex.: cancelada antes de começar)
+            return
+        t.fim = time.monotonic()
+        t.erro = err
+        if isinstance(err, Cancelado) or (err is None and t.token.cancelado):
+            t.estado = CANCELADA
+        else:
+            t.estado = FALHOU if err is not None else CONCLUIDA
+        if err is not None and not isinstance(err, Cancelado):
+            log.error("'%s' falhou", t.nome, exc_info=err)
+        try:
+            if t._ao_concluir:
+                t._ao_concluir(res, err)
+        finally:
+            self._podar()
+            for fn in list(self.ouvintes):
+                try:
+                    fn()
+                except Exception:
+                    pass
+
+    def _podar(self):
+        with self._lock:
+            encerradas = [k for k, t in self._tarefas.items() if not t.ativa]
+            for k in encerradas[:max(0, len(encerradas) - HISTORICO)]:
+                del self._tarefas[k]
+
+    # ---------------- submissão ----------------
+    def submeter(self, nome: str, func, *args, processo: bool = False, ao_concluir=None, ao_progresso=None,
+                 token: CancelToken | None = None, passar_tarefa: bool = False, **kwargs) -> Tarefa:
+        """
+        Agenda func(*args, **kwargs). ao_concluir(resultado, erro) e
+        ao_progresso(tarefa) rodam no main thread do Tk.
+        """
+        t = Tarefa(self, next(self._ids), nome, token or CancelToken(), ao_concluir, ao_progresso)
+        with self._lock:
+            self._tarefas[t.id] = t
+        if passar_tarefa:
+            kwargs["tarefa"] = t
+
+        if processo:
+            if self._processos is None:
+                self._processos = ProcessPoolExecutor(max_workers=self._max_processos)
+            t.inicio = time.monotonic()
+            t.estado = EXECUTANDO
+            t._future = self._processos.submit(func, *args, **kwargs)
+
+            def _fim(fut):
+                if fut.cancelled():
+                    return
+                err = fut.exception()
+                self._postar(("fim", t, None if err else fut.result(), err))
+            t._future.add_done_callback(_fim)
+        else:
+            def _rodar():
+                res, err = None, None
+                t.inicio = time.monotonic()
+                t.estado = EXECUTANDO
+                try:
+                    t.token.verificar()
+                    res = func(*args, **kwargs)
+                except BaseException as e:
+                    err = e
+                self._postar(("fim", t, res, err))
+            t._future = self._threads.submit(_rodar)
+        for fn in list(self.ouvintes):
+            try:
+                fn()
+            except Exception:
+                pass
+        return t
+
+    def tarefas(self) -> list[Tarefa]:
+        with self._lock:
+            return list(self._tarefas.values())
+
+    def cancelar_todas(self):
+        for t in self.tarefas():
+            if t.ativa:
+                t.cancelar()
+
+    def encerrar(self):
+        """Cancela o que estiver pendente e libera os pools (ao fechar o app)."""
+        self.cancelar_todas()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processos is not None:
+            self._processos.shutdown(wait=False, cancel_futures=True)
+
+_agendador: Agendador | None = None
+_agendador_lock = threading.Lock()
+
+def agendador() -> Agendador:
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None:
+            _agendador = Agendador()
+        return _agendador
+
+def executar(widget, nome: str, func, *args, **kwargs) -> Tarefa:
+    """Atalho: liga o agendador ao Tk de 'widget' e submete a tarefa."""
+    ag = agendador()
+    if widget is not None:
+        ag.ligar_tk(widget)
+    return ag.submeter(nome, func, *args, **kwargs)
+
+# ======================== Painel de tarefas ========================
+
+def _fmt_tempo(seg: float) -> str:
+    seg = int(seg)
+    return f"{seg // 60}:{seg % 60:02d}"
+
+def abrir_painel_tarefas(parent=None):
+    """Janela com as tarefas em segundo plano e os processamentos interrompidos (retomáveis)."""
+    ag = agendador()
+    top = tk.Toplevel(parent) if parent else tk.Toplevel()
+    top.title("Tarefas em segundo plano")
+    top.geometry("760x420")
+    if parent is not None:
+        ag.ligar_tk(parent)
+
+    cols = ("id", "nome", "estado", "progresso", "tempo", "mensagem")
+    tv = ttk.Treeview(top, columns=cols, show="headings", height=10)
+    for c, h, w in zip(cols, ("#", "TAREFA", "ESTADO", "PROGRESSO", "TEMPO", "MENSAGEM"),
+                       (40, 220, 90, 90, 60, 240)):
+        tv.heading(c, text=h); tv.column(c, width=w, anchor="w")
+    tv.pack(fill="both", expand=True, padx=10, pady=(10, 4))
+
+    frm_jobs = ttk.LabelFrame(top, text="Processamentos interrompidos (rode de novo com os mesmos arquivos para retomar)")
+    frm_jobs.pack(fill="x", padx=10, pady=4)
+    tv_jobs = ttk.Treeview(frm_jobs, columns=("id", "tipo", "estado", "itens", "atualizado", "arquivos"),
+                           show="headings", height=4)
+    for c, h, w in zip(("id", "tipo", "estado", "itens", "atualizado", "arquivos"),
+                       ("#", "TIPO", "ESTADO", "ITENS", "ATUALIZADO", "ARQUIVOS"),
+                       (40, 110, 90, 60, 130, 300)):
+        tv_jobs.heading(c, text=h); tv_jobs.column(c, width=w, anchor="w")
+    tv_jobs.pack(fill="x", padx=6, pady=6)
+
+    def _atualizar_jobs():
+        try:
+            from utils import jobs
+            pendentes = jobs.listar_jobs(limite=20, pendentes=True)
+        except Exception:
+            pendentes = []
+        tv_jobs.delete(*tv_jobs.get_children())
+        for j in pendentes:
+            tv_jobs.insert("", "end", values=(j["id"], j["tipo"], j["estado"], j["itens"], j["atualizado_em"],
+                                              ", ".join(os.path.basename(a) for a in j["entradas"])))
+
+    def _atualizar():
+        if not top.winfo_exists():
+            return
+        sel = set(tv.selection())
+        tv.delete(*tv.get_children())
+        for t in reversed(ag.tarefas()):
+            pct = t.percentual
+            prog = f"{pct:5.1f}%" if pct is not None else (f"{t.feito}" if t.feito else "")
+            tv.insert("", "end", iid=str(t.id),
+                      values=(t.id, t.nome, t.estado, prog, _fmt_tempo(t.duracao),
+                              str(t.erro) if t.estado == FALHOU else t.mensagem))
+        tv.selection_set([i for i in sel if tv.exists(i)])
+        top.after(500, _atualizar)
+
+    def _cancelar_sel():
+        for iid in tv.selection():
+            t = next((x for x in ag.tarefas() if str(x.id) == iid), None)
+            if t is not None and t.ativa:
+                t.cancelar()
+
+    btns = ttk.Frame(top); btns.pack(fill="x", padx=10, pady=(4, 10))
+    ttk.Button(btns, text="Cancelar selecionada", command=_cancelar_sel).pack(side="left")
+    ttk.Button(btns, text="Fechar", command=top.destroy).pack(side="right")
+
+    _atualizar_jobs()
+    _atualizar()
+    return top
@@ -0,0 +1,193 @@
+# utils/titulo.py — representação canônica do título
+"""
+Título com tipos nativos: valor em centavos (int) e datas como datetime.date.
+O texto do arquivo é convertido uma única vez, na importação (extratores);
+remessa, boleto, registro de NN e banco leem os campos tipados e só formatam
+na borda ('1.234,56', 'DD/MM/AAAA', 'DDMMAA').
+
+Para não quebrar quem ainda trata o título como dict, Titulo também aceita
+t["valor"], t.get("vencimento"), "nosso_numero" in t e t[k] = v — nesses
+acessos valor/datas saem formatados como antes.
+"""
+import re
+from dataclasses import dataclass, field, fields
+from datetime import date, datetime
+
+# ---------------- conversões (entrada) ----------------
+
+def _so_digitos(s: str) -> str:
+    return "".join(ch for ch in s if ch.isdigit())
+
+_MILHARES = re.compile(r"[1-9]\d{0,2}(?:\.\d{3})+")
+
+def centavos(valor) -> int:
+    """
+    '1.234,56' / '1234,56' / '1234.56' (XML) / 1234.56 -> 123456.
+    Sem vírgula, ponto em grupos de 3 é milhar: '1.234' -> 123400,
+    '500.000' -> 50000000. int é tratado como centavos. Aritmética inteira
+    (sem float para strings); a 3ª casa decimal arredonda. Negativos e
+    vazios viram 0.
+    """
+    if valor is None:
+        return 0
+    if isinstance(valor, bool):
+        return 0
+    if isinstance(valor, int):
+        return max(0, valor)
+    if isinstance(valor, float):
+        return max(0, int(round(valor * 100)))
+    s = str(valor).strip().replace(" ", "")
+    if not s or s.startswith("-"):
+        return 0
+    if "," in s:
+        inteiro, _, frac = s.rpartition(",")
+        inteiro = inteiro.replace(".", "")
+    elif s.count(".") == 1 and not _MILHARES.fullmatch(s):
+        inteiro, _, frac = s.partition(".")
+    else:
+        inteiro, frac = s.replace(".", ""), ""
+    if not (inteiro.isdigit() or inteiro == "") or not (frac.isdigit() or frac == ""):
+        return int(_so_digitos(s) or 0) * 100
+    frac = (frac + "000")[:3]
+    c = int(inteiro or "0") * 100 + int(frac[:2])
+    if frac[2] >= "5":
+        c += 1
+    return c
+
+def data(valor) -> date | None:
+    """
+    'DD/MM/AAAA', 'AAAA-MM-DD[...]' (dhEmi do XML), 'DDMMAA', 'DDMMAAAA',
+    date/datetime -> date. Vazio, zeros ou inválido -> None.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    s = str(valor).strip()
+    try:
+        if len(s) >= 10 and s[4] == "-" and s[7] == "-":
+            return date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
+        if len(s) == 10 and s[2] == "/" and s[5] == "/":
+            return date(int(s[6:10]), int(s[3:5]), int(s[0:2]))
+        if s.isdigit():
+            if len(s) == 6:  # mesmo pivô do %y do strptime
+                aa = int(s[4:6])
+                return date(aa + (2000 if aa < 69 else 1900), int(s[2:4]), int(s[0:2]))
+            if len(s) == 8:
+                return date(int(s[4:8]), int(s[2:4]), int(s[0:2]))
+    except ValueError:
+        return None
+    return None
+
+# ---------------- formatação (borda) ----------------
+
+def fmt_brl(cents: int) -> str:
+    """123456 -> '1.234,56'."""
+    inteiro, frac = divmod(max(0, int(cents or 0)), 100)
+    return f"{inteiro:,}".replace(",", ".") + f",{frac:02d}"
+
+def fmt_data(d: date | None) -> str:
+    return f"{d.day:02d}/{d.month:02d}/{d.year:04d}" if d else ""
+
+def fmt_ddmmaa(d: date | None) -> str:
+    return f"{d.day:02d}{d.month:02d}{d.year % 100:02d}" if d else "000000"
+
+# ---------------- registro ----------------
+
+_DATAS = ("vencimento", "emissao")
+
+@dataclass(slots=True)
+class Titulo:
+    sacado: str = ""
+    documento: str = ""
+    valor_centavos: int = 0
+    vencimento: date | None = None
+    emissao: date | None = None
+    nosso_numero: str = ""
+    nn_dv: str = ""
+    sacado_cnpj: str = ""
+    doc_pagador_tipo: str = ""
+    sacado_endereco: str = ""
+    sacado_cidade: str = ""
+    sacado_uf: str = ""
+    sacado_cep: str = ""
+    sacado_fone: str = ""
+    origem: str = ""
+    extras: dict = field(default_factory=dict)
+
+    # ----- compatibilidade com dict -----
+    def _ler(self, k):
+        if k == "valor":
+            return fmt_brl(self.valor_centavos)
+        if k in _DATAS:
+            return fmt_data(getattr(self, k))
+        if k in _CAMPOS:
+            return getattr(self, k)
+        return self.extras.get(k)
+
+    def __getitem__(self, k):
+        if k not in _CAMPOS and k != "valor" and k not in self.extras:
+            raise KeyError(k)
+        return self._ler(k)
+
+    def get(self, k, default=None):
+        v = self._ler(k)
+        return default if v is None or v == "" else v
+
+    def __contains__(self, k):
+        return self.get(k) is not None
+
+    def __setitem__(self, k, v):
+        if k == "valor":
+            self.valor_centavos = centavos(v)
+        elif k == "valor_centavos":            # já em centavos ('12345' de linha do banco)
+            self.valor_centavos = int(v or 0)
+        elif k in _DATAS:
+            setattr(self, k, data(v))
+        elif k in _CAMPOS:
+            setattr(self, k, "" if v is None else str(v))
+        else:
+            self.extras[k] = v
+
+    def setdefault(self, k, default=None):
+        v = self.get(k)
+        if v is None:
+            self[k] = default
+            return default
+        return v
+
+    def como_dict(self) -> dict:
+        """Dict com valor/datas formatados (mesmo formato dos extratores antigos)."""
+        d = {k: self._ler(k) for k in _ORDEM if k != "valor_centavos"}
+        d["valor"] = fmt_brl(self.valor_centavos)
+        d.update(self.extras)
+        return d
+
+    @classmethod
+    def de_dict(cls, d: dict) -> "Titulo":
+        t = cls()
+        for k, v in d.items():
+            t[k] = v
+        return t
+
+_ORDEM = tuple(f.name for f in fields(Titulo) if f.name != "extras")
+_CAMPOS = frozenset(_ORDEM)
+
+# ---------------- acesso rápido para quem recebe dict ou Titulo ----------------
+
+def valor_centavos_de(t) -> int:
+    if isinstance(t, Titulo):
+        return t.valor_centavos
+    return centavos(t.get("valor"))
+
+def vencimento_de(t) -> date | None:
+    if isinstance(t, Titulo):
+        return t.vencimento
+    return data(t.get("vencimento"))
+
+def emissao_de(t) -> date | None:
+    if isinstance(t, Titulo):
+        return t.emissao
+    return data(t.get("emissao"))
@@ -1,6 +1,5 @@
 # utils/ui_busy.py
 import tkinter as tk
-from threading import Thread
 import os
 try:
     from PIL import Image, ImageTk
@@ -8,7 +7,8 @@ except Exception:
     Image = ImageTk = None  # opcional
 
 class BusyOverlay:
-    def __init__(self, parent, texto="Processando..."):
+    def __init__(self, parent, texto="Processando...", ao_cancelar=None):
+        """ao_cancelar: se informado, mostra o botão Cancelar (chamado uma vez, no main thread)."""
         self.parent = parent.winfo_toplevel()
         self.top = tk.Toplevel(self.parent)
         self.top.overrideredirect(True)
@@ -19,10 +19,18 @@ class BusyOverlay:
         self.canvas.pack(padx=18, pady=(16, 8))
         self._draw_logo()
         self.arc = self.canvas.create_arc(205, 22, 245, 62, start=0, extent=60, style="arc", width=3, outline="#2b6cb0")
-        tk.Label(frm, text=texto, bg="#fff", fg="#333", font=("Segoe UI", 10)).pack(padx=18, pady=(0, 16))
+        self.lbl = tk.Label(frm, text=texto, bg="#fff", fg="#333", font=("Segoe UI", 10))
+        self.lbl.pack(padx=18, pady=(0, 8 if ao_cancelar else 16))
+        self.btn_cancelar = None
+        if ao_cancelar:
+            def _cancelar():
+                self.btn_cancelar.configure(state="disabled", text="Cancelando…")
+                ao_cancelar()
+            self.btn_cancelar = tk.Button(frm, text="Cancelar", command=_cancelar, relief="groove", bg="#fff")
+            self.btn_cancelar.pack(pady=(0, 12))
 
         self.parent.update_idletasks()
-        w = 300; h = 150
+        w = 300; h = 185 if ao_cancelar else 150
         x = self.parent.winfo_rootx() + (self.parent.winfo_width() - w)//2
         y = self.parent.winfo_rooty() + (self.parent.winfo_height() - h)//2
         self.top.geometry(f"{w}x{h}+{max(x,0)}+{max(y,0)}")
@@ -49,22 +57,36 @@ class BusyOverlay:
         self.canvas.itemconfigure(self.arc, start=self._angle)
         self.top.after(50, self._tick)
 
+    def mensagem(self, texto: str):
+        try: self.lbl.configure(text=texto)
+        except Exception: pass
+
     def close(self):
         self._alive = False
         try: self.top.destroy()
         except Exception: pass
 
-def run_with_busy(parent, text, func, on_done=None):
-    """Executa func() em thread com overlay; chama on_done(result, error) no main thread."""
-    ov = BusyOverlay(parent, text); parent.update_idletasks()
-    def worker():
-        res, err = None, None
-        try: res = func()
-        except Exception as e: err = e
+def run_with_busy(parent, text, func, on_done=None, cancelar=None, passar_tarefa=False):
+    """
+    Executa func() no agendador de tarefas (utils.tasks) com overlay; chama
+    on_done(result, error) no main thread. Devolve a Tarefa.
+    cancelar: threading.Event que o botão Cancelar do overlay seta; func deve
+    observá-lo e encerrar limpo (ex.: Pipeline(cancelar=...)).
+    passar_tarefa=True: func(tarefa=...) pode chamar tarefa.progresso(feito, total,
+    mensagem), mostrado no overlay, e tarefa.token.verificar().
+    """
+    from utils import tasks
+    token = tasks.CancelToken(cancelar)
+    ov = BusyOverlay(parent, text, ao_cancelar=token.cancelar if (cancelar is not None or passar_tarefa) else None)
+    parent.update_idletasks()
+
+    def progresso(t):
+        pct = t.percentual
+        ov.mensagem(f"{text}  {t.feito}/{t.total}" if pct is not None else (t.mensagem or text))
+
+    def finish(res, err):
+        try: ov.close()
         finally:
-            def finish():
-                try: ov.close()
-                finally:
-                    if callable(on_done): on_done(res, err)
-            parent.after(0, finish)
-    Thread(target=worker, daemon=True).start()
+            if callable(on_done): on_done(res, err)
+    return tasks.executar(parent, text, func, ao_concluir=finish, ao_progresso=progresso,
+                          token=token, passar_tarefa=passar_tarefa)
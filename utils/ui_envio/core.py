@@ -4,6 +4,7 @@ from tkinter import ttk, messagebox
 
 from utils.parametros import carregar_parametros
 from utils.ui_busy import run_with_busy
+from utils import perf
 
 from .assinatura import open_assinatura_tab, html_escape
 from .smtp import send_html, img_to_cid
@@ -315,8 +316,9 @@ def _enviar_sacados(page, cfg, subject, raw_msg):
     html, inline = _build_html_message(cfg, raw_msg, pag, titles)
 
     def work():
-        send_html(cfg, pag["email"], subj, html, inline, files)
-        now_iso = ds.record_send(page, [t.get("tid") for t in titles if t.get("tid") is not None])
+        with perf.lote("envio"):
+            send_html(cfg, pag["email"], subj, html, inline, files)
+            now_iso = ds.record_send(page, [t.get("tid") for t in titles if t.get("tid") is not None])
         for _pid, t in choice:
             t["send_count"] = int(t.get("send_count") or 0) + 1
             t["last_ts"] = now_iso
@@ -391,7 +393,7 @@ def _ui_envio_sacado(container, cfg):
     def _clear_sel(*_):
         try: tvP.selection_remove(tvP.selection())
         except Exception: pass
-        ds.refresh_pagadores(page, v_busca_p.get()); _refresh_titles()
+        ds.refresh_pagadores(page, v_busca_p.get(), ao_concluir=_refresh_titles)
     btn_clear_sel.configure(command=_clear_sel)
     tvP.bind("<Escape>", lambda e: _clear_sel())
     ent_busca_p.bind("<Escape>", lambda e: v_busca_p.set(""))
@@ -579,8 +581,7 @@ def _ui_envio_sacado(container, cfg):
     # ---------------- Carga inicial ----------------
     try:
         ds.load_initial(page)
-        ds.refresh_pagadores(page, v_busca_p.get())
-        _refresh_titles()
+        ds.refresh_pagadores(page, v_busca_p.get(), ao_concluir=_refresh_titles)
     except Exception as e:
         messagebox.showwarning("Fonte de dados", f"Não consegui ler o banco padrão.\nDetalhe: {e}", parent=page)
 
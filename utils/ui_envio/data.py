@@ -9,6 +9,10 @@ Camada de dados para a tela de Envio.
 import os, sqlite3, datetime, re
 from typing import Dict, List, Tuple, Optional
 
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
 _DB_PATH = r"C:\nasapay\nasapay.db"
 
 # ------------- utils -------------
@@ -134,21 +138,49 @@ def _fetch_boletos_do_pagador(pagador_id: int) -> List[Dict]:
     con.close()
     return rows
 
+def _carregar(filtro_nome: str, token=None) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+    pags = _fetch_pagadores(filtro_nome or "")
+    titulos = {}
+    for p in pags:
+        if token is not None:
+            token.verificar()    # outra busca já foi pedida: abandona esta
+        titulos[str(p["id"])] = _fetch_boletos_do_pagador(int(p["id"]))
+    return pags, titulos
+
 # ------------- API da tela -------------
-def refresh_pagadores(page, filtro_nome: str) -> None:
+def refresh_pagadores(page, filtro_nome: str, ao_concluir=None) -> None:
     """
-    Recarrega a lista de pagadores e (preguiçosamente) os títulos de cada um.
-    Preenche o Treeview da esquerda.
+    Recarrega a lista de pagadores e os títulos de cada um em segundo plano
+    (utils.tasks) e preenche o Treeview da esquerda ao terminar; ao_concluir()
+    roda depois disso, no main thread. Uma nova chamada (ex.: a cada tecla da
+    busca) cancela a carga anterior, e só o resultado da última é aplicado.
     """
-    page._map_pags = _fetch_pagadores(filtro_nome or "")
-    # carrega títulos para cada pagador da lista atual
-    page._map_titles = {str(p["id"]): _fetch_boletos_do_pagador(int(p["id"])) for p in page._map_pags}
-
-    tvP = page._tvP
-    tvP.delete(*tvP.get_children())
-    for p in page._map_pags:
-        tvP.insert("", "end", iid=str(p["id"]),
-                   values=(p["razao"], p["fantasia"], p["fone"], p["email"], p["contato"]))
+    from utils import tasks
+    anterior = getattr(page, "_refresh_tarefa", None)
+    if anterior is not None and anterior.ativa:
+        anterior.cancelar()
+
+    def _aplicar(res, err):
+        if page._refresh_tarefa is not tarefa or err is not None:
+            if err is not None and not isinstance(err, tasks.Cancelado):
+                log.warning("falha ao carregar pagadores: %s", err)
+            return
+        page._map_pags, page._map_titles = res
+        try:
+            tvP = page._tvP
+            tvP.delete(*tvP.get_children())
+            for p in page._map_pags:
+                tvP.insert("", "end", iid=str(p["id"]),
+                           values=(p["razao"], p["fantasia"], p["fone"], p["email"], p["contato"]))
+        except Exception:
+            return   # aba fechada enquanto carregava
+        if callable(ao_concluir):
+            ao_concluir()
+
+    token = tasks.CancelToken()
+    tarefa = tasks.executar(page, "Carregar pagadores", _carregar, filtro_nome, token,
+                            token=token, ao_concluir=_aplicar)
+    page._refresh_tarefa = tarefa
 
 def save_pagador_field(page, pagador_id: str, col: str, value: str) -> None:
     """
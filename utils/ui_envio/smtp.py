@@ -6,6 +6,8 @@ from email.mime.base import MIMEBase
 from email.mime.image import MIMEImage
 from email import encoders
 
+from utils import perf
+
 def _from_header(cfg: dict) -> str:
     nome = (cfg.get("smtp_nome_remetente") or cfg.get("razao_social") or "").strip()
     mail = (cfg.get("smtp_email") or cfg.get("smtp_usuario") or "").strip()
@@ -89,6 +91,7 @@ def _smtp_connect(cfg: dict):
         server.login(user, pwd)
     return server
 
+@perf.medir("smtp.send_html")
 def send_html(cfg: dict, to_addr: str, subject: str, html: str, inline=None, files=None):
     inline = inline or []
     files  = files or []
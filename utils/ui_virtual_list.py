@@ -0,0 +1,362 @@
+# utils/ui_virtual_list.py — Treeview virtual para listas grandes
+"""
+ListaVirtual: um ttk.Treeview que só tem as linhas visíveis. As linhas vêm
+de uma fonte de dados em páginas (PAGINA linhas, poucas páginas em cache);
+rolar só troca os valores dos itens já existentes. Abrir uma janela com 50
+mil registros custa o mesmo que abrir com 50.
+
+Filtro e ordenação ficam na fonte, que sabe fazer melhor:
+
+    FonteLista    linhas já em memória (tuplas); filtra/ordena uma vez por
+                  mudança, depois só fatia
+    (nn_registry_ui._FonteRegistro pagina direto no SQL do registro)
+
+Toda fonte implementa contar(filtro) e pagina(filtro, ordem, reverso,
+inicio, qtd). As linhas são tuplas na ordem das colunas; valores a mais no
+fim (ex.: a chave do registro) não aparecem, mas voltam em selecionados().
+
+    lista = ListaVirtual(frm, [("sacado", "Sacado", 300, "w", True), ...], fonte)
+    lista.pack(fill="both", expand=True)
+    lista.filtrar("acme"); lista.dimensionar()
+    for linha in lista.selecionados(): ...
+
+Clique no cabeçalho ordena (de novo inverte). Seleção com clique,
+Ctrl/Shift+clique e setas/PageUp/PageDown/Home/End.
+"""
+from collections import OrderedDict
+from tkinter import ttk
+from tkinter import font as tkfont
+from typing import Callable
+
+PAGINA = 200            # linhas buscadas por vez na fonte
+PAGINAS_EM_CACHE = 8
+AMOSTRA = 300           # linhas medidas em dimensionar()
+LARGURA_MAX = 520
+PADDING = 24
+
+# ======================== fontes de dados ========================
+
+class FonteLista:
+    """
+    Linhas já em memória. 'chaves' = {coluna: função(valor) -> chave de
+    ordenação} para colunas cujo texto não ordena certo (valores, datas).
+    """
+    def __init__(self, linhas: list, colunas: tuple | list, chaves: dict | None = None):
+        self.linhas = linhas
+        self.colunas = list(colunas)
+        self.chaves = chaves or {}
+        self._textos: list[str] | None = None
+        self._visao_de = None
+        self._visao: list | None = None
+
+    def _indices(self, filtro: str, ordem: str | None, reverso: bool) -> list:
+        de = (filtro, ordem, reverso)
+        if self._visao is not None and self._visao_de == de:
+            return self._visao
+        if filtro:
+            if self._textos is None:
+                n = len(self.colunas)
+                self._textos = ["\x00".join(str(v) for v in ln[:n]).lower() for ln in self.linhas]
+            f = filtro.lower()
+            idx = [i for i, t in enumerate(self._textos) if f in t]
+        else:
+            idx = list(range(len(self.linhas)))
+        if ordem in self.colunas:
+            c = self.colunas.index(ordem)
+            chave = self.chaves.get(ordem) or (lambda v: str(v))
+            linhas = self.linhas
+            idx.sort(key=lambda i: chave(linhas[i][c]), reverse=reverso)
+        self._visao_de, self._visao = de, idx
+        return idx
+
+    def contar(self, filtro: str = "") -> int:
+        if self._visao is not None and self._visao_de[0] == filtro:
+            return len(self._visao)
+        return len(self._indices(filtro, None, False))
+
+    def pagina(self, filtro: str, ordem: str | None, reverso: bool, inicio: int, qtd: int) -> list:
+        idx = self._indices(filtro, ordem, reverso)
+        return [self.linhas[i] for i in idx[inicio:inicio + qtd]]
+
+    def invalidar(self) -> None:
+        self._textos = None
+        self._visao_de = self._visao = None
+
+# ======================== widget ========================
+
+class ListaVirtual(ttk.Frame):
+    """
+    colunas: [(id, título, largura, âncora, stretch, largura_mínima)] — os três
+    últimos opcionais ("w", True, até 60 px); dimensionar() não desce do mínimo.
+    ao_selecionar(lista) e ao_duplo_clique(linha) rodam no main thread do Tk.
+    """
+    def __init__(self, parent, colunas: list, fonte, selectmode: str = "extended",
+                 ordem: str | None = None, reverso: bool = False,
+                 ao_selecionar: Callable | None = None, ao_duplo_clique: Callable | None = None):
+        super().__init__(parent)
+        self.fonte = fonte
+        self.colunas = [c[0] for c in colunas]
+        self._titulos = {c[0]: c[1] for c in colunas}
+        self.selectmode = selectmode
+        self.filtro = ""
+        self.ordem = ordem
+        self.reverso = reverso
+        self.ao_selecionar = ao_selecionar
+        self.ao_duplo_clique = ao_duplo_clique
+
+        self.total = 0
+        self._topo = 0
+        self._visiveis = 1
+        self._paginas: OrderedDict[int, list] = OrderedDict()
+        self._sel: set[int] = set()
+        self._cursor: int | None = None
+        self._ancora: int | None = None
+        self._alt_linha: int | None = None
+        self._y0: int | None = None
+        self._agendado = False
+
+        self.tree = ttk.Treeview(self, columns=self.colunas, show="headings", selectmode="none", height=1)
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self._rolar)
+        self.hsb = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hsb.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.vsb.grid(row=0, column=1, sticky="ns")
+        self.hsb.grid(row=1, column=0, sticky="ew")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        for c in colunas:
+            cid, titulo, largura = c[0], c[1], c[2]
+            ancora = c[3] if len(c) > 3 else "w"
+            stretch = c[4] if len(c) > 4 else True
+            minimo = c[5] if len(c) > 5 else min(largura, 60)
+            self.tree.heading(cid, text=titulo, command=lambda k=cid: self.ordenar(k))
+            self.tree.column(cid, width=largura, minwidth=minimo, anchor=ancora, stretch=stretch)
+
+        try:
+            self._fonte_tk = tkfont.nametofont("TkDefaultFont")
+        except Exception:
+            self._fonte_tk = tkfont.Font(family="Segoe UI", size=9)
+
+        t = self.tree
+        t.bind("<Configure>", lambda e: self._agendar())
+        t.bind("<Button-1>", self._clique)
+        t.bind("<Double-1>", self._duplo)
+        t.bind("<MouseWheel>", lambda e: self._rolar("scroll", -3 if e.delta > 0 else 3, "units") or "break")
+        t.bind("<Button-4>", lambda e: self._rolar("scroll", -3, "units") or "break")
+        t.bind("<Button-5>", lambda e: self._rolar("scroll", 3, "units") or "break")
+        for tecla, passo in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-p"), ("<Next>", "+p"),
+                             ("<Home>", "ini"), ("<End>", "fim")):
+            t.bind(tecla, lambda e, p=passo: self._tecla(p, e))
+        self._atualizar_cabecalhos()
+        self.atualizar()
+
+    # ---------------- dados ----------------
+    def atualizar(self, manter_posicao: bool = True) -> None:
+        """Relê a contagem e as linhas da fonte (depois de editar/apagar/importar)."""
+        if hasattr(self.fonte, "invalidar"):
+            self.fonte.invalidar()
+        self._paginas.clear()
+        self._pagina(0)            # monta a visão (filtro + ordem) antes de contar
+        self.total = self.fonte.contar(self.filtro)
+        if not manter_posicao:
+            self._topo = 0
+        self._sel = {i for i in self._sel if i < self.total}
+        self._desenhar()
+
+    def filtrar(self, filtro: str) -> None:
+        self.filtro = (filtro or "").strip()
+        self._sel.clear(); self._cursor = self._ancora = None
+        self.atualizar(manter_posicao=False)
+
+    def ordenar(self, coluna: str, reverso: bool | None = None) -> None:
+        if reverso is None:
+            reverso = not self.reverso if coluna == self.ordem else False
+        self.ordem, self.reverso = coluna, reverso
+        self._sel.clear(); self._cursor = self._ancora = None
+        self._atualizar_cabecalhos()
+        self._paginas.clear()
+        self._topo = 0
+        self._desenhar()
+
+    def _pagina(self, p: int) -> list | None:
+        pg = self._paginas.get(p)
+        if pg is None:
+            pg = self.fonte.pagina(self.filtro, self.ordem, self.reverso, p * PAGINA, PAGINA)
+            self._paginas[p] = pg
+            while len(self._paginas) > PAGINAS_EM_CACHE:
+                self._paginas.popitem(last=False)
+        else:
+            self._paginas.move_to_end(p)
+        return pg
+
+    def linha(self, i: int) -> tuple | None:
+        if not 0 <= i < self.total:
+            return None
+        pg = self._pagina(i // PAGINA)
+        k = i % PAGINA
+        return pg[k] if k < len(pg) else None
+
+    def selecionados(self) -> list:
+        """Linhas selecionadas (com os valores extras), na ordem da lista."""
+        return [ln for ln in (self.linha(i) for i in sorted(self._sel)) if ln is not None]
+
+    def indices_selecionados(self) -> list[int]:
+        return sorted(self._sel)
+
+    # ---------------- desenho ----------------
+    def _atualizar_cabecalhos(self):
+        for c in self.colunas:
+            seta = (" ▼" if self.reverso else " ▲") if c == self.ordem else ""
+            self.tree.heading(c, text=self._titulos[c] + seta)
+
+    def _medidas(self) -> tuple[int, int]:
+        if self._alt_linha is None:
+            bbox = self.tree.bbox("0") if self.tree.exists("0") else ""
+            if bbox:
+                self._y0, self._alt_linha = bbox[1], bbox[3]
+            else:
+                alt = self._fonte_tk.metrics("linespace") + 4
+                return alt + 6, alt
+        return self._y0, self._alt_linha
+
+    def _agendar(self):
+        if not self._agendado:
+            self._agendado = True
+            self.after_idle(self._desenhar)
+
+    def _desenhar(self):
+        self._agendado = False
+        y0, alt = self._medidas()
+        altura = self.tree.winfo_height()
+        self._visiveis = max(1, (altura - y0) // alt) if altura > 1 else 20
+        self._topo = max(0, min(self._topo, self.total - self._visiveis))
+
+        n = min(self._visiveis, self.total - self._topo)
+        t = self.tree
+        existentes = len(t.get_children())
+        for k in range(n, existentes):
+            t.delete(str(k))
+        ncol = len(self.colunas)
+        sel = []
+        for k in range(n):
+            i = self._topo + k
+            ln = self.linha(i) or ()
+            valores = tuple(ln[:ncol])
+            iid = str(k)
+            if k < existentes:
+                t.item(iid, values=valores)
+            else:
+                t.insert("", "end", iid=iid, values=valores)
+            if i in self._sel:
+                sel.append(iid)
+        t.selection_set(sel)
+        if self._alt_linha is None and n:
+            self._medidas()
+        if self.total:
+            self.vsb.set(self._topo / self.total, min(1.0, (self._topo + self._visiveis) / self.total))
+        else:
+            self.vsb.set(0.0, 1.0)
+
+    def _rolar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            novo = int(round(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            n = int(args[1])
+            novo = self._topo + (n * max(1, self._visiveis - 1) if args[2] == "pages" else n)
+        else:
+            return
+        novo = max(0, min(novo, self.total - self._visiveis))
+        if novo != self._topo:
+            self._topo = novo
+            self._desenhar()
+
+    def ver(self, i: int) -> None:
+        """Rola até a linha i ficar visível."""
+        if i < self._topo:
+            self._topo = i
+        elif i >= self._topo + self._visiveis:
+            self._topo = i - self._visiveis + 1
+        self._desenhar()
+
+    # ---------------- seleção ----------------
+    def _selecionar(self, i: int, ctrl: bool = False, shift: bool = False):
+        if self.selectmode == "none":
+            return
+        if self.selectmode != "extended":
+            ctrl = shift = False
+        if shift and self._ancora is not None:
+            a, b = sorted((self._ancora, i))
+            faixa = set(range(a, b + 1))
+            self._sel = (self._sel | faixa) if ctrl else faixa
+        elif ctrl:
+            self._sel ^= {i}
+            self._ancora = i
+        else:
+            self._sel = {i}
+            self._ancora = i
+        self._cursor = i
+        self._desenhar()
+        if self.ao_selecionar:
+            self.ao_selecionar(self)
+
+    def _clique(self, e):
+        if self.tree.identify_region(e.x, e.y) not in ("cell", "tree"):
+            return None          # cabeçalho / separador: comportamento normal do Treeview
+        iid = self.tree.identify_row(e.y)
+        self.tree.focus_set()
+        if iid:
+            self._selecionar(self._topo + int(iid), ctrl=bool(e.state & 0x0004), shift=bool(e.state & 0x0001))
+        return "break"
+
+    def _duplo(self, e):
+        iid = self.tree.identify_row(e.y)
+        if iid and self.ao_duplo_clique:
+            ln = self.linha(self._topo + int(iid))
+            if ln is not None:
+                self.ao_duplo_clique(ln)
+        return "break"
+
+    def _tecla(self, passo, e):
+        if not self.total:
+            return "break"
+        atual = self._cursor if self._cursor is not None else self._topo
+        if passo == "ini":
+            i = 0
+        elif passo == "fim":
+            i = self.total - 1
+        elif passo in ("-p", "+p"):
+            i = atual + (self._visiveis - 1) * (-1 if passo == "-p" else 1)
+        else:
+            i = atual + passo
+        i = max(0, min(i, self.total - 1))
+        if i < self._topo or i >= self._topo + self._visiveis:
+            self._topo = i if i < self._topo else i - self._visiveis + 1
+        self._selecionar(i, shift=bool(e.state & 0x0001))
+        return "break"
+
+    # ---------------- colunas ----------------
+    def dimensionar(self, amostra: int = AMOSTRA, largura_max: int = LARGURA_MAX) -> None:
+        """
+        Ajusta as larguras pelo cabeçalho e por uma amostra de linhas (início
+        da lista + páginas espalhadas), sem medir todas as células.
+        """
+        linhas = []
+        if self.total:
+            passos = max(1, amostra // PAGINA)
+            inicios = sorted({0} | {(self.total * k // passos) // PAGINA * PAGINA for k in range(passos)})
+            for ini in inicios:
+                linhas += self.fonte.pagina(self.filtro, self.ordem, self.reverso, ini,
+                                            min(PAGINA, max(1, amostra - len(linhas))))
+                if len(linhas) >= amostra:
+                    break
+        medir = self._fonte_tk.measure
+        for k, c in enumerate(self.colunas):
+            w = medir(self._titulos[c] + " ▼") + PADDING
+            for ln in linhas:
+                if k < len(ln):
+                    w = max(w, medir(str(ln[k])) + PADDING)
+            info = self.tree.column(c)
+            self.tree.column(c, width=max(int(info.get("minwidth") or 40), min(w, largura_max)))
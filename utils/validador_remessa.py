@@ -1,96 +1,291 @@
 # === utils/validador_remessa.py ===
-import os, re
+import os, re, json, time
+from dataclasses import dataclass, asdict
+from functools import lru_cache
 from tkinter import filedialog, messagebox
 
-def _slice(line: str, i: int, j: int) -> str:
-    """1-based inclusive [i..j]."""
-    return line[i-1:j]
+from utils.cnab_mmap import ArquivoCnab, txt
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# ======================== motor de validação ========================
+# Coleta TODAS as violações (linha + faixa de colunas 1-based) em vez de parar
+# na primeira. Arquivos grandes são divididos em blocos de registros
+# conferidos num pool de processos (cada processo abre o próprio mmap).
+
+TAM_REGISTRO = 400
+BLOCO_REGISTROS = 25_000
+_MIN_REGISTROS_PARALELO = 60_000
+
+@dataclass(slots=True)
+class Violacao:
+    linha: int          # nº do registro (1 = header)
+    col_ini: int        # colunas 1-based inclusivas, como no manual do layout
+    col_fim: int
+    regra: str          # identificador curto (tamanho, multa, nn_dv...)
+    mensagem: str
+    valor: str = ""
+
+    @property
+    def colunas(self) -> str:
+        return f"{self.col_ini:03d}" if self.col_ini == self.col_fim else f"{self.col_ini:03d}–{self.col_fim:03d}"
+
+@dataclass(slots=True)
+class RelatorioValidacao:
+    arquivo: str
+    registros: int
+    violacoes: list
+    segundos: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.violacoes
+
+    def resumo(self) -> str:
+        if self.ok:
+            return f"{os.path.basename(self.arquivo)}: {self.registros} registros, nenhum erro."
+        linhas = len({v.linha for v in self.violacoes})
+        return (f"{os.path.basename(self.arquivo)}: {len(self.violacoes)} erro(s) em "
+                f"{linhas} registro(s) de {self.registros}.")
+
+    def como_dict(self) -> dict:
+        return {
+            "arquivo": self.arquivo,
+            "registros": self.registros,
+            "ok": self.ok,
+            "total_violacoes": len(self.violacoes),
+            "segundos": round(self.segundos, 3),
+            "violacoes": [asdict(v) for v in self.violacoes],
+        }
+
+    def salvar_json(self, caminho: str | None = None) -> str:
+        caminho = caminho or self.arquivo + ".validacao.json"
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.como_dict(), f, ensure_ascii=False, indent=2)
+        return caminho
 
 def _dig(s: str) -> str:
     return re.sub(r"\D", "", s or "")
 
-def _must_len(line: str, n: int, msg: str):
-    if len(line) != n:
-        raise ValueError(f"{msg}: esperado {n} colunas, veio {len(line)}")
+# --- DV do Nosso Número (módulo 11, base 7) sem laço por dígito ---
+# Mesmo cálculo de utils.boletos_bmp.dv_nosso_numero_base7: carteira (2) +
+# NN (11) com pesos 2..7 da direita para a esquerda. A parte da carteira é
+# constante no arquivo todo e fica em cache; para o NN, tabelas por posição.
+_CICLO = (2, 3, 4, 5, 6, 7)
+_PESOS_NN = tuple(_CICLO[i % 6] for i in range(11))[::-1]            # NN: posições 10..0 a partir da direita
+_TAB_NN = tuple(tuple(d * p for d in range(10)) for p in _PESOS_NN)
 
-def validar_remessa_bmp(path_rem: str) -> None:
+@lru_cache(maxsize=128)
+def _soma_carteira(cart2: str) -> int:
+    c = f"{int(cart2):02d}"
+    return int(c[0]) * _CICLO[12 % 6] + int(c[1]) * _CICLO[11 % 6]     # carteira: posições 12 e 11
+
+def _dv_nn(cart2: str, nn11: str) -> str:
+    s = _soma_carteira(cart2)
+    for tab, ch in zip(_TAB_NN, nn11):
+        s += tab[ord(ch) - 48]
+    resto = s % 11
+    return "0" if resto in (0, 1) else str(11 - resto)
+
+def _seq_nome(path_rem: str):
+    m = re.search(r"(\d{7})\.REM$", os.path.basename(path_rem).upper())
+    return int(m.group(1)) if m else None
+
+def _conferir_seq(out: list, n: int, l: str) -> None:
+    if l[394:400] != f"{n:06d}":
+        out.append(Violacao(n, 395, 400, "sequencial", f"Sequencial do registro deve ser {n:06d}.", l[394:400]))
+
+def _conferir_header(out: list, n: int, l: str, seq_nome) -> None:
+    if not l or l[0] != "0":
+        out.append(Violacao(n, 1, 1, "header", "Header inválido (tipo de registro deve ser '0').", l[:1]))
+        return
+    if len(l) != TAM_REGISTRO:
+        out.append(Violacao(n, 1, max(len(l), 1), "tamanho", f"Header: esperado {TAM_REGISTRO} colunas, veio {len(l)}."))
+        return
+    if l[11:26] != "COBRANCA".ljust(15):
+        out.append(Violacao(n, 12, 26, "header_literal", "Header: pos 12–26 deve ser 'COBRANCA'.", l[11:26]))
+    nr = l[110:117]
+    if not nr.isdigit():
+        out.append(Violacao(n, 111, 117, "header_nr_remessa", "Header: nº da remessa (111–117) não numérico.", nr))
+    elif seq_nome is not None and int(nr) != seq_nome:
+        out.append(Violacao(n, 111, 117, "header_nr_remessa",
+                            f"Header: pos 111–117 ({int(nr)}) deve bater com o sequencial do nome ({seq_nome}).", nr))
+    _conferir_seq(out, n, l)
+
+def _conferir_detalhe(out: list, n: int, l: str) -> None:
+    if not l or l[0] != "1":
+        out.append(Violacao(n, 1, 1, "tipo_registro", "Registro detalhe inválido (tipo deve ser '1').", l[:1]))
+        return
+    if len(l) != TAM_REGISTRO:
+        out.append(Violacao(n, 1, max(len(l), 1), "tamanho", f"Esperado {TAM_REGISTRO} colunas, veio {len(l)}."))
+        return
+
+    # MULTA
+    if l[65] == "0" and l[66:70] != "0000":
+        out.append(Violacao(n, 67, 70, "multa",
+                            "Código de multa isento (66='0') e percentual (67–70) não zerado.", l[66:70]))
+
+    # NOSSO NÚMERO + DV (71–82); carteira no identificador da empresa (022–024, 2 últimos dígitos)
+    nn, dv = l[70:81], l[81]
+    if not (nn.isdigit() and nn.isascii()):
+        out.append(Violacao(n, 71, 81, "nn", "Nosso Número (71–81) deve ter 11 dígitos.", nn))
+    else:
+        cart2 = l[22:24]
+        if not (cart2.strip().isdigit() and cart2.isascii()):
+            out.append(Violacao(n, 23, 24, "carteira", "Carteira (023–024) não numérica: DV do NN não pode ser conferido.", cart2))
+        else:
+            dv_ok = _dv_nn(cart2, nn)
+            if dv != dv_ok:
+                out.append(Violacao(n, 82, 82, "nn_dv", f"DV do Nosso Número inválido: esperado '{dv_ok}'.", dv))
+
+    # DOC PAGADOR
+    tipo, doc = l[218:220], l[220:234]
+    d = _dig(doc)
+    if len(d) not in (11, 14):
+        out.append(Violacao(n, 221, 234, "doc_pagador", "Número de inscrição do pagador inválido.", doc))
+    elif tipo == "02" and len(d) != 14:
+        out.append(Violacao(n, 219, 234, "doc_pagador", "Tipo de inscrição '02' (CNPJ) requer 14 dígitos.", doc))
+
+    _conferir_seq(out, n, l)
+
+def _conferir_trailer(out: list, n: int, l: str) -> None:
+    if not l or l[0] != "9":
+        out.append(Violacao(n, 1, 1, "trailer", "Trailer inválido (tipo de registro deve ser '9').", l[:1]))
+        return
+    if len(l) != TAM_REGISTRO:
+        out.append(Violacao(n, 1, max(len(l), 1), "tamanho", f"Trailer: esperado {TAM_REGISTRO} colunas, veio {len(l)}."))
+        return
+    _conferir_seq(out, n, l)
+
+def _validar_bloco(args) -> list:
+    """Detalhes [ini, fim) (índices 0-based) de um arquivo de passo fixo — roda nos processos."""
+    caminho, ini, fim = args
+    out = []
+    with ArquivoCnab(caminho, tam_registro=TAM_REGISTRO) as arq:
+        for i in range(ini, fim):
+            _conferir_detalhe(out, i + 1, txt(arq[i]))
+    return out
+
+def _blocos(caminho: str, ini: int, fim: int):
+    return [(caminho, a, min(a + BLOCO_REGISTROS, fim)) for a in range(ini, fim, BLOCO_REGISTROS)]
+
+def _validar_detalhes_paralelo(caminho: str, n: int, max_workers: int | None) -> list:
+    blocos = _blocos(caminho, 1, n - 1)
+    workers = max_workers or os.cpu_count() or 1
+    if workers > 1 and n >= _MIN_REGISTROS_PARALELO:
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(workers, len(blocos))) as ex:
+                return [v for parte in ex.map(_validar_bloco, blocos) for v in parte]
+        except (OSError, RuntimeError) as e:
+            log.warning("pool de processos indisponível (%s); validando em sequência", e)
+    return [v for b in blocos for v in _validar_bloco(b)]
+
+def validar_remessa(path_rem: str, max_workers: int | None = None) -> RelatorioValidacao:
     """
-    Validações locais:
-    - tamanho 400 colunas
-    - HEADER literal \'COBRANCA\'
-    - número da remessa (111–117) == sequencial do nome (últimos 7 dígitos) e >= 6
-    - MULTA: se código (66) == \'0\' então percentual (67–70) == \'0000\'
-    - DOC pagador: tipo (219–220) coerente com dígitos (221–234)
+    Confere a remessa inteira e devolve todas as violações:
+    - tamanho 400 colunas e tipo de registro (0 header, 1 detalhe, 9 trailer)
+    - HEADER literal 'COBRANCA' e número da remessa (111–117) == sequencial do nome
+    - MULTA: se código (66) == '0' então percentual (67–70) == '0000'
     - NOSSO NÚMERO: 71–81 (11 dígitos) e 82 = DV módulo 11 base 7 com a carteira
-      (carteira obtida do identificador da empresa: pos 022–024; usamos apenas os 2 últimos dígitos)
+    - DOC pagador: tipo (219–220) coerente com dígitos (221–234)
+    - sequencial do registro (395–400)
     """
+    t0 = time.perf_counter()
     if not os.path.exists(path_rem):
         raise ValueError("Arquivo REM não encontrado.")
+    out = []
+    seq_nome = _seq_nome(path_rem)
+    if seq_nome is None:
+        out.append(Violacao(0, 0, 0, "nome_arquivo", "Nome do arquivo não segue padrão CBddmmXXXXXXX.REM.",
+                            os.path.basename(path_rem)))
 
-    nome = os.path.basename(path_rem)
-    m = re.search(r"(\d{7})\.REM$", nome.upper())
-    if not m:
-        raise ValueError("Nome do arquivo não segue padrão CBddmmXXXXXXX.REM.")
-    seq_nome = int(m.group(1))
-
-    with open(path_rem, "r", encoding="latin-1") as f:
-        linhas = [ln.rstrip("\\r\\n") for ln in f]
-
-    if not linhas or linhas[0][0] != "0":
-        raise ValueError("Header inválido.")
-
-    # HEADER
-    h = linhas[0]
-    _must_len(h, 400, "Header")
-    literal = _slice(h, 12, 26)
-    if literal != "COBRANCA".ljust(15):
-        raise ValueError("Header: pos 12–26 deve ser \'COBRANCA\'.")
-    nr_header = int(_slice(h, 111, 117))
-    if nr_header != seq_nome:
-        raise ValueError(f"Header: pos 111–117 ({nr_header}) deve bater com o sequencial do nome.")
-
-    # DETALHES
-    for i, det in enumerate(linhas[1:-1], start=2):
-        if not det or det[0] != "1":
-            raise ValueError(f"Linha {i}: registro detalhe inválido.")
-        _must_len(det, 400, f"Linha {i}")
-
-        # MULTA
-        cod_multa = _slice(det, 66, 66)
-        perc_multa = _slice(det, 67, 70)
-        if cod_multa == "0" and perc_multa != "0000":
-            raise ValueError(f"Linha {i}: código de multa isento (66=\'0\') e percentual não zerado (67–70=\\'{perc_multa}\\'.)")
-
-        # NOSSO NÚMERO + DV (71–82)
-        nn = _slice(det, 71, 81)
-        dv = _slice(det, 82, 82)
-        if not nn.isdigit() or len(nn) != 11:
-            raise ValueError(f"Linha {i}: Nosso Número (71–81) deve ter 11 dígitos. Valor: \'{nn}\'.")
-        # carteira fica no identificador da empresa (021–037) => 022–024
-        cart3 = _slice(det, 22, 24)
-        cart2 = cart3[-2:]
-        
-        from utils.boletos_bmp import dv_nosso_numero_base7
-        dv_ok = dv_nosso_numero_base7(cart2, nn)
-        if dv != dv_ok:
-            raise ValueError(f"Linha {i}: DV do Nosso Número inválido em 82. Esperado \'{dv_ok}\' , recebido \'{dv}\'.")
-
-        # DOC PAGADOR
-        tipo = _slice(det, 219, 220)
-        doc  = _slice(det, 221, 234)
-        d = _dig(doc)
-        if not d.isdigit() or len(d) not in (11, 14):
-            raise ValueError(f"Linha {i}: número inscrição pagador inválido (221–234=\\'{doc}\\'.)")
-        if tipo == "01" and len(d) not in (11, 14):
-            raise ValueError(f"Linha {i}: tipo inscrição \'01\' (CPF) inconsistente com documento \'{doc}\'.")
-        if tipo == "02" and len(d) != 14:
-            raise ValueError(f"Linha {i}: tipo inscrição \'02\' (CNPJ) requer 14 dígitos no documento \'{doc}\'.")
-
-    # TRAILER
-    t = linhas[-1]
-    if not t or t[0] != "9":
-        raise ValueError("Trailer inválido.")
-    _must_len(t, 400, "Trailer")
+    with ArquivoCnab(path_rem, tam_registro=TAM_REGISTRO) as arq:
+        n = len(arq)
+        if n and arq.desalinhado() is None and arq.passo > TAM_REGISTRO:
+            # passo fixo: header/trailer direto por índice, detalhes em blocos
+            _conferir_header(out, 1, txt(arq[0]), seq_nome)
+            if n > 1:
+                out.extend(_validar_detalhes_paralelo(path_rem, n, max_workers))
+                _conferir_trailer(out, n, txt(arq[-1]))
+            else:
+                out.append(Violacao(1, 1, 1, "trailer", "Arquivo sem trailer."))
+        else:
+            # linhas de tamanho irregular: uma passada sequencial, linha a linha
+            n, anterior = 0, None
+            for i, reg in arq.linhas():
+                n = i
+                l = txt(reg)
+                if i == 1:
+                    _conferir_header(out, i, l, seq_nome)
+                    continue
+                if anterior:
+                    _conferir_detalhe(out, *anterior)
+                anterior = (i, l)
+            if anterior:
+                _conferir_trailer(out, *anterior)
+            elif n:
+                out.append(Violacao(1, 1, 1, "trailer", "Arquivo sem trailer."))
+        if not n:
+            out.append(Violacao(1, 1, 1, "header", "Arquivo vazio."))
+
+    out.sort(key=lambda v: (v.linha, v.col_ini))
+    return RelatorioValidacao(path_rem, n, out, time.perf_counter() - t0)
+
+def validar_remessa_bmp(path_rem: str) -> None:
+    """Compatibilidade: levanta ValueError com o 1º erro (e quantos mais houver)."""
+    rel = validar_remessa(path_rem)
+    if not rel.ok:
+        v = rel.violacoes[0]
+        extra = f" (+{len(rel.violacoes) - 1} outro(s) erro(s))" if len(rel.violacoes) > 1 else ""
+        onde = f"Linha {v.linha}, col. {v.colunas}: " if v.linha else ""
+        raise ValueError(f"{onde}{v.mensagem}{extra}")
+
+# ======================== relatório na tela ========================
+
+def mostrar_relatorio(rel: RelatorioValidacao, parent=None, titulo: str = "Validação da Remessa"):
+    """Janela com as violações numa Treeview (linha, colunas, regra, mensagem, valor)."""
+    import tkinter as tk
+    from tkinter import ttk
+
+    top = tk.Toplevel(parent) if parent else tk.Toplevel()
+    top.title(titulo)
+    top.geometry("980x520")
+
+    ttk.Label(top, text=rel.resumo(), font=("Segoe UI", 10, "bold")).pack(anchor="w", padx=10, pady=(10, 4))
+
+    frm = ttk.Frame(top); frm.pack(fill="both", expand=True, padx=10)
+    cols = ("linha", "colunas", "regra", "mensagem", "valor")
+    tv = ttk.Treeview(frm, columns=cols, show="headings", height=18)
+    for c, rot, w, anc in (("linha", "Linha", 70, "e"), ("colunas", "Colunas", 90, "center"),
+                           ("regra", "Regra", 120, "w"), ("mensagem", "Mensagem", 480, "w"),
+                           ("valor", "Valor", 160, "w")):
+        tv.heading(c, text=rot)
+        tv.column(c, width=w, anchor=anc)
+    sb = ttk.Scrollbar(frm, orient="vertical", command=tv.yview)
+    tv.configure(yscrollcommand=sb.set)
+    tv.pack(side="left", fill="both", expand=True)
+    sb.pack(side="left", fill="y")
+
+    LIMITE = 5000  # o JSON tem todas; a tela mostra as primeiras
+    for v in rel.violacoes[:LIMITE]:
+        tv.insert("", "end", values=(v.linha or "", v.colunas if v.col_ini else "", v.regra, v.mensagem, v.valor))
+    if len(rel.violacoes) > LIMITE:
+        ttk.Label(top, text=f"Mostrando {LIMITE} de {len(rel.violacoes)} — salve o JSON para ver todas.",
+                  foreground="#a00").pack(anchor="w", padx=10)
+
+    btns = ttk.Frame(top); btns.pack(fill="x", pady=8, padx=10)
+    def salvar():
+        destino = filedialog.asksaveasfilename(
+            parent=top, defaultextension=".json",
+            initialfile=os.path.basename(rel.arquivo) + ".validacao.json",
+            filetypes=[("JSON", "*.json")])
+        if destino:
+            rel.salvar_json(destino)
+    ttk.Button(btns, text="Salvar relatório (JSON)", command=salvar).pack(side="left")
+    ttk.Button(btns, text="Fechar", command=top.destroy).pack(side="right")
+    return top
 
 # --- wrapper simples p/ integrar com o menu ---
 def validar_arquivo_remessa(path_rem: str, parent=None) -> None:
@@ -108,7 +303,7 @@ def validar_arquivo_remessa(path_rem: str, parent=None) -> None:
 # Função de interface para o menu principal
 def open_validador_remessa(parent=None, container=None):
     """Interface para abrir o validador de remessa a partir do menu principal."""
-    print("[DEBUG] open_validador_remessa chamada!")
+    log.debug("open_validador_remessa chamada!")
     
     try:
         # Forçar reload dos módulos para garantir que estamos usando a versão mais recente
@@ -125,13 +320,13 @@ def open_validador_remessa(parent=None, container=None):
         cfg = carregar_parametros()
         pasta_remessas = cfg.get("pastas", {}).get("pasta_salvar_remessa_nasapay", os.path.expanduser("~"))
         
-        print(f"[DEBUG] Configurações carregadas: {type(cfg)}")
-        print(f"[DEBUG] Pasta remessas: {pasta_remessas}")
+        log.debug(f"Configurações carregadas: {type(cfg)}")
+        log.debug(f"Pasta remessas: {pasta_remessas}")
         
         # Garantir que a pasta existe
         if not os.path.exists(pasta_remessas):
             os.makedirs(pasta_remessas, exist_ok=True)
-            print(f"[DEBUG] Pasta criada: {pasta_remessas}")
+            log.debug(f"Pasta criada: {pasta_remessas}")
         
         # Abrir diálogo de seleção na pasta correta
         arquivo = filedialog.askopenfilename(
@@ -142,19 +337,22 @@ def open_validador_remessa(parent=None, container=None):
         )
         
         if not arquivo:
-            print("[DEBUG] Nenhum arquivo selecionado")
+            log.debug("Nenhum arquivo selecionado")
             return
         
-        print(f"[DEBUG] Arquivo selecionado: {arquivo}")
+        log.debug(f"Arquivo selecionado: {arquivo}")
         
         # Validar o arquivo selecionado
         try:
-            validar_remessa_bmp(arquivo)
-            messagebox.showinfo(
-                "Validação Concluída", 
-                f"Arquivo validado com sucesso!\\n\\nArquivo: {os.path.basename(arquivo)}", 
-                parent=parent
-            )
+            rel = validar_remessa(arquivo)
+            if rel.ok:
+                messagebox.showinfo(
+                    "Validação Concluída",
+                    f"Arquivo validado com sucesso!\n\n{rel.resumo()}",
+                    parent=parent
+                )
+            else:
+                mostrar_relatorio(rel, parent=parent)
         except Exception as e:
             messagebox.showerror(
                 "Erro de Validação", 
@@ -169,7 +367,8 @@ def open_validador_remessa(parent=None, container=None):
         messagebox.showerror("Erro", error_msg, parent=parent)
 
 # Garantir que as funções estão disponíveis no módulo
-__all__ = ['validar_remessa_bmp', 'validar_arquivo_remessa', 'open_validador_remessa']
+__all__ = ['Violacao', 'RelatorioValidacao', 'validar_remessa', 'mostrar_relatorio',
+           'validar_remessa_bmp', 'validar_arquivo_remessa', 'open_validador_remessa']
 
 # Debug: mostrar que o módulo foi carregado
-print(f"[DEBUG] Módulo validador_remessa carregado. Funções disponíveis: {__all__}")
+log.debug(f"Módulo validador_remessa carregado. Funções disponíveis: {__all__}")